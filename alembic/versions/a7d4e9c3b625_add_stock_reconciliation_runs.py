@@ -0,0 +1,45 @@
+"""Add stock_reconciliation_runs table and ledger sum index
+
+Revision ID: a7d4e9c3b625
+Revises: f6c3d8a2b514
+Create Date: 2026-10-17 16:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a7d4e9c3b625'
+down_revision: Union[str, None] = 'f6c3d8a2b514'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('stock_reconciliation_runs',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('mode', sa.String(), nullable=False),
+    sa.Column('repair', sa.Boolean(), nullable=False),
+    sa.Column('from_transaction_id', sa.Integer(), nullable=True),
+    sa.Column('to_transaction_id', sa.Integer(), nullable=True),
+    sa.Column('keys_checked', sa.Integer(), nullable=False),
+    sa.Column('drift_count', sa.Integer(), nullable=False),
+    sa.Column('repaired_count', sa.Integer(), nullable=False),
+    sa.Column('started_at', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('finished_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_stock_reconciliation_runs_id'), 'stock_reconciliation_runs', ['id'], unique=False)
+    op.create_index('ix_inventory_transactions_product_location_qty', 'inventory_transactions',
+                    ['product_id', 'location_id', 'quantity_change'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_inventory_transactions_product_location_qty', table_name='inventory_transactions')
+    op.drop_index(op.f('ix_stock_reconciliation_runs_id'), table_name='stock_reconciliation_runs')
+    op.drop_table('stock_reconciliation_runs')
@@ -0,0 +1,53 @@
+"""Add daily_sales_rollup table
+
+Revision ID: b7e41c2d9a10
+Revises: 92c385f0dafd
+Create Date: 2026-10-17 10:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b7e41c2d9a10'
+down_revision: Union[str, None] = '92c385f0dafd'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('daily_sales_rollup',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('business_date', sa.Date(), nullable=False),
+    sa.Column('location_id', sa.Integer(), nullable=False),
+    sa.Column('product_id', sa.Integer(), nullable=False),
+    sa.Column('quantity', sa.Float(), nullable=False),
+    sa.Column('revenue', sa.Float(), nullable=False),
+    sa.Column('discount_amount', sa.Float(), nullable=False),
+    sa.Column('sale_line_count', sa.Integer(), nullable=False),
+    sa.Column('rtc_quantity', sa.Float(), nullable=False),
+    sa.Column('rtc_line_count', sa.Integer(), nullable=False),
+    sa.Column('last_updated', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.ForeignKeyConstraint(['location_id'], ['locations.id'], ),
+    sa.ForeignKeyConstraint(['product_id'], ['products.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('business_date', 'location_id', 'product_id', name='uq_daily_sales_rollup_day_location_product')
+    )
+    op.create_index(op.f('ix_daily_sales_rollup_business_date'), 'daily_sales_rollup', ['business_date'], unique=False)
+    op.create_index(op.f('ix_daily_sales_rollup_id'), 'daily_sales_rollup', ['id'], unique=False)
+    op.create_index(op.f('ix_daily_sales_rollup_location_id'), 'daily_sales_rollup', ['location_id'], unique=False)
+    op.create_index(op.f('ix_daily_sales_rollup_product_id'), 'daily_sales_rollup', ['product_id'], unique=False)
+    # ข้อมูลเดิม: รัน python backfill_sales_rollup.py หลัง upgrade
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_daily_sales_rollup_product_id'), table_name='daily_sales_rollup')
+    op.drop_index(op.f('ix_daily_sales_rollup_location_id'), table_name='daily_sales_rollup')
+    op.drop_index(op.f('ix_daily_sales_rollup_id'), table_name='daily_sales_rollup')
+    op.drop_index(op.f('ix_daily_sales_rollup_business_date'), table_name='daily_sales_rollup')
+    op.drop_table('daily_sales_rollup')
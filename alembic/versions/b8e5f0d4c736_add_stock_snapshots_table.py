@@ -0,0 +1,42 @@
+"""Add stock_snapshots table
+
+Revision ID: b8e5f0d4c736
+Revises: a7d4e9c3b625
+Create Date: 2026-10-17 17:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b8e5f0d4c736'
+down_revision: Union[str, None] = 'a7d4e9c3b625'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('stock_snapshots',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('snapshot_date', sa.Date(), nullable=False),
+    sa.Column('product_id', sa.Integer(), nullable=False),
+    sa.Column('location_id', sa.Integer(), nullable=False),
+    sa.Column('quantity', sa.Float(), nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.ForeignKeyConstraint(['location_id'], ['locations.id'], ),
+    sa.ForeignKeyConstraint(['product_id'], ['products.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('snapshot_date', 'location_id', 'product_id', name='uq_stock_snapshot_date_location_product')
+    )
+    op.create_index(op.f('ix_stock_snapshots_id'), 'stock_snapshots', ['id'], unique=False)
+    # ข้อมูลเดิม: รัน python snapshot_stock.py --start <วันแรก> --end <เมื่อวาน> หลัง upgrade
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_stock_snapshots_id'), table_name='stock_snapshots')
+    op.drop_table('stock_snapshots')
@@ -0,0 +1,43 @@
+"""Add pg_trgm GIN indexes for product search
+
+Revision ID: d4a8e6b1f203
+Revises: c3f9a1d27e54
+Create Date: 2026-10-17 13:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd4a8e6b1f203'
+down_revision: Union[str, None] = 'c3f9a1d27e54'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+TRIGRAM_INDEXES = {
+    'ix_products_name_trgm': 'name',
+    'ix_products_sku_trgm': 'sku',
+    'ix_products_barcode_trgm': 'barcode',
+}
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # ใช้ได้เฉพาะ PostgreSQL (dialect อื่นใช้ n-gram index ในหน่วยความจำของ product_search_service)
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for index_name, column in TRIGRAM_INDEXES.items():
+        op.create_index(index_name, 'products', [sa.text(f'{column} gin_trgm_ops')], unique=False, postgresql_using='gin')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    for index_name in TRIGRAM_INDEXES:
+        op.drop_index(index_name, table_name='products', postgresql_using='gin')
+    # ไม่ DROP EXTENSION pg_trgm เพราะอาจมี object อื่นใช้อยู่
@@ -0,0 +1,96 @@
+"""Add stock_lots table
+
+Revision ID: f6c3d8a2b514
+Revises: e5b2c7d4a019
+Create Date: 2026-10-17 15:00:00.000000
+
+"""
+from datetime import datetime, timezone
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f6c3d8a2b514'
+down_revision: Union[str, None] = 'e5b2c7d4a019'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _backfill_lots() -> None:
+    """
+    สร้างล็อตจากยอด CurrentStock ที่มีอยู่: ยอดคงเหลือถือว่ามาจากรายการรับเข้า (STOCK_IN) ล่าสุดก่อน
+    (ของที่รับก่อนถูกขายไปก่อน) ส่วนที่เกินรายการรับเข้าเป็นล็อตที่ไม่มีวันหมดอายุ
+    """
+    bind = op.get_bind()
+    stock_rows = bind.execute(sa.text(
+        "SELECT product_id, location_id, quantity FROM current_stock WHERE quantity > 0"
+    )).all()
+    if not stock_rows: return
+    stock_in_rows = bind.execute(sa.text(
+        "SELECT id, product_id, location_id, quantity_change, expiry_date, production_date, cost_per_unit, transaction_date "
+        "FROM inventory_transactions WHERE transaction_type = 'STOCK_IN' AND quantity_change > 0 "
+        "ORDER BY product_id, location_id, transaction_date DESC, id DESC"
+    )).all()
+    stock_ins_by_key = {}
+    for row in stock_in_rows:
+        stock_ins_by_key.setdefault((row.product_id, row.location_id), []).append(row)
+
+    lots = []
+    backfilled_at = datetime.now(timezone.utc)
+    for product_id, location_id, quantity in stock_rows:
+        remaining = quantity
+        for tx in stock_ins_by_key.get((product_id, location_id), []):
+            if remaining <= 0: break
+            taken = min(remaining, tx.quantity_change)
+            lots.append({
+                "product_id": product_id, "location_id": location_id, "expiry_date": tx.expiry_date,
+                "production_date": tx.production_date, "cost_per_unit": tx.cost_per_unit,
+                "received_quantity": tx.quantity_change, "remaining_qty": taken,
+                "received_at": tx.transaction_date, "source_transaction_id": tx.id,
+            })
+            remaining -= taken
+        if remaining > 0:
+            lots.append({
+                "product_id": product_id, "location_id": location_id, "expiry_date": None,
+                "production_date": None, "cost_per_unit": None,
+                "received_quantity": remaining, "remaining_qty": remaining,
+                "received_at": backfilled_at, "source_transaction_id": None,
+            })
+    if lots: op.bulk_insert(sa.table('stock_lots', *[sa.column(name) for name in lots[0]]), lots)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('stock_lots',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('product_id', sa.Integer(), nullable=False),
+    sa.Column('location_id', sa.Integer(), nullable=False),
+    sa.Column('expiry_date', sa.Date(), nullable=True),
+    sa.Column('production_date', sa.Date(), nullable=True),
+    sa.Column('cost_per_unit', sa.Float(), nullable=True),
+    sa.Column('received_quantity', sa.Float(), nullable=False),
+    sa.Column('remaining_qty', sa.Float(), nullable=False),
+    sa.Column('received_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.Column('source_transaction_id', sa.Integer(), nullable=True),
+    sa.ForeignKeyConstraint(['location_id'], ['locations.id'], ),
+    sa.ForeignKeyConstraint(['product_id'], ['products.id'], ),
+    sa.ForeignKeyConstraint(['source_transaction_id'], ['inventory_transactions.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_stock_lots_id'), 'stock_lots', ['id'], unique=False)
+    op.create_index('ix_stock_lots_expiry_live', 'stock_lots', ['expiry_date'], unique=False,
+                    postgresql_where=sa.text('remaining_qty > 0'), sqlite_where=sa.text('remaining_qty > 0'))
+    op.create_index('ix_stock_lots_product_location_live', 'stock_lots', ['product_id', 'location_id', 'expiry_date'], unique=False,
+                    postgresql_where=sa.text('remaining_qty > 0'), sqlite_where=sa.text('remaining_qty > 0'))
+    _backfill_lots()
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_stock_lots_product_location_live', table_name='stock_lots')
+    op.drop_index('ix_stock_lots_expiry_live', table_name='stock_lots')
+    op.drop_index(op.f('ix_stock_lots_id'), table_name='stock_lots')
+    op.drop_table('stock_lots')
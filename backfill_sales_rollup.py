@@ -0,0 +1,32 @@
+# backfill_sales_rollup.py
+# สร้างตาราง daily_sales_rollup ใหม่จากข้อมูล sales / sale_items เดิม
+# ใช้หลังรัน alembic upgrade ครั้งแรก หรือเมื่อต้องการสร้างยอดรายวันใหม่บางช่วง
+#   python backfill_sales_rollup.py                                  (ทั้งหมด)
+#   python backfill_sales_rollup.py --start 2025-01-01 --end 2025-01-31 (เฉพาะช่วงวันที่ตามเวลาไทย)
+import argparse
+from datetime import date
+
+import database
+import models # noqa: F401 ให้ Base รู้จักทุกตาราง
+from services import sales_rollup_service
+
+def main():
+    parser = argparse.ArgumentParser(description="Backfill daily_sales_rollup from sales and sale_items.")
+    parser.add_argument("--start", type=date.fromisoformat, default=None, help="วันที่เริ่มต้น (YYYY-MM-DD, เวลาไทย)")
+    parser.add_argument("--end", type=date.fromisoformat, default=None, help="วันที่สิ้นสุด (YYYY-MM-DD, เวลาไทย, รวมวันนี้ด้วย)")
+    args = parser.parse_args()
+
+    if database.SessionLocal is None:
+        print("!!! Database session factory is not configured in database.py.")
+        return
+    db = database.SessionLocal()
+    try:
+        result = sales_rollup_service.backfill_daily_sales_rollup(db, start_date=args.start, end_date=args.end)
+        print(f"✅ daily_sales_rollup backfilled: removed {result['deleted']} rows, inserted {result['inserted']} rows.")
+    except Exception as e:
+        print(f"!!! Backfill failed: {type(e).__name__} - {e}")
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,7 @@
 # main.py
 import os
+import asyncio
+import anyio
 from fastapi import FastAPI, Request, HTTPException
 from fastapi.templating import Jinja2Templates
 from fastapi.staticfiles import StaticFiles
@@ -18,6 +20,8 @@ from routers import inventory as api_inventory_router_module
 from routers import sales as api_sales_router_module
 from routers import stock_count as api_stock_count_router_module
 from routers import dashboard as api_dashboard_router_module
+from routers import async_api as api_async_router_module # Async (AsyncSession) hot paths, opt-in
+import database
 
 # UI Routers
 try:
@@ -102,6 +106,52 @@ app.add_middleware(
 )
 # --- End SessionMiddleware ---
 
+# --- Thread Pool for DB-bound Handlers ---
+# Route handlers that use the synchronous SQLAlchemy Session (and the get_db dependency) are plain `def`,
+# so FastAPI runs them on AnyIO's worker thread pool instead of blocking the event loop.
+# Size this together with the DB connection pool so threads don't just queue on connections.
+THREADPOOL_MAX_WORKERS = int(os.getenv("THREADPOOL_MAX_WORKERS", "40"))
+
+@app.on_event("startup")
+async def configure_threadpool():
+    limiter = anyio.to_thread.current_default_thread_limiter()
+    limiter.total_tokens = THREADPOOL_MAX_WORKERS
+    print(f"[*] Thread pool for sync route handlers limited to {THREADPOOL_MAX_WORKERS} workers.")
+# --- End Thread Pool ---
+
+# --- DB Pool Stats Log (per worker) ---
+# Set DB_POOL_STATS_LOG_INTERVAL (seconds) to print pool usage periodically; 0 disables it.
+DB_POOL_STATS_LOG_INTERVAL = int(os.getenv("DB_POOL_STATS_LOG_INTERVAL", "0"))
+
+async def _log_db_pool_stats_forever():
+    while True:
+        await asyncio.sleep(DB_POOL_STATS_LOG_INTERVAL)
+        print(f"[db-pool] {database.get_pool_stats()}")
+
+@app.on_event("startup")
+async def start_db_pool_stats_logger():
+    if DB_POOL_STATS_LOG_INTERVAL > 0:
+        app.state.db_pool_stats_task = asyncio.create_task(_log_db_pool_stats_forever())
+# --- End DB Pool Stats Log ---
+
+# --- Cross-worker Cache Invalidation (per worker) ---
+# Each worker listens for invalidation events (Postgres LISTEN/NOTIFY, or polling cache_versions on SQLite)
+# so in-memory caches (scan index, reference data) drop stale entries when another worker commits a change.
+CACHE_BUS_ENABLED = os.getenv("CACHE_BUS_ENABLED", "true").lower() in ("1", "true", "yes")
+
+@app.on_event("startup")
+async def start_cache_invalidation_listener():
+    if CACHE_BUS_ENABLED and database.engine is not None:
+        from services import invalidation_service
+        invalidation_service.start_listener(database.engine, database.SessionLocal)
+        print(f"[*] Cache invalidation listener started ({database.engine.dialect.name}).")
+
+@app.on_event("shutdown")
+async def stop_cache_invalidation_listener():
+    from services import invalidation_service
+    invalidation_service.stop_listener()
+# --- End Cross-worker Cache Invalidation ---
+
 app.state.templates = templates
 try:
     if os.path.isdir(STATIC_DIR):
@@ -115,6 +165,12 @@ except Exception as e:
 # ========== Include Routers ==========
 API_INCLUDE_IN_SCHEMA = True # Controls whether API routes appear in OpenAPI docs
 
+# --- Async API Router (only when ASYNC_DATABASE_URL is set) ---
+# Included before the sync API routers so its handlers take over the same hot paths.
+if database.ASYNC_DB_ENABLED:
+    app.include_router(api_async_router_module.router)
+    print("[*] Async API routes enabled (AsyncSession) for sales, scan lookup, stock summary and dashboard.")
+
 # --- API Routers ---
 if api_categories_router_module:
     app.include_router(api_categories_router_module.router, prefix="/api/categories", tags=["API - หมวดหมู่สินค้า"], include_in_schema=API_INCLUDE_IN_SCHEMA)
@@ -169,6 +225,11 @@ async def health_check():
     """Simple health check endpoint."""
     return {"status": "ok", "timestamp": datetime.datetime.utcnow().isoformat()}
 
+@app.get("/health/db-pool", tags=["Health Check"], include_in_schema=False)
+def db_pool_stats():
+    """Connection pool stats for the worker that serves this request (checked-out, overflow, wait time)."""
+    return database.get_pool_stats()
+
 if __name__ == "__main__":
     import uvicorn
     # This part is for direct execution (e.g., python main.py)
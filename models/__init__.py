@@ -7,4 +7,10 @@ from .inventory_transaction import InventoryTransaction, TransactionType
 from .sale import Sale
 from .sale_item import SaleItem
 from .stock_count import StockCountSession, StockCountStatus
-from .stock_count_item import StockCountItem
\ No newline at end of file
+from .stock_count_item import StockCountItem
+from .daily_sales_rollup import DailySalesRollup
+from .cache_version import CacheVersion
+from .session_draft import SessionDraft
+from .stock_lot import StockLot
+from .stock_reconciliation_run import StockReconciliationRun
+from .stock_snapshot import StockSnapshot
@@ -0,0 +1,14 @@
+# models/cache_version.py
+from sqlalchemy import Column, Integer, String, DateTime
+from sqlalchemy.sql import func
+from database import Base # Absolute Import
+
+class CacheVersion(Base):
+    """ ตัวนับเวอร์ชันของข้อมูลที่ถูก cache ไว้ในแต่ละ worker (เพิ่มขึ้นใน transaction เดียวกับการแก้ข้อมูล) """
+    __tablename__ = "cache_versions"
+    name = Column(String, primary_key=True) # ชื่อ cache เช่น "products"
+    version = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+    def __repr__(self):
+        return f"<CacheVersion(name='{self.name}', version={self.version})>"
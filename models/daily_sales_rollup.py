@@ -0,0 +1,26 @@
+# models/daily_sales_rollup.py
+from sqlalchemy import Column, Integer, Float, ForeignKey, DateTime, Date, UniqueConstraint
+from sqlalchemy.orm import relationship
+from sqlalchemy.sql import func
+from database import Base # Absolute Import
+
+class DailySalesRollup(Base):
+    """ ยอดขายรวมรายวัน (วันทำการตามเวลา Asia/Bangkok) ต่อสถานที่และสินค้า อัปเดตทุกครั้งที่บันทึกการขาย """
+    __tablename__ = "daily_sales_rollup"
+    id = Column(Integer, primary_key=True, index=True)
+    business_date = Column(Date, nullable=False, index=True) # วันที่ขายตามเวลาไทย
+    location_id = Column(Integer, ForeignKey("locations.id"), nullable=False, index=True)
+    product_id = Column(Integer, ForeignKey("products.id"), nullable=False, index=True)
+    quantity = Column(Float, nullable=False, default=0.0)
+    revenue = Column(Float, nullable=False, default=0.0) # sum(quantity * unit_price)
+    discount_amount = Column(Float, nullable=False, default=0.0) # sum(discount_amount ต่อหน่วย * quantity)
+    sale_line_count = Column(Integer, nullable=False, default=0)
+    rtc_quantity = Column(Float, nullable=False, default=0.0)
+    rtc_line_count = Column(Integer, nullable=False, default=0)
+    last_updated = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+    location = relationship("Location")
+    product = relationship("Product")
+    __table_args__ = (UniqueConstraint('business_date', 'location_id', 'product_id', name='uq_daily_sales_rollup_day_location_product'),)
+    def __repr__(self):
+        return f"<DailySalesRollup(date={self.business_date}, location_id={self.location_id}, product_id={self.product_id}, qty={self.quantity})>"
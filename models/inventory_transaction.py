@@ -1,7 +1,7 @@
 # models/inventory_transaction.py
 import enum
 from sqlalchemy import (Column, Integer, String, Float, ForeignKey, DateTime,
-                        Text, Date, Enum as SQLAlchemyEnum)
+                        Text, Date, Index, Enum as SQLAlchemyEnum)
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from database import Base # Absolute Import
@@ -47,6 +47,11 @@ class InventoryTransaction(Base):
     product = relationship("Product", back_populates="inventory_transactions")
     location = relationship("Location", back_populates="inventory_transactions")
 
+    __table_args__ = (
+        # SUM(quantity_change) ต่อ (product, location) ทีละช่วงสินค้า (reconcile_stock.py) ด้วย index-only scan
+        Index("ix_inventory_transactions_product_location_qty", "product_id", "location_id", "quantity_change"),
+    )
+
     def __repr__(self):
         return (f"<InventoryTransaction(id={self.id}, "
                 f"type={self.transaction_type.value if self.transaction_type else 'None'}, "
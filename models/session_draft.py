@@ -0,0 +1,16 @@
+# models/session_draft.py
+from sqlalchemy import Column, String, DateTime, JSON
+from sqlalchemy.sql import func
+from database import Base # Absolute Import
+
+class SessionDraft(Base):
+    """ ข้อมูลฟอร์มหลายขั้นตอนที่ยังไม่ได้บันทึก (เช่น Batch รับสินค้าเข้ารอตรวจสอบ) cookie ของ session เก็บแค่ key """
+    __tablename__ = "session_drafts"
+    key = Column(String, primary_key=True) # token สุ่ม (secrets.token_urlsafe)
+    kind = Column(String, nullable=False) # ประเภทของ draft เช่น "stock_in_batch"
+    data = Column(JSON, nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    expires_at = Column(DateTime(timezone=True), nullable=False, index=True)
+
+    def __repr__(self):
+        return f"<SessionDraft(key='{self.key}', kind='{self.kind}', expires_at='{self.expires_at}')>"
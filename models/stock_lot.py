@@ -0,0 +1,37 @@
+# models/stock_lot.py
+from sqlalchemy import Column, Integer, Float, ForeignKey, DateTime, Date, Index
+from sqlalchemy.orm import relationship
+from sqlalchemy.sql import func
+from database import Base # Absolute Import
+
+class StockLot(Base):
+    """
+    ล็อตสินค้าที่ยังอยู่ในคลัง (หนึ่งแถวต่อการรับเข้า/รับโอนแต่ละครั้ง) remaining_qty ถูกตัดแบบ FEFO
+    (หมดอายุก่อนออกก่อน) เมื่อขาย โอนออก หรือปรับลด ผลรวม remaining_qty ของ (product, location) = ยอดคงเหลือที่มีล็อตรองรับ
+    ล็อตที่ไม่มีวันหมดอายุ (ปรับเพิ่ม / ข้อมูลเก่า) ถูกตัดหลังสุด
+    """
+    __tablename__ = "stock_lots"
+    id = Column(Integer, primary_key=True, index=True)
+    product_id = Column(Integer, ForeignKey("products.id"), nullable=False)
+    location_id = Column(Integer, ForeignKey("locations.id"), nullable=False)
+    expiry_date = Column(Date, nullable=True)
+    production_date = Column(Date, nullable=True)
+    cost_per_unit = Column(Float, nullable=True)
+    received_quantity = Column(Float, nullable=False)
+    remaining_qty = Column(Float, nullable=False)
+    received_at = Column(DateTime(timezone=True), server_default=func.now())
+    source_transaction_id = Column(Integer, ForeignKey("inventory_transactions.id"), nullable=True) # STOCK_IN / TRANSFER_IN / ADJUSTMENT_ADD ที่สร้างล็อตนี้
+
+    product = relationship("Product")
+    location = relationship("Location")
+
+    __table_args__ = (
+        # รายงานใกล้หมดอายุ: range scan เฉพาะล็อตที่ยังมีของ
+        Index("ix_stock_lots_expiry_live", "expiry_date", postgresql_where=(remaining_qty > 0), sqlite_where=(remaining_qty > 0)),
+        # FEFO: ล็อตที่ยังมีของของ (product, location) เรียงตามวันหมดอายุ
+        Index("ix_stock_lots_product_location_live", "product_id", "location_id", "expiry_date",
+              postgresql_where=(remaining_qty > 0), sqlite_where=(remaining_qty > 0)),
+    )
+
+    def __repr__(self):
+        return f"<StockLot(id={self.id}, product_id={self.product_id}, location_id={self.location_id}, expiry_date={self.expiry_date}, remaining_qty={self.remaining_qty})>"
@@ -0,0 +1,24 @@
+# models/stock_reconciliation_run.py
+from sqlalchemy import Column, Integer, String, DateTime, Boolean
+from sqlalchemy.sql import func
+from database import Base # Absolute Import
+
+class StockReconciliationRun(Base):
+    """
+    ประวัติการตรวจ current_stock เทียบกับผลรวม inventory_transactions (reconcile_stock.py)
+    to_transaction_id ของรอบล่าสุดที่สำเร็จคือ watermark ของโหมด incremental
+    """
+    __tablename__ = "stock_reconciliation_runs"
+    id = Column(Integer, primary_key=True, index=True)
+    mode = Column(String, nullable=False) # "full" / "incremental"
+    repair = Column(Boolean, nullable=False, default=False)
+    from_transaction_id = Column(Integer, nullable=True) # incremental: ตรวจเฉพาะ key ที่มี transaction id > ค่านี้
+    to_transaction_id = Column(Integer, nullable=True) # MAX(inventory_transactions.id) ตอนเริ่มรอบ
+    keys_checked = Column(Integer, nullable=False, default=0)
+    drift_count = Column(Integer, nullable=False, default=0)
+    repaired_count = Column(Integer, nullable=False, default=0)
+    started_at = Column(DateTime(timezone=True), nullable=False)
+    finished_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    def __repr__(self):
+        return f"<StockReconciliationRun(id={self.id}, mode='{self.mode}', to_transaction_id={self.to_transaction_id}, drift_count={self.drift_count})>"
@@ -0,0 +1,24 @@
+# models/stock_snapshot.py
+from sqlalchemy import Column, Integer, Float, ForeignKey, DateTime, Date, UniqueConstraint
+from sqlalchemy.sql import func
+from database import Base # Absolute Import
+
+class StockSnapshot(Base):
+    """
+    ยอดสต็อก ณ สิ้นวัน snapshot_date (เวลาไทย) = SUM(quantity_change) ของ transaction ก่อนเที่ยงคืนของวันถัดไป
+    เก็บเฉพาะ (product, location) ที่ยอดไม่เป็น 0 ใช้เป็นจุดเริ่มของ inventory_service.get_stock_as_of
+    """
+    __tablename__ = "stock_snapshots"
+    id = Column(Integer, primary_key=True, index=True)
+    snapshot_date = Column(Date, nullable=False)
+    product_id = Column(Integer, ForeignKey("products.id"), nullable=False)
+    location_id = Column(Integer, ForeignKey("locations.id"), nullable=False)
+    quantity = Column(Float, nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    __table_args__ = (
+        UniqueConstraint("snapshot_date", "location_id", "product_id", name="uq_stock_snapshot_date_location_product"),
+    )
+
+    def __repr__(self):
+        return f"<StockSnapshot(snapshot_date={self.snapshot_date}, product_id={self.product_id}, location_id={self.location_id}, quantity={self.quantity})>"
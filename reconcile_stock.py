@@ -0,0 +1,51 @@
+# reconcile_stock.py
+# ตรวจ current_stock เทียบกับผลรวม inventory_transactions ต่อ (สินค้า, สถานที่) และซ่อมยอดที่ไม่ตรง (ถ้าสั่ง)
+#   python reconcile_stock.py                       (full: ตรวจทุก key แบบขนาน รายงานอย่างเดียว)
+#   python reconcile_stock.py --incremental         (ตรวจเฉพาะ key ที่มี transaction ใหม่กว่ารอบก่อน)
+#   python reconcile_stock.py --incremental --since-id 1200000
+#   python reconcile_stock.py --repair              (ตั้ง current_stock = ผลรวม ledger สำหรับ key ที่ไม่ตรง)
+# คืน exit code 1 ถ้าเจอยอดไม่ตรงที่ไม่ได้ซ่อม (ใช้กับ cron / monitoring ได้)
+import argparse
+import sys
+
+import database
+import models # noqa: F401 ให้ Base รู้จักทุกตาราง
+from services import stock_reconciliation_service
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Reconcile current_stock against inventory_transactions.")
+    parser.add_argument("--incremental", action="store_true", help="ตรวจเฉพาะ key ที่มี transaction หลัง watermark ของรอบก่อน")
+    parser.add_argument("--since-id", type=int, default=None, help="watermark (inventory_transactions.id) ที่ใช้แทนค่าของรอบก่อน")
+    parser.add_argument("--repair", action="store_true", help="ซ่อม current_stock (และ stock_lots) ให้ตรงกับ ledger")
+    parser.add_argument("--workers", type=int, default=stock_reconciliation_service.RECONCILE_WORKERS, help="จำนวน process ที่สแกนขนานกัน")
+    parser.add_argument("--chunk-products", type=int, default=stock_reconciliation_service.RECONCILE_CHUNK_PRODUCTS, help="จำนวน product_id ต่อ chunk (full)")
+    parser.add_argument("--show", type=int, default=50, help="จำนวนรายการที่ไม่ตรงที่แสดง")
+    args = parser.parse_args()
+
+    if database.SessionLocal is None:
+        print("!!! Database session factory is not configured in database.py.")
+        return 2
+    db = database.SessionLocal()
+    try:
+        result = stock_reconciliation_service.reconcile_stock(
+            db, incremental=args.incremental or args.since_id is not None, repair=args.repair,
+            since_transaction_id=args.since_id, workers=args.workers, chunk_products=args.chunk_products
+        )
+    except Exception as e:
+        print(f"!!! Reconciliation failed: {type(e).__name__} - {e}")
+        return 2
+    finally:
+        db.close()
+
+    drifts = result["drifts"]
+    for drift in drifts[:args.show]:
+        print(f"  product {drift['product_id']} @ location {drift['location_id']}: "
+              f"current_stock={drift['stock_quantity']:g} ledger={drift['ledger_quantity']:g} (diff {drift['difference']:+g})")
+    if len(drifts) > args.show: print(f"  ... and {len(drifts) - args.show} more")
+    print(f"{'✅' if not drifts or args.repair else '⚠️'} {result['mode']} reconciliation: checked {result['keys_checked']} keys "
+          f"in {result['chunks']} chunks (transactions {result['from_transaction_id'] or 0}..{result['to_transaction_id']}), "
+          f"{len(drifts)} drifted, {result['repaired_count']} repaired.")
+    return 1 if drifts and not args.repair else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
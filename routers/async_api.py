@@ -0,0 +1,148 @@
+# routers/async_api.py
+# Async (AsyncSession) versions of the hot API endpoints: POS sale, barcode/SKU scan lookup,
+# stock summary and the dashboard widgets. main.py only includes this router when
+# ASYNC_DATABASE_URL is configured, and includes it *before* the sync API routers so these
+# handlers take over the same paths; everything else keeps using the sync Session.
+from fastapi import APIRouter, Depends, HTTPException, status, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
+
+import schemas
+from services import sales_service, product_service, product_search_service, inventory_service, dashboard_service
+from database import get_async_db
+from routers.sales import sale_error_to_http_exception
+
+router = APIRouter(include_in_schema=False) # Same paths as the sync API routers, which stay in the docs
+
+# --- Sales ---
+@router.post("/api/sales/", response_model=schemas.Sale, status_code=status.HTTP_201_CREATED)
+async def api_record_new_sale_async(
+    sale: schemas.SaleCreate,
+    allow_negative_stock: bool = Query(False, alias="allowNegativeStock", description="Allow sale even if stock is insufficient"),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """ บันทึกข้อมูลการขายใหม่ (API, AsyncSession) """
+    try:
+        return await sales_service.record_sale_async(db, sale_data=sale, allow_negative_stock_on_sale=allow_negative_stock)
+    except ValueError as e:
+        raise sale_error_to_http_exception(e)
+    except Exception as e:
+        print(f"Unexpected Error during sale recording (async API): {type(e).__name__} - {e}")
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="เกิดข้อผิดพลาดภายในระบบขณะบันทึกการขาย (API)")
+
+# --- Products ---
+@router.get("/api/products/lookup-by-scan/{scan_code}", response_model=Optional[schemas.ProductScanResult])
+async def api_lookup_product_by_scan_code_async(scan_code: str, db: AsyncSession = Depends(get_async_db)):
+    """ ค้นหาสินค้าด้วย SKU หรือ Barcode (สำหรับ POS Scan, AsyncSession, ตอบจาก scan index ในหน่วยความจำ) """
+    if not scan_code or not scan_code.strip():
+        return None
+    return await product_service.lookup_product_by_scan_code_async(db, scan_code=scan_code)
+
+@router.get("/api/products/search", response_model=schemas.ProductSearchResult)
+async def api_search_products_async(
+    q: str = Query(""),
+    category_id: Optional[int] = Query(None),
+    skip: int = Query(0, ge=0),
+    limit: int = Query(20, ge=1, le=100),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """ ค้นหาสินค้าแบบ type-ahead (AsyncSession) """
+    return await product_search_service.search_products_async(db, q, category_id=category_id, skip=skip, limit=limit)
+
+# --- Inventory ---
+@router.get("/api/inventory/summary/", response_model=List[schemas.CurrentStock])
+async def api_get_inventory_summary_async(
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1),
+    category_id_str: Optional[str] = Query(None, alias="category_id"),
+    location_id_str: Optional[str] = Query(None, alias="location_id"),
+    db: AsyncSession = Depends(get_async_db)
+):
+    category_id: Optional[int] = None
+    if category_id_str is not None and category_id_str.strip():
+        try: category_id = int(category_id_str)
+        except ValueError: raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid category_id format for API.")
+
+    location_id: Optional[int] = None
+    if location_id_str is not None and location_id_str.strip():
+        try: location_id = int(location_id_str)
+        except ValueError: raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid location_id format for API.")
+
+    stock_summary_data = await inventory_service.get_current_stock_summary_async(
+        db, skip=skip, limit=limit, category_id=category_id, location_id=location_id
+    )
+    return stock_summary_data.get("items", [])
+
+# --- Dashboard ---
+@router.get("/api/dashboard/overview", response_model=schemas.DashboardOverviewSchema)
+async def get_dashboard_overview_async(
+    days: int = Query(7, ge=1, le=90),
+    top_limit: int = Query(5, ge=1, le=20),
+    low_stock_threshold: int = Query(5, ge=0),
+    low_stock_limit: int = Query(5, ge=1, le=20),
+    recent_limit: int = Query(5, ge=1, le=50),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """ Get every dashboard widget in one response, served from a short-TTL cache (AsyncSession). """
+    try:
+        return await dashboard_service.get_dashboard_overview_async(
+            db, days=days, top_limit=top_limit, low_stock_threshold=low_stock_threshold,
+            low_stock_limit=low_stock_limit, recent_limit=recent_limit
+        )
+    except Exception as e:
+        print(f"Error fetching dashboard overview async API: {type(e).__name__} - {e}")
+        raise HTTPException(status_code=500, detail="Could not fetch dashboard overview.")
+
+@router.get("/api/dashboard/kpis", response_model=schemas.KpiSummarySchema)
+async def get_kpi_summary_async(db: AsyncSession = Depends(get_async_db)):
+    """ Get Key Performance Indicators for the dashboard (AsyncSession). """
+    try:
+        return await dashboard_service.get_dashboard_kpis_async(db)
+    except Exception as e:
+        print(f"Error fetching KPIs async API: {type(e).__name__} - {e}")
+        raise HTTPException(status_code=500, detail="Could not calculate dashboard KPIs.")
+
+@router.get("/api/dashboard/sales-trend-weekly", response_model=List[schemas.SalesTrendItemSchema])
+async def get_weekly_sales_trend_async(days: int = Query(7, ge=1, le=90), db: AsyncSession = Depends(get_async_db)):
+    """ Get sales trend data for the last N days (AsyncSession). """
+    try:
+        return await dashboard_service.get_sales_trend_async(db, days=days)
+    except Exception as e:
+        print(f"Error fetching sales trend async API: {type(e).__name__} - {e}")
+        raise HTTPException(status_code=500, detail="Could not fetch sales trend data.")
+
+@router.get("/api/dashboard/top-products-weekly", response_model=List[schemas.ProductPerformanceItemSchema])
+async def get_top_products_async(days: int = Query(7, ge=1, le=90), limit: int = Query(5, ge=1, le=20), db: AsyncSession = Depends(get_async_db)):
+    """ Get top N selling products by quantity over the last M days (AsyncSession). """
+    try:
+        return await dashboard_service.get_top_selling_products_async(db, days=days, limit=limit)
+    except Exception as e:
+        print(f"Error fetching top products async API: {type(e).__name__} - {e}")
+        raise HTTPException(status_code=500, detail="Could not fetch top products data.")
+
+@router.get("/api/dashboard/category-distribution", response_model=List[schemas.CategoryDistributionItemSchema])
+async def get_category_distribution_async(value_based: bool = Query(False), db: AsyncSession = Depends(get_async_db)):
+    """ Get stock distribution by category (AsyncSession). """
+    try:
+        return await dashboard_service.get_category_stock_distribution_async(db, value_based=value_based)
+    except Exception as e:
+        print(f"Error fetching category distribution async API: {type(e).__name__} - {e}")
+        raise HTTPException(status_code=500, detail="Could not fetch category distribution data.")
+
+@router.get("/api/dashboard/low-stock-items", response_model=List[schemas.ProductPerformanceItemSchema])
+async def get_low_stock_items_async(threshold: int = Query(5, ge=0), limit: int = Query(5, ge=1, le=20), db: AsyncSession = Depends(get_async_db)):
+    """ Get N items with stock at or below a threshold (AsyncSession). """
+    try:
+        return await dashboard_service.get_low_stock_items_async(db, threshold=threshold, limit=limit)
+    except Exception as e:
+        print(f"Error fetching low stock items async API: {type(e).__name__} - {e}")
+        raise HTTPException(status_code=500, detail="Could not fetch low stock items.")
+
+@router.get("/api/dashboard/recent-transactions", response_model=List[schemas.RecentTransactionItemSchema])
+async def get_recent_transactions_async(limit: int = Query(5, ge=1, le=50), db: AsyncSession = Depends(get_async_db)):
+    """ Get N most recent inventory transactions (AsyncSession). """
+    try:
+        return await dashboard_service.get_recent_transactions_async(db, limit=limit)
+    except Exception as e:
+        print(f"Error fetching recent transactions async API: {type(e).__name__} - {e}")
+        raise HTTPException(status_code=500, detail="Could not fetch recent transactions.")
@@ -18,7 +18,7 @@ router = APIRouter(
 
 # --- API Routes Only ---
 @router.post("/", response_model=schemas.Category, status_code=status.HTTP_201_CREATED)
-async def api_create_new_category(category: schemas.CategoryCreate, db: Session = Depends(get_db)):
+def api_create_new_category(category: schemas.CategoryCreate, db: Session = Depends(get_db)):
     """สร้างหมวดหมู่สินค้าใหม่ (API)"""
     try:
         return category_service.create_category(db=db, category=category)
@@ -26,13 +26,13 @@ async def api_create_new_category(category: schemas.CategoryCreate, db: Session
         raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
 
 @router.get("/", response_model=List[schemas.Category])
-async def api_read_all_categories(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
+def api_read_all_categories(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
     """ดึงรายการหมวดหมู่สินค้าทั้งหมด (API)"""
     categories_data = category_service.get_categories(db, skip=skip, limit=limit)
     return categories_data.get("items", []) # Return only items for List response
 
 @router.get("/{category_id}", response_model=schemas.Category)
-async def api_read_one_category(category_id: int, db: Session = Depends(get_db)):
+def api_read_one_category(category_id: int, db: Session = Depends(get_db)):
     """ดึงข้อมูลหมวดหมู่ตามรหัส (API)"""
     db_category = category_service.get_category(db, category_id=category_id)
     if db_category is None:
@@ -40,7 +40,7 @@ async def api_read_one_category(category_id: int, db: Session = Depends(get_db))
     return db_category
 
 @router.put("/{category_id}", response_model=schemas.Category)
-async def api_update_existing_category(category_id: int, category: schemas.CategoryCreate, db: Session = Depends(get_db)):
+def api_update_existing_category(category_id: int, category: schemas.CategoryCreate, db: Session = Depends(get_db)):
     """อัปเดตข้อมูลหมวดหมู่ตามรหัส (API)"""
     try:
         updated_category = category_service.update_category(db, category_id=category_id, category_update=category)
@@ -51,7 +51,7 @@ async def api_update_existing_category(category_id: int, category: schemas.Categ
         raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
 
 @router.delete("/{category_id}", response_model=schemas.Category)
-async def api_remove_category(category_id: int, db: Session = Depends(get_db)):
+def api_remove_category(category_id: int, db: Session = Depends(get_db)):
     """ลบหมวดหมู่ตามรหัส (API)"""
     try:
         deleted_category = category_service.delete_category(db, category_id=category_id)
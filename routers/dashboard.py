@@ -1,11 +1,13 @@
 # routers/dashboard.py
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Request
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from typing import List, Optional
 
 # Adjust imports
 import schemas
-from services import dashboard_service
+import database
+from services import dashboard_service, dashboard_stream_service
 from database import get_db
 
 API_INCLUDE_IN_SCHEMA = True
@@ -19,8 +21,42 @@ router = APIRouter(
 )
 
 # --- API Routes Only ---
+@router.get("/overview", response_model=schemas.DashboardOverviewSchema)
+def get_dashboard_overview_api(
+    days: int = Query(7, ge=1, le=90),
+    top_limit: int = Query(5, ge=1, le=20),
+    low_stock_threshold: int = Query(5, ge=0),
+    low_stock_limit: int = Query(5, ge=1, le=20),
+    recent_limit: int = Query(5, ge=1, le=50),
+    db: Session = Depends(get_db)
+):
+    """ Get every dashboard widget (KPIs, sales trend, top products, low stock, recent transactions) in one response, served from a short-TTL cache. """
+    try:
+        return dashboard_service.get_dashboard_overview(
+            db, days=days, top_limit=top_limit, low_stock_threshold=low_stock_threshold,
+            low_stock_limit=low_stock_limit, recent_limit=recent_limit
+        )
+    except Exception as e:
+        print(f"Error fetching dashboard overview API: {type(e).__name__} - {e}")
+        raise HTTPException(status_code=500, detail="Could not fetch dashboard overview.")
+
+@router.get("/stream", response_class=StreamingResponse)
+async def stream_dashboard_kpis(request: Request):
+    """
+    Server-Sent Events stream of dashboard KPIs: one `snapshot` event on connect, then a `delta` event with only the
+    changed fields after sales / stock movements commit. KPIs are computed once per change and shared by all open dashboards.
+    """
+    if database.SessionLocal is None:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Database is not configured.")
+    broadcaster = dashboard_stream_service.get_kpi_broadcaster(database.SessionLocal)
+    return StreamingResponse(
+        dashboard_stream_service.stream_kpi_events(broadcaster, request.is_disconnected),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"} # ไม่ให้ proxy (nginx) buffer event
+    )
+
 @router.get("/kpis", response_model=schemas.KpiSummarySchema)
-async def get_kpi_summary(db: Session = Depends(get_db)):
+def get_kpi_summary(db: Session = Depends(get_db)):
     """ Get Key Performance Indicators for the dashboard. """
     try:
         kpis = dashboard_service.get_dashboard_kpis(db)
@@ -30,7 +66,7 @@ async def get_kpi_summary(db: Session = Depends(get_db)):
         raise HTTPException(status_code=500, detail="Could not calculate dashboard KPIs.")
 
 @router.get("/sales-trend-weekly", response_model=List[schemas.SalesTrendItemSchema])
-async def get_weekly_sales_trend_api(days: int = Query(7, ge=1, le=90), db: Session = Depends(get_db)):
+def get_weekly_sales_trend_api(days: int = Query(7, ge=1, le=90), db: Session = Depends(get_db)):
      """ Get sales trend data for the last N days (default 7). """
      try:
          trend_data = dashboard_service.get_sales_trend(db, days=days)
@@ -40,7 +76,7 @@ async def get_weekly_sales_trend_api(days: int = Query(7, ge=1, le=90), db: Sess
          raise HTTPException(status_code=500, detail="Could not fetch sales trend data.")
 
 @router.get("/top-products-weekly", response_model=List[schemas.ProductPerformanceItemSchema])
-async def get_top_products_api(days: int = Query(7, ge=1, le=90), limit: int = Query(5, ge=1, le=20), db: Session = Depends(get_db)):
+def get_top_products_api(days: int = Query(7, ge=1, le=90), limit: int = Query(5, ge=1, le=20), db: Session = Depends(get_db)):
     """ Get top N selling products by quantity over the last M days. """
     try:
         top_products = dashboard_service.get_top_selling_products(db, days=days, limit=limit)
@@ -50,7 +86,7 @@ async def get_top_products_api(days: int = Query(7, ge=1, le=90), limit: int = Q
         raise HTTPException(status_code=500, detail="Could not fetch top products data.")
 
 @router.get("/category-distribution", response_model=List[schemas.CategoryDistributionItemSchema])
-async def get_category_distribution_api(value_based: bool = Query(False), db: Session = Depends(get_db)):
+def get_category_distribution_api(value_based: bool = Query(False), db: Session = Depends(get_db)):
     """ Get stock distribution by category (count of SKUs or estimated value). """
     try:
         distribution_data = dashboard_service.get_category_stock_distribution(db, value_based=value_based)
@@ -60,7 +96,7 @@ async def get_category_distribution_api(value_based: bool = Query(False), db: Se
         raise HTTPException(status_code=500, detail="Could not fetch category distribution data.")
 
 @router.get("/low-stock-items", response_model=List[schemas.ProductPerformanceItemSchema])
-async def get_low_stock_items_api(threshold: int = Query(5, ge=0), limit: int = Query(5, ge=1, le=20), db: Session = Depends(get_db)):
+def get_low_stock_items_api(threshold: int = Query(5, ge=0), limit: int = Query(5, ge=1, le=20), db: Session = Depends(get_db)):
     """ Get N items with stock at or below a threshold. """
     try:
         low_stock = dashboard_service.get_low_stock_items(db, threshold=threshold, limit=limit)
@@ -70,7 +106,7 @@ async def get_low_stock_items_api(threshold: int = Query(5, ge=0), limit: int =
         raise HTTPException(status_code=500, detail="Could not fetch low stock items.")
 
 @router.get("/recent-transactions", response_model=List[schemas.RecentTransactionItemSchema])
-async def get_recent_transactions_api(limit: int = Query(5, ge=1, le=50), db: Session = Depends(get_db)):
+def get_recent_transactions_api(limit: int = Query(5, ge=1, le=50), db: Session = Depends(get_db)):
     """ Get N most recent inventory transactions. """
     try:
         transactions = dashboard_service.get_recent_transactions(db, limit=limit)
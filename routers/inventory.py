@@ -1,12 +1,16 @@
 # routers/inventory.py
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Response
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session, joinedload
 from typing import List, Optional
+from datetime import date, datetime
 
 import schemas
 import models
 from services import inventory_service # Assuming this service is correctly implemented
+import database
 from database import get_db
+from utils import set_pagination_headers, stream_csv_export, csv_attachment_headers
 # from models import CurrentStock # Only if directly used, otherwise schemas are enough
 
 API_INCLUDE_IN_SCHEMA = True
@@ -20,7 +24,7 @@ router = APIRouter(
 
 # --- API Routes Only ---
 @router.get("/summary/", response_model=List[schemas.CurrentStock])
-async def api_get_inventory_summary(
+def api_get_inventory_summary(
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1),
     category_id_str: Optional[str] = Query(None, alias="category_id"),
@@ -43,7 +47,7 @@ async def api_get_inventory_summary(
     return stock_summary_data.get("items", [])
 
 @router.post("/stock-in/", response_model=schemas.InventoryTransaction)
-async def api_record_new_stock_in(stock_in: schemas.StockInSchema, db: Session = Depends(get_db)):
+def api_record_new_stock_in(stock_in: schemas.StockInSchema, db: Session = Depends(get_db)):
     try:
         created_transaction = inventory_service.record_stock_in(db=db, stock_in_data=stock_in)
         tx = db.query(models.InventoryTransaction).options(
@@ -65,7 +69,7 @@ async def api_record_new_stock_in(stock_in: schemas.StockInSchema, db: Session =
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="เกิดข้อผิดพลาดที่ไม่คาดคิด (API Stock-in)")
 
 @router.post("/adjust/", response_model=schemas.InventoryTransaction, status_code=status.HTTP_201_CREATED)
-async def api_record_stock_adjustment(adjustment: schemas.StockAdjustmentSchema, db: Session = Depends(get_db)):
+def api_record_stock_adjustment(adjustment: schemas.StockAdjustmentSchema, db: Session = Depends(get_db)):
     try:
         created_transaction = inventory_service.record_stock_adjustment(db=db, adjustment_data=adjustment)
         tx = db.query(models.InventoryTransaction).options(
@@ -86,18 +90,84 @@ async def api_record_stock_adjustment(adjustment: schemas.StockAdjustmentSchema,
         print(f"Unexpected API Error during adjustment: {type(e).__name__} - {e}")
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="เกิดข้อผิดพลาดที่ไม่คาดคิด (API Adjustment)")
 
-@router.get("/near-expiry/", response_model=List[schemas.InventoryTransaction])
-async def api_get_near_expiry_report(
+@router.get("/summary/export", response_class=StreamingResponse, name="api_export_inventory_summary")
+def api_export_inventory_summary(
+    category_id: Optional[int] = Query(None),
+    location_id: Optional[int] = Query(None),
+):
+    """ ยอดสต็อกคงเหลือทั้งหมดตามตัวกรองเป็นไฟล์ CSV (stream ทีละ chunk ไม่โหลดทั้งหมดเข้าหน่วยความจำ) """
+    if database.SessionLocal is None: raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Database is not configured.")
+    return StreamingResponse(
+        stream_csv_export(database.SessionLocal, inventory_service.CURRENT_STOCK_EXPORT_HEADER, inventory_service.iter_current_stock_rows,
+                          category_id=category_id, location_id=location_id),
+        media_type="text/csv; charset=utf-8", headers=csv_attachment_headers("stock_summary")
+    )
+
+@router.get("/transactions/export", response_class=StreamingResponse, name="api_export_inventory_transactions")
+def api_export_inventory_transactions(
+    product_id: Optional[int] = Query(None),
+    location_id: Optional[int] = Query(None),
+    transaction_type: Optional[models.TransactionType] = Query(None),
+    start_date: Optional[date] = Query(None, description="Start date (YYYY-MM-DD)"),
+    end_date: Optional[date] = Query(None, description="End date (YYYY-MM-DD)"),
+):
+    """ ประวัติการเคลื่อนไหวสต็อกทั้งหมดตามตัวกรองเป็นไฟล์ CSV (stream ด้วย server-side cursor) """
+    if database.SessionLocal is None: raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Database is not configured.")
+    return StreamingResponse(
+        stream_csv_export(database.SessionLocal, inventory_service.INVENTORY_TRANSACTION_EXPORT_HEADER, inventory_service.iter_inventory_transaction_rows,
+                          product_id=product_id, location_id=location_id, transaction_type=transaction_type,
+                          start_date=start_date, end_date=end_date),
+        media_type="text/csv; charset=utf-8", headers=csv_attachment_headers("inventory_transactions")
+    )
+
+@router.get("/transactions/", response_model=List[schemas.InventoryTransaction])
+def api_get_inventory_transactions(
+    response: Response,
+    product_id: Optional[int] = Query(None),
+    location_id: Optional[int] = Query(None),
+    transaction_type: Optional[models.TransactionType] = Query(None),
+    start_date: Optional[date] = Query(None, description="Start date (YYYY-MM-DD)"),
+    end_date: Optional[date] = Query(None, description="End date (YYYY-MM-DD)"),
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor จากหน้าก่อน (keyset pagination, ใช้แทน skip)"),
+    count: str = Query("exact", pattern="^(exact|estimate|none)$", description="วิธีนับ X-Total-Count"),
+    db: Session = Depends(get_db)
+):
+    """ ดึงประวัติการเคลื่อนไหวสต็อก (API) หน้าถัดไปส่ง cursor จาก header X-Next-Cursor """
+    try:
+        transactions_data = inventory_service.get_inventory_transactions(
+            db, skip=skip, limit=limit, product_id=product_id, location_id=location_id,
+            transaction_type=transaction_type, start_date=start_date, end_date=end_date,
+            cursor=cursor, count_mode=count
+        )
+    except ValueError as e: raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    set_pagination_headers(response, transactions_data)
+    return transactions_data.get("items", [])
+
+@router.get("/as-of", response_model=schemas.StockAsOfReport)
+def api_get_stock_as_of(
+    as_of: datetime = Query(..., description="เวลาที่ต้องการดูยอด (ISO 8601 ควรระบุ timezone เช่น +07:00, ไม่ระบุ = UTC)"),
+    location_id: Optional[int] = Query(None),
+    category_id: Optional[int] = Query(None),
+    db: Session = Depends(get_db)
+):
+    """ ยอดสต็อกย้อนหลัง ณ เวลา as_of (เริ่มจาก snapshot รายวันล่าสุดก่อนหน้า แล้ว replay transaction ที่เหลือ) """
+    return inventory_service.get_stock_as_of(db, as_of, location_id=location_id, category_id=category_id)
+
+@router.get("/near-expiry/", response_model=List[schemas.StockLot])
+def api_get_near_expiry_report(
     days_ahead: int = Query(30, ge=1),
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1),
     db: Session = Depends(get_db)
 ):
-    report_data = inventory_service.get_near_expiry_transactions(db, days_ahead=days_ahead, skip=skip, limit=limit)
-    return report_data.get("transactions", [])
+    """ ล็อตที่ยังมีของคงเหลือ (remaining_qty > 0) และหมดอายุภายใน days_ahead วัน """
+    report_data = inventory_service.get_near_expiry_lots(db, days_ahead=days_ahead, skip=skip, limit=limit)
+    return report_data.get("lots", [])
 
 @router.post("/transfer/", response_model=List[schemas.InventoryTransaction], status_code=status.HTTP_201_CREATED)
-async def api_record_stock_transfer(
+def api_record_stock_transfer(
     transfer: schemas.StockTransferSchema, db: Session = Depends(get_db)
 ):
     try:
@@ -123,7 +193,7 @@ async def api_record_stock_transfer(
 @router.get("/stock-level/{product_id}/{location_id}",
             response_model=schemas.CurrentStock,
             summary="Get Current Stock for a Specific Item and Location")
-async def api_get_specific_stock_level(
+def api_get_specific_stock_level(
     product_id: int,
     location_id: int,
     db: Session = Depends(get_db)
@@ -18,7 +18,7 @@ router = APIRouter(
 
 # --- API Routes Only ---
 @router.post("/", response_model=schemas.Location, status_code=status.HTTP_201_CREATED)
-async def api_create_new_location(location: schemas.LocationCreate, db: Session = Depends(get_db)):
+def api_create_new_location(location: schemas.LocationCreate, db: Session = Depends(get_db)):
     """สร้างสถานที่จัดเก็บใหม่ (API)"""
     try:
         return location_service.create_location(db=db, location=location)
@@ -26,13 +26,13 @@ async def api_create_new_location(location: schemas.LocationCreate, db: Session
         raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
 
 @router.get("/", response_model=List[schemas.Location])
-async def api_read_all_locations(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
+def api_read_all_locations(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
     """ดึงรายการสถานที่จัดเก็บทั้งหมด (API)"""
     locations_data = location_service.get_locations(db, skip=skip, limit=limit)
     return locations_data.get("items", [])
 
 @router.get("/{location_id}", response_model=schemas.Location)
-async def api_read_one_location(location_id: int, db: Session = Depends(get_db)):
+def api_read_one_location(location_id: int, db: Session = Depends(get_db)):
     """ดึงข้อมูลสถานที่จัดเก็บตามรหัส (API)"""
     db_location = location_service.get_location(db, location_id=location_id)
     if db_location is None:
@@ -40,7 +40,7 @@ async def api_read_one_location(location_id: int, db: Session = Depends(get_db))
     return db_location
 
 @router.put("/{location_id}", response_model=schemas.Location)
-async def api_update_existing_location(location_id: int, location: schemas.LocationCreate, db: Session = Depends(get_db)):
+def api_update_existing_location(location_id: int, location: schemas.LocationCreate, db: Session = Depends(get_db)):
     """อัปเดตข้อมูลสถานที่จัดเก็บ (API)"""
     try:
         updated_loc = location_service.update_location(db, location_id=location_id, location_update=location)
@@ -55,7 +55,7 @@ async def api_update_existing_location(location_id: int, location: schemas.Locat
 
 
 @router.delete("/{location_id}", response_model=schemas.Location)
-async def api_remove_location(location_id: int, db: Session = Depends(get_db)):
+def api_remove_location(location_id: int, db: Session = Depends(get_db)):
     """ลบสถานที่จัดเก็บ (API)"""
     try:
         deleted_loc = location_service.delete_location(db, location_id=location_id)
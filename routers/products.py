@@ -1,11 +1,11 @@
 # routers/products.py
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, status, Query, UploadFile, File
 from sqlalchemy.orm import Session
 from typing import List, Optional
 
 # Adjust imports
 import schemas
-from services import product_service
+from services import product_service, product_search_service, product_import_service
 from database import get_db
 
 API_INCLUDE_IN_SCHEMA = True
@@ -18,7 +18,7 @@ router = APIRouter(
 
 # --- API Routes Only ---
 @router.post("/", response_model=schemas.Product, status_code=status.HTTP_201_CREATED)
-async def api_create_new_product(product: schemas.ProductCreate, db: Session = Depends(get_db)):
+def api_create_new_product(product: schemas.ProductCreate, db: Session = Depends(get_db)):
     try:
         return product_service.create_product(db=db, product_in=product)
     except ValueError as e:
@@ -34,19 +34,47 @@ async def api_create_new_product(product: schemas.ProductCreate, db: Session = D
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="An unexpected error occurred while creating the product.")
 
 
+@router.post("/import", response_model=schemas.ProductImportResult)
+def api_import_products(
+    file: UploadFile = File(..., description="ไฟล์ .csv (มี header) หรือ .jsonl (หนึ่ง object ต่อบรรทัด)"),
+    format: Optional[str] = Query(None, description="csv หรือ jsonl (ค่า default ดูจากนามสกุลไฟล์)"),
+    dry_run: bool = Query(False, description="ตรวจอย่างเดียว ไม่บันทึก"),
+    db: Session = Depends(get_db)
+):
+    """ นำเข้าสินค้าจำนวนมาก แถวที่ผิด (ข้อมูลไม่ครบ / ไม่พบหมวดหมู่ / SKU หรือ Barcode ซ้ำ) ถูกข้ามและรายงานพร้อมเลขบรรทัด """
+    try:
+        import_format = product_import_service.detect_format(file.filename, format)
+        return product_import_service.import_products(db, file.file, import_format, dry_run=dry_run)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    except Exception as e:
+        print(f"Unexpected API Error importing products: {type(e).__name__} - {e}")
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="An unexpected error occurred while importing products.")
+
 @router.get("/", response_model=List[schemas.Product])
-async def api_read_all_products(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
+def api_read_all_products(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
     products_data = product_service.get_products(db, skip=skip, limit=limit)
     return products_data.get("items", [])
 
+@router.get("/search", response_model=schemas.ProductSearchResult)
+def api_search_products(
+    q: str = Query("", description="คำค้น (ชื่อ / SKU / Barcode) หลายคำคั่นด้วยช่องว่าง"),
+    category_id: Optional[int] = Query(None),
+    skip: int = Query(0, ge=0),
+    limit: int = Query(20, ge=1, le=100),
+    db: Session = Depends(get_db)
+):
+    """ ค้นหาสินค้าแบบ type-ahead (POS, รับสินค้าเข้า) เรียงตามความเกี่ยวข้อง """
+    return product_search_service.search_products(db, q, category_id=category_id, skip=skip, limit=limit)
+
 @router.get("/{product_id}", response_model=schemas.Product)
-async def api_read_one_product(product_id: int, db: Session = Depends(get_db)):
+def api_read_one_product(product_id: int, db: Session = Depends(get_db)):
     db_product = product_service.get_product(db, product_id=product_id)
     if db_product is None: raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"ไม่พบสินค้ารหัส {product_id}")
     return db_product
 
 @router.get("/by-category/{category_id}/basic", response_model=List[schemas.ProductBasic])
-async def api_get_products_basic_by_category(category_id: int, db: Session = Depends(get_db)):
+def api_get_products_basic_by_category(category_id: int, db: Session = Depends(get_db)):
     """ ดึงข้อมูลสินค้าเบื้องต้น (รวม shelf_life_days) ตามหมวดหมู่ """
     try:
         products = product_service.get_products_basic_by_category(db, category_id=category_id)
@@ -55,19 +83,15 @@ async def api_get_products_basic_by_category(category_id: int, db: Session = Dep
         print(f"Unexpected API Error getting basic products by category {category_id}: {type(e).__name__} - {e}")
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="An unexpected error occurred while fetching basic products.")
 
-@router.get("/lookup-by-scan/{scan_code}", response_model=Optional[schemas.ProductBasic])
-async def api_lookup_product_by_scan_code(scan_code: str, db: Session = Depends(get_db)):
-    """ ค้นหาสินค้าด้วย SKU หรือ Barcode (สำหรับ POS Scan) """
+@router.get("/lookup-by-scan/{scan_code}", response_model=Optional[schemas.ProductScanResult])
+def api_lookup_product_by_scan_code(scan_code: str, db: Session = Depends(get_db)):
+    """ ค้นหาสินค้าด้วย SKU หรือ Barcode (สำหรับ POS Scan, ตอบจาก scan index ในหน่วยความจำ) """
     if not scan_code or not scan_code.strip():
         return None
-    product = product_service.get_product_by_scan_code(db, scan_code=scan_code)
-    if not product:
-        return None
-    # Use model_validate for Pydantic v2
-    return schemas.ProductBasic.model_validate(product)
+    return product_service.lookup_product_by_scan_code(db, scan_code=scan_code)
 
 @router.put("/{product_id}", response_model=schemas.Product)
-async def api_update_existing_product(product_id: int, product_update_data: schemas.ProductUpdate, db: Session = Depends(get_db)):
+def api_update_existing_product(product_id: int, product_update_data: schemas.ProductUpdate, db: Session = Depends(get_db)):
     """ อัปเดตข้อมูลสินค้า (รองรับ shelf_life_days) """
     try:
         updated_product = product_service.update_product(db, product_id=product_id, product_update=product_update_data)
@@ -86,7 +110,7 @@ async def api_update_existing_product(product_id: int, product_update_data: sche
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="An unexpected error occurred while updating the product.")
 
 @router.delete("/{product_id}", response_model=schemas.Product)
-async def api_remove_product(product_id: int, db: Session = Depends(get_db)):
+def api_remove_product(product_id: int, db: Session = Depends(get_db)):
     """ ลบสินค้า """
     try:
         deleted_product_schema = product_service.delete_product(db, product_id=product_id)
@@ -1,5 +1,6 @@
 # routers/sales.py
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Response
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from typing import List, Optional
 from datetime import date
@@ -8,7 +9,9 @@ from datetime import date
 import schemas
 import models
 from services import sales_service # Might need product/location service if API expands
+import database
 from database import get_db
+from utils import set_pagination_headers, stream_csv_export, csv_attachment_headers
 
 API_INCLUDE_IN_SCHEMA = True
 
@@ -18,11 +21,25 @@ router = APIRouter(
     include_in_schema=API_INCLUDE_IN_SCHEMA
 )
 
+def sale_error_to_http_exception(e: ValueError) -> HTTPException:
+    """ แปลง ValueError จาก sales_service เป็น HTTPException (ใช้ร่วมกับ async handler ใน routers/async_api.py) """
+    error_message = str(e)
+    if "ไม่พบ" in error_message:
+        return HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=error_message)
+    elif "สต็อกในระบบไม่เพียงพอ" in error_message or "สต็อกไม่เพียงพอ" in error_message :
+        # Provide more context if possible, maybe which item caused it if service returns that info
+        return HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=error_message)
+    elif "ไม่มีรายการสินค้า" in error_message:
+        return HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=error_message)
+    else:
+        print(f"Sale recording ValueError (API): {error_message}")
+        return HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"ไม่สามารถบันทึกการขาย: {error_message}")
+
 # --- API Routes Only ---
 @router.post("/",
              response_model=schemas.Sale, # Should be schemas.Sale for detailed response
              status_code=status.HTTP_201_CREATED)
-async def api_record_new_sale(
+def api_record_new_sale(
     sale: schemas.SaleCreate,
     allow_negative_stock: bool = Query(False, alias="allowNegativeStock", description="Allow sale even if stock is insufficient"), # Example Query Param
     db: Session = Depends(get_db)
@@ -38,41 +55,51 @@ async def api_record_new_sale(
         # The service should return the full Sale object with items loaded
         return created_sale
     except ValueError as e:
-        error_message = str(e)
-        if "ไม่พบ" in error_message:
-            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=error_message)
-        elif "สต็อกในระบบไม่เพียงพอ" in error_message or "สต็อกไม่เพียงพอ" in error_message :
-            # Provide more context if possible, maybe which item caused it if service returns that info
-            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=error_message)
-        elif "ไม่มีรายการสินค้า" in error_message:
-            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=error_message)
-        else:
-            print(f"Sale recording ValueError (API): {error_message}")
-            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"ไม่สามารถบันทึกการขาย: {error_message}")
+        raise sale_error_to_http_exception(e)
     except Exception as e:
         print(f"Unexpected Error during sale recording (API): {type(e).__name__} - {e}")
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="เกิดข้อผิดพลาดภายในระบบขณะบันทึกการขาย (API)")
 
 
 @router.get("/report/", response_model=List[schemas.Sale])
-async def api_get_sales_report(
+def api_get_sales_report(
+    response: Response,
     start_date: Optional[date] = Query(None, description="Start date (YYYY-MM-DD)"),
     end_date: Optional[date] = Query(None, description="End date (YYYY-MM-DD)"),
     skip: int = Query(0, ge=0),
     limit: int = Query(100, gt=0),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor จากหน้าก่อน (keyset pagination, ใช้แทน skip)"),
+    count: str = Query("exact", pattern="^(exact|estimate|none)$", description="วิธีนับ X-Total-Count"),
     db: Session = Depends(get_db)
 ):
-    """ ดึงรายงานการขาย (API) """
+    """ ดึงรายงานการขาย (API) หน้าถัดไปส่ง cursor จาก header X-Next-Cursor """
     try:
         report_data = sales_service.get_sales_report(
-            db, start_date=start_date, end_date=end_date, skip=skip, limit=limit
+            db, start_date=start_date, end_date=end_date, skip=skip, limit=limit, cursor=cursor, count_mode=count
         )
-        # Service returns dict {"sales": [...], "total_count": N}
-        # API returns just the list of sales
+        # Service returns dict {"sales": [...], "total_count": N, "next_cursor": ...}
+        # API returns just the list of sales; paging info goes in headers
+        set_pagination_headers(response, report_data)
         return report_data.get("sales", [])
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
     except Exception as e:
         print(f"Error fetching sales report API: {type(e).__name__} - {e}")
         raise HTTPException(status_code=500, detail="Could not fetch sales report data.")
 
 
+@router.get("/report/export", response_class=StreamingResponse, name="api_export_sales_report")
+def api_export_sales_report(
+    start_date: Optional[date] = Query(None, description="Start date (YYYY-MM-DD)"),
+    end_date: Optional[date] = Query(None, description="End date (YYYY-MM-DD)"),
+):
+    """ รายการขายทั้งหมดในช่วงวันที่เป็นไฟล์ CSV หนึ่งแถวต่อสินค้าที่ขาย (stream ด้วย server-side cursor) """
+    if database.SessionLocal is None: raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Database is not configured.")
+    return StreamingResponse(
+        stream_csv_export(database.SessionLocal, sales_service.SALES_REPORT_EXPORT_HEADER, sales_service.iter_sales_report_rows,
+                          start_date=start_date, end_date=end_date),
+        media_type="text/csv; charset=utf-8", headers=csv_attachment_headers("sales_report")
+    )
+
+
 # --- No UI Routes Here Anymore ---
\ No newline at end of file
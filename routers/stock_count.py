@@ -1,13 +1,14 @@
 # routers/stock_count.py
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Response
 from sqlalchemy.orm import Session, joinedload
-from typing import List
+from typing import List, Optional
 
 # Adjust imports
 import schemas
 import models
 from services import stock_count_service
 from database import get_db
+from utils import set_pagination_headers
 
 API_INCLUDE_IN_SCHEMA = True
 
@@ -21,7 +22,7 @@ router = APIRouter(
 
 # Session API Routes
 @router.post("/sessions/", response_model=schemas.StockCountSession, status_code=status.HTTP_201_CREATED)
-async def api_create_new_stock_count_session(
+def api_create_new_stock_count_session(
     session_in: schemas.StockCountSessionCreate, db: Session = Depends(get_db)
 ):
     """ สร้างรอบนับสต็อกใหม่ (API) """
@@ -39,15 +40,21 @@ async def api_create_new_stock_count_session(
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="เกิดข้อผิดพลาดในการสร้างรอบนับสต็อก")
 
 @router.get("/sessions/", response_model=List[schemas.StockCountSessionInList])
-async def api_get_all_stock_count_sessions(
-    skip: int = 0, limit: int = 100, db: Session = Depends(get_db)
+def api_get_all_stock_count_sessions(
+    response: Response, skip: int = 0, limit: int = 100,
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor จากหน้าก่อน (keyset pagination, ใช้แทน skip)"),
+    count: str = Query("exact", pattern="^(exact|estimate|none)$", description="วิธีนับ X-Total-Count"),
+    db: Session = Depends(get_db)
 ):
-    """ ดึงรายการรอบนับสต็อกทั้งหมด (API) """
-    sessions_data = stock_count_service.get_stock_count_sessions(db, skip=skip, limit=limit)
+    """ ดึงรายการรอบนับสต็อกทั้งหมด (API) หน้าถัดไปส่ง cursor จาก header X-Next-Cursor """
+    try:
+        sessions_data = stock_count_service.get_stock_count_sessions(db, skip=skip, limit=limit, cursor=cursor, count_mode=count)
+    except ValueError as e: raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    set_pagination_headers(response, sessions_data)
     return sessions_data.get("items", []) # Return list
 
 @router.get("/sessions/{session_id}", response_model=schemas.StockCountSession)
-async def api_get_one_stock_count_session(session_id: int, db: Session = Depends(get_db)):
+def api_get_one_stock_count_session(session_id: int, db: Session = Depends(get_db)):
     """ ดึงข้อมูลรอบนับสต็อกตาม ID (API) """
     # Service function already loads relations needed for the schema
     session = stock_count_service.get_stock_count_session(db, session_id=session_id)
@@ -56,7 +63,7 @@ async def api_get_one_stock_count_session(session_id: int, db: Session = Depends
 
 # Item API Routes
 @router.post("/sessions/{session_id}/items", response_model=schemas.StockCountItem, status_code=status.HTTP_201_CREATED)
-async def api_add_item_to_session(
+def api_add_item_to_session(
     session_id: int, item_in: schemas.StockCountItemCreate, db: Session = Depends(get_db)
 ):
     """ เพิ่มสินค้าเข้ารอบนับสต็อก (API) """
@@ -74,7 +81,7 @@ async def api_add_item_to_session(
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="เกิดข้อผิดพลาดในการเพิ่มสินค้ารอบนับสต็อก")
 
 @router.patch("/items/{item_id}", response_model=schemas.StockCountItem)
-async def api_update_item_count(
+def api_update_item_count(
     item_id: int, item_update: schemas.StockCountItemUpdate, db: Session = Depends(get_db)
 ):
     """ อัปเดตยอดนับจริงของรายการสินค้า (API) """
@@ -92,8 +99,22 @@ async def api_update_item_count(
         print(f"Error updating count item (API) {item_id}: {e}")
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="เกิดข้อผิดพลาดในการบันทึกยอดนับ")
 
+@router.post("/sessions/{session_id}/items/bulk", response_model=schemas.StockCountItemsBulkUpdateResult)
+def api_bulk_update_item_counts(
+    session_id: int, bulk_update: schemas.StockCountItemsBulkUpdate, db: Session = Depends(get_db)
+):
+    """ บันทึกยอดนับหลายรายการใน transaction เดียว (API) รายการที่ไม่ถูกต้องจะรายงานใน errors """
+    try:
+        return stock_count_service.bulk_update_counted_quantities(db=db, session_id=session_id, counts=bulk_update.items)
+    except ValueError as e:
+        if "ไม่พบรอบนับสต็อก" in str(e): raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    except Exception as e:
+        print(f"Error bulk updating counts (API) for session {session_id}: {e}")
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="เกิดข้อผิดพลาดในการบันทึกยอดนับ")
+
 @router.post("/sessions/{session_id}/close", response_model=schemas.StockCountSession)
-async def api_close_session_and_adjust(session_id: int, db: Session = Depends(get_db)):
+def api_close_session_and_adjust(session_id: int, db: Session = Depends(get_db)):
     """ ปิดรอบนับสต็อกและสร้าง Adjustment อัตโนมัติ (API) """
     try:
         closed_session = stock_count_service.close_stock_count_session(db=db, session_id=session_id)
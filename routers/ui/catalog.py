@@ -1,12 +1,12 @@
 # routers/ui/catalog.py
-from fastapi import APIRouter, Depends, Request, Query, HTTPException
-from fastapi.responses import HTMLResponse
-from sqlalchemy.orm import Session, joinedload
+from fastapi import APIRouter, Depends, Request, Query, HTTPException, status
+from fastapi.responses import HTMLResponse, Response
+from sqlalchemy.orm import Session
 from typing import Optional, List
 
-import models
-from services import product_service, category_service
+from services import category_service, catalog_service
 from database import get_db
+from utils import conditional_get_headers, is_not_modified
 
 ui_router = APIRouter(
     prefix="/ui/catalog",
@@ -15,7 +15,7 @@ ui_router = APIRouter(
 )
 
 @ui_router.get("/price-display/", response_class=HTMLResponse, name="ui_price_display")
-async def show_price_display_page(
+def show_price_display_page(
     request: Request,
     db: Session = Depends(get_db),
     # --- เปลี่ยน type hint ตรงนี้ ---
@@ -33,24 +33,21 @@ async def show_price_display_page(
         category_filter = int(category_query_param.strip())
     # ---------------------------------------------------------
 
-    products_query = db.query(models.Product).options(
-        joinedload(models.Product.category)
-    )
+    # จอแสดงราคาในร้านเรียกหน้านี้ซ้ำตลอด: ตอบ 304 ถ้าไม่มีอะไรเปลี่ยน หรือส่ง HTML ที่ render ไว้แล้ว โดยไม่ query สินค้า
+    # (ไม่ cache หน้าที่มีข้อความ message/error จาก redirect)
+    etag, last_modified = catalog_service.get_catalog_validators(db)
+    cacheable = etag is not None and not request.query_params.get('message') and not request.query_params.get('error')
+    if cacheable:
+        validator_headers = conditional_get_headers(etag, last_modified)
+        if is_not_modified(request, etag, last_modified):
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=validator_headers)
+        cached_body = catalog_service.get_rendered_page(etag, category_filter, search_query)
+        if cached_body is not None:
+            return HTMLResponse(content=cached_body, headers=validator_headers)
 
-    if category_filter is not None: # ใช้ category_filter ที่แปลงแล้ว
-        products_query = products_query.filter(models.Product.category_id == category_filter)
+    all_products = catalog_service.get_price_display_products(db, category_id=category_filter, search=search_query)
 
-    if search_query and search_query.strip():
-        search_term_like = f"%{search_query.strip()}%"
-        products_query = products_query.filter(
-            (models.Product.name.ilike(search_term_like)) |
-            (models.Product.sku.ilike(search_term_like))
-        )
-    
-    all_products = products_query.order_by(models.Product.name).all()
-
-    categories_data = category_service.get_categories(db=db, limit=1000)
-    all_categories = categories_data.get("items", [])
+    all_categories = category_service.get_all_categories_cached(db)
 
     context = {
         "request": request,
@@ -61,4 +58,8 @@ async def show_price_display_page(
         "message": request.query_params.get('message'),
         "error": request.query_params.get('error'),
     }
-    return templates.TemplateResponse("catalog/price_display.html", context)
\ No newline at end of file
+    response = templates.TemplateResponse("catalog/price_display.html", context)
+    if cacheable:
+        catalog_service.store_rendered_page(etag, category_filter, search_query, response.body)
+        response.headers.update(validator_headers)
+    return response
\ No newline at end of file
@@ -20,7 +20,7 @@ ui_router = APIRouter(
 
 # --- UI Routes ---
 @ui_router.get("/", response_class=HTMLResponse, name="ui_read_all_categories")
-async def ui_read_all_categories(request: Request, page: int = 1, limit: int = 15, db: Session = Depends(get_db)):
+def ui_read_all_categories(request: Request, page: int = 1, limit: int = 15, db: Session = Depends(get_db)):
     templates = request.app.state.templates
     if templates is None: raise HTTPException(status_code=500, detail="Templates not configured")
     skip = (page - 1) * limit
@@ -44,7 +44,7 @@ async def ui_show_add_category_form(request: Request):
     return templates.TemplateResponse("categories/add.html", {"request": request, "form_data": None, "error": None})
 
 @ui_router.post("/add", response_class=HTMLResponse, name="ui_handle_add_category_form")
-async def ui_handle_add_category_form(request: Request, db: Session = Depends(get_db), name: str = Form(...)):
+def ui_handle_add_category_form(request: Request, db: Session = Depends(get_db), name: str = Form(...)):
     templates = request.app.state.templates
     if templates is None: raise HTTPException(status_code=500, detail="Templates not configured")
     form_data_dict = {"name": name}
@@ -68,7 +68,7 @@ async def ui_handle_add_category_form(request: Request, db: Session = Depends(ge
          return templates.TemplateResponse("categories/add.html", {"request": request, "error": "เกิดข้อผิดพลาดที่ไม่คาดคิด", "form_data": form_data_dict}, status_code=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 @ui_router.post("/delete/{category_id}", name="ui_handle_delete_category")
-async def ui_handle_delete_category(request: Request, category_id: int, db: Session = Depends(get_db)):
+def ui_handle_delete_category(request: Request, category_id: int, db: Session = Depends(get_db)):
     error_message = None; success_message = None
     try:
         deleted_category = category_service.delete_category(db=db, category_id=category_id)
@@ -98,7 +98,7 @@ async def ui_handle_delete_category(request: Request, category_id: int, db: Sess
     return RedirectResponse(url=str(redirect_url), status_code=status.HTTP_303_SEE_OTHER)
 
 @ui_router.get("/edit/{category_id}", response_class=HTMLResponse, name="ui_show_edit_category_form")
-async def ui_show_edit_category_form(request: Request, category_id: int, db: Session = Depends(get_db)):
+def ui_show_edit_category_form(request: Request, category_id: int, db: Session = Depends(get_db)):
     templates = request.app.state.templates
     if templates is None: raise HTTPException(status_code=500, detail="Templates not configured")
     category = category_service.get_category(db, category_id=category_id)
@@ -106,7 +106,7 @@ async def ui_show_edit_category_form(request: Request, category_id: int, db: Ses
     return templates.TemplateResponse("categories/edit.html", {"request": request, "category": category, "form_data": None, "error": None})
 
 @ui_router.post("/edit/{category_id}", response_class=HTMLResponse, name="ui_handle_edit_category_form")
-async def ui_handle_edit_category_form(request: Request, category_id: int, db: Session = Depends(get_db), name: str = Form(...)):
+def ui_handle_edit_category_form(request: Request, category_id: int, db: Session = Depends(get_db), name: str = Form(...)):
      templates = request.app.state.templates
      if templates is None: raise HTTPException(status_code=500, detail="Templates not configured")
      form_data_dict = {"name": name}
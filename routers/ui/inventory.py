@@ -6,14 +6,14 @@ from typing import List, Optional, Dict, Any
 from datetime import date, timedelta, datetime, time # Ensure datetime is imported
 from urllib.parse import urlencode as python_urlencode
 import math
-import json # For session data
 
 import schemas # Import the main schemas module
 from schemas.inventory import BatchStockInSchema, StockInItemDetailSchema # Specific schemas
 import models
 from models import TransactionType # Ensure TransactionType is imported
-from services import inventory_service, product_service, category_service, location_service
+from services import inventory_service, product_service, category_service, location_service, draft_service
 from database import get_db
+from utils import get_form_data, bangkok_today, export_url
 
 try:
     from utils import format_thai_datetime, format_thai_date 
@@ -28,9 +28,15 @@ ui_router = APIRouter(
     include_in_schema=False
 )
 
+# ข้อมูลฟอร์มรับสินค้าเข้าเก็บใน draft_service (ตาราง session_drafts) cookie ของ session เก็บแค่ key
+STOCK_IN_BATCH_DRAFT = "stock_in_batch"      # Batch ที่ผ่านการตรวจแล้ว รอหน้า review / ยืนยัน
+STOCK_IN_FORM_DRAFT = "stock_in_form"        # ค่าที่กรอกไว้ + ข้อความ error เมื่อประมวลผลไม่ผ่าน
+STOCK_IN_BATCH_SESSION_KEY = "stock_in_batch_draft_key"
+STOCK_IN_FORM_SESSION_KEY = "stock_in_form_draft_key"
+
 # --- ui_view_inventory_summary (No changes from previous versions you provided) ---
 @ui_router.get("/summary/", response_class=HTMLResponse, name="ui_view_inventory_summary")
-async def ui_view_inventory_summary(
+def ui_view_inventory_summary(
     request: Request, page: int = Query(1, ge=1), limit: int = Query(15, ge=1),
     category_str: Optional[str] = Query(None, alias="category"), location_str: Optional[str] = Query(None, alias="location"),
     db: Session = Depends(get_db)
@@ -48,8 +54,8 @@ async def ui_view_inventory_summary(
     items_orm = report_data.get("items", [])
     total_count = report_data.get("total_count", 0)
     total_pages = math.ceil(total_count / limit) if limit > 0 else 0
-    all_categories_data = category_service.get_categories(db=db, limit=1000); all_categories = all_categories_data.get("items", [])
-    all_locations_data = location_service.get_locations(db=db, limit=1000); all_locations = all_locations_data.get("items", [])
+    all_categories = category_service.get_all_categories_cached(db)
+    all_locations = location_service.get_all_locations_cached(db)
 
     formatted_items = []
     for item_orm in items_orm:
@@ -70,6 +76,7 @@ async def ui_view_inventory_summary(
 
     context = {
         "request": request, "stock_summary": formatted_items,
+        "export_url": export_url(request, "api_export_inventory_summary", category_id=category_id, location_id=location_id),
         "page": page, "limit": limit, "total_count": total_count, "total_pages": total_pages,
         "message": request.query_params.get('message'), "error": request.query_params.get('error'),
         "skip": skip, "all_categories": all_categories, "selected_category_id": category_id,
@@ -80,30 +87,25 @@ async def ui_view_inventory_summary(
 
 # --- Batch Stock-In Routes (New and Modified) ---
 @ui_router.get("/stock-in", response_class=HTMLResponse, name="ui_show_stock_in_form")
-async def ui_show_stock_in_form(request: Request, db: Session = Depends(get_db)):
+def ui_show_stock_in_form(request: Request, db: Session = Depends(get_db)):
     templates = request.app.state.templates
     if templates is None: raise HTTPException(status_code=500, detail="Templates not configured")
     
-    locations_data = location_service.get_locations(db=db, limit=1000)
-    categories_data = category_service.get_categories(db=db, limit=1000)
-    
-    form_data_raw_json = request.session.pop("stock_in_form_data_raw", None)
-    error_message = request.session.pop("stock_in_error_message", None)
+    locations = location_service.get_all_locations_cached(db)
+    categories = category_service.get_all_categories_cached(db)
     
-    form_data_raw = None
-    if form_data_raw_json:
-        try:
-            form_data_raw = json.loads(form_data_raw_json)
-        except json.JSONDecodeError:
-            print("Warning: Could not decode stock_in_form_data_raw from session.")
-            form_data_raw = None # Ensure it's None if decode fails
+    form_draft_key = request.session.pop(STOCK_IN_FORM_SESSION_KEY, None)
+    form_draft = draft_service.get_draft(db, form_draft_key, STOCK_IN_FORM_DRAFT) or {}
+    if form_draft_key: draft_service.discard_draft(db, form_draft_key) # แสดงครั้งเดียวเหมือน session.pop เดิม
+    form_data_raw = form_draft.get("form_data")
+    error_message = form_draft.get("error_message")
 
     return templates.TemplateResponse(
         "inventory/stock_in.html", # This template is now designed for batch stock-in
         {
             "request": request,
-            "locations": locations_data.get("items", []),
-            "categories": categories_data.get("items", []),
+            "locations": locations,
+            "categories": categories,
             "error": error_message or request.query_params.get('error'),
             "message": request.query_params.get('message'),
             "form_data_raw": form_data_raw 
@@ -111,12 +113,11 @@ async def ui_show_stock_in_form(request: Request, db: Session = Depends(get_db))
     )
 
 @ui_router.post("/stock-in/process-details", name="ui_process_stock_in_details_for_review")
-async def ui_process_stock_in_details_for_review(
+def ui_process_stock_in_details_for_review(
     request: Request, 
-    db: Session = Depends(get_db) 
+    db: Session = Depends(get_db),
+    form_data: Dict[str, Any] = Depends(get_form_data) # Parsed form as a regular dict for easier processing
 ):
-    form_data_dict = await request.form() 
-    form_data = dict(form_data_dict) # Convert FormData to a regular dict for easier processing
 
     parsed_items: List[StockInItemDetailSchema] = []
     
@@ -186,27 +187,33 @@ async def ui_process_stock_in_details_for_review(
             items=parsed_items,
             batch_notes=batch_notes_val
         )
-        request.session["batch_stock_in_data"] = batch_schema_for_session.model_dump(mode='json')
+        request.session[STOCK_IN_BATCH_SESSION_KEY] = draft_service.save_draft(
+            db, STOCK_IN_BATCH_DRAFT, batch_schema_for_session.model_dump(mode='json'),
+            key=request.session.get(STOCK_IN_BATCH_SESSION_KEY)
+        )
         
         return RedirectResponse(url=request.app.url_path_for('ui_show_stock_in_review_page'), status_code=status.HTTP_303_SEE_OTHER)
 
     except ValueError as ve:
-        request.session["stock_in_error_message"] = str(ve)
-        request.session["stock_in_form_data_raw"] = json.dumps(form_data) # Store original form_data
-        return RedirectResponse(url=request.app.url_path_for('ui_show_stock_in_form'), status_code=status.HTTP_303_SEE_OTHER)
+        error_message = str(ve)
     except Exception as ex:
         print(f"Error processing stock-in details: {type(ex).__name__} - {ex}")
-        request.session["stock_in_error_message"] = "เกิดข้อผิดพลาดในการประมวลผลข้อมูล โปรดลองอีกครั้ง"
-        request.session["stock_in_form_data_raw"] = json.dumps(form_data)
-        return RedirectResponse(url=request.app.url_path_for('ui_show_stock_in_form'), status_code=status.HTTP_303_SEE_OTHER)
+        db.rollback() # ให้ session ใช้ต่อได้ถ้า error มาจาก DB
+        error_message = "เกิดข้อผิดพลาดในการประมวลผลข้อมูล โปรดลองอีกครั้ง"
+    # เก็บค่าที่กรอกไว้ (Store original form_data) ให้หน้าฟอร์มเติมกลับ
+    request.session[STOCK_IN_FORM_SESSION_KEY] = draft_service.save_draft(
+        db, STOCK_IN_FORM_DRAFT, {"error_message": error_message, "form_data": form_data},
+        key=request.session.get(STOCK_IN_FORM_SESSION_KEY)
+    )
+    return RedirectResponse(url=request.app.url_path_for('ui_show_stock_in_form'), status_code=status.HTTP_303_SEE_OTHER)
 
 
 @ui_router.get("/stock-in/review", response_class=HTMLResponse, name="ui_show_stock_in_review_page")
-async def ui_show_stock_in_review_page(request: Request, db: Session = Depends(get_db)):
+def ui_show_stock_in_review_page(request: Request, db: Session = Depends(get_db)):
     templates = request.app.state.templates
     if templates is None: raise HTTPException(status_code=500, detail="Templates not configured")
 
-    batch_data_dict_from_session = request.session.get("batch_stock_in_data")
+    batch_data_dict_from_session = draft_service.get_draft(db, request.session.get(STOCK_IN_BATCH_SESSION_KEY), STOCK_IN_BATCH_DRAFT)
     if not batch_data_dict_from_session:
         error_query_params = python_urlencode({"error": "ไม่พบข้อมูล Batch สำหรับตรวจสอบ กรุณาเริ่มต้นใหม่"})
         return RedirectResponse(url=f"{request.app.url_path_for('ui_show_stock_in_form')}?{error_query_params}", status_code=status.HTTP_303_SEE_OTHER)
@@ -220,7 +227,7 @@ async def ui_show_stock_in_review_page(request: Request, db: Session = Depends(g
 
     except Exception as e: 
         print(f"Error validating batch data from session for review: {type(e).__name__} - {e}")
-        request.session.pop("batch_stock_in_data", None) 
+        draft_service.discard_draft(db, request.session.pop(STOCK_IN_BATCH_SESSION_KEY, None))
         error_query_params = python_urlencode({"error": "ข้อมูล Batch ใน Session ไม่ถูกต้อง กรุณาเริ่มต้นใหม่"})
         return RedirectResponse(url=f"{request.app.url_path_for('ui_show_stock_in_form')}?{error_query_params}", status_code=status.HTTP_303_SEE_OTHER)
 
@@ -237,9 +244,12 @@ async def ui_show_stock_in_review_page(request: Request, db: Session = Depends(g
     )
 
 @ui_router.post("/stock-in/confirm", name="ui_confirm_batch_stock_in")
-async def ui_confirm_batch_stock_in(request: Request, db: Session = Depends(get_db)):
-    batch_data_dict = request.session.pop("batch_stock_in_data", None) 
+def ui_confirm_batch_stock_in(request: Request, db: Session = Depends(get_db)):
+    # ลบ draft ใน transaction เดียวกับการบันทึก: สำเร็จแล้ว draft หายไปด้วย (กดยืนยันซ้ำจะไม่บันทึกซ้ำ) ถ้า rollback draft กลับมาให้ลองใหม่
+    batch_draft_key = request.session.get(STOCK_IN_BATCH_SESSION_KEY)
+    batch_data_dict = draft_service.take_draft(db, batch_draft_key, STOCK_IN_BATCH_DRAFT)
     if not batch_data_dict:
+        request.session.pop(STOCK_IN_BATCH_SESSION_KEY, None)
         error_query_params = python_urlencode({"error": "ไม่พบข้อมูล Batch ที่จะบันทึก กรุณาเริ่มต้นใหม่"})
         return RedirectResponse(url=f"{request.app.url_path_for('ui_show_stock_in_form')}?{error_query_params}", status_code=status.HTTP_303_SEE_OTHER)
 
@@ -247,21 +257,20 @@ async def ui_confirm_batch_stock_in(request: Request, db: Session = Depends(get_
         batch_stock_in_data = BatchStockInSchema.model_validate(batch_data_dict)
         # The service function record_batch_stock_in prepares transactions but doesn't commit.
         inventory_service.record_batch_stock_in(db=db, batch_data=batch_stock_in_data)
-        db.commit() # Commit all prepared changes here
+        db.commit() # Commit all prepared changes here (รวมการลบ draft)
+        request.session.pop(STOCK_IN_BATCH_SESSION_KEY, None)
         success_message = f"บันทึกการรับสินค้าเข้า Batch (จำนวน {len(batch_stock_in_data.items)} ประเภทสินค้า) เรียบร้อยแล้ว"
         redirect_url_path = str(request.app.url_path_for('ui_view_inventory_summary'))
         query_params = python_urlencode({"message": success_message})
         return RedirectResponse(url=f"{redirect_url_path}?{query_params}", status_code=status.HTTP_303_SEE_OTHER)
     
     except ValueError as e:
-        db.rollback()
-        request.session["batch_stock_in_data"] = batch_data_dict # Put data back for retry
+        db.rollback() # draft กลับมาให้ลองใหม่
         error_query_params = python_urlencode({"error": str(e)})
         review_page_url = str(request.app.url_path_for('ui_show_stock_in_review_page'))
         return RedirectResponse(url=f"{review_page_url}?{error_query_params}", status_code=status.HTTP_303_SEE_OTHER)
     except Exception as e:
         db.rollback()
-        request.session["batch_stock_in_data"] = batch_data_dict 
         print(f"Unexpected error confirming batch stock-in: {type(e).__name__} - {e}")
         error_query_params = python_urlencode({"error": "เกิดข้อผิดพลาดที่ไม่คาดคิดขณะบันทึก Batch สต็อกเข้า"})
         review_page_url = str(request.app.url_path_for('ui_show_stock_in_review_page'))
@@ -270,18 +279,18 @@ async def ui_confirm_batch_stock_in(request: Request, db: Session = Depends(get_
 
 # --- Adjustment Routes (No changes from previous versions you provided) ---
 @ui_router.get("/adjust/", response_class=HTMLResponse, name="ui_show_adjustment_form")
-async def ui_show_adjustment_form(request: Request, db: Session = Depends(get_db)):
+def ui_show_adjustment_form(request: Request, db: Session = Depends(get_db)):
     templates = request.app.state.templates
     if templates is None: raise HTTPException(status_code=500, detail="Templates not configured")
-    locations_data = location_service.get_locations(db=db, limit=1000); locations = locations_data.get("items", [])
-    categories_data = category_service.get_categories(db=db, limit=1000); categories = categories_data.get("items", [])
+    locations = location_service.get_all_locations_cached(db)
+    categories = category_service.get_all_categories_cached(db)
     adjustment_reasons = [ "สินค้าเสียหาย", "สินค้าหมดอายุ", "แก้ไขยอดจากการนับสต็อก - เพิ่ม", "แก้ไขยอดจากการนับสต็อก - ลด", "ใช้ภายใน", "ส่งคืนผู้ขาย", "อื่นๆ" ]
     return templates.TemplateResponse("inventory/adjustment.html", {
         "request": request, "categories": categories, "locations": locations,
         "reasons": adjustment_reasons, "form_data": None, "error": None })
 
 @ui_router.post("/adjust/", response_class=HTMLResponse, name="ui_handle_adjustment_form")
-async def ui_handle_adjustment_form(
+def ui_handle_adjustment_form(
     request: Request, db: Session = Depends(get_db), product_id: int = Form(...), location_id: int = Form(...),
     quantity_change: float = Form(...), reason: Optional[str] = Form(None), notes: Optional[str] = Form(None),
     sku_barcode_display_only: Optional[str] = Form(None), category_id_for_reload: Optional[str] = Form(None)
@@ -293,8 +302,8 @@ async def ui_handle_adjustment_form(
                       "category_id_for_reload": category_id_for_reload}
     adjustment_reasons = [ "สินค้าเสียหาย", "สินค้าหมดอายุ", "แก้ไขยอดจากการนับสต็อก - เพิ่ม", "แก้ไขยอดจากการนับสต็อก - ลด", "ใช้ภายใน", "ส่งคืนผู้ขาย", "อื่นๆ" ]
     common_context = {"request": request,
-                            "locations": location_service.get_locations(db=db, limit=1000).get("items", []),
-                            "categories": category_service.get_categories(db=db, limit=1000).get("items", []),
+                            "locations": location_service.get_all_locations_cached(db),
+                            "categories": category_service.get_all_categories_cached(db),
                             "reasons": adjustment_reasons, "form_data": form_data_dict}
     if not product_id:
         common_context["error"] = "ไม่พบรหัสสินค้า กรุณาค้นหาหรือเลือกสินค้าอีกครั้ง"
@@ -329,15 +338,15 @@ async def ui_handle_adjustment_form(
 
 # --- Transfer Routes (No changes from previous versions you provided) ---
 @ui_router.get("/transfer/", response_class=HTMLResponse, name="ui_show_transfer_form")
-async def ui_show_transfer_form(request: Request, db: Session = Depends(get_db)):
+def ui_show_transfer_form(request: Request, db: Session = Depends(get_db)):
     templates = request.app.state.templates
     if templates is None: raise HTTPException(status_code=500, detail="Templates not configured")
-    locations_data = location_service.get_locations(db=db, limit=1000); locations = locations_data.get("items", [])
-    categories_data = category_service.get_categories(db=db, limit=1000); categories = categories_data.get("items", [])
+    locations = location_service.get_all_locations_cached(db)
+    categories = category_service.get_all_categories_cached(db)
     return templates.TemplateResponse("inventory/transfer.html", {"request": request, "locations": locations, "categories": categories, "form_data": None, "error": None})
 
 @ui_router.post("/transfer/", response_class=HTMLResponse, name="ui_handle_transfer_form")
-async def ui_handle_transfer_form(
+def ui_handle_transfer_form(
     request: Request, db: Session = Depends(get_db), product_id: int = Form(...),
     from_location_id: int = Form(...), to_location_id: int = Form(...),
     quantity: float = Form(...), notes: Optional[str] = Form(None), 
@@ -348,8 +357,8 @@ async def ui_handle_transfer_form(
     form_data_dict = {"product_id": product_id, "from_location_id": from_location_id, "to_location_id": to_location_id,
                       "quantity": quantity, "notes": notes, "sku_barcode_display_only": sku_barcode_display_only,
                       "category_id_for_reload": category_id_for_reload}
-    common_context = {"request": request, "locations": location_service.get_locations(db=db, limit=1000).get("items", []),
-                            "categories": category_service.get_categories(db=db, limit=1000).get("items", []),
+    common_context = {"request": request, "locations": location_service.get_all_locations_cached(db),
+                            "categories": category_service.get_all_categories_cached(db),
                             "form_data": form_data_dict}
     if not product_id:
         common_context["error"] = "ไม่พบรหัสสินค้า กรุณาค้นหาหรือเลือกสินค้าอีกครั้ง"
@@ -384,11 +393,13 @@ async def ui_handle_transfer_form(
 
 # --- Transaction Log Page Route (No changes from previous versions you provided) ---
 @ui_router.get("/transactions/", response_class=HTMLResponse, name="ui_view_all_transactions")
-async def ui_view_all_transactions(
+def ui_view_all_transactions(
     request: Request, page: int = Query(1, ge=1), limit: int = Query(30, ge=1, le=200),
     product_id_str: Optional[str] = Query(None, alias="product_id"), location_id_str: Optional[str] = Query(None, alias="location_id"),
     type_str: Optional[str] = Query(None, alias="type"), start_date_str: Optional[str] = Query(None, alias="start_date"),
-    end_date_str: Optional[str] = Query(None, alias="end_date"), db: Session = Depends(get_db)
+    end_date_str: Optional[str] = Query(None, alias="end_date"),
+    cursor: Optional[str] = Query(None), count: str = Query("exact", pattern="^(exact|estimate|none)$"),
+    db: Session = Depends(get_db)
 ):
     templates = request.app.state.templates
     if templates is None: raise HTTPException(status_code=500, detail="Templates not configured")
@@ -405,20 +416,24 @@ async def ui_view_all_transactions(
     except ValueError: parse_error = (f"{parse_error}; " if parse_error else "") + f"รูปแบบวันที่สิ้นสุดไม่ถูกต้อง: '{end_date_str}'"
 
     context = {"request": request, "transactions": [], "page": page, "limit": limit, "total_count": 0, "total_pages": 0, "skip": skip,
+               "next_cursor": None,
                "all_products": [], "all_locations": [], "all_transaction_types": TransactionType, 
                "selected_product_id": product_id, "selected_location_id": location_id, "selected_type": type_str,
                "start_date": start_date_str or "", "end_date": end_date_str or "", "error": parse_error,
+               "export_url": export_url(request, "api_export_inventory_transactions", product_id=product_id, location_id=location_id,
+                                        transaction_type=transaction_type, start_date=start_date_obj, end_date=end_date_obj),
                "message": request.query_params.get('message'), "models": models, "timedelta": timedelta} # Pass timedelta
     try: context["all_products"] = product_service.get_products(db, limit=10000).get("items", [])
     except Exception as e: print(f"Error fetching products for filter: {e}")
-    try: context["all_locations"] = location_service.get_locations(db, limit=1000).get("items", [])
+    try: context["all_locations"] = location_service.get_all_locations_cached(db)
     except Exception as e: print(f"Error fetching locations for filter: {e}")
 
     if not parse_error:
         try:
             transactions_data = inventory_service.get_inventory_transactions(
                 db, skip=skip, limit=limit, product_id=product_id, location_id=location_id,
-                transaction_type=transaction_type, start_date=start_date_obj, end_date=end_date_obj
+                transaction_type=transaction_type, start_date=start_date_obj, end_date=end_date_obj,
+                cursor=cursor, count_mode=count
             )
             items_orm = transactions_data.get("items", [])
             total_count = transactions_data.get("total_count", 0)
@@ -438,40 +453,42 @@ async def ui_view_all_transactions(
                 except Exception as format_err: print(f"Error processing transaction ID {getattr(tx_orm, 'id', 'N/A')} for display: {format_err}")
             context["transactions"] = formatted_items
             context["total_count"] = total_count
-            context["total_pages"] = math.ceil(total_count / limit) if limit > 0 else 0
+            context["total_pages"] = (math.ceil(total_count / limit) if limit > 0 else 0) if total_count is not None else None
+            context["next_cursor"] = transactions_data.get("next_cursor")
         except Exception as e:
             print(f"Error fetching inventory transactions: {e}")
             context["error"] = f"เกิดข้อผิดพลาดในการดึงข้อมูล: {e}"
     return templates.TemplateResponse("inventory/transactions_list.html", context)
 
-# --- Near Expiry Report (No changes from previous versions you provided) ---
+# --- Near Expiry Report (ล็อตที่ยังมีของคงเหลือ จาก stock_lots) ---
 @ui_router.get("/near-expiry/", response_class=HTMLResponse, name="ui_near_expiry_report")
-async def ui_near_expiry_report(
+def ui_near_expiry_report(
     request: Request, db: Session = Depends(get_db),
     days_ahead: int = Query(30, ge=1), page: int = Query(1, ge=1), limit: int = Query(15, ge=1)
 ):
     templates = request.app.state.templates
     if templates is None: raise HTTPException(status_code=500, detail="Templates not configured")
     skip = (page - 1) * limit; skip = max(0, skip)
-    report_data = inventory_service.get_near_expiry_transactions(db, days_ahead=days_ahead, skip=skip, limit=limit)
-    transactions_orm = report_data.get("transactions", [])
+    report_data = inventory_service.get_near_expiry_lots(db, days_ahead=days_ahead, skip=skip, limit=limit)
+    lots_orm = report_data.get("lots", [])
     total_count = report_data.get("total_count", 0)
     total_pages = math.ceil(total_count / limit) if limit > 0 else 0
-    today_date_obj = date.today()
-    formatted_transactions = []
-    for tx_orm in transactions_orm:
+    today_date_obj = bangkok_today()
+    formatted_lots = []
+    for lot_orm in lots_orm:
         try:
-            tx_dict = {"id": tx_orm.id, "quantity_change": tx_orm.quantity_change, "cost_per_unit": tx_orm.cost_per_unit,
-                       "notes": tx_orm.notes, 'product_name': tx_orm.product.name if tx_orm.product else 'N/A',
-                       'product_sku': tx_orm.product.sku if tx_orm.product else 'N/A',
-                       'location_name': tx_orm.location.name if tx_orm.location else 'N/A',
-                       'shelf_life_days': tx_orm.product.shelf_life_days if tx_orm.product and tx_orm.product.shelf_life_days is not None else '-',
-                       'expiry_date_formatted': format_thai_date(tx_orm.expiry_date, format_str="%d/%m/%Y"),
-                       'transaction_date_formatted': format_thai_datetime(tx_orm.transaction_date, format_str='%d/%m/%y %H:%M'),
-                       'days_left': (tx_orm.expiry_date - today_date_obj).days if tx_orm.expiry_date else -1}
-            formatted_transactions.append(tx_dict)
-        except Exception as format_err: print(f"Error processing near-expiry transaction {getattr(tx_orm, 'id', 'N/A')}: {format_err}")
-    context = {"request": request, "transactions": formatted_transactions, "days_ahead": days_ahead, "page": page,
+            lot_dict = {"id": lot_orm.id, "remaining_qty": lot_orm.remaining_qty, "received_quantity": lot_orm.received_quantity,
+                        "cost_per_unit": lot_orm.cost_per_unit,
+                        'product_name': lot_orm.product.name if lot_orm.product else 'N/A',
+                        'product_sku': lot_orm.product.sku if lot_orm.product else 'N/A',
+                        'location_name': lot_orm.location.name if lot_orm.location else 'N/A',
+                        'shelf_life_days': lot_orm.product.shelf_life_days if lot_orm.product and lot_orm.product.shelf_life_days is not None else '-',
+                        'expiry_date_formatted': format_thai_date(lot_orm.expiry_date, format_str="%d/%m/%Y"),
+                        'received_at_formatted': format_thai_datetime(lot_orm.received_at, format_str='%d/%m/%y %H:%M'),
+                        'days_left': (lot_orm.expiry_date - today_date_obj).days if lot_orm.expiry_date else -1}
+            formatted_lots.append(lot_dict)
+        except Exception as format_err: print(f"Error processing near-expiry lot {getattr(lot_orm, 'id', 'N/A')}: {format_err}")
+    context = {"request": request, "lots": formatted_lots, "days_ahead": days_ahead, "page": page,
                "limit": limit, "total_count": total_count, "total_pages": total_pages, "today": today_date_obj, "skip": skip,
                "timedelta": timedelta} # Pass timedelta
     return templates.TemplateResponse("reports/near_expiry.html", context)
\ No newline at end of file
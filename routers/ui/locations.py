@@ -20,7 +20,7 @@ ui_router = APIRouter(
 
 # --- UI Routes ---
 @ui_router.get("/", response_class=HTMLResponse, name="ui_read_all_locations")
-async def ui_read_all_locations(
+def ui_read_all_locations(
     request: Request, page: int = 1, limit: int = 15, db: Session = Depends(get_db)
 ):
     templates = request.app.state.templates
@@ -46,7 +46,7 @@ async def ui_show_add_location_form(request: Request):
     return templates.TemplateResponse("locations/add.html", {"request": request, "form_data": None, "error": None})
 
 @ui_router.post("/add", response_class=HTMLResponse, name="ui_handle_add_location_form")
-async def ui_handle_add_location_form(
+def ui_handle_add_location_form(
     request: Request, db: Session = Depends(get_db),
     name: str = Form(...),
     description: Optional[str] = Form(None),
@@ -76,7 +76,7 @@ async def ui_handle_add_location_form(
          return templates.TemplateResponse("locations/add.html", {"request": request, "error": "เกิดข้อผิดพลาดที่ไม่คาดคิดขณะเพิ่มสถานที่", "form_data": form_data_dict }, status_code=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 @ui_router.get("/edit/{location_id}", response_class=HTMLResponse, name="ui_show_edit_location_form")
-async def ui_show_edit_location_form(
+def ui_show_edit_location_form(
     request: Request, location_id: int, db: Session = Depends(get_db)
 ):
     templates = request.app.state.templates
@@ -88,7 +88,7 @@ async def ui_show_edit_location_form(
     })
 
 @ui_router.post("/edit/{location_id}", response_class=HTMLResponse, name="ui_handle_edit_location_form")
-async def ui_handle_edit_location_form(
+def ui_handle_edit_location_form(
     request: Request, location_id: int, db: Session = Depends(get_db),
     name: str = Form(...),
     description: Optional[str] = Form(None),
@@ -134,7 +134,7 @@ async def ui_handle_edit_location_form(
          return templates.TemplateResponse("locations/edit.html", context, status_code=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 @ui_router.post("/delete/{location_id}", name="ui_handle_delete_location")
-async def ui_handle_delete_location(
+def ui_handle_delete_location(
     request: Request, location_id: int, db: Session = Depends(get_db)
 ):
     error_message = None; success_message = None
@@ -11,6 +11,7 @@ import schemas
 import models
 from services import product_service, category_service
 from database import get_db
+from utils import get_form_data
 
 # Define prefix here
 ui_router = APIRouter(
@@ -21,7 +22,7 @@ ui_router = APIRouter(
 
 # --- UI Routes (Moved from original routers/products.py) ---
 @ui_router.get("/", response_class=HTMLResponse, name="ui_read_all_products")
-async def ui_read_all_products(request: Request, page: int = 1, limit: int = 15, db: Session = Depends(get_db)):
+def ui_read_all_products(request: Request, page: int = 1, limit: int = 15, db: Session = Depends(get_db)):
     templates = request.app.state.templates
     if templates is None: raise HTTPException(status_code=500, detail="Templates not configured")
     skip = (page - 1) * limit
@@ -37,16 +38,15 @@ async def ui_read_all_products(request: Request, page: int = 1, limit: int = 15,
     })
 
 @ui_router.get("/add", response_class=HTMLResponse, name="ui_show_add_product_form")
-async def ui_show_add_product_form(request: Request, db: Session = Depends(get_db)):
+def ui_show_add_product_form(request: Request, db: Session = Depends(get_db)):
     templates = request.app.state.templates
     if templates is None: raise HTTPException(status_code=500, detail="Templates not configured")
-    categories_data = category_service.get_categories(db=db, limit=1000)
-    categories = categories_data.get("items", [])
+    categories = category_service.get_all_categories_cached(db)
     return templates.TemplateResponse("products/add.html", {"request": request, "categories": categories, "form_data": None, "error": None})
 
 
 @ui_router.post("/add", response_class=HTMLResponse, name="ui_handle_add_product_form")
-async def ui_handle_add_product_form(
+def ui_handle_add_product_form(
     request: Request, db: Session = Depends(get_db), sku: str = Form(...), name: str = Form(...),
     category_id: int = Form(...), price_b2c: float = Form(...),
     standard_cost: Optional[float] = Form(None), price_b2b: Optional[float] = Form(None),
@@ -83,18 +83,16 @@ async def ui_handle_add_product_form(
 
         return RedirectResponse(url=redirect_url, status_code=status.HTTP_303_SEE_OTHER)
     except ValueError as e:
-        categories_data = category_service.get_categories(db=db, limit=1000)
-        categories = categories_data.get("items", [])
+        categories = category_service.get_all_categories_cached(db)
         return templates.TemplateResponse("products/add.html", {"request": request, "categories": categories, "error": str(e), "form_data": form_data_dict}, status_code=status.HTTP_400_BAD_REQUEST)
     except Exception as e:
-         categories_data = category_service.get_categories(db=db, limit=1000)
-         categories = categories_data.get("items", [])
+         categories = category_service.get_all_categories_cached(db)
          print(f"Unexpected add product form error: {type(e).__name__} - {e}")
          return templates.TemplateResponse("products/add.html", {"request": request, "categories": categories, "error": "เกิดข้อผิดพลาดที่ไม่คาดคิดขณะเพิ่มสินค้า", "form_data": form_data_dict }, status_code=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
 @ui_router.post("/delete/{product_id}", name="ui_handle_delete_product")
-async def ui_handle_delete_product(request: Request, product_id: int, db: Session = Depends(get_db)):
+def ui_handle_delete_product(request: Request, product_id: int, db: Session = Depends(get_db)):
     error_message = None; success_message = None
     redirect_url = "/ui/products/" # Fallback
     try:
@@ -126,7 +124,7 @@ async def ui_handle_delete_product(request: Request, product_id: int, db: Sessio
 
 
 @ui_router.get("/edit/{product_id}", response_class=HTMLResponse, name="ui_show_edit_product_form")
-async def ui_show_edit_product_form(request: Request, product_id: int, db: Session = Depends(get_db)):
+def ui_show_edit_product_form(request: Request, product_id: int, db: Session = Depends(get_db)):
     templates = request.app.state.templates
     if templates is None: raise HTTPException(status_code=500, detail="Templates not configured")
 
@@ -134,8 +132,7 @@ async def ui_show_edit_product_form(request: Request, product_id: int, db: Sessi
     if product_data is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"ไม่พบสินค้ารหัส {product_id}")
 
-    categories_data = category_service.get_categories(db=db, limit=1000)
-    categories = categories_data.get("items", [])
+    categories = category_service.get_all_categories_cached(db)
     form_data_from_db = schemas.Product.model_validate(product_data).model_dump()
     return templates.TemplateResponse("products/edit.html", {
         "request": request,
@@ -147,14 +144,15 @@ async def ui_show_edit_product_form(request: Request, product_id: int, db: Sessi
 
 
 @ui_router.post("/edit/{product_id}", response_class=HTMLResponse, name="ui_handle_edit_product_form")
-async def ui_handle_edit_product_form(
+def ui_handle_edit_product_form(
     request: Request, product_id: int, db: Session = Depends(get_db),
     sku: Optional[str] = Form(None), name: Optional[str] = Form(None),
     category_id: Optional[int] = Form(None), price_b2c: Optional[float] = Form(None),
     standard_cost: Optional[float] = Form(None), price_b2b: Optional[float] = Form(None),
     barcode: Optional[str] = Form(None),
     shelf_life_days: Optional[str] = Form(None), # <-- Receive as string
-    description: Optional[str] = Form(None), image_url: Optional[str] = Form(None)
+    description: Optional[str] = Form(None), image_url: Optional[str] = Form(None),
+    raw_form_data: Dict[str, Any] = Depends(get_form_data)
 ):
     templates = request.app.state.templates
     if templates is None: raise HTTPException(status_code=500, detail="Templates not configured")
@@ -176,7 +174,7 @@ async def ui_handle_edit_product_form(
     if price_b2b is not None: update_payload['price_b2b'] = price_b2b
 
     # Handle fields where empty string means clear
-    submitted_form_keys = (await request.form()).keys()
+    submitted_form_keys = raw_form_data.keys()
     for key in ['barcode', 'description', 'image_url']:
          if key in submitted_form_keys:
              value = form_data_dict_raw.get(key)
@@ -195,8 +193,7 @@ async def ui_handle_edit_product_form(
                 update_payload['shelf_life_days'] = shelf_life_int
             except (ValueError, TypeError):
                  product_data_for_form = product_service.get_product(db, product_id=product_id)
-                 categories_data = category_service.get_categories(db=db, limit=1000)
-                 categories = categories_data.get("items", [])
+                 categories = category_service.get_all_categories_cached(db)
                  return templates.TemplateResponse("products/edit.html", {"request": request, "product": product_data_for_form, "categories": categories, "error": "รูปแบบอายุสินค้า (Shelf Life) ไม่ถูกต้อง ต้องเป็นตัวเลขจำนวนเต็ม", "form_data": form_data_dict_raw }, status_code=status.HTTP_400_BAD_REQUEST)
     # If 'shelf_life_days' was not submitted, it won't be in update_payload
 
@@ -230,8 +227,7 @@ async def ui_handle_edit_product_form(
 
     except ValueError as e:
         product_data_for_form = product_service.get_product(db, product_id=product_id)
-        categories_data = category_service.get_categories(db=db, limit=1000)
-        categories = categories_data.get("items", [])
+        categories = category_service.get_all_categories_cached(db)
         if not product_data_for_form:
             return RedirectResponse(url=request.app.url_path_for('ui_read_all_products') + "?error=Product+not+found+during+edit+error", status_code=status.HTTP_303_SEE_OTHER)
         return templates.TemplateResponse("products/edit.html", {
@@ -240,8 +236,7 @@ async def ui_handle_edit_product_form(
         }, status_code=status.HTTP_400_BAD_REQUEST)
     except Exception as e:
          product_data_for_form = product_service.get_product(db, product_id=product_id)
-         categories_data = category_service.get_categories(db=db, limit=1000)
-         categories = categories_data.get("items", [])
+         categories = category_service.get_all_categories_cached(db)
          print(f"Unexpected edit product form error: {type(e).__name__} - {e}")
          context = {
             "request": request, "error": "เกิดข้อผิดพลาดที่ไม่คาดคิดขณะอัปเดตสินค้า",
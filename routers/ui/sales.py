@@ -12,6 +12,7 @@ import schemas
 import models
 from services import sales_service, location_service, category_service, product_service
 from database import get_db
+from utils import export_url
 
 # Define prefix here for all routes in this file
 ui_router = APIRouter(
@@ -22,12 +23,12 @@ ui_router = APIRouter(
 
 # --- UI Routes ---
 @ui_router.get("/pos/", response_class=HTMLResponse, name="ui_show_pos_form")
-async def ui_show_pos_form(request: Request, db: Session = Depends(get_db)):
+def ui_show_pos_form(request: Request, db: Session = Depends(get_db)):
     templates = request.app.state.templates
     if not templates: raise HTTPException(status_code=500, detail="Templates not configured")
 
-    locations_data = location_service.get_locations(db=db, limit=1000)
-    categories_data = category_service.get_categories(db=db, limit=1000)
+    locations = location_service.get_all_locations_cached(db)
+    categories = category_service.get_all_categories_cached(db)
 
     message = request.query_params.get('message')
     error = request.query_params.get('error')
@@ -35,15 +36,15 @@ async def ui_show_pos_form(request: Request, db: Session = Depends(get_db)):
 
     return templates.TemplateResponse("pos/form.html", {
         "request": request,
-        "locations": locations_data.get("items", []),
-        "categories": categories_data.get("items", []),
+        "locations": locations,
+        "categories": categories,
         "message": message,
         "error": error,
         "ask_override": ask_override == "true" # Pass as boolean to template
     })
 
 @ui_router.post("/pos/", response_class=HTMLResponse, name="ui_handle_pos_form")
-async def ui_handle_pos_form(
+def ui_handle_pos_form(
     request: Request,
     db: Session = Depends(get_db),
     location_id: int = Form(...),
@@ -122,11 +123,12 @@ async def ui_handle_pos_form(
          return RedirectResponse(url=f"{base_pos_url}?{query_params}", status_code=status.HTTP_303_SEE_OTHER)
 
 @ui_router.get("/sales/report/", response_class=HTMLResponse, name="ui_sales_report")
-async def ui_sales_report(
+def ui_sales_report(
     request: Request, db: Session = Depends(get_db),
     start_date_str: Optional[str] = Query(None, alias="start_date"),
     end_date_str: Optional[str] = Query(None, alias="end_date"),
-    page: int = Query(1, gt=0), limit: int = Query(15, gt=0)
+    page: int = Query(1, gt=0), limit: int = Query(15, gt=0),
+    cursor: Optional[str] = Query(None), count: str = Query("exact", pattern="^(exact|estimate|none)$")
 ):
     templates = request.app.state.templates
     if not templates: raise HTTPException(status_code=500, detail="Templates not configured")
@@ -149,7 +151,8 @@ async def ui_sales_report(
         "request": request, "start_date": start_date_str or "", "end_date": end_date_str or "",
         "page": page, "limit": limit, "skip": current_skip,
         "sales_data_with_profit": [], "grand_total_profit": 0.0,
-        "total_count": 0, "total_pages": 0, "error": parse_error
+        "total_count": 0, "total_pages": 0, "next_cursor": None, "error": parse_error,
+        "export_url": export_url(request, "api_export_sales_report", start_date=start_date_obj, end_date=end_date_obj)
     }
 
     if parse_error:
@@ -157,10 +160,16 @@ async def ui_sales_report(
         return templates.TemplateResponse("reports/sales.html", context_vars, status_code=status.HTTP_400_BAD_REQUEST)
 
     # Fetch data only if dates are valid or not provided
-    report_data_dict = sales_service.get_sales_report(db, start_date=start_date_obj, end_date=end_date_obj, skip=current_skip, limit=limit)
+    try:
+        report_data_dict = sales_service.get_sales_report(
+            db, start_date=start_date_obj, end_date=end_date_obj, skip=current_skip, limit=limit, cursor=cursor, count_mode=count
+        )
+    except ValueError as e: # cursor ไม่ถูกต้อง
+        context_vars["error"] = str(e)
+        return templates.TemplateResponse("reports/sales.html", context_vars, status_code=status.HTTP_400_BAD_REQUEST)
     sales_list = report_data_dict.get("sales", [])
-    total_count = report_data_dict.get("total_count", 0)
-    total_pages = math.ceil(total_count / limit) if limit > 0 else 0
+    total_count = report_data_dict.get("total_count")
+    total_pages = (math.ceil(total_count / limit) if limit > 0 else 0) if total_count is not None else None
 
     # Calculate estimated profit (same logic as before)
     sales_data_with_profit = []
@@ -182,6 +191,7 @@ async def ui_sales_report(
         "sales_data_with_profit": sales_data_with_profit,
         "grand_total_profit": grand_total_profit_page,
         "total_count": total_count, "total_pages": total_pages,
+        "next_cursor": report_data_dict.get("next_cursor"),
         "error": None # Clear parse error if data fetch was successful
     })
     return templates.TemplateResponse("reports/sales.html", context_vars)
\ No newline at end of file
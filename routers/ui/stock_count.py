@@ -11,6 +11,7 @@ import schemas
 import models
 from services import stock_count_service, location_service, category_service, product_service
 from database import get_db
+from utils import get_form_data
 
 # Define prefix here
 ui_router = APIRouter(
@@ -21,28 +22,32 @@ ui_router = APIRouter(
 
 # --- UI Routes ---
 @ui_router.get("/sessions/", response_class=HTMLResponse, name="ui_list_stock_count_sessions")
-async def ui_list_stock_count_sessions(
-    request: Request, page: int = Query(1, ge=1), limit: int = Query(15, ge=1), db: Session = Depends(get_db)
+def ui_list_stock_count_sessions(
+    request: Request, page: int = Query(1, ge=1), limit: int = Query(15, ge=1),
+    cursor: Optional[str] = Query(None), count: str = Query("exact", pattern="^(exact|estimate|none)$"),
+    db: Session = Depends(get_db)
 ):
     templates = request.app.state.templates
     if templates is None: raise HTTPException(status_code=500, detail="Templates not configured")
     skip = (page - 1) * limit
     if skip < 0: skip = 0
     message = request.query_params.get('message'); error = request.query_params.get('error')
-    sessions_data = stock_count_service.get_stock_count_sessions(db, skip=skip, limit=limit)
+    try: sessions_data = stock_count_service.get_stock_count_sessions(db, skip=skip, limit=limit, cursor=cursor, count_mode=count)
+    except ValueError as e: # cursor ไม่ถูกต้อง
+        sessions_data = {"items": [], "total_count": 0, "next_cursor": None}; error = str(e)
     total_count = sessions_data["total_count"]; items = sessions_data["items"]
-    total_pages = math.ceil(total_count / limit) if limit > 0 else 0
-    return templates.TemplateResponse("stock_count/sessions_list.html", {"request": request, "sessions": items, "page": page, "limit": limit, "total_count": total_count, "total_pages": total_pages, "message": message, "error": error, "skip": skip})
+    total_pages = (math.ceil(total_count / limit) if limit > 0 else 0) if total_count is not None else None
+    return templates.TemplateResponse("stock_count/sessions_list.html", {"request": request, "sessions": items, "page": page, "limit": limit, "total_count": total_count, "total_pages": total_pages, "next_cursor": sessions_data["next_cursor"], "message": message, "error": error, "skip": skip})
 
 @ui_router.get("/sessions/new", response_class=HTMLResponse, name="ui_show_create_session_form")
-async def ui_show_create_session_form(request: Request, db: Session = Depends(get_db)):
+def ui_show_create_session_form(request: Request, db: Session = Depends(get_db)):
     templates = request.app.state.templates
     if templates is None: raise HTTPException(status_code=500, detail="Templates not configured")
-    locations_data = location_service.get_locations(db=db, limit=1000); locations = locations_data.get("items", [])
+    locations = location_service.get_all_locations_cached(db)
     return templates.TemplateResponse("stock_count/session_create.html", {"request": request, "locations": locations, "form_data": None, "error": None})
 
 @ui_router.post("/sessions/new", response_class=HTMLResponse, name="ui_handle_create_session_form")
-async def ui_handle_create_session_form(
+def ui_handle_create_session_form(
     request: Request, db: Session = Depends(get_db), location_id: int = Form(...), notes: Optional[str] = Form(None)
 ):
     templates = request.app.state.templates
@@ -66,25 +71,25 @@ async def ui_handle_create_session_form(
 
         return RedirectResponse(url=str(redirect_url), status_code=status.HTTP_303_SEE_OTHER)
     except ValueError as e:
-         locations_data = location_service.get_locations(db=db, limit=1000); locations = locations_data.get("items", [])
+         locations = location_service.get_all_locations_cached(db)
          return templates.TemplateResponse("stock_count/session_create.html", {"request": request, "locations": locations, "error": str(e), "form_data": form_data_dict}, status_code=status.HTTP_400_BAD_REQUEST)
     except Exception as e:
-         locations_data = location_service.get_locations(db=db, limit=1000); locations = locations_data.get("items", [])
+         locations = location_service.get_all_locations_cached(db)
          print(f"Unexpected create session error: {e}")
          return templates.TemplateResponse("stock_count/session_create.html", {"request": request, "locations": locations, "error": "เกิดข้อผิดพลาดที่ไม่คาดคิดขณะสร้างรอบนับสต็อก", "form_data": form_data_dict}, status_code=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 @ui_router.get("/sessions/{session_id}", response_class=HTMLResponse, name="ui_view_stock_count_session")
-async def ui_view_stock_count_session(request: Request, session_id: int, db: Session = Depends(get_db)):
+def ui_view_stock_count_session(request: Request, session_id: int, db: Session = Depends(get_db)):
     templates = request.app.state.templates
     if templates is None: raise HTTPException(status_code=500, detail="Templates not configured")
     session = stock_count_service.get_stock_count_session(db, session_id=session_id)
     if session is None: raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"ไม่พบรอบนับสต็อก รหัส {session_id}")
-    categories_data = category_service.get_categories(db=db, limit=1000); categories = categories_data.get("items", [])
+    categories = category_service.get_all_categories_cached(db)
     message = request.query_params.get('message'); error = request.query_params.get('error')
     return templates.TemplateResponse("stock_count/session_detail.html", {"request": request, "session": session, "categories": categories, "message": message, "error": error})
 
 @ui_router.post("/sessions/{session_id}/items/add", name="ui_handle_add_item_to_session")
-async def ui_handle_add_item_to_session(request: Request, session_id: int, db: Session = Depends(get_db), product_id: int = Form(...)):
+def ui_handle_add_item_to_session(request: Request, session_id: int, db: Session = Depends(get_db), product_id: int = Form(...)):
     error_message = None; success_message = None
     redirect_url = f"/ui/stock-counts/sessions/{session_id}"
     try:
@@ -110,7 +115,7 @@ async def ui_handle_add_item_to_session(request: Request, session_id: int, db: S
 
 
 @ui_router.post("/sessions/{session_id}/start-counting", name="ui_start_counting_session")
-async def ui_start_counting_session(request: Request, session_id: int, db: Session = Depends(get_db)):
+def ui_start_counting_session(request: Request, session_id: int, db: Session = Depends(get_db)):
     error_message = None; success_message = None
     redirect_url = f"/ui/stock-counts/sessions/{session_id}"
     try:
@@ -134,10 +139,10 @@ async def ui_start_counting_session(request: Request, session_id: int, db: Sessi
     return RedirectResponse(url=str(redirect_url), status_code=status.HTTP_303_SEE_OTHER)
 
 @ui_router.post("/sessions/{session_id}/update-counts", response_class=HTMLResponse, name="ui_handle_update_counts")
-async def ui_handle_update_counts(request: Request, session_id: int, db: Session = Depends(get_db)):
+def ui_handle_update_counts(request: Request, session_id: int, db: Session = Depends(get_db), form_data: Dict[str, Any] = Depends(get_form_data)):
     templates = request.app.state.templates
     if templates is None: raise HTTPException(status_code=500, detail="Templates not configured")
-    form_data = await request.form(); errors = []; success_count = 0
+    errors = []; success_count = 0
     session = stock_count_service.get_stock_count_session(db, session_id=session_id) # โหลด session มาแสดงผลหากมี error
     if not session: raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"ไม่พบรอบนับสต็อก รหัส {session_id}")
 
@@ -160,17 +165,18 @@ async def ui_handle_update_counts(request: Request, session_id: int, db: Session
             except (ValueError, IndexError): errors.append(f"ข้อมูลยอดนับสำหรับ '{key}' ไม่ถูกต้อง (อาจไม่ใช่ตัวเลข)")
 
     if errors:
-        categories_data = category_service.get_categories(db=db, limit=1000); categories = categories_data.get("items", [])
+        categories = category_service.get_all_categories_cached(db)
         return templates.TemplateResponse("stock_count/session_detail.html", {"request": request, "session": session, "categories": categories, "error": "; ".join(errors)}, status_code=status.HTTP_400_BAD_REQUEST)
 
-    for item_update in items_to_update:
-         if item_update["counted_quantity"] is not None: # Redundant check if schema enforces float, but good for safety
-             try:
-                 update_schema = schemas.StockCountItemUpdate(counted_quantity=item_update["counted_quantity"])
-                 stock_count_service.update_counted_quantity(db, item_id=item_update["item_id"], item_update_data=update_schema)
-                 success_count += 1
-             except ValueError as e: errors.append(f"Item ID {item_update['item_id']}: {str(e)}")
-             except Exception as e: errors.append(f"เกิดข้อผิดพลาดกับ Item ID {item_update['item_id']}: {str(e)}"); print(f"Error updating count item {item_update['item_id']}: {type(e).__name__} - {e}")
+    if items_to_update:
+        # บันทึกทุกรายการใน transaction เดียว (แทนการ commit ทีละรายการ)
+        try:
+            bulk_entries = [schemas.StockCountItemBulkEntry(**item_update) for item_update in items_to_update]
+            bulk_result = stock_count_service.bulk_update_counted_quantities(db, session_id=session_id, counts=bulk_entries)
+            success_count = bulk_result["updated"]
+            errors.extend(f"Item ID {item_error['item_id']}: {item_error['error']}" for item_error in bulk_result["errors"])
+        except ValueError as e: errors.append(str(e))
+        except Exception as e: errors.append(f"เกิดข้อผิดพลาดขณะบันทึกยอดนับ: {str(e)}"); print(f"Error bulk updating counts for session {session_id}: {type(e).__name__} - {e}")
 
     query_params_dict = {}
     if errors: query_params_dict["error"] = "เกิดข้อผิดพลาดบางรายการ: " + "; ".join(errors)
@@ -189,7 +195,7 @@ async def ui_handle_update_counts(request: Request, session_id: int, db: Session
     return RedirectResponse(url=str(redirect_url), status_code=status.HTTP_303_SEE_OTHER)
 
 @ui_router.post("/sessions/{session_id}/close", name="ui_handle_close_session")
-async def ui_handle_close_session(request: Request, session_id: int, db: Session = Depends(get_db)):
+def ui_handle_close_session(request: Request, session_id: int, db: Session = Depends(get_db)):
     error_message = None; success_message = None
     redirect_target_name = 'ui_view_stock_count_session'
     redirect_params = {"session_id": session_id}
@@ -223,7 +229,7 @@ async def ui_handle_close_session(request: Request, session_id: int, db: Session
 
 
 @ui_router.post("/sessions/{session_id}/cancel", name="ui_handle_cancel_session")
-async def ui_handle_cancel_session(request: Request, session_id: int, db: Session = Depends(get_db)):
+def ui_handle_cancel_session(request: Request, session_id: int, db: Session = Depends(get_db)):
     error_message = None; success_message = None
     redirect_target_name = 'ui_view_stock_count_session'
     redirect_params = {"session_id": session_id}
@@ -257,7 +263,7 @@ async def ui_handle_cancel_session(request: Request, session_id: int, db: Sessio
     return RedirectResponse(url=str(redirect_url), status_code=status.HTTP_303_SEE_OTHER)
 
 @ui_router.post("/sessions/{session_id}/items/add-all-from-location", name="ui_handle_add_all_items_from_location")
-async def ui_handle_add_all_items_from_location(
+def ui_handle_add_all_items_from_location(
     request: Request, session_id: int, db: Session = Depends(get_db)
 ):
     error_message = None
@@ -1,6 +1,6 @@
 # schemas/__init__.py
 from .category import Category, CategoryBase, CategoryCreate
-from .product import Product, ProductBase, ProductCreate, ProductUpdate, ProductBasic
+from .product import Product, ProductBase, ProductCreate, ProductUpdate, ProductBasic, ProductScanResult, ProductSearchResult, ProductImportRowError, ProductImportResult
 from .location import Location, LocationBase, LocationCreate
 from .current_stock import CurrentStock
 from .inventory_transaction import (
@@ -15,11 +15,14 @@ from .inventory import ( # แก้ไขส่วนนี้
     StockInItemDetailSchema,  # <--- ที่เพิ่มเข้ามา
     BatchStockInSchema        # <--- ที่เพิ่มเข้ามา
 )
+from .stock_lot import StockLot
+from .stock_snapshot import StockAsOfItem, StockAsOfReport
 from .sale import Sale, SaleBase, SaleCreate, SaleItem, SaleItemBase, SaleItemCreate
 from .stock_count import (
     StockCountSession, StockCountSessionBase, StockCountSessionCreate, StockCountSessionUpdate,
     StockCountItem, StockCountItemBase, StockCountItemCreate, StockCountItemUpdate,
-    StockCountSessionInList
+    StockCountSessionInList, StockCountItemBulkEntry, StockCountItemsBulkUpdate,
+    StockCountItemBulkError, StockCountItemsBulkUpdateResult
 )
 # --- Add Dashboard Schemas ---
 from .dashboard import ( 
@@ -27,5 +30,6 @@ from .dashboard import (
     SalesTrendItemSchema,
     ProductPerformanceItemSchema,
     CategoryDistributionItemSchema,
-    RecentTransactionItemSchema
+    RecentTransactionItemSchema,
+    DashboardOverviewSchema
 )
\ No newline at end of file
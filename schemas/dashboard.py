@@ -51,4 +51,13 @@ class RecentTransactionItemSchema(BaseModel):
      notes: Optional[str] = None
 
      class Config:
-         from_attributes = True # orm_mode = True for Pydantic v1
\ No newline at end of file
+         from_attributes = True # orm_mode = True for Pydantic v1
+
+class DashboardOverviewSchema(BaseModel):
+    """ Schema for the combined dashboard payload (/api/dashboard/overview) """
+    kpis: KpiSummarySchema
+    sales_trend: List[SalesTrendItemSchema] = []
+    top_products: List[ProductPerformanceItemSchema] = []
+    low_stock_items: List[ProductPerformanceItemSchema] = []
+    recent_transactions: List[RecentTransactionItemSchema] = []
+    generated_at: datetime # When the payload was computed (it may be served from cache for a few seconds)
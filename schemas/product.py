@@ -77,4 +77,22 @@ class ProductBasic(BaseModel): # Schema for simpler product display (e.g., dropd
     # but the catalog page uses the full 'Product' schema.
 
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+class ProductScanResult(ProductBasic): # Compact record served from the in-memory scan index (lookup-by-scan)
+    category_name: Optional[str] = None
+
+class ProductSearchResult(BaseModel): # One page of /api/products/search (ranked by relevance)
+    items: List[ProductScanResult]
+    total_count: int
+
+class ProductImportRowError(BaseModel): # One rejected row of a bulk import (row = line number in the uploaded file)
+    row: int
+    sku: Optional[str] = None
+    error: str
+
+class ProductImportResult(BaseModel): # Report of POST /api/products/import
+    total_rows: int
+    imported_count: int
+    error_count: int
+    errors: List[ProductImportRowError]
+    dry_run: bool = False
@@ -22,6 +22,21 @@ class StockCountItemCreate(BaseModel):
 class StockCountItemUpdate(BaseModel):
     counted_quantity: float = Field(..., ge=0)
 
+class StockCountItemBulkEntry(BaseModel):
+    item_id: int
+    counted_quantity: float # ตรวจค่าติดลบใน service เพื่อรายงานเป็น error รายรายการ
+
+class StockCountItemsBulkUpdate(BaseModel):
+    items: List[StockCountItemBulkEntry] = Field(..., min_length=1)
+
+class StockCountItemBulkError(BaseModel):
+    item_id: int
+    error: str
+
+class StockCountItemsBulkUpdateResult(BaseModel):
+    updated: int
+    errors: List[StockCountItemBulkError] = []
+
 class StockCountItem(StockCountItemBase):
     id: int
     session_id: int
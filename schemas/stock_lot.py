@@ -0,0 +1,24 @@
+# schemas/stock_lot.py
+from pydantic import BaseModel
+from typing import Optional
+from datetime import datetime, date
+
+from .product import Product as ProductSchema
+from .location import Location as LocationSchema
+
+class StockLot(BaseModel):
+    id: int
+    product_id: int
+    location_id: int
+    expiry_date: Optional[date] = None
+    production_date: Optional[date] = None
+    cost_per_unit: Optional[float] = None
+    received_quantity: float
+    remaining_qty: float
+    received_at: Optional[datetime] = None
+    source_transaction_id: Optional[int] = None
+    product: ProductSchema
+    location: LocationSchema
+
+    class Config:
+        from_attributes = True
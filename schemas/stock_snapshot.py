@@ -0,0 +1,23 @@
+# schemas/stock_snapshot.py
+from pydantic import BaseModel
+from typing import List, Optional
+from datetime import datetime, date
+
+from .product import ProductBasic
+from .location import Location as LocationSchema
+
+class StockAsOfItem(BaseModel):
+    product_id: int
+    location_id: int
+    quantity: float
+    product: Optional[ProductBasic] = None
+    location: Optional[LocationSchema] = None
+
+    class Config:
+        from_attributes = True
+
+class StockAsOfReport(BaseModel):
+    as_of: datetime
+    snapshot_date: Optional[date] = None # snapshot ที่ใช้เป็นจุดเริ่ม (None = replay ทั้ง ledger)
+    replayed_transactions: int
+    items: List[StockAsOfItem]
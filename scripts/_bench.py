@@ -0,0 +1,135 @@
+# scripts/_bench.py
+# ส่วนกลางของ benchmark scripts ใน scripts/: เลือก database, สร้างตาราง, seed ข้อมูลจำนวนมาก และสรุปเวลา
+# ค่า default ใช้ SQLite ไฟล์ชั่วคราว ตั้ง BENCH_DATABASE_URL (หรือ --database-url) เพื่อวัดกับ PostgreSQL
+# !!! database ที่ใช้วัดต้องเป็น database ว่างสำหรับทดสอบ ตารางทั้งหมดจะถูกลบและสร้างใหม่
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+from typing import Callable, Dict, List, Optional, Sequence
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT_DIR not in sys.path: sys.path.insert(0, ROOT_DIR)
+
+def add_database_argument(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--database-url", default=os.getenv("BENCH_DATABASE_URL"),
+                        help="database ว่างสำหรับวัดผล (default: SQLite ไฟล์ชั่วคราว) ตารางจะถูกลบ/สร้างใหม่")
+
+def setup_database(database_url: Optional[str] = None, reset: bool = True):
+    """
+    ตั้ง DATABASE_URL ก่อน import database (engine ถูกสร้างตอน import) แล้วสร้างตารางใหม่ คืน module database
+    """
+    if not database_url:
+        database_url = f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='gofresh-bench-'), 'bench.db')}"
+    os.environ["DATABASE_URL"] = database_url
+    os.environ.pop("ASYNC_DATABASE_URL", None)
+    import database
+    import models # noqa: F401 ให้ Base รู้จักทุกตาราง
+    if database.engine is None: raise SystemExit(f"!!! Cannot create engine for {database_url}")
+    print(f"[bench] database: {database.engine.url.render_as_string(hide_password=True)}")
+    if reset:
+        database.Base.metadata.drop_all(bind=database.engine)
+        database.Base.metadata.create_all(bind=database.engine)
+    return database
+
+def seed_catalog(db, products: int, locations: int = 1, categories: int = 20, with_barcodes: bool = True) -> Dict[str, List[int]]:
+    """
+    สร้างหมวดหมู่ / สถานที่ / สินค้าสังเคราะห์ด้วย executemany (ชื่อ "Product 000123 ...", SKU "SKU000123", barcode 885 + 10 หลัก)
+    คืน {"category_ids": [...], "location_ids": [...], "product_ids": [...]}
+    """
+    from sqlalchemy import insert
+    import models
+    words = ("Fresh", "Organic", "Milk", "Apple", "Banana", "Rice", "Chicken", "Pork", "Egg", "Juice",
+             "Bread", "Cheese", "Yogurt", "Mango", "Orange", "Tea", "Coffee", "Water", "Noodle", "Sauce")
+    db.execute(insert(models.Category), [{"name": f"Category {i:03d}"} for i in range(categories)])
+    db.execute(insert(models.Location), [{"name": f"Location {i:03d}"} for i in range(locations)])
+    category_ids = [row[0] for row in db.query(models.Category.id).order_by(models.Category.id)]
+    location_ids = [row[0] for row in db.query(models.Location.id).order_by(models.Location.id)]
+    batch: List[dict] = []
+    for i in range(products):
+        batch.append({
+            "sku": f"SKU{i:06d}", "barcode": f"885{i:010d}" if with_barcodes else None,
+            "name": f"{words[i % len(words)]} {words[(i // len(words)) % len(words)]} Product {i:06d}",
+            "price_b2c": 10.0 + i % 500, "price_b2b": 9.0 + i % 500, "standard_cost": 5.0 + i % 300,
+            "category_id": category_ids[i % len(category_ids)],
+        })
+        if len(batch) >= 10000:
+            db.execute(insert(models.Product), batch); batch = []
+    if batch: db.execute(insert(models.Product), batch)
+    db.commit()
+    product_ids = [row[0] for row in db.query(models.Product.id).order_by(models.Product.id)]
+    return {"category_ids": category_ids, "location_ids": location_ids, "product_ids": product_ids}
+
+def seed_stock(db, product_ids: Sequence[int], location_ids: Sequence[int], quantity: float = 1000.0) -> None:
+    """ ตั้งยอด current_stock พร้อมรายการ INITIAL ใน ledger ให้ทุก (สินค้า, สถานที่) ยอดตรงกับ ledger """
+    from sqlalchemy import insert
+    import models
+    for location_id in location_ids:
+        for start in range(0, len(product_ids), 10000):
+            chunk = product_ids[start:start + 10000]
+            db.execute(insert(models.CurrentStock), [{"product_id": p, "location_id": location_id, "quantity": quantity} for p in chunk])
+            db.execute(insert(models.InventoryTransaction), [
+                {"transaction_type": models.TransactionType.INITIAL, "quantity_change": quantity,
+                 "product_id": p, "location_id": location_id, "notes": "bench seed"} for p in chunk
+            ])
+    db.commit()
+
+def timed(fn: Callable[[], object]) -> float:
+    started = time.perf_counter()
+    fn()
+    return time.perf_counter() - started
+
+def percentile(samples: Sequence[float], p: float) -> float:
+    ordered = sorted(samples)
+    if not ordered: return 0.0
+    return ordered[min(len(ordered) - 1, max(0, int(round(p / 100 * len(ordered) + 0.5)) - 1))]
+
+def report(label: str, samples: Sequence[float]) -> None:
+    """ พิมพ์ p50 / p99 / max / mean เป็นมิลลิวินาที """
+    if not samples:
+        print(f"{label:<48} (no samples)"); return
+    ms = [s * 1000 for s in samples]
+    print(f"{label:<48} n={len(ms):<6} p50={percentile(ms, 50):9.3f} ms  p99={percentile(ms, 99):9.3f} ms  "
+          f"max={max(ms):9.3f} ms  mean={statistics.fmean(ms):9.3f} ms")
+
+def seed_sales(db, product_ids: Sequence[int], location_ids: Sequence[int], sales: int, items_per_sale: int = 3,
+               days: int = 90, seed: int = 1) -> None:
+    """ สร้างการขายย้อนหลัง days วัน (ไม่ตัดสต็อก / ไม่ลง ledger) สำหรับวัดรายงานและ dashboard """
+    import random
+    from datetime import datetime, timedelta, timezone
+    from sqlalchemy import insert
+    import models
+    rng = random.Random(seed)
+    now = datetime.now(timezone.utc)
+    for start in range(0, sales, 5000):
+        count = min(5000, sales - start)
+        lines = [[(rng.choice(product_ids), rng.randint(1, 5), float(rng.randint(10, 200))) for _ in range(items_per_sale)] for _ in range(count)]
+        sale_ids = db.execute(insert(models.Sale).returning(models.Sale.id, sort_by_parameter_order=True), [
+            {"location_id": rng.choice(location_ids), "total_amount": sum(q * p for _, q, p in sale_lines),
+             "sale_date": now - timedelta(seconds=rng.randint(0, days * 86400))} for sale_lines in lines
+        ]).scalars().all()
+        db.execute(insert(models.SaleItem), [
+            {"sale_id": sale_id, "product_id": product_id, "quantity": quantity, "unit_price": price, "is_rtc": False, "discount_amount": 0.0}
+            for sale_id, sale_lines in zip(sale_ids, lines) for product_id, quantity, price in sale_lines
+        ])
+    db.commit()
+
+class StatementCounter:
+    """ นับจำนวน statement ที่ส่งไป database (executemany นับเป็นหนึ่ง) ใช้แบบ with StatementCounter(engine) as counter """
+    def __init__(self, engine):
+        self.engine = engine
+        self.count = 0
+
+    def _on_execute(self, *args, **kwargs) -> None:
+        self.count += 1
+
+    def __enter__(self) -> "StatementCounter":
+        from sqlalchemy import event
+        event.listen(self.engine, "before_cursor_execute", self._on_execute)
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        from sqlalchemy import event
+        event.remove(self.engine, "before_cursor_execute", self._on_execute)
@@ -0,0 +1,65 @@
+# scripts/bench_batch_stock_in.py
+# วัด inventory_service.record_batch_stock_in (bulk insert + upsert เดียว) เทียบกับการเรียก record_stock_in ทีละบรรทัด
+# ต่อขนาด batch: จำนวน statement และเวลา (รวม commit) ทั้งสองแบบต้องได้ยอดสต็อกเท่ากัน
+#   python scripts/bench_batch_stock_in.py
+#   python scripts/bench_batch_stock_in.py --batch-sizes 10,100,1000,5000
+import argparse
+import sys
+from datetime import date, timedelta
+
+import _bench
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark batch stock-in.")
+    _bench.add_database_argument(parser)
+    parser.add_argument("--batch-sizes", default="10,100,1000")
+    args = parser.parse_args()
+    batch_sizes = [int(size) for size in args.batch_sizes.split(",")]
+
+    database = _bench.setup_database(args.database_url)
+    import models
+    import schemas
+    from services import inventory_service
+
+    db = database.SessionLocal()
+    mismatched = []
+    try:
+        seeded = _bench.seed_catalog(db, max(batch_sizes), locations=2)
+        per_line_location, batch_location = seeded["location_ids"]
+
+        for size in batch_sizes:
+            items = [schemas.StockInItemDetailSchema(
+                product_id=product_id, quantity=10 + i % 7, cost_per_unit=5.0, production_date=date.today() - timedelta(days=i % 30),
+                expiry_date=date.today() + timedelta(days=30 + i % 60),
+            ) for i, product_id in enumerate(seeded["product_ids"][:size])]
+
+            def per_line():
+                for item in items:
+                    inventory_service.record_stock_in(db, schemas.StockInSchema(location_id=per_line_location, **item.model_dump(
+                        include={"product_id", "quantity", "cost_per_unit", "production_date", "expiry_date", "notes"}
+                    )))
+                db.commit()
+
+            def batched():
+                inventory_service.record_batch_stock_in(db, schemas.BatchStockInSchema(location_id=batch_location, items=items, batch_notes="bench"))
+                db.commit()
+
+            for label, run in (("record_stock_in per line", per_line), ("record_batch_stock_in", batched)):
+                with _bench.StatementCounter(database.engine) as counter:
+                    seconds = _bench.timed(run)
+                print(f"{size:>5} lines: {label:<26} {counter.count:>6} stmts  {seconds * 1000:9.1f} ms")
+
+            stock = {location_id: dict(db.query(models.CurrentStock.product_id, models.CurrentStock.quantity).filter_by(location_id=location_id).all())
+                     for location_id in (per_line_location, batch_location)}
+            if stock[per_line_location] != stock[batch_location]: mismatched.append(size)
+    finally:
+        db.close()
+
+    if mismatched:
+        print(f"⚠️ stock differs between the two paths for batch sizes {mismatched}")
+        return 1
+    print("✅ both paths produced the same stock")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
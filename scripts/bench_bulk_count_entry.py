@@ -0,0 +1,61 @@
+# scripts/bench_bulk_count_entry.py
+# วัดการบันทึกยอดนับทั้งรอบ: update_counted_quantity ทีละรายการ (commit ทุกครั้ง แบบฟอร์มเดิม)
+# เทียบกับ bulk_update_counted_quantities (transaction เดียว) ทั้งสองรอบต้องได้ยอดนับเท่ากัน
+#   python scripts/bench_bulk_count_entry.py --items 800
+import argparse
+import random
+import sys
+
+import _bench
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark bulk count entry for stock count sessions.")
+    _bench.add_database_argument(parser)
+    parser.add_argument("--items", type=int, default=800)
+    args = parser.parse_args()
+
+    database = _bench.setup_database(args.database_url)
+    import models
+    import schemas
+    from services import stock_count_service
+
+    db = database.SessionLocal()
+    try:
+        seeded = _bench.seed_catalog(db, args.items, locations=2)
+        _bench.seed_stock(db, seeded["product_ids"], seeded["location_ids"], quantity=50.0)
+        rng = random.Random(11)
+        counted = {product_id: float(rng.randint(30, 70)) for product_id in seeded["product_ids"]}
+
+        def per_item(session_id, items):
+            for item_id, product_id in items:
+                stock_count_service.update_counted_quantity(db, item_id, schemas.StockCountItemUpdate(counted_quantity=counted[product_id]))
+
+        def bulk(session_id, items):
+            result = stock_count_service.bulk_update_counted_quantities(db, session_id, [
+                schemas.StockCountItemBulkEntry(item_id=item_id, counted_quantity=counted[product_id]) for item_id, product_id in items
+            ])
+            assert not result["errors"], result["errors"]
+
+        saved = []
+        for (label, enter_counts), location_id in zip(
+            (("update_counted_quantity per item", per_item), ("bulk_update_counted_quantities", bulk)), seeded["location_ids"]
+        ):
+            session = stock_count_service.create_stock_count_session(db, schemas.StockCountSessionCreate(location_id=location_id))
+            stock_count_service.add_all_products_from_location_to_session(db, session.id)
+            items = db.query(models.StockCountItem.id, models.StockCountItem.product_id).filter_by(session_id=session.id).all()
+            with _bench.StatementCounter(database.engine) as counter:
+                seconds = _bench.timed(lambda: enter_counts(session.id, items))
+            print(f"{label:<36} {len(items)} items: {counter.count:>6} stmts  {seconds:.3f} s")
+            db.expire_all()
+            saved.append(dict(db.query(models.StockCountItem.product_id, models.StockCountItem.counted_quantity).filter_by(session_id=session.id).all()))
+    finally:
+        db.close()
+
+    if saved[0] != saved[1]:
+        print("⚠️ the two paths saved different counts")
+        return 1
+    print("✅ both paths saved the same counts")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,82 @@
+# scripts/bench_ledger_pagination.py
+# วัด get_inventory_transactions บน ledger ขนาดใหญ่: หน้าแรก (count exact / estimate / none) และหน้าลึก
+# ด้วย OFFSET เทียบกับ keyset cursor (ต้องได้แถวเดียวกัน)
+#   python scripts/bench_ledger_pagination.py                           (SQLite ชั่วคราว, 1M แถว, หน้า 5,000 ขนาด 200)
+#   python scripts/bench_ledger_pagination.py --rows 200000 --page 500
+#   BENCH_DATABASE_URL=postgresql://.../bench python scripts/bench_ledger_pagination.py   (count=estimate ใช้ EXPLAIN จริง)
+import argparse
+import sys
+from datetime import datetime, timedelta, timezone
+
+import _bench
+
+def _seed_ledger(db, product_ids, location_ids, rows: int) -> None:
+    from sqlalchemy import insert
+    import models
+    types = (models.TransactionType.STOCK_IN, models.TransactionType.SALE, models.TransactionType.ADJUSTMENT_SUB)
+    started_at = datetime.now(timezone.utc) - timedelta(seconds=rows)
+    for start in range(0, rows, 20000):
+        db.execute(insert(models.InventoryTransaction), [
+            {"transaction_type": types[i % 3], "quantity_change": 5.0 if i % 3 == 0 else -1.0,
+             "product_id": product_ids[i % len(product_ids)], "location_id": location_ids[i % len(location_ids)],
+             # หลายแถวต่อวินาทีเดียวกันบ้าง เพื่อให้ tie-break ด้วย id ถูกใช้จริง
+             "transaction_date": started_at + timedelta(seconds=i - i % 3), "notes": "bench"}
+            for i in range(start, min(rows, start + 20000))
+        ])
+        db.commit()
+        print(f"\r[bench] seeded {min(rows, start + 20000):,}/{rows:,} ledger rows", end="", flush=True)
+    print()
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark ledger pagination: OFFSET vs keyset cursor.")
+    _bench.add_database_argument(parser)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--page", type=int, default=5000, help="หน้าลึกที่วัด (เริ่มที่ 1)")
+    parser.add_argument("--limit", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    if (args.page - 1) * args.limit >= args.rows: raise SystemExit("!!! --page is past the end of --rows")
+
+    database = _bench.setup_database(args.database_url)
+    from sqlalchemy import text
+    import models
+    from services import inventory_service
+    from utils import encode_cursor
+
+    db = database.SessionLocal()
+    try:
+        seeded = _bench.seed_catalog(db, 2000, locations=5)
+        _seed_ledger(db, seeded["product_ids"], seeded["location_ids"], args.rows)
+        if db.get_bind().dialect.name == "postgresql":
+            db.execute(text("ANALYZE inventory_transactions")); db.commit()
+
+        def page(**kwargs):
+            db.expunge_all()
+            return inventory_service.get_inventory_transactions(db, limit=args.limit, **kwargs)
+
+        for count_mode in ("exact", "estimate", "none"):
+            samples = [_bench.timed(lambda: page(count_mode=count_mode)) for _ in range(args.repeat)]
+            _bench.report(f"page 1, count={count_mode} (total={page(count_mode=count_mode)['total_count']})", samples)
+
+        skip = (args.page - 1) * args.limit
+        # cursor ของหน้าก่อนหน้าหน้าลึก = แถวสุดท้ายของหน้า page-1 (เตรียมนอกการจับเวลา)
+        previous_last = db.query(models.InventoryTransaction).order_by(
+            models.InventoryTransaction.transaction_date.desc(), models.InventoryTransaction.id.desc()
+        ).offset(skip - 1).first()
+        cursor = encode_cursor(previous_last.transaction_date, previous_last.id)
+
+        offset_ids = [row.id for row in page(skip=skip, count_mode="none")["items"]]
+        cursor_ids = [row.id for row in page(cursor=cursor, count_mode="none")["items"]]
+        _bench.report(f"page {args.page:,} via OFFSET {skip:,}", [_bench.timed(lambda: page(skip=skip, count_mode="none")) for _ in range(args.repeat)])
+        _bench.report(f"page {args.page:,} via cursor", [_bench.timed(lambda: page(cursor=cursor, count_mode="none")) for _ in range(args.repeat)])
+    finally:
+        db.close()
+
+    if offset_ids != cursor_ids:
+        print("⚠️ OFFSET and cursor pages differ")
+        return 1
+    print(f"✅ OFFSET and cursor return the same {len(cursor_ids)} rows")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
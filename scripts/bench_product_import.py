@@ -0,0 +1,78 @@
+# scripts/bench_product_import.py
+# วัด product_import_service.import_products กับไฟล์ CSV / JSONL สังเคราะห์ (default 100k แถว)
+# ครั้งแรก (นำเข้าทั้งหมด), ครั้งที่สอง (ไฟล์เดิม ทุกแถวชน SKU ที่มีแล้ว) และเทียบอัตรากับ create_product ทีละแถว
+#   python scripts/bench_product_import.py
+#   python scripts/bench_product_import.py --rows 20000 --format jsonl
+#   BENCH_DATABASE_URL=postgresql://.../bench python scripts/bench_product_import.py   (ใช้ COPY เข้า staging table)
+import argparse
+import csv
+import io
+import json
+import sys
+
+import _bench
+
+def _build_file(rows: int, import_format: str, bad_every: int) -> bytes:
+    """ สินค้า rows แถว (แถวที่ bad_every ราคาไม่ถูกต้อง เพื่อให้มีรายงาน error) หมวดหมู่อ้างด้วย category_name """
+    records = []
+    for i in range(rows):
+        records.append({
+            "sku": f"IMP{i:07d}", "name": f"Imported product {i:07d}", "barcode": f"999{i:010d}",
+            "price_b2c": "-1" if bad_every and i % bad_every == bad_every - 1 else f"{10 + i % 400}.50",
+            "price_b2b": f"{9 + i % 400}", "standard_cost": f"{5 + i % 200}", "category_name": f"Category {i % 20:03d}",
+            "shelf_life_days": str(i % 90) if i % 3 else "",
+        })
+    if import_format == "jsonl":
+        return "\n".join(json.dumps(record) for record in records).encode("utf-8")
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=list(records[0]))
+    writer.writeheader(); writer.writerows(records)
+    return buffer.getvalue().encode("utf-8")
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark bulk product import.")
+    _bench.add_database_argument(parser)
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--format", choices=("csv", "jsonl"), default="csv")
+    parser.add_argument("--bad-every", type=int, default=1000, help="ทุก ๆ N แถวมีหนึ่งแถวที่ไม่ถูกต้อง (0 = ไม่มี)")
+    parser.add_argument("--baseline-rows", type=int, default=1000, help="จำนวนแถวที่วัดด้วย create_product ทีละแถว")
+    args = parser.parse_args()
+
+    database = _bench.setup_database(args.database_url)
+    from sqlalchemy import func
+    import schemas
+    from models.product import Product
+    from services import product_import_service, product_service
+
+    content = _build_file(args.rows, args.format, args.bad_every)
+    expected_bad = args.rows // args.bad_every if args.bad_every else 0
+    failures = []
+    db = database.SessionLocal()
+    try:
+        seeded = _bench.seed_catalog(db, 0, categories=20)
+        print(f"[bench] {args.format} file: {args.rows:,} rows, {len(content) / 1e6:.1f} MB")
+        for label, expected_imported in (("first import", args.rows - expected_bad), ("re-import (all conflicts)", 0)):
+            result = {}
+            seconds = _bench.timed(lambda: result.update(product_import_service.import_products(db, io.BytesIO(content), args.format)))
+            print(f"{label:<28} {seconds:7.2f} s  imported {result['imported_count']:,}, rejected {result['error_count']:,} "
+                  f"({args.rows / seconds:,.0f} rows/s)")
+            if result["imported_count"] != expected_imported: failures.append(label)
+        if db.query(func.count(Product.id)).scalar() != args.rows - expected_bad: failures.append("product count")
+
+        baseline = [schemas.ProductCreate(sku=f"ONE{i:07d}", name=f"One by one {i}", price_b2c=10.0, category_id=seeded["category_ids"][i % 20])
+                    for i in range(args.baseline_rows)]
+        seconds = _bench.timed(lambda: [product_service.create_product(db, product) for product in baseline])
+        rate = args.baseline_rows / seconds
+        print(f"{'create_product per row':<28} {seconds:7.2f} s  for {args.baseline_rows:,} rows "
+              f"({rate:,.0f} rows/s, ~{args.rows / rate:,.0f} s for {args.rows:,})")
+    finally:
+        db.close()
+
+    if failures:
+        print(f"⚠️ unexpected import counts: {', '.join(failures)}")
+        return 1
+    print("✅ import counts as expected")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,86 @@
+# scripts/bench_product_search.py
+# วัด product_search_service.search_products เทียบกับ ILIKE '%คำ%' แบบเดิม (เป้าหมาย < 20 ms ต่อคำค้นที่ 100k SKU)
+#   python scripts/bench_product_search.py                              (SQLite ชั่วคราว, 100k สินค้า, backend memory)
+#   python scripts/bench_product_search.py --products 20000 --repeat 50
+#   BENCH_DATABASE_URL=postgresql://.../bench python scripts/bench_product_search.py --backend trigram
+# คืน exit code 1 ถ้า p99 ของคำค้นใดเกิน --target-ms
+import argparse
+import sys
+import time
+import tracemalloc
+
+import _bench
+
+QUERIES = {
+    "exact sku": "SKU054321",
+    "exact barcode": "8850000054321",
+    "word (~5k hits)": "mango",
+    "two words": "fresh milk",
+    "repeated digits": "0000",
+    "short term (no index)": "ap",
+    "name prefix + number": "apple product 0123",
+    "no match": "zzzz",
+}
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark ranked product search.")
+    _bench.add_database_argument(parser)
+    parser.add_argument("--products", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=30, help="จำนวนรอบต่อคำค้น")
+    parser.add_argument("--backend", choices=("memory", "trigram"), default="memory")
+    parser.add_argument("--target-ms", type=float, default=20.0)
+    args = parser.parse_args()
+
+    database = _bench.setup_database(args.database_url)
+    from sqlalchemy import func, or_, text
+    from models.product import Product
+    from services import product_search_service
+
+    product_search_service.PRODUCT_SEARCH_BACKEND = args.backend
+    db = database.SessionLocal()
+    try:
+        print(f"[bench] seeding {args.products} products ...")
+        _bench.seed_catalog(db, args.products)
+        if args.backend == "trigram":
+            if db.get_bind().dialect.name != "postgresql": raise SystemExit("!!! --backend trigram needs PostgreSQL")
+            db.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+            for column in ("name", "sku", "barcode"): # เหมือน migration d4a8e6b1f203 (create_all ไม่สร้าง GIN index)
+                db.execute(text(f"CREATE INDEX IF NOT EXISTS ix_products_{column}_trgm ON products USING gin ({column} gin_trgm_ops)"))
+            db.execute(text("ANALYZE products"))
+            db.commit()
+        else:
+            tracemalloc.start()
+            build = _bench.timed(lambda: product_search_service.search_products(db, "warmup"))
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            print(f"[bench] n-gram index build {build:.2f} s, peak traced memory {peak / 1e6:.1f} MB")
+
+        failed = []
+        for label, query in QUERIES.items():
+            samples = [_bench.timed(lambda: product_search_service.search_products(db, query, limit=20)) for _ in range(args.repeat)]
+            _bench.report(f"search {label!r}", samples)
+            if _bench.percentile(samples, 99) * 1000 > args.target_ms: failed.append(label)
+
+        def baseline(query: str):
+            conditions = [or_(Product.name.ilike(f"%{term}%"), Product.sku.ilike(f"%{term}%"), Product.barcode.ilike(f"%{term}%"))
+                          for term in query.split()]
+            q = db.query(Product).filter(*conditions)
+            q.with_entities(func.count(Product.id)).scalar()
+            q.order_by(Product.name).limit(20).all()
+        for label in ("word (~5k hits)", "two words"):
+            samples = [_bench.timed(lambda: baseline(QUERIES[label])) for _ in range(max(3, args.repeat // 5))]
+            _bench.report(f"baseline ILIKE {label!r}", samples)
+    finally:
+        db.close()
+
+    if failed:
+        print(f"⚠️ p99 above {args.target_ms:g} ms: {', '.join(failed)}")
+        return 1
+    print(f"✅ all queries p99 <= {args.target_ms:g} ms")
+    return 0
+
+if __name__ == "__main__":
+    started = time.perf_counter()
+    code = main()
+    print(f"[bench] done in {time.perf_counter() - started:.1f} s")
+    sys.exit(code)
@@ -0,0 +1,106 @@
+# scripts/bench_reconcile_stock.py
+# วัด stock_reconciliation_service.reconcile_stock บน ledger ขนาดใหญ่ (default 10M แถว)
+# seed ledger ที่ยอด current_stock ตรงกัน แล้วทำให้ยอดเพี้ยน --drift key จากนั้นวัด
+# full (ตามจำนวน worker ที่ระบุ), incremental หลังมี transaction ใหม่ และ repair ต้องเจอ key ที่เพี้ยนครบพอดีและซ่อมได้
+#   python scripts/bench_reconcile_stock.py --rows 1000000
+#   BENCH_DATABASE_URL=postgresql://.../bench python scripts/bench_reconcile_stock.py --workers 1,4,8
+import argparse
+import random
+import sys
+
+import _bench
+
+def _seed_ledger(db, product_ids, location_ids, rows: int) -> None:
+    """ ledger rows แถว กระจายทุก key แล้วตั้ง current_stock = ผลรวมต่อ key ด้วย INSERT ... SELECT """
+    from sqlalchemy import func, insert, select
+    import models
+    keys = [(product_id, location_id) for product_id in product_ids for location_id in location_ids]
+    types = (models.TransactionType.STOCK_IN, models.TransactionType.SALE, models.TransactionType.ADJUSTMENT_SUB)
+    for start in range(0, rows, 50000):
+        db.execute(insert(models.InventoryTransaction), [
+            {"transaction_type": types[i % 3], "quantity_change": 12.0 if i % 3 == 0 else -1.5,
+             "product_id": keys[i % len(keys)][0], "location_id": keys[i % len(keys)][1]}
+            for i in range(start, min(rows, start + 50000))
+        ])
+        db.commit()
+        print(f"\r[bench] seeded {min(rows, start + 50000):,}/{rows:,} ledger rows", end="", flush=True)
+    print()
+    transaction = models.InventoryTransaction
+    db.execute(insert(models.CurrentStock).from_select(
+        ["product_id", "location_id", "quantity"],
+        select(transaction.product_id, transaction.location_id, func.sum(transaction.quantity_change)).group_by(transaction.product_id, transaction.location_id)
+    ))
+    db.commit()
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark current_stock reconciliation against the ledger.")
+    _bench.add_database_argument(parser)
+    parser.add_argument("--rows", type=int, default=10_000_000)
+    parser.add_argument("--products", type=int, default=10_000)
+    parser.add_argument("--locations", type=int, default=4)
+    parser.add_argument("--drift", type=int, default=25, help="จำนวน key ที่ทำให้ยอดเพี้ยน")
+    parser.add_argument("--workers", default="1,4", help="จำนวน worker ของ full scan ที่วัด คั่นด้วย comma")
+    parser.add_argument("--new-transactions", type=int, default=10_000, help="transaction ใหม่ก่อนวัด incremental")
+    args = parser.parse_args()
+
+    database = _bench.setup_database(args.database_url)
+    from sqlalchemy import insert, text, update
+    import models
+    from services import inventory_service, stock_reconciliation_service
+
+    failures = []
+    db = database.SessionLocal()
+    try:
+        seeded = _bench.seed_catalog(db, args.products, locations=args.locations)
+        _seed_ledger(db, seeded["product_ids"], seeded["location_ids"], args.rows)
+        if db.get_bind().dialect.name == "postgresql":
+            db.execute(text("ANALYZE inventory_transactions")); db.commit()
+
+        rng = random.Random(13)
+        keys = [(p, l) for p in seeded["product_ids"] for l in seeded["location_ids"]]
+        drifted = set(rng.sample(keys, args.drift))
+        for product_id, location_id in drifted:
+            db.execute(update(models.CurrentStock).where(
+                models.CurrentStock.product_id == product_id, models.CurrentStock.location_id == location_id
+            ).values(quantity=models.CurrentStock.quantity + rng.choice((-3.0, 2.0))))
+        db.commit()
+
+        def found(result):
+            return {(drift["product_id"], drift["location_id"]) for drift in result["drifts"]}
+
+        for workers in (int(w) for w in args.workers.split(",")):
+            result = {}
+            seconds = _bench.timed(lambda: result.update(stock_reconciliation_service.reconcile_stock(db, workers=workers)))
+            print(f"full, {workers} worker(s): {seconds:.2f} s, {result['keys_checked']:,} keys in {result['chunks']} chunks, {len(result['drifts'])} drifted")
+            if found(result) != drifted: failures.append(f"full/{workers} workers")
+
+        # transaction ใหม่ที่ปรับ current_stock ถูกต้อง (ผ่าน apply_stock_deltas) แล้ว incremental จาก watermark ของรอบล่าสุด
+        touched = rng.sample(keys, min(len(keys), args.new_transactions))
+        for start in range(0, len(touched), 5000):
+            chunk = touched[start:start + 5000]
+            db.execute(insert(models.InventoryTransaction), [
+                {"transaction_type": models.TransactionType.STOCK_IN, "quantity_change": 1.0, "product_id": p, "location_id": l} for p, l in chunk
+            ])
+            inventory_service.apply_stock_deltas(db, [(key, 1.0) for key in chunk])
+        db.commit()
+        result = {}
+        seconds = _bench.timed(lambda: result.update(stock_reconciliation_service.reconcile_stock(db, incremental=True)))
+        print(f"incremental ({len(touched):,} new transactions): {seconds:.2f} s, {result['keys_checked']:,} keys, {len(result['drifts'])} drifted")
+        # ต้องเจอ key ที่เพี้ยนซึ่งมี transaction ใหม่ (อาจเจอ key เพี้ยนอื่นจากช่วง overlap ของ watermark ด้วย) และไม่เจอ key ที่ถูกต้อง
+        if not drifted & set(touched) <= found(result) <= drifted: failures.append("incremental")
+
+        seconds = _bench.timed(lambda: result.update(stock_reconciliation_service.reconcile_stock(db, repair=True)))
+        print(f"full repair: {seconds:.2f} s, {result['repaired_count']} repaired")
+        result = stock_reconciliation_service.reconcile_stock(db)
+        if result["drifts"]: failures.append("repair")
+    finally:
+        db.close()
+
+    if failures:
+        print(f"⚠️ unexpected drift results: {', '.join(failures)}")
+        return 1
+    print(f"✅ found exactly the {len(drifted)} drifted keys and repaired them")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,62 @@
+# scripts/bench_record_sale.py
+# วัด sales_service.record_sale ตามขนาดตะกร้า (จำนวน statement และเวลา) และเทียบขั้นค้นสินค้า/สต็อก
+# แบบเดิม (get_product + get_current_stock_record ทีละบรรทัด) กับแบบ batch (IN query เดียว + upsert เดียว)
+#   python scripts/bench_record_sale.py
+#   python scripts/bench_record_sale.py --basket-sizes 1,20,100 --repeat 50
+import argparse
+import random
+import sys
+
+import _bench
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark record_sale by basket size.")
+    _bench.add_database_argument(parser)
+    parser.add_argument("--basket-sizes", default="1,5,20,50,200")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+    basket_sizes = [int(size) for size in args.basket_sizes.split(",")]
+
+    database = _bench.setup_database(args.database_url)
+    import schemas
+    from services import inventory_service, product_service, sales_service
+
+    db = database.SessionLocal()
+    try:
+        seeded = _bench.seed_catalog(db, max(2000, max(basket_sizes)))
+        location_id = seeded["location_ids"][0]
+        _bench.seed_stock(db, seeded["product_ids"], [location_id], quantity=1_000_000.0)
+        rng = random.Random(3)
+
+        def lookups_per_line(product_ids):
+            for product_id in product_ids:
+                product_service.get_product(db, product_id=product_id)
+                inventory_service.get_current_stock_record(db, product_id=product_id, location_id=location_id)
+            db.rollback()
+
+        def lookups_batched(product_ids):
+            product_service.get_products_by_ids(db, product_ids)
+            inventory_service.apply_stock_deltas(db, [((product_id, location_id), -1.0) for product_id in product_ids])
+            db.rollback()
+
+        for size in basket_sizes:
+            baskets = [rng.sample(seeded["product_ids"], size) for _ in range(args.repeat)]
+            for label, lookup in (("per-line lookups (before)", lookups_per_line), ("batched lookups", lookups_batched)):
+                with _bench.StatementCounter(database.engine) as counter:
+                    lookup(baskets[0])
+                samples = [_bench.timed(lambda: lookup(basket)) for basket in baskets]
+                _bench.report(f"{size:>3} lines: {label}, {counter.count} stmts", samples)
+
+            sales = [schemas.SaleCreate(location_id=location_id, items=[
+                schemas.SaleItemCreate(product_id=product_id, quantity=1, unit_price=10.0) for product_id in basket
+            ]) for basket in baskets]
+            with _bench.StatementCounter(database.engine) as counter:
+                sales_service.record_sale(db, sales[0])
+            samples = [_bench.timed(lambda: sales_service.record_sale(db, sale)) for sale in sales[1:]]
+            _bench.report(f"{size:>3} lines: record_sale (incl. commit), {counter.count} stmts", samples)
+    finally:
+        db.close()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
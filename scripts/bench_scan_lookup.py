@@ -0,0 +1,71 @@
+# scripts/bench_scan_lookup.py
+# วัดการยิงบาร์โค้ด/SKU: product_service.lookup_product_by_scan_code (scan index ในหน่วยความจำ)
+# เทียบกับ get_product_by_scan_code (query เดิมทุกครั้ง) และตรวจว่าได้สินค้าเดียวกันทุกรหัสที่สุ่ม
+#   python scripts/bench_scan_lookup.py                         (10k สินค้า, 4,000 scans ผสม barcode / SKU / ไม่พบ)
+#   python scripts/bench_scan_lookup.py --products 100000
+# คืน exit code 1 ถ้า p99 ของ scan index เกิน --target-ms หรือผลไม่ตรงกับ query เดิม
+import argparse
+import random
+import sys
+import time
+
+import _bench
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark barcode/SKU scan lookups.")
+    _bench.add_database_argument(parser)
+    parser.add_argument("--products", type=int, default=10_000)
+    parser.add_argument("--scans", type=int, default=4000)
+    parser.add_argument("--target-ms", type=float, default=1.0)
+    args = parser.parse_args()
+
+    database = _bench.setup_database(args.database_url)
+    from sqlalchemy import update
+    from models.product import Product
+    from services import product_service
+
+    db = database.SessionLocal()
+    try:
+        seeded = _bench.seed_catalog(db, args.products)
+        db.execute(update(Product).where(Product.id % 4 == 0).values(barcode=None)) # สินค้าบางส่วนไม่มี barcode (ยิงด้วย SKU)
+        db.commit()
+        codes = dict(db.query(Product.id, Product.barcode).all())
+        skus = dict(db.query(Product.id, Product.sku).all())
+        rng = random.Random(5)
+        scans = []
+        for _ in range(args.scans):
+            product_id, roll = rng.choice(seeded["product_ids"]), rng.random()
+            if roll < 0.6 and codes[product_id]: scans.append(codes[product_id])
+            elif roll < 0.95: scans.append(skus[product_id])
+            else: scans.append(f"UNKNOWN{rng.randint(0, 10**6)}")
+
+        build = _bench.timed(lambda: product_service.lookup_product_by_scan_code(db, scans[0]))
+        print(f"[bench] scan index build {build * 1000:.1f} ms for {args.products:,} products")
+
+        def old_query(code):
+            product = product_service.get_product_by_scan_code(db, code)
+            db.expunge_all() # เหมือนแต่ละ request ที่เริ่มด้วย session ใหม่
+            return product
+
+        query_samples, index_samples, mismatches = [], [], 0
+        for code in scans:
+            started = time.perf_counter(); old = old_query(code); query_samples.append(time.perf_counter() - started)
+            started = time.perf_counter(); new = product_service.lookup_product_by_scan_code(db, code); index_samples.append(time.perf_counter() - started)
+            if (old.id if old else None) != (new.id if new else None): mismatches += 1
+    finally:
+        db.close()
+
+    _bench.report("get_product_by_scan_code (query)", query_samples)
+    _bench.report("lookup_product_by_scan_code (index)", index_samples)
+    if mismatches:
+        print(f"⚠️ {mismatches} of {len(scans)} scans resolved to a different product")
+        return 1
+    p99_ms = _bench.percentile(index_samples, 99) * 1000
+    if p99_ms > args.target_ms:
+        print(f"⚠️ index p99 {p99_ms:.3f} ms above {args.target_ms:g} ms")
+        return 1
+    print(f"✅ {len(scans)} scans match the old query, index p99 {p99_ms:.3f} ms")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,87 @@
+# scripts/bench_stock_count_close.py
+# วัดเวลาปิดรอบนับสต็อก (ช่วงที่ถือ lock แถว session และแถว current_stock ตั้งแต่เริ่มจน commit)
+# เทียบ close_stock_count_session แบบ set-based กับแบบเดิมที่เรียก record_stock_adjustment ทีละรายการ
+# ทั้งสองแบบใช้ข้อมูลเดียวกัน (คนละสาขา) และต้องได้ adjustment / ยอดสต็อกเหมือนกัน
+#   python scripts/bench_stock_count_close.py --items 800
+#   BENCH_DATABASE_URL=postgresql://.../bench python scripts/bench_stock_count_close.py --items 5000
+import argparse
+import random
+import sys
+from datetime import datetime
+
+import _bench
+
+def _close_per_item(db, session_id: int) -> None:
+    """ close_stock_count_session ก่อน set-based: โหลด item ทั้งรอบแล้ว record_stock_adjustment ทีละรายการ """
+    from sqlalchemy.orm import subqueryload
+    import models
+    import schemas
+    from services import inventory_service
+
+    session = db.query(models.StockCountSession).options(subqueryload(models.StockCountSession.items)).filter(
+        models.StockCountSession.id == session_id
+    ).with_for_update().first()
+    for item in session.items:
+        difference = item.counted_quantity - item.system_quantity
+        if difference != 0:
+            inventory_service.record_stock_adjustment(db=db, adjustment_data=schemas.StockAdjustmentSchema(
+                product_id=item.product_id, location_id=session.location_id, quantity_change=difference,
+                reason=f"ปิดรอบตรวจนับสต็อก #{session_id}",
+                notes=f"ยอดในระบบ: {item.system_quantity}, ยอดนับจริง: {item.counted_quantity}, ส่วนต่าง: {difference:+.2f}",
+            ), allow_negative_stock_for_count=True)
+    session.status = models.StockCountStatus.CLOSED
+    session.end_date = datetime.utcnow()
+    db.commit()
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark closing a stock count session.")
+    _bench.add_database_argument(parser)
+    parser.add_argument("--items", type=int, default=800, help="จำนวนสินค้าในรอบนับ")
+    parser.add_argument("--diff-ratio", type=float, default=0.66, help="สัดส่วนรายการที่ยอดนับไม่ตรง")
+    args = parser.parse_args()
+
+    database = _bench.setup_database(args.database_url)
+    from sqlalchemy import func
+    import models
+    import schemas
+    from services import stock_count_service
+
+    db = database.SessionLocal()
+    try:
+        seeded = _bench.seed_catalog(db, args.items, locations=2)
+        _bench.seed_stock(db, seeded["product_ids"], seeded["location_ids"], quantity=50.0)
+        rng = random.Random(7)
+        counted = {product_id: 50.0 + (rng.choice((-1, 1)) * rng.randint(1, 20) if rng.random() < args.diff_ratio else 0)
+                   for product_id in seeded["product_ids"]}
+
+        results = {}
+        for label, location_id, close in (
+            ("per-item record_stock_adjustment", seeded["location_ids"][0], _close_per_item),
+            ("set-based close_stock_count_session", seeded["location_ids"][1], stock_count_service.close_stock_count_session),
+        ):
+            session = stock_count_service.create_stock_count_session(db, schemas.StockCountSessionCreate(location_id=location_id))
+            stock_count_service.add_all_products_from_location_to_session(db, session.id)
+            items = db.query(models.StockCountItem.id, models.StockCountItem.product_id).filter_by(session_id=session.id).all()
+            stock_count_service.bulk_update_counted_quantities(db, session.id, [
+                schemas.StockCountItemBulkEntry(item_id=item.id, counted_quantity=counted[item.product_id]) for item in items
+            ])
+            seconds = _bench.timed(lambda: close(db, session.id))
+            adjustments = db.query(func.count(models.InventoryTransaction.id)).filter(
+                models.InventoryTransaction.location_id == location_id,
+                models.InventoryTransaction.transaction_type.in_([models.TransactionType.ADJUSTMENT_ADD, models.TransactionType.ADJUSTMENT_SUB])
+            ).scalar()
+            stock = dict(db.query(models.CurrentStock.product_id, models.CurrentStock.quantity).filter_by(location_id=location_id).all())
+            results[label] = (seconds, adjustments, stock)
+            print(f"{label:<40} {args.items} items, {adjustments} adjustments: locks held {seconds:.3f} s")
+    finally:
+        db.close()
+
+    (before, before_count, before_stock), (after, after_count, after_stock) = results.values()
+    if before_count != after_count or before_stock != after_stock:
+        print("⚠️ the two close paths produced different adjustments / stock")
+        return 1
+    print(f"✅ identical results, set-based close {before / after:.1f}x faster")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,121 @@
+# scripts/load_pos_latency.py
+# Load test: latency ของการขายที่ POS (POST /api/sales/) ขณะมีรายงานหนัก (GET /api/sales/report/) วิ่งอยู่พร้อมกัน
+# ถ้า handler ที่ใช้ Session แบบ sync บล็อก event loop การขายจะรอจนรายงานเสร็จ p99 จะพุ่งตามเวลาของรายงาน
+# วัดสองช่วง: POS อย่างเดียว (baseline) แล้ว POS + รายงาน พิมพ์ p50 / p99 ของแต่ละช่วง
+#   python scripts/load_pos_latency.py                      (in-process ผ่าน httpx.ASGITransport กับ SQLite ชั่วคราว)
+#   python scripts/load_pos_latency.py --base-url http://127.0.0.1:8000 --location-id 1
+#       (server ที่รันอยู่จริง เช่น gunicorn -k uvicorn.workers.UvicornWorker main:app, ต้องมีสินค้าและสต็อกอยู่แล้ว)
+# เกณฑ์เทียบกับ baseline ของเครื่องเดียวกัน: p99 ช่วงมีรายงาน / p99 ช่วง POS อย่างเดียว ต้องไม่เกิน --max-p99-ratio
+# in-process บน CPU เดียว รายงานแย่ง CPU/GIL กับการขายจึงช้าลงหลายเท่าอยู่แล้ว (วัดได้ ~4-16 เท่า) แต่ถ้ารายงานบล็อก event loop
+# การขายต้องรอทั้งรายงาน (วัดได้ ~60 เท่า เมื่อทดลองเปลี่ยน handler รายงานเป็น async def ที่เรียก Session ตรง ๆ)
+# default ใช้ผู้ขายและรายงานอย่างละหนึ่ง client: ผู้ขายหลายรายบน SQLite รอ write lock กันเองจน baseline แกว่ง
+# คืน exit code 1 ถ้าเกินเกณฑ์, มี request ล้มเหลว, ไม่มีรายงานเสร็จระหว่างวัด หรือ p99 เกิน --max-p99-ms (ถ้าระบุ)
+import argparse
+import asyncio
+import random
+import sys
+import time
+from typing import List, Optional
+
+import httpx
+
+import _bench
+
+async def _pos_client(client: httpx.AsyncClient, product_ids: List[int], location_id: int, stop_at: float,
+                      samples: List[float], errors: List[str], seed: int) -> None:
+    rng = random.Random(seed)
+    while time.perf_counter() < stop_at:
+        basket = rng.sample(product_ids, min(len(product_ids), rng.randint(1, 4)))
+        body = {"location_id": location_id, "items": [{"product_id": p, "quantity": 1, "unit_price": 10.0} for p in basket]}
+        started = time.perf_counter()
+        response = await client.post("/api/sales/", params={"allowNegativeStock": "true"}, json=body)
+        samples.append(time.perf_counter() - started)
+        if response.status_code != 201: errors.append(f"POST /api/sales/ -> {response.status_code} {response.text[:200]}")
+
+async def _report_client(client: httpx.AsyncClient, report_limit: int, stop_at: float, samples: List[float], errors: List[str]) -> None:
+    while time.perf_counter() < stop_at:
+        started = time.perf_counter()
+        response = await client.get("/api/sales/report/", params={"limit": report_limit, "count": "exact"})
+        samples.append(time.perf_counter() - started)
+        if response.status_code != 200: errors.append(f"GET /api/sales/report/ -> {response.status_code}")
+
+async def _run_phase(client: httpx.AsyncClient, args, product_ids: List[int], location_id: int, with_report: bool):
+    pos_samples: List[float] = []
+    report_samples: List[float] = []
+    errors: List[str] = []
+    stop_at = time.perf_counter() + args.duration
+    tasks = [_pos_client(client, product_ids, location_id, stop_at, pos_samples, errors, seed) for seed in range(args.pos_clients)]
+    if with_report:
+        tasks += [_report_client(client, args.report_limit, stop_at, report_samples, errors) for _ in range(args.report_clients)]
+    await asyncio.gather(*tasks)
+    return pos_samples, report_samples, errors
+
+async def _discover(client: httpx.AsyncClient, location_id: Optional[int]):
+    products = (await client.get("/api/products/", params={"limit": 50})).json()
+    if location_id is None: location_id = (await client.get("/api/locations/")).json()[0]["id"]
+    return [product["id"] for product in products], location_id
+
+async def _main(args) -> int:
+    if args.base_url:
+        client = httpx.AsyncClient(base_url=args.base_url, timeout=120)
+    else:
+        database = _bench.setup_database(args.database_url)
+        db = database.SessionLocal()
+        try:
+            print(f"[load] seeding {args.products} products and {args.sales} past sales ...")
+            seeded = _bench.seed_catalog(db, args.products)
+            _bench.seed_stock(db, seeded["product_ids"], seeded["location_ids"], quantity=1_000_000.0)
+            _bench.seed_sales(db, seeded["product_ids"], seeded["location_ids"], args.sales)
+        finally:
+            db.close()
+        import main # หลัง setup_database: main import database ซึ่งอ่าน DATABASE_URL ตอน import
+        await main.configure_threadpool() # ASGITransport ไม่รัน startup event
+        client = httpx.AsyncClient(transport=httpx.ASGITransport(app=main.app), base_url="http://bench", timeout=120)
+
+    async with client:
+        product_ids, location_id = await _discover(client, args.location_id)
+        if not product_ids: raise SystemExit("!!! No products found")
+        for _ in range(5): # warm-up: cache / connection pool / import ครั้งแรกไม่นับ
+            await client.post("/api/sales/", params={"allowNegativeStock": "true"},
+                              json={"location_id": location_id, "items": [{"product_id": product_ids[0], "quantity": 1, "unit_price": 10.0}]})
+        await client.get("/api/sales/report/", params={"limit": 10})
+        print(f"[load] {args.pos_clients} POS clients, {args.report_clients} report clients (limit={args.report_limit}), {args.duration:g}s per phase")
+        baseline, _, baseline_errors = await _run_phase(client, args, product_ids, location_id, with_report=False)
+        loaded, report, loaded_errors = await _run_phase(client, args, product_ids, location_id, with_report=True)
+
+    _bench.report("POS sale, idle", baseline)
+    _bench.report("POS sale, with heavy report running", loaded)
+    _bench.report("sales report", report)
+    errors = baseline_errors + loaded_errors
+    for error in errors[:5]: print(f"  ! {error}")
+    if errors: print(f"⚠️ {len(errors)} failed requests")
+    if not report:
+        print("⚠️ No sales report completed during the loaded phase (increase --duration)")
+        return 1
+    baseline_p99_ms, p99_ms = _bench.percentile(baseline, 99) * 1000, _bench.percentile(loaded, 99) * 1000
+    ratio = p99_ms / baseline_p99_ms
+    summary = f"POS p99 under report load {p99_ms:.1f} ms = {ratio:.1f}x idle p99 {baseline_p99_ms:.1f} ms (limit {args.max_p99_ratio:g}x"
+    summary += f", {args.max_p99_ms:g} ms)" if args.max_p99_ms is not None else ")"
+    if ratio > args.max_p99_ratio or (args.max_p99_ms is not None and p99_ms > args.max_p99_ms) or errors:
+        print(f"⚠️ {summary}")
+        return 1
+    print(f"✅ {summary}")
+    return 0
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="POS sale latency while a heavy sales report runs.")
+    _bench.add_database_argument(parser)
+    parser.add_argument("--base-url", default=None, help="server ที่รันอยู่ (ไม่ใส่ = รัน app ใน process นี้)")
+    parser.add_argument("--location-id", type=int, default=None, help="สาขาที่ใช้ขาย (default: สาขาแรกจาก /api/locations/)")
+    parser.add_argument("--products", type=int, default=500)
+    parser.add_argument("--sales", type=int, default=20_000, help="จำนวนการขายย้อนหลังที่ seed (in-process เท่านั้น)")
+    parser.add_argument("--pos-clients", type=int, default=1)
+    parser.add_argument("--report-clients", type=int, default=1)
+    parser.add_argument("--report-limit", type=int, default=2000, help="จำนวนการขายต่อการเรียกรายงานหนึ่งครั้ง")
+    parser.add_argument("--duration", type=float, default=10.0, help="วินาทีต่อช่วง")
+    parser.add_argument("--max-p99-ratio", type=float, default=25.0, help="p99 ช่วงมีรายงาน / p99 ช่วง POS อย่างเดียว")
+    parser.add_argument("--max-p99-ms", type=float, default=None, help="เพดาน p99 แบบตายตัว (ใช้กับ server จริงที่รู้ SLA)")
+    return asyncio.run(_main(parser.parse_args()))
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,140 @@
+# services/cache_service.py
+# In-process caches (ต่อ worker) และการล้าง cache เมื่อ transaction ที่แก้ตารางที่เกี่ยวข้อง commit
+import threading
+import time
+from typing import Any, Callable, Dict, Hashable, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy import event, func, select
+from sqlalchemy.orm import Session
+
+import models
+
+_MISSING = object()
+CHANGED_TABLES_KEY = "cache_service.changed_tables" # key ใน Session.info ที่เก็บชื่อตารางที่ถูกแก้ใน transaction ปัจจุบัน
+
+class TTLCache:
+    """
+    Cache แบบ key -> value ที่หมดอายุตาม ttl_seconds (thread-safe)
+    get_or_compute ให้ request ที่พลาด cache พร้อมกันด้วย key เดียวกันรอผลจากการคำนวณครั้งเดียว
+    """
+    def __init__(self, ttl_seconds: float, max_entries: int = 256):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries: Dict[Hashable, Tuple[float, Any]] = {}
+        self._key_locks: Dict[Hashable, threading.Lock] = {}
+        self._lock = threading.Lock()
+        self._generation = 0 # เพิ่มทุกครั้งที่ clear เพื่อไม่ให้ผลที่คำนวณค้างอยู่ระหว่าง clear ถูกเก็บลง cache
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None: return default
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return default
+            return value
+
+    def set(self, key: Hashable, value: Any, generation: Optional[int] = None) -> None:
+        with self._lock:
+            if generation is not None and generation != self._generation: return
+            if len(self._entries) >= self.max_entries and key not in self._entries:
+                # ทิ้ง entry ที่จะหมดอายุก่อนสุด
+                del self._entries[min(self._entries, key=lambda k: self._entries[k][0])]
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+
+    def get_or_compute(self, key: Hashable, compute: Callable[[], Any]) -> Any:
+        value = self.get(key, _MISSING)
+        if value is not _MISSING: return value
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+        with key_lock:
+            value = self.get(key, _MISSING) # อีก request อาจคำนวณเสร็จระหว่างรอ lock
+            if value is not _MISSING: return value
+            generation = self.generation
+            value = compute()
+            self.set(key, value, generation=generation)
+            return value
+
+    @property
+    def generation(self) -> int:
+        """ ส่งค่านี้ให้ set(..., generation=) เมื่อคำนวณเองนอก get_or_compute (เช่น ฝั่ง async ที่ห้ามรอ threading.Lock) """
+        with self._lock: return self._generation
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._key_locks.clear()
+            self._generation += 1
+
+    def __len__(self) -> int:
+        with self._lock: return len(self._entries)
+
+# --- Version counter ใน DB (สำหรับ cache ที่ต้องตรงกันทุก worker) ---
+PRODUCTS_CACHE_NAME = "products" # scan index ใน product_service (มีชื่อหมวดหมู่อยู่ด้วย)
+
+def bump_cache_version(db: Session, name: str) -> None:
+    """
+    เพิ่ม cache_versions.version ของ name ใน transaction ปัจจุบัน (ไม่ commit)
+    เรียกก่อน commit ของการแก้ข้อมูล worker อื่นจะเห็นเวอร์ชันใหม่พร้อมกับข้อมูลที่ commit แล้วเท่านั้น
+    """
+    from services.inventory_service import _dialect_insert
+    version_table = models.CacheVersion
+    insert_fn = _dialect_insert(db)
+    if insert_fn is None:
+        version_row = db.query(version_table).filter(version_table.name == name).with_for_update().first()
+        if version_row is None: db.add(version_table(name=name, version=1))
+        else: version_row.version += 1
+        db.flush()
+        return
+    stmt = insert_fn(version_table).values(name=name, version=1)
+    db.execute(stmt.on_conflict_do_update(
+        index_elements=["name"], set_={"version": version_table.version + 1, "updated_at": func.now()}
+    ))
+
+def get_cache_versions(db: Session, names: Tuple[str, ...]) -> Tuple[int, ...]:
+    """ เวอร์ชันของหลายชื่อใน query เดียว เรียงตาม names (0 ถ้ายังไม่เคยถูก bump) """
+    versions = dict(db.execute(
+        select(models.CacheVersion.name, models.CacheVersion.version).where(models.CacheVersion.name.in_(names))
+    ).all())
+    return tuple(versions.get(name, 0) for name in names)
+
+# --- Invalidation เมื่อ commit ---
+# บันทึกชื่อตารางที่ถูก INSERT/UPDATE/DELETE ระหว่าง transaction (ทั้งผ่าน unit of work และ ORM bulk statement)
+# แล้วหลัง commit เรียก callback ที่ลงทะเบียนไว้กับตารางเหล่านั้น ไม่ต้องไล่เรียก invalidate ในทุก service / route
+_commit_listeners: List[Tuple[frozenset, Callable[[Set[str]], None]]] = []
+
+def on_tables_committed(table_names: Iterable[str], callback: Callable[[Set[str]], None]) -> None:
+    """ ลงทะเบียน callback(changed_tables) ที่จะถูกเรียกหลัง commit ที่แก้ตารางใดตารางหนึ่งใน table_names """
+    _commit_listeners.append((frozenset(table_names), callback))
+
+def _mark_tables_changed(session: Session, table_names: Iterable[str]) -> None:
+    session.info.setdefault(CHANGED_TABLES_KEY, set()).update(table_names)
+
+@event.listens_for(Session, "after_flush")
+def _track_flushed_tables(session: Session, flush_context) -> None:
+    _mark_tables_changed(session, {
+        obj.__table__.name for obj in (*session.new, *session.dirty, *session.deleted) if hasattr(obj, "__table__")
+    })
+
+@event.listens_for(Session, "do_orm_execute")
+def _track_orm_statement_tables(orm_execute_state) -> None:
+    if not (orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete): return
+    mapper = orm_execute_state.bind_mapper
+    if mapper is not None:
+        _mark_tables_changed(orm_execute_state.session, [mapper.local_table.name])
+
+@event.listens_for(Session, "after_commit")
+def _notify_committed_tables(session: Session) -> None:
+    changed_tables = session.info.pop(CHANGED_TABLES_KEY, None)
+    if not changed_tables: return
+    for table_names, callback in _commit_listeners:
+        if table_names & changed_tables:
+            try:
+                callback(changed_tables)
+            except Exception as e: # cache ล้มต้องไม่ทำให้ commit ที่สำเร็จแล้วกลายเป็น error
+                print(f"!!! Error in cache invalidation callback {getattr(callback, '__name__', callback)}: {type(e).__name__} - {e}")
+
+@event.listens_for(Session, "after_rollback")
+def _discard_changed_tables(session: Session) -> None:
+    session.info.pop(CHANGED_TABLES_KEY, None)
@@ -0,0 +1,60 @@
+# services/catalog_service.py
+# ข้อมูลและ cache ของหน้าแคตตาล็อกราคา (/ui/catalog/price-display/) ที่จอแสดงราคาในร้านเรียกซ้ำตลอดเวลา
+# - validator (ETag / Last-Modified) มาจากเวอร์ชัน "products" + "categories" ใน cache_versions และเวลาเปลี่ยนราคาล่าสุด
+#   เก็บไว้ใน VersionedCache จึงตอบ 304 ได้โดยไม่ query ตาราง products
+# - HTML ที่ render แล้วเก็บตาม (เวอร์ชัน, หมวดหมู่, คำค้น) เวอร์ชันใหม่ = key ใหม่ จึงไม่ต้องล้างเอง
+import os
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session, joinedload
+
+import models
+from services import cache_service, invalidation_service, product_search_service
+from services.category_service import CATEGORIES_CACHE_NAME
+
+CATALOG_PAGE_CACHE_TTL_SECONDS = float(os.getenv("CATALOG_PAGE_CACHE_TTL_SECONDS", "600"))
+CATALOG_PAGE_CACHE_MAX_ENTRIES = int(os.getenv("CATALOG_PAGE_CACHE_MAX_ENTRIES", "128"))
+
+def _as_utc(value: Optional[datetime]) -> Optional[datetime]:
+    if value is None: return None
+    return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value.astimezone(timezone.utc)
+
+def _load_last_modified(db: Session) -> Optional[datetime]:
+    """ เวลาล่าสุดที่ราคาเปลี่ยน หรือที่สินค้า/หมวดหมู่ถูกแก้ (cache_versions.updated_at) """
+    price_changed_b2c, price_changed_b2b = db.query(
+        func.max(models.Product.price_b2c_last_changed), func.max(models.Product.price_b2b_last_changed)
+    ).one()
+    versions_changed = db.query(func.max(models.CacheVersion.updated_at)).filter(
+        models.CacheVersion.name.in_((cache_service.PRODUCTS_CACHE_NAME, CATEGORIES_CACHE_NAME))
+    ).scalar()
+    candidates = [_as_utc(value) for value in (price_changed_b2c, price_changed_b2b, versions_changed) if value is not None]
+    return max(candidates).replace(microsecond=0) if candidates else None # HTTP date ละเอียดแค่วินาที
+
+_catalog_state = invalidation_service.VersionedCache((cache_service.PRODUCTS_CACHE_NAME, CATEGORIES_CACHE_NAME), _load_last_modified)
+_rendered_pages = cache_service.TTLCache(ttl_seconds=CATALOG_PAGE_CACHE_TTL_SECONDS, max_entries=CATALOG_PAGE_CACHE_MAX_ENTRIES)
+
+def get_catalog_validators(db: Session) -> Tuple[Optional[str], Optional[datetime]]:
+    """
+    คืน (etag, last_modified) ของแคตตาล็อกปัจจุบัน
+    etag เป็น None ถ้าข้อมูลเพิ่งถูกแก้ระหว่างโหลด (ไม่ควร cache response นั้น)
+    """
+    last_modified, version = _catalog_state.get_with_version(db)
+    if version is None: return None, last_modified
+    return f'W/"catalog-{"-".join(str(v) for v in version)}"', last_modified
+
+def get_price_display_products(db: Session, category_id: Optional[int] = None, search: Optional[str] = None) -> List[models.Product]:
+    """ สินค้าสำหรับหน้าแคตตาล็อกราคา (พร้อม Category) กรองตามหมวดหมู่และคำค้น (product_search_service) เรียงตามชื่อ """
+    products_query = db.query(models.Product).options(joinedload(models.Product.category))
+    if category_id is not None:
+        products_query = products_query.filter(models.Product.category_id == category_id)
+    if search and search.strip():
+        products_query = products_query.filter(product_search_service.product_search_filter(db, search))
+    return products_query.order_by(models.Product.name).all()
+
+def get_rendered_page(etag: str, category_id: Optional[int], search: Optional[str]) -> Optional[bytes]:
+    return _rendered_pages.get((etag, category_id, (search or "").strip()))
+
+def store_rendered_page(etag: str, category_id: Optional[int], search: Optional[str], body: bytes) -> None:
+    _rendered_pages.set((etag, category_id, (search or "").strip()), body)
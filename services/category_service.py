@@ -5,6 +5,9 @@ from typing import List, Optional, Dict, Any
 # Absolute Imports
 from models import Category, Product
 import schemas # Using 'import schemas' then 'schemas.CategoryCreate'
+from services import cache_service, invalidation_service
+
+CATEGORIES_CACHE_NAME = "categories"
 
 def get_category(db: Session, category_id: int) -> Optional[Category]:
     """ ดึงข้อมูล Category ตาม ID """
@@ -21,6 +24,15 @@ def get_categories(db: Session, skip: int = 0, limit: int = 100) -> Dict[str, An
     categories_data = query.order_by(Category.id).offset(skip).limit(limit).all()
     return {"items": categories_data, "total_count": total_count}
 
+def _load_all_categories(db: Session) -> List[schemas.Category]:
+    return [schemas.Category.model_validate(category) for category in db.query(Category).order_by(Category.id).all()]
+
+_categories_cache = invalidation_service.VersionedCache(CATEGORIES_CACHE_NAME, _load_all_categories)
+
+def get_all_categories_cached(db: Session) -> List[schemas.Category]:
+    """ หมวดหมู่ทั้งหมด (เรียงตาม id) จาก cache ในหน่วยความจำ สำหรับ dropdown / filter ในหน้า UI ไม่ query DB ทุก request """
+    return _categories_cache.get(db)
+
 def create_category(db: Session, category: schemas.CategoryCreate) -> Category:
     """ สร้าง Category ใหม่ """
     existing_category = get_category_by_name(db, name=category.name)
@@ -28,6 +40,7 @@ def create_category(db: Session, category: schemas.CategoryCreate) -> Category:
         raise ValueError(f"มีหมวดหมู่ชื่อ '{category.name}' อยู่ในระบบแล้ว")
     db_category = Category(**category.model_dump())
     db.add(db_category)
+    invalidation_service.publish(db, CATEGORIES_CACHE_NAME)
     db.commit()
     db.refresh(db_category)
     return db_category
@@ -44,6 +57,8 @@ def update_category(db: Session, category_id: int, category_update: schemas.Cate
     update_data = category_update.model_dump()
     for key, value in update_data.items():
          setattr(db_category, key, value)
+    invalidation_service.publish(db, CATEGORIES_CACHE_NAME)
+    invalidation_service.publish(db, cache_service.PRODUCTS_CACHE_NAME) # scan index เก็บชื่อหมวดหมู่ไว้ด้วย
     db.commit()
     db.refresh(db_category)
     return db_category
@@ -58,5 +73,6 @@ def delete_category(db: Session, category_id: int) -> Optional[Category]:
         raise ValueError(f"ไม่สามารถลบหมวดหมู่ '{db_category.name}' ได้ เนื่องจากมีสินค้าผูกอยู่")
     deleted_category_copy = Category(id=db_category.id, name=db_category.name)
     db.delete(db_category)
+    invalidation_service.publish(db, CATEGORIES_CACHE_NAME)
     db.commit()
     return deleted_category_copy
\ No newline at end of file
@@ -1,8 +1,10 @@
 # services/dashboard_service.py
 from sqlalchemy.orm import Session, joinedload, subqueryload
-from sqlalchemy import func, distinct, desc, cast, Date as SQLDate
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import func, distinct, desc
 from datetime import date, timedelta, datetime, time
 from typing import List, Dict, Any, Optional
+import os
 
 # Import necessary models directly and schemas
 from models import (
@@ -10,13 +12,29 @@ from models import (
     Product, Category, Location
 )
 import schemas
+from services import sales_rollup_service, cache_service, stock_lot_service, invalidation_service
+from utils import bangkok_today, bangkok_day_bounds
+
+# --- Overview Cache ---
+# ผลของ /api/dashboard/overview เก็บไว้ใน process ตาม TTL (ค่า default 15 วินาที, 0 = ปิด cache)
+# และถูกล้างทันทีเมื่อ transaction ที่แตะยอดขายหรือการเคลื่อนไหวสต็อก commit จาก worker ใดก็ได้
+# (transaction นั้น publish DASHBOARD_CACHE_NAME ผ่าน invalidation_service ทุก worker ที่เปิด listener จะได้รับ)
+DASHBOARD_CACHE_TTL_SECONDS = float(os.getenv("DASHBOARD_CACHE_TTL_SECONDS", "15"))
+DASHBOARD_SOURCE_TABLES = ("sales", "sale_items", "daily_sales_rollup", "inventory_transactions", "current_stock", "stock_lots")
+DASHBOARD_CACHE_NAME = "dashboard"
+_overview_cache = cache_service.TTLCache(ttl_seconds=DASHBOARD_CACHE_TTL_SECONDS, max_entries=64)
+
+def invalidate_dashboard_cache(name: Optional[str] = None) -> None:
+    """ ล้าง cache ของ dashboard overview (เรียกอัตโนมัติเมื่อมีการ publish DASHBOARD_CACHE_NAME) """
+    _overview_cache.clear()
+
+invalidation_service.publish_on_tables_committed(DASHBOARD_SOURCE_TABLES, DASHBOARD_CACHE_NAME)
+invalidation_service.subscribe(DASHBOARD_CACHE_NAME, invalidate_dashboard_cache)
 
 def get_dashboard_kpis(db: Session, near_expiry_days: int = 7) -> schemas.KpiSummarySchema:
-    """ Calculates Key Performance Indicators for the dashboard. """
-    today_start = datetime.combine(date.today(), time.min)
-    today_end = datetime.combine(date.today() + timedelta(days=1), time.min)
-    today_date_only = date.today()
-    near_expiry_threshold_date = today_date_only + timedelta(days=near_expiry_days)
+    """ Calculates Key Performance Indicators for the dashboard ('today' is the Asia/Bangkok business day). """
+    today_date_only = bangkok_today()
+    today_start, today_end = bangkok_day_bounds(today_date_only)
 
     sales_today_agg = None
     negative_stock_count = 0
@@ -37,20 +55,8 @@ def get_dashboard_kpis(db: Session, near_expiry_days: int = 7) -> schemas.KpiSum
             CurrentStock.quantity < 0
         ).scalar() or 0
 
-        # --- Near Expiry Count ---
-        near_expiry_product_ids_subquery = db.query(
-            distinct(InventoryTransaction.product_id).label("product_id")
-        ).filter(
-            InventoryTransaction.transaction_type == TransactionType.STOCK_IN,
-            InventoryTransaction.expiry_date.isnot(None),
-            InventoryTransaction.expiry_date >= today_date_only,
-            InventoryTransaction.expiry_date <= near_expiry_threshold_date
-        ).subquery('near_expiry_pids')
-
-        near_expiry_count_final = db.query(func.count(distinct(CurrentStock.product_id))).join(
-             near_expiry_product_ids_subquery,
-             CurrentStock.product_id == near_expiry_product_ids_subquery.c.product_id
-        ).filter(CurrentStock.quantity > 0).scalar() or 0
+        # --- Near Expiry Count (สินค้าที่มีล็อตคงเหลือหมดอายุภายใน near_expiry_days วัน) ---
+        near_expiry_count_final = stock_lot_service.count_near_expiry_products(db, near_expiry_days, today=today_date_only)
 
     except Exception as e:
         print(f"!!! Error calculating KPIs in dashboard_service.py: {type(e).__name__} - {e}")
@@ -68,28 +74,17 @@ def get_dashboard_kpis(db: Session, near_expiry_days: int = 7) -> schemas.KpiSum
 
 # ... (rest of the functions: get_sales_trend, get_top_selling_products, etc. as provided previously) ...
 def get_sales_trend(db: Session, days: int = 7) -> List[schemas.SalesTrendItemSchema]:
-    """ Gets total sales for each of the last 'days', filling missing days with 0. """
+    """
+    Gets total sales for each of the last 'days' (Asia/Bangkok business days), filling missing days with 0.
+    Reads the pre-aggregated daily_sales_rollup table, so the cost depends on days * locations * products sold, not on raw sales.
+    """
     trend_result: List[schemas.SalesTrendItemSchema] = []
     try:
-        end_date = date.today()
+        end_date = bangkok_today()
         start_date = end_date - timedelta(days=days - 1) # Inclusive start date
         all_dates = [start_date + timedelta(days=i) for i in range(days)]
-        start_datetime = datetime.combine(start_date, time.min)
-        end_datetime = datetime.combine(end_date + timedelta(days=1), time.min)
-
-        sales_data = db.query(
-            cast(Sale.sale_date, SQLDate).label("sale_day"), # Cast timestamp to date
-            func.sum(Sale.total_amount).label("daily_total")
-        ).filter(
-            Sale.sale_date >= start_datetime,
-            Sale.sale_date < end_datetime
-        ).group_by(
-            cast(Sale.sale_date, SQLDate)
-        ).order_by(
-            cast(Sale.sale_date, SQLDate)
-        ).all()
 
-        sales_dict = {item.sale_day: item.daily_total for item in sales_data}
+        sales_dict = sales_rollup_service.get_daily_totals(db, start_date=start_date, end_date=end_date)
 
         for current_date in all_dates:
             total = sales_dict.get(current_date, 0.0)
@@ -101,31 +96,13 @@ def get_sales_trend(db: Session, days: int = 7) -> List[schemas.SalesTrendItemSc
     return trend_result
 
 def get_top_selling_products(db: Session, days: int = 7, limit: int = 5) -> List[schemas.ProductPerformanceItemSchema]:
-    """ Gets top N selling products by quantity over the last 'days'. """
+    """ Gets top N selling products by quantity over the last 'days' (Asia/Bangkok business days, from daily_sales_rollup). """
     result_list: List[schemas.ProductPerformanceItemSchema] = []
     try:
-        end_date = date.today() + timedelta(days=1)
-        start_date = end_date - timedelta(days=days)
-        start_datetime = datetime.combine(start_date, time.min)
-        end_datetime = datetime.combine(end_date, time.min)
-
-        top_products_query = db.query(
-            SaleItem.product_id,
-            Product.name.label("product_name"),
-            Product.sku.label("product_sku"),
-            func.sum(SaleItem.quantity).label("total_quantity")
-        ).join(
-            Sale, SaleItem.sale_id == Sale.id
-        ).join(
-            Product, SaleItem.product_id == Product.id
-        ).filter(
-            Sale.sale_date >= start_datetime,
-            Sale.sale_date < end_datetime
-        ).group_by(
-            SaleItem.product_id, Product.name, Product.sku
-        ).order_by(
-            desc("total_quantity")
-        ).limit(limit).all()
+        end_date = bangkok_today()
+        start_date = end_date - timedelta(days=days - 1) # Inclusive start date
+
+        top_products_query = sales_rollup_service.get_top_products_by_quantity(db, start_date=start_date, end_date=end_date, limit=limit)
 
         result_list = [
             schemas.ProductPerformanceItemSchema(
@@ -236,4 +213,77 @@ def get_recent_transactions(db: Session, limit: int = 5) -> List[schemas.RecentT
     except Exception as e:
         print(f"!!! Error calculating recent transactions: {type(e).__name__} - {e}")
         # Return empty list on error or re-raise
-    return result_list
\ No newline at end of file
+    return result_list
+
+def _compute_dashboard_overview(
+    db: Session, days: int, top_limit: int, low_stock_threshold: int, low_stock_limit: int, recent_limit: int
+) -> schemas.DashboardOverviewSchema:
+    return schemas.DashboardOverviewSchema(
+        kpis=get_dashboard_kpis(db),
+        sales_trend=get_sales_trend(db, days=days),
+        top_products=get_top_selling_products(db, days=days, limit=top_limit),
+        low_stock_items=get_low_stock_items(db, threshold=low_stock_threshold, limit=low_stock_limit),
+        recent_transactions=get_recent_transactions(db, limit=recent_limit),
+        generated_at=datetime.utcnow()
+    )
+
+def _overview_cache_key(days: int, top_limit: int, low_stock_threshold: int, low_stock_limit: int, recent_limit: int) -> tuple:
+    return (bangkok_today(), days, top_limit, low_stock_threshold, low_stock_limit, recent_limit) # วันที่อยู่ใน key เพื่อไม่ให้ KPI "วันนี้" ข้ามวัน
+
+def get_dashboard_overview(
+    db: Session, days: int = 7, top_limit: int = 5, low_stock_threshold: int = 5, low_stock_limit: int = 5, recent_limit: int = 5
+) -> schemas.DashboardOverviewSchema:
+    """
+    ข้อมูลทุก widget ของหน้า Dashboard ใน response เดียว คำนวณด้วย session (connection) เดียว
+    ผลถูก cache ตามพารามิเตอร์ (DASHBOARD_CACHE_TTL_SECONDS) request ที่พลาด cache พร้อมกันจะรอผลจากการคำนวณครั้งเดียว
+    """
+    def compute() -> schemas.DashboardOverviewSchema:
+        return _compute_dashboard_overview(db, days, top_limit, low_stock_threshold, low_stock_limit, recent_limit)
+    if DASHBOARD_CACHE_TTL_SECONDS <= 0:
+        return compute()
+    return _overview_cache.get_or_compute(_overview_cache_key(days, top_limit, low_stock_threshold, low_stock_limit, recent_limit), compute)
+
+# --- Async Variants (AsyncSession) ---
+# Each one runs the sync query function above through AsyncSession.run_sync, so the SQL
+# stays in one place and the I/O is awaited on the event loop instead of a worker thread.
+
+async def get_dashboard_kpis_async(db: AsyncSession, near_expiry_days: int = 7) -> schemas.KpiSummarySchema:
+    """ Async variant of get_dashboard_kpis. """
+    return await db.run_sync(get_dashboard_kpis, near_expiry_days=near_expiry_days)
+
+async def get_sales_trend_async(db: AsyncSession, days: int = 7) -> List[schemas.SalesTrendItemSchema]:
+    """ Async variant of get_sales_trend. """
+    return await db.run_sync(get_sales_trend, days=days)
+
+async def get_top_selling_products_async(db: AsyncSession, days: int = 7, limit: int = 5) -> List[schemas.ProductPerformanceItemSchema]:
+    """ Async variant of get_top_selling_products. """
+    return await db.run_sync(get_top_selling_products, days=days, limit=limit)
+
+async def get_category_stock_distribution_async(db: AsyncSession, value_based: bool = False) -> List[schemas.CategoryDistributionItemSchema]:
+    """ Async variant of get_category_stock_distribution. """
+    return await db.run_sync(get_category_stock_distribution, value_based=value_based)
+
+async def get_low_stock_items_async(db: AsyncSession, threshold: int = 5, limit: int = 5) -> List[schemas.ProductPerformanceItemSchema]:
+    """ Async variant of get_low_stock_items. """
+    return await db.run_sync(get_low_stock_items, threshold=threshold, limit=limit)
+
+async def get_recent_transactions_async(db: AsyncSession, limit: int = 5) -> List[schemas.RecentTransactionItemSchema]:
+    """ Async variant of get_recent_transactions. """
+    return await db.run_sync(get_recent_transactions, limit=limit)
+
+async def get_dashboard_overview_async(
+    db: AsyncSession, days: int = 7, top_limit: int = 5, low_stock_threshold: int = 5, low_stock_limit: int = 5, recent_limit: int = 5
+) -> schemas.DashboardOverviewSchema:
+    """
+    Async variant of get_dashboard_overview.
+    Shares the same cache, but a miss is computed without waiting on the per-key lock (a threading.Lock would block the event loop).
+    """
+    cache_key = _overview_cache_key(days, top_limit, low_stock_threshold, low_stock_limit, recent_limit)
+    if DASHBOARD_CACHE_TTL_SECONDS > 0:
+        cached_overview = _overview_cache.get(cache_key)
+        if cached_overview is not None: return cached_overview
+    generation = _overview_cache.generation
+    overview = await db.run_sync(_compute_dashboard_overview, days, top_limit, low_stock_threshold, low_stock_limit, recent_limit)
+    if DASHBOARD_CACHE_TTL_SECONDS > 0:
+        _overview_cache.set(cache_key, overview, generation=generation)
+    return overview
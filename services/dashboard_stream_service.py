@@ -0,0 +1,128 @@
+# services/dashboard_stream_service.py
+# Live KPI ของหน้า Dashboard ผ่าน Server-Sent Events (/api/dashboard/stream)
+# KPI ถูกคำนวณครั้งเดียวต่อการเปลี่ยนแปลง (หลัง commit ที่แตะยอดขาย/สต็อกจาก worker ใดก็ได้ ผ่าน invalidation bus)
+# แล้วกระจายให้ทุก dashboard ที่เปิดอยู่ใน worker นี้
+# จำนวน query จึงไม่ขึ้นกับจำนวนผู้ชม
+import asyncio
+import json
+import os
+from typing import Any, Callable, Dict, Optional, Set
+
+from sqlalchemy.orm import Session
+
+from services import dashboard_service, invalidation_service
+
+DASHBOARD_STREAM_DEBOUNCE_SECONDS = float(os.getenv("DASHBOARD_STREAM_DEBOUNCE_SECONDS", "1"))  # รวม commit ที่มาติด ๆ กันเป็นการคำนวณครั้งเดียว
+DASHBOARD_STREAM_REFRESH_SECONDS = float(os.getenv("DASHBOARD_STREAM_REFRESH_SECONDS", "60"))   # คำนวณซ้ำตามรอบ (สำรองไว้สำหรับการข้ามวันเท่านั้น)
+DASHBOARD_STREAM_HEARTBEAT_SECONDS = float(os.getenv("DASHBOARD_STREAM_HEARTBEAT_SECONDS", "15"))
+SUBSCRIBER_QUEUE_SIZE = 16
+
+def format_sse(event: str, data: Dict[str, Any]) -> str:
+    """ แปลงข้อมูลเป็นข้อความ SSE หนึ่ง event """
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+class KpiBroadcaster:
+    """
+    เก็บ KPI ล่าสุดและรายชื่อผู้ติดตาม (asyncio.Queue ต่อ connection)
+    notify_changed() เรียกได้จากทุก thread (callback หลัง commit ใน thread pool หรือ listener thread ของ invalidation bus)
+    ส่วนการคำนวณทำใน task เดียวบน event loop
+    ผู้ติดตามที่รับไม่ทัน (queue เต็ม) จะถูกตัดออก ให้ EventSource ฝั่ง browser reconnect แล้วรับ snapshot ใหม่
+    """
+    def __init__(self, session_factory: Callable[[], Session]):
+        self.session_factory = session_factory
+        self.snapshot: Optional[Dict[str, Any]] = None
+        self._subscribers: Set[asyncio.Queue] = set()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._changed: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._start_lock = asyncio.Lock()
+
+    def _compute_kpis(self) -> Dict[str, Any]:
+        db = self.session_factory()
+        try:
+            return dashboard_service.get_dashboard_kpis(db).model_dump()
+        finally:
+            db.close()
+
+    async def subscribe(self) -> asyncio.Queue:
+        """ ลงทะเบียนผู้ติดตามใหม่ คืน queue ที่มี snapshot ปัจจุบันเป็นข้อความแรก """
+        async with self._start_lock: # connection แรกพร้อมกันหลายตัวต้องได้ task คำนวณเพียงตัวเดียว
+            if self._task is None or self._task.done():
+                self._loop = asyncio.get_running_loop()
+                self._changed = asyncio.Event()
+                self.snapshot = await asyncio.to_thread(self._compute_kpis)
+                self._task = asyncio.create_task(self._run())
+            queue: asyncio.Queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+            queue.put_nowait(("snapshot", self.snapshot))
+            self._subscribers.add(queue)
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue) -> None:
+        self._subscribers.discard(queue)
+
+    @property
+    def subscriber_count(self) -> int:
+        return len(self._subscribers)
+
+    def notify_changed(self, name: Optional[str] = None) -> None:
+        """ แจ้งว่าข้อมูลที่ใช้คำนวณ KPI เปลี่ยน (thread-safe ไม่ทำอะไรถ้ายังไม่มีใครติดตาม) """
+        loop, changed = self._loop, self._changed
+        if loop is None or changed is None or not self._subscribers or loop.is_closed(): return
+        loop.call_soon_threadsafe(changed.set)
+
+    async def _run(self) -> None:
+        while self._subscribers:
+            try:
+                await asyncio.wait_for(self._changed.wait(), timeout=DASHBOARD_STREAM_REFRESH_SECONDS)
+                await asyncio.sleep(DASHBOARD_STREAM_DEBOUNCE_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+            self._changed.clear()
+            if not self._subscribers: break
+            try:
+                new_snapshot = await asyncio.to_thread(self._compute_kpis)
+            except Exception as e:
+                print(f"!!! Error computing dashboard stream KPIs: {type(e).__name__} - {e}")
+                continue
+            delta = {key: value for key, value in new_snapshot.items() if self.snapshot.get(key) != value}
+            self.snapshot = new_snapshot
+            if delta: self._broadcast(("delta", delta))
+
+    def _broadcast(self, message: Any) -> None:
+        for queue in list(self._subscribers):
+            try:
+                queue.put_nowait(message)
+            except asyncio.QueueFull:
+                self._subscribers.discard(queue) # stream_kpi_events จะเห็นว่าถูกตัดแล้วปิด connection
+
+    def is_subscribed(self, queue: asyncio.Queue) -> bool:
+        return queue in self._subscribers
+
+_kpi_broadcaster: Optional[KpiBroadcaster] = None
+
+def get_kpi_broadcaster(session_factory: Callable[[], Session]) -> KpiBroadcaster:
+    """ KpiBroadcaster ของ worker นี้ (สร้างครั้งแรกที่เรียก และติดตาม DASHBOARD_CACHE_NAME บน invalidation bus) """
+    global _kpi_broadcaster
+    if _kpi_broadcaster is None:
+        _kpi_broadcaster = KpiBroadcaster(session_factory)
+        invalidation_service.subscribe(dashboard_service.DASHBOARD_CACHE_NAME, _kpi_broadcaster.notify_changed)
+    return _kpi_broadcaster
+
+async def stream_kpi_events(broadcaster: KpiBroadcaster, is_disconnected: Callable[[], Any]):
+    """
+    Async generator ของข้อความ SSE: snapshot แรก แล้วตามด้วย delta (เฉพาะค่าที่เปลี่ยน) และ heartbeat comment
+    is_disconnected: coroutine function เช่น request.is_disconnected
+    """
+    queue = await broadcaster.subscribe()
+    try:
+        yield "retry: 5000\n\n" # ให้ EventSource reconnect ภายใน 5 วินาทีถ้าหลุด
+        while broadcaster.is_subscribed(queue) or not queue.empty():
+            try:
+                event, data = await asyncio.wait_for(queue.get(), timeout=DASHBOARD_STREAM_HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                if await is_disconnected(): break
+                yield ": keep-alive\n\n"
+                continue
+            yield format_sse(event, data)
+    finally:
+        broadcaster.unsubscribe(queue)
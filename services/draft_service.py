@@ -0,0 +1,74 @@
+# services/draft_service.py
+# ที่เก็บ draft ของฟอร์มหลายขั้นตอนฝั่ง server (ตาราง session_drafts) แทนการยัดข้อมูลทั้งก้อนลง cookie ของ SessionMiddleware
+# request.session เก็บแค่ key สั้น ๆ ข้อมูลจริงอยู่ใน DB (ใช้ได้ทุก worker) และหมดอายุตาม DRAFT_TTL_SECONDS
+import os
+import secrets
+from datetime import datetime, timedelta, timezone
+from typing import Any, Optional
+
+from sqlalchemy.orm import Session
+
+import models
+
+DRAFT_TTL_SECONDS = int(os.getenv("DRAFT_TTL_SECONDS", "7200"))
+
+def _utc_now() -> datetime:
+    return datetime.now(timezone.utc)
+
+def delete_expired_drafts(db: Session) -> int:
+    """ ลบ draft ที่หมดอายุแล้ว (ไม่ commit) คืนจำนวนที่ลบ """
+    return db.query(models.SessionDraft).filter(models.SessionDraft.expires_at <= _utc_now()).delete(synchronize_session=False)
+
+def save_draft(db: Session, kind: str, data: Any, key: Optional[str] = None) -> str:
+    """
+    บันทึก draft (data ต้องแปลงเป็น JSON ได้) แล้ว commit คืน key สำหรับเก็บใน request.session
+    ส่ง key เดิมเพื่อเขียนทับ draft เดิม (อายุนับใหม่) ระหว่างนี้ลบ draft ที่หมดอายุไปด้วย
+    """
+    try:
+        delete_expired_drafts(db)
+        draft = db.get(models.SessionDraft, key) if key else None
+        if draft is None:
+            draft = models.SessionDraft(key=secrets.token_urlsafe(16))
+            db.add(draft)
+        draft.kind = kind
+        draft.data = data
+        draft.expires_at = _utc_now() + timedelta(seconds=DRAFT_TTL_SECONDS)
+        db.commit()
+        return draft.key
+    except Exception:
+        db.rollback()
+        raise
+
+def _live_draft_query(db: Session, key: str, kind: str):
+    return db.query(models.SessionDraft).filter(
+        models.SessionDraft.key == key, models.SessionDraft.kind == kind, models.SessionDraft.expires_at > _utc_now()
+    )
+
+def get_draft(db: Session, key: Optional[str], kind: str) -> Optional[Any]:
+    """ ข้อมูลของ draft ที่ยังไม่หมดอายุ (None ถ้าไม่พบ หมดอายุ หรือเป็นคนละประเภท) """
+    if not key: return None
+    draft = _live_draft_query(db, key, kind).first()
+    return draft.data if draft else None
+
+def take_draft(db: Session, key: Optional[str], kind: str) -> Optional[Any]:
+    """
+    ลบ draft ใน transaction ปัจจุบัน (ไม่ commit) แล้วคืนข้อมูล ใช้ตอนยืนยันบันทึก:
+    commit พร้อมข้อมูลที่บันทึก = draft หายไปด้วย, rollback = draft กลับมาให้ลองใหม่
+    คำขอซ้ำ (กดยืนยันสองครั้ง) จะได้ None เพราะมีเพียง transaction เดียวที่ลบแถวได้
+    """
+    if not key: return None
+    draft = _live_draft_query(db, key, kind).first()
+    if draft is None: return None
+    data = draft.data
+    deleted = db.query(models.SessionDraft).filter(models.SessionDraft.key == key).delete(synchronize_session=False)
+    return data if deleted else None
+
+def discard_draft(db: Session, key: Optional[str]) -> None:
+    """ ลบ draft ทันที (commit) ไม่ error ถ้าไม่มีแล้ว """
+    if not key: return
+    try:
+        db.query(models.SessionDraft).filter(models.SessionDraft.key == key).delete(synchronize_session=False)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
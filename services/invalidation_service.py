@@ -0,0 +1,216 @@
+# services/invalidation_service.py
+# Bus สำหรับล้าง cache ในหน่วยความจำของทุก worker (gunicorn -w N) เมื่อข้อมูลต้นทางเปลี่ยน
+#
+# ฝั่งส่ง: service เรียก publish(db, name) ก่อน commit -> bump cache_versions[name] (+ pg_notify บน PostgreSQL)
+#          ทั้งสองอย่างอยู่ใน transaction เดียวกับการแก้ข้อมูล จึงมีผลเมื่อ commit สำเร็จเท่านั้น
+# ฝั่งรับ: subscribe(name, callback) ลงทะเบียน callback(name)
+#          - worker ที่ commit เอง: เรียก callback ทันทีหลัง commit (Session event)
+#          - worker อื่น: thread ของ start_listener() รับ NOTIFY (PostgreSQL) หรือ poll ตาราง cache_versions (SQLite/อื่น ๆ)
+#            ทุก CACHE_BUS_POLL_SECONDS ตอนเชื่อมต่อ LISTEN ใหม่ก็ poll หนึ่งครั้งเพื่อตามเหตุการณ์ที่หลุดไประหว่างหลุดการเชื่อมต่อ
+import os
+import select
+import threading
+import time
+import uuid
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple, Union
+
+from sqlalchemy import event, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+import models
+from services import cache_service
+
+NOTIFY_CHANNEL = "cache_invalidation"
+CACHE_BUS_POLL_SECONDS = float(os.getenv("CACHE_BUS_POLL_SECONDS", "2"))
+CACHE_BUS_RECONNECT_SECONDS = float(os.getenv("CACHE_BUS_RECONNECT_SECONDS", "5"))
+PENDING_NAMES_KEY = "invalidation_service.pending_names" # key ใน Session.info: ชื่อที่ publish แล้วรอ commit
+
+WORKER_TOKEN = uuid.uuid4().hex # ใช้ข้าม NOTIFY ที่ worker นี้ส่งเอง (ถูก dispatch ไปแล้วหลัง commit)
+
+_subscribers: Dict[str, List[Callable[[str], None]]] = {}
+_subscribers_lock = threading.Lock()
+
+def subscribe(name: str, callback: Callable[[str], None]) -> None:
+    """ ลงทะเบียน callback(name) ที่จะถูกเรียกเมื่อ name ถูก publish (จาก worker ใดก็ได้) """
+    with _subscribers_lock:
+        _subscribers.setdefault(name, []).append(callback)
+
+def dispatch(name: str) -> None:
+    """ เรียก callback ทั้งหมดของ name (error ของ callback หนึ่งไม่กระทบตัวอื่น) """
+    with _subscribers_lock:
+        callbacks = list(_subscribers.get(name, ()))
+    for callback in callbacks:
+        try:
+            callback(name)
+        except Exception as e:
+            print(f"!!! Error in invalidation callback for '{name}': {type(e).__name__} - {e}")
+
+def publish(db: Session, name: str) -> None:
+    """
+    ประกาศว่าข้อมูลของ cache name เปลี่ยนใน transaction ปัจจุบัน (ไม่ commit)
+    ต้องเรียกก่อน db.commit() ของการแก้ข้อมูลนั้น ถ้า rollback จะไม่มีใครได้รับเหตุการณ์
+    """
+    cache_service.bump_cache_version(db, name)
+    if db.get_bind().dialect.name == "postgresql":
+        # NOTIFY เป็น transactional: PostgreSQL ส่งให้ผู้ LISTEN ตอน commit เท่านั้น
+        db.execute(text("SELECT pg_notify(:channel, :payload)"), {"channel": NOTIFY_CHANNEL, "payload": f"{name}:{WORKER_TOKEN}"})
+    db.info.setdefault(PENDING_NAMES_KEY, set()).add(name)
+
+# ชื่อที่ publish อัตโนมัติเมื่อ transaction แก้ตารางที่กำหนด (ยอดขาย/สต็อกถูกแก้จากหลายจุด ไม่ต้องไล่เรียก publish ทุก service / route)
+_table_publications: List[Tuple[frozenset, str]] = []
+
+def publish_on_tables_committed(table_names: Iterable[str], name: str) -> None:
+    """ publish name ในทุก transaction ที่แก้ตารางใดตารางหนึ่งใน table_names (ตรวจตอน before_commit) """
+    _table_publications.append((frozenset(table_names), name))
+
+@event.listens_for(Session, "before_commit")
+def _publish_changed_tables(session: Session) -> None:
+    if not _table_publications: return
+    if session.new or session.dirty or session.deleted: session.flush() # ให้ cache_service เห็นตารางของ object ที่ยังไม่ flush
+    changed_tables = session.info.get(cache_service.CHANGED_TABLES_KEY)
+    if not changed_tables: return
+    for name in sorted({name for table_names, name in _table_publications if table_names & changed_tables}):
+        publish(session, name)
+
+@event.listens_for(Session, "after_commit")
+def _dispatch_committed_names(session: Session) -> None:
+    for name in sorted(session.info.pop(PENDING_NAMES_KEY, ())):
+        dispatch(name)
+
+@event.listens_for(Session, "after_rollback")
+def _discard_pending_names(session: Session) -> None:
+    session.info.pop(PENDING_NAMES_KEY, None)
+
+class InvalidationListener:
+    """ Thread รับเหตุการณ์จาก worker อื่น: LISTEN/NOTIFY บน PostgreSQL, poll cache_versions บน dialect อื่น """
+    def __init__(self, engine: Engine, session_factory: Callable[[], Session]):
+        self.engine = engine
+        self.session_factory = session_factory
+        self._known_versions: Optional[Dict[str, int]] = None # None = ยังไม่เคย poll (ครั้งแรกแค่จำค่าไว้)
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        target = self._listen_forever if self.engine.dialect.name == "postgresql" else self._poll_forever
+        self._thread = threading.Thread(target=target, name="cache-invalidation-listener", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        self._stop.set()
+        if self._thread is not None: self._thread.join(timeout)
+
+    def poll_versions(self) -> Set[str]:
+        """ อ่าน cache_versions แล้ว dispatch ชื่อที่เวอร์ชันเปลี่ยนจากครั้งก่อน คืนชุดชื่อที่เปลี่ยน """
+        db = self.session_factory()
+        try:
+            versions = dict(db.query(models.CacheVersion.name, models.CacheVersion.version).all())
+        finally:
+            db.close()
+        known, self._known_versions = self._known_versions, versions
+        if known is None: return set()
+        changed = {name for name, version in versions.items() if known.get(name) != version}
+        for name in sorted(changed): dispatch(name)
+        return changed
+
+    def _poll_forever(self) -> None:
+        while not self._stop.is_set():
+            try:
+                self.poll_versions()
+            except Exception as e:
+                print(f"!!! Error polling cache_versions: {type(e).__name__} - {e}")
+            self._stop.wait(CACHE_BUS_POLL_SECONDS)
+
+    def _listen_forever(self) -> None:
+        while not self._stop.is_set():
+            raw_connection = None
+            try:
+                raw_connection = self.engine.raw_connection()
+                raw_connection.detach() # connection นี้ค้างไว้ LISTEN ตลอด ไม่คืนเข้า pool
+                dbapi_connection = raw_connection.dbapi_connection
+                dbapi_connection.autocommit = True
+                with dbapi_connection.cursor() as cursor:
+                    cursor.execute(f"LISTEN {NOTIFY_CHANNEL}")
+                self.poll_versions() # ตามเหตุการณ์ที่อาจหลุดไประหว่างยังไม่ได้ LISTEN
+                while not self._stop.is_set():
+                    if select.select([dbapi_connection], [], [], CACHE_BUS_POLL_SECONDS) == ([], [], []):
+                        continue
+                    dbapi_connection.poll()
+                    while dbapi_connection.notifies:
+                        notify = dbapi_connection.notifies.pop(0)
+                        name, _, sender_token = notify.payload.partition(":")
+                        if sender_token != WORKER_TOKEN: dispatch(name)
+            except Exception as e:
+                print(f"!!! Cache invalidation LISTEN connection lost: {type(e).__name__} - {e}. Reconnecting in {CACHE_BUS_RECONNECT_SECONDS}s")
+                self._stop.wait(CACHE_BUS_RECONNECT_SECONDS)
+            finally:
+                if raw_connection is not None:
+                    try: raw_connection.close()
+                    except Exception: pass
+
+_listener: Optional[InvalidationListener] = None
+
+def start_listener(engine: Engine, session_factory: Callable[[], Session]) -> InvalidationListener:
+    """ เริ่ม listener thread ของ worker นี้ (เรียกตอน app startup ครั้งเดียวต่อ process) """
+    global _listener
+    if _listener is None:
+        _listener = InvalidationListener(engine, session_factory)
+        _listener.start()
+    return _listener
+
+def stop_listener() -> None:
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+def is_listening() -> bool:
+    """ True ถ้า worker นี้รับเหตุการณ์จาก worker อื่นอยู่ (cache ใช้ตัดสินใจว่าต้องตรวจเวอร์ชันเองหรือไม่) """
+    return _listener is not None
+
+# --- Versioned read-through cache ---
+VERSION_CHECK_SECONDS = float(os.getenv("CACHE_VERSION_CHECK_SECONDS", "5")) # ใช้เฉพาะ process ที่ไม่ได้เปิด listener
+
+class VersionedCache:
+    """
+    ข้อมูลทั้งชุดที่โหลดด้วย loader(db) แล้วเก็บไว้ในหน่วยความจำของ worker ผูกกับ cache_versions ของชื่อใน names
+    ถูกล้างเมื่อมีการ publish ชื่อใดชื่อหนึ่งจาก worker ใดก็ได้ ถ้า process ไม่ได้เปิด listener (เช่น script)
+    จะตรวจเวอร์ชันใน DB เองอย่างมากทุก CACHE_VERSION_CHECK_SECONDS
+    """
+    def __init__(self, names: Union[str, Tuple[str, ...]], loader: Callable[[Session], Any]):
+        self.names: Tuple[str, ...] = (names,) if isinstance(names, str) else tuple(names)
+        self.loader = loader
+        # (ข้อมูล, เวอร์ชัน) เป็น tuple เดียว อ่าน/แทนที่ในครั้งเดียวนอก lock ได้ จึงไม่มีทางได้ข้อมูลเก่าคู่กับเวอร์ชันใหม่
+        # เวอร์ชัน None = ยังไม่ได้โหลด หรือถูก invalidate
+        self._state: Tuple[Any, Optional[Tuple[int, ...]]] = (None, None)
+        self._generation = 0 # เพิ่มทุกครั้งที่ invalidate เพื่อไม่ให้การโหลดที่ค้างอยู่ระหว่างนั้นถูกนับว่าสด
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+        for name in self.names: subscribe(name, self.invalidate)
+
+    def invalidate(self, name: Optional[str] = None) -> None:
+        # ไม่ถือ _lock: listener thread ต้องไม่รอการโหลดที่ค้างอยู่ (การโหลดนั้นจะเห็น generation ที่เปลี่ยนแล้วไม่นับว่าสด)
+        self._generation += 1
+        self._state = (self._state[0], None)
+
+    def _is_fresh(self, version: Optional[Tuple[int, ...]]) -> bool:
+        if version is None: return False
+        return is_listening() or time.monotonic() - self._checked_at < VERSION_CHECK_SECONDS
+
+    def get(self, db: Session) -> Any:
+        """ คืนข้อมูลจาก cache (ใช้ db เฉพาะตอนตรวจเวอร์ชัน/โหลดใหม่) """
+        return self.get_with_version(db)[0]
+
+    def get_with_version(self, db: Session) -> Tuple[Any, Optional[Tuple[int, ...]]]:
+        """ คืน (ข้อมูล, เวอร์ชันของแต่ละชื่อใน names) เวอร์ชันเป็น None ถ้าข้อมูลถูก invalidate ระหว่างโหลด """
+        state = self._state
+        if self._is_fresh(state[1]): return state
+        with self._lock:
+            state = self._state
+            if self._is_fresh(state[1]): return state # thread อื่นเพิ่งโหลดระหว่างรอ lock
+            generation = self._generation
+            db_version = cache_service.get_cache_versions(db, self.names) # อ่านเวอร์ชันก่อนโหลดข้อมูล
+            value = state[0] if db_version == state[1] else self.loader(db)
+            self._state = (value, db_version if generation == self._generation else None)
+            self._checked_at = time.monotonic()
+            return self._state
@@ -1,8 +1,10 @@
 # gofresh_stockpro/services/inventory_service.py
+import os
 from sqlalchemy.orm import Session, selectinload, joinedload
-from sqlalchemy import func, and_, or_ 
-from datetime import date, datetime, time, timedelta
-from typing import List, Optional, Dict, Any, Tuple
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import func, and_, or_, insert, select
+from datetime import date, datetime, time, timedelta, timezone
+from typing import List, Optional, Dict, Any, Tuple, Iterable, Iterator
 
 # Absolute Imports
 from models import (Product, Location, CurrentStock, InventoryTransaction,
@@ -15,7 +17,8 @@ from schemas.inventory import StockInSchema, StockAdjustmentSchema, StockTransfe
 from schemas.stock_count import StockCountItemUpdate # Assuming this is used by other functions if they exist here
 
 # Absolute Imports for other services
-from services import product_service, location_service # Ensure these are correctly imported
+from services import product_service, location_service, stock_lot_service # Ensure these are correctly imported
+from utils import paginate_keyset, count_for_pagination, bangkok_day_bounds, bangkok_today, to_bangkok_date
 
 def get_current_stock_record(db: Session, product_id: int, location_id: int) -> Optional[CurrentStock]:
     """ ดึงข้อมูล CurrentStock ของสินค้าและสถานที่ที่ระบุ (พร้อม Lock สำหรับ Update) """
@@ -24,6 +27,98 @@ def get_current_stock_record(db: Session, product_id: int, location_id: int) ->
         CurrentStock.location_id == location_id
     ).with_for_update().first()
 
+StockKey = Tuple[int, int] # (product_id, location_id)
+
+def _dialect_insert(db: Session):
+    """ คืน insert() ของ dialect ที่รองรับ ON CONFLICT (PostgreSQL / SQLite) หรือ None ถ้าไม่รองรับ """
+    dialect_name = db.get_bind().dialect.name
+    if dialect_name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as pg_insert
+        return pg_insert
+    if dialect_name == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+        return sqlite_insert
+    return None
+
+def _stock_keys_filter(keys: Iterable[StockKey]):
+    """ เงื่อนไข WHERE สำหรับชุด (product_id, location_id) แบบจัดกลุ่มตาม location (ไม่ต้องใช้ tuple IN) """
+    product_ids_by_location: Dict[int, List[int]] = {}
+    for product_id, location_id in keys:
+        product_ids_by_location.setdefault(location_id, []).append(product_id)
+    return or_(*[
+        and_(CurrentStock.location_id == location_id, CurrentStock.product_id.in_(product_ids))
+        for location_id, product_ids in product_ids_by_location.items()
+    ])
+
+def lock_current_stock_rows(db: Session, keys: Iterable[StockKey]) -> Dict[StockKey, CurrentStock]:
+    """
+    Lock แถว CurrentStock ตามลำดับมาตรฐานแล้วคืนแถวให้อ่าน/แก้เอง (ไม่ commit)
+    1. สร้างแถวที่ยังไม่มีด้วย INSERT ... ON CONFLICT DO NOTHING (quantity = 0)
+    2. Lock ทุกแถวใน query เดียว (SELECT ... FOR UPDATE) เรียงตาม (product_id, location_id) เสมอ
+    การเปลี่ยนยอดสต็อกทุกเส้นทาง (ขาย/รับเข้า/ปรับ/โอนย้าย/ปิดรอบนับ) ต้องเรียก apply_stock_deltas ซึ่ง lock ตามลำดับเดียวกัน
+    ใช้ฟังก์ชันนี้ตรง ๆ เฉพาะเมื่อต้องถือ lock ก่อนอ่านข้อมูลอื่น (เช่น repair ของ stock_reconciliation_service)
+    และเป็น fallback ของ apply_stock_deltas บน dialect ที่ไม่มี ON CONFLICT
+    คืนค่าเป็น dict {(product_id, location_id): CurrentStock}
+    """
+    ordered_keys = sorted(set(keys))
+    if not ordered_keys: return {}
+
+    insert_fn = _dialect_insert(db)
+    if insert_fn is not None:
+        db.execute(
+            insert_fn(CurrentStock)
+            .values([{"product_id": pid, "location_id": lid, "quantity": 0.0} for pid, lid in ordered_keys])
+            .on_conflict_do_nothing(index_elements=["product_id", "location_id"])
+        )
+    else: # Fallback สำหรับ dialect อื่น: เพิ่มเฉพาะแถวที่ยังไม่มี
+        existing_keys = set(db.query(CurrentStock.product_id, CurrentStock.location_id).filter(_stock_keys_filter(ordered_keys)).all())
+        for pid, lid in ordered_keys:
+            if (pid, lid) not in existing_keys:
+                db.add(CurrentStock(product_id=pid, location_id=lid, quantity=0.0))
+        db.flush()
+
+    records = db.query(CurrentStock).filter(_stock_keys_filter(ordered_keys)).order_by(
+        CurrentStock.product_id, CurrentStock.location_id
+    ).populate_existing().with_for_update().all()
+    return {(record.product_id, record.location_id): record for record in records}
+
+def apply_stock_deltas(db: Session, deltas: Iterable[Tuple[StockKey, float]]) -> Dict[StockKey, float]:
+    """
+    ปรับยอด CurrentStock แบบ atomic ใน statement เดียว (ไม่ commit) เป็นทางเข้าเดียวของการเปลี่ยนยอดสต็อก
+    ทุก service ที่ขาย/รับเข้า/ปรับ/โอนย้ายต้องผ่านฟังก์ชันนี้ ลำดับ lock จึงเหมือนกันทุก transaction และไม่เกิด deadlock
+    INSERT ... ON CONFLICT (product_id, location_id) DO UPDATE SET quantity = quantity + excluded.quantity RETURNING
+    - รวม delta ของ key ซ้ำกันก่อน และเรียง key ตาม (product_id, location_id) เพื่อให้ลำดับ lock เหมือน lock_current_stock_rows
+    - ไม่ต้องอ่านยอดเดิมก่อน (ไม่มี read-modify-write) ผู้เรียกตรวจสต็อกติดลบจากยอดใหม่ที่คืนมา แล้ว raise เพื่อ rollback
+    - dialect ที่ไม่รองรับ ON CONFLICT จะ fallback เป็น lock_current_stock_rows แล้วบวกยอดใน Python
+    คืนค่าเป็น dict {(product_id, location_id): quantity ใหม่}
+    """
+    aggregated: Dict[StockKey, float] = {}
+    for key, delta in deltas:
+        aggregated[key] = aggregated.get(key, 0.0) + delta
+    ordered_keys = sorted(aggregated)
+    if not ordered_keys: return {}
+
+    insert_fn = _dialect_insert(db)
+    if insert_fn is None:
+        locked_stock = lock_current_stock_rows(db, ordered_keys)
+        for key in ordered_keys:
+            locked_stock[key].quantity += aggregated[key]
+        db.flush()
+        return {key: locked_stock[key].quantity for key in ordered_keys}
+
+    stmt = insert_fn(CurrentStock).values([
+        {"product_id": pid, "location_id": lid, "quantity": aggregated[(pid, lid)]} for pid, lid in ordered_keys
+    ])
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["product_id", "location_id"],
+        set_={"quantity": CurrentStock.quantity + stmt.excluded.quantity, "last_updated": func.now()}
+    ).returning(CurrentStock.product_id, CurrentStock.location_id, CurrentStock.quantity)
+    new_quantities = {(row.product_id, row.location_id): row.quantity for row in db.execute(stmt)}
+    # แถว CurrentStock ที่อาจโหลดค้างอยู่ใน session จะมียอดเก่า ให้ไปอ่านใหม่เมื่อมีการใช้งาน
+    for record in [obj for obj in db.identity_map.values() if isinstance(obj, CurrentStock)]:
+        db.expire(record)
+    return new_quantities
+
 def record_stock_in(db: Session, stock_in_data: schemas.StockInSchema) -> InventoryTransaction:
     """ บันทึกการรับสินค้าเข้า, คำนวณวันหมดอายุ (ไม่ commit ที่นี่) """
     product = product_service.get_product(db, product_id=stock_in_data.product_id)
@@ -50,17 +145,42 @@ def record_stock_in(db: Session, stock_in_data: schemas.StockInSchema) -> Invent
         expiry_date=calculated_expiry_date, notes=stock_in_data.notes
     )
     db.add(transaction)
-    current_stock = get_current_stock_record(db, product_id=stock_in_data.product_id, location_id=stock_in_data.location_id)
-    if current_stock: current_stock.quantity += stock_in_data.quantity
-    else:
-        current_stock = CurrentStock(product_id=stock_in_data.product_id, location_id=stock_in_data.location_id, quantity=stock_in_data.quantity)
-        db.add(current_stock)
+    db.flush() # ต้องการ transaction.id สำหรับล็อต
+    stock_key = (stock_in_data.product_id, stock_in_data.location_id)
+    stock_after = apply_stock_deltas(db, [(stock_key, stock_in_data.quantity)])
+    stock_lot_service.receive_lots(db, [{
+        "product_id": stock_in_data.product_id, "location_id": stock_in_data.location_id, "quantity": stock_in_data.quantity,
+        "expiry_date": calculated_expiry_date, "production_date": stock_in_data.production_date,
+        "cost_per_unit": stock_in_data.cost_per_unit, "source_transaction_id": transaction.id,
+    }], stock_after)
     # No commit here, should be handled by the calling route
     return transaction
 
-def record_batch_stock_in(db: Session, batch_data: schemas.BatchStockInSchema) -> List[models.InventoryTransaction]:
-    created_transactions: List[models.InventoryTransaction] = []
+def _calculate_batch_item_expiry(product: Product, item_data: StockInItemDetailSchema) -> Optional[date]:
+    """ คำนวณวันหมดอายุของรายการใน Batch จาก shelf_life_days (ในหน่วยความจำ ไม่ query) """
+    calculated_expiry_date: Optional[date] = item_data.expiry_date
     
+    if item_data.production_date and product.shelf_life_days is not None and product.shelf_life_days >= 0:
+        if not calculated_expiry_date: 
+            try:
+                calculated_expiry_date = item_data.production_date + timedelta(days=int(product.shelf_life_days))
+            except (TypeError, ValueError) as e:
+                raise ValueError(f"สินค้า ID {product.id} ({product.sku}): ไม่สามารถคำนวณ Expiry Date. {e}")
+        elif calculated_expiry_date and item_data.expiry_date != (item_data.production_date + timedelta(days=int(product.shelf_life_days))):
+             print(f"Warning (Batch Item {product.sku}): Expiry date provided ({item_data.expiry_date}) differs from calculated. Using provided one.")
+    elif product.shelf_life_days is not None and product.shelf_life_days >= 0 and \
+         not item_data.production_date and not item_data.expiry_date:
+        raise ValueError(f"สินค้า ID {product.id} ({product.sku}): มีอายุสินค้า กรุณาระบุวันผลิต หรือวันหมดอายุโดยตรง")
+    return calculated_expiry_date
+
+def record_batch_stock_in(db: Session, batch_data: schemas.BatchStockInSchema) -> List[models.InventoryTransaction]:
+    """
+    บันทึกรับสินค้าเข้าแบบ Batch แบบ bulk (ไม่ commit ที่นี่)
+    - ตรวจสอบสินค้าทุกรายการด้วย query เดียว และคำนวณวันหมดอายุในหน่วยความจำ
+    - INSERT InventoryTransaction ทุกรายการด้วย multi-row insert เดียว (RETURNING แถวที่สร้าง)
+    - ปรับ CurrentStock ทุกรายการด้วย upsert เดียว (apply_stock_deltas)
+    จำนวน query จึงคงที่ ไม่ขึ้นกับจำนวนบรรทัดใน Batch
+    """
     location = location_service.get_location(db, location_id=batch_data.location_id)
     if not location:
         raise ValueError(f"ไม่พบสถานที่จัดเก็บ รหัส {batch_data.location_id}")
@@ -68,24 +188,15 @@ def record_batch_stock_in(db: Session, batch_data: schemas.BatchStockInSchema) -
     if not batch_data.items:
         raise ValueError("ไม่มีรายการสินค้าใน Batch นี้")
 
+    products_by_id = product_service.get_products_by_ids(db, [item.product_id for item in batch_data.items])
+
+    transaction_rows: List[Dict[str, Any]] = []
     for item_data in batch_data.items:
-        product = product_service.get_product(db, product_id=item_data.product_id)
+        product = products_by_id.get(item_data.product_id)
         if not product:
             raise ValueError(f"ไม่พบสินค้า รหัส {item_data.product_id} ในรายการ Batch")
 
-        calculated_expiry_date: Optional[date] = item_data.expiry_date
-        
-        if item_data.production_date and product.shelf_life_days is not None and product.shelf_life_days >= 0:
-            if not calculated_expiry_date: 
-                try:
-                    calculated_expiry_date = item_data.production_date + timedelta(days=int(product.shelf_life_days))
-                except (TypeError, ValueError) as e:
-                    raise ValueError(f"สินค้า ID {product.id} ({product.sku}): ไม่สามารถคำนวณ Expiry Date. {e}")
-            elif calculated_expiry_date and item_data.expiry_date != (item_data.production_date + timedelta(days=int(product.shelf_life_days))):
-                 print(f"Warning (Batch Item {product.sku}): Expiry date provided ({item_data.expiry_date}) differs from calculated. Using provided one.")
-        elif product.shelf_life_days is not None and product.shelf_life_days >= 0 and \
-             not item_data.production_date and not item_data.expiry_date:
-            raise ValueError(f"สินค้า ID {product.id} ({product.sku}): มีอายุสินค้า กรุณาระบุวันผลิต หรือวันหมดอายุโดยตรง")
+        calculated_expiry_date = _calculate_batch_item_expiry(product, item_data)
         
         transaction_notes = item_data.notes # Individual item notes are None if removed from UI
         if batch_data.batch_notes and batch_data.batch_notes.strip(): 
@@ -94,30 +205,31 @@ def record_batch_stock_in(db: Session, batch_data: schemas.BatchStockInSchema) -
             else:
                 transaction_notes = f"Batch: {batch_data.batch_notes}"
         
-        transaction = models.InventoryTransaction(
-            transaction_type=models.TransactionType.STOCK_IN,
-            product_id=item_data.product_id,
-            location_id=batch_data.location_id, 
-            quantity_change=item_data.quantity,
-            cost_per_unit=item_data.cost_per_unit, 
-            production_date=item_data.production_date,
-            expiry_date=calculated_expiry_date,
-            notes=transaction_notes
-        )
-        db.add(transaction) 
-        
-        current_stock = get_current_stock_record(db, product_id=item_data.product_id, location_id=batch_data.location_id)
-        if current_stock:
-            current_stock.quantity += item_data.quantity
-        else:
-            current_stock = models.CurrentStock(
-                product_id=item_data.product_id,
-                location_id=batch_data.location_id,
-                quantity=item_data.quantity
-            )
-            db.add(current_stock)
-        
-        created_transactions.append(transaction)
+        transaction_rows.append({
+            "transaction_type": models.TransactionType.STOCK_IN,
+            "product_id": item_data.product_id,
+            "location_id": batch_data.location_id,
+            "quantity_change": item_data.quantity,
+            "cost_per_unit": item_data.cost_per_unit,
+            "production_date": item_data.production_date,
+            "expiry_date": calculated_expiry_date,
+            "notes": transaction_notes,
+        })
+
+    # insertmanyvalues ไม่รับประกันลำดับแถวที่ RETURNING กลับมา จึงเรียงตาม id (ลำดับที่ insert) อีกครั้ง
+    created_transactions = sorted(
+        db.scalars(insert(models.InventoryTransaction).returning(models.InventoryTransaction), transaction_rows),
+        key=lambda transaction: transaction.id
+    )
+    stock_after = apply_stock_deltas(db, [((item.product_id, batch_data.location_id), item.quantity) for item in batch_data.items])
+    stock_lot_service.receive_lots(db, [
+        {
+            "product_id": transaction.product_id, "location_id": transaction.location_id, "quantity": transaction.quantity_change,
+            "expiry_date": transaction.expiry_date, "production_date": transaction.production_date,
+            "cost_per_unit": transaction.cost_per_unit, "source_transaction_id": transaction.id,
+        }
+        for transaction in created_transactions
+    ], stock_after)
     # No commit here, handled by the calling route
     return created_transactions
 
@@ -182,21 +294,131 @@ def get_current_stock_summary(
     
     return {"items": items_orm, "total_count": total_count}
 
-
-def get_inventory_transactions(
-    db: Session,
+async def get_current_stock_summary_async(
+    db: AsyncSession,
     skip: int = 0,
-    limit: int = 30,
-    product_id: Optional[int] = None,
-    location_id: Optional[int] = None,
-    transaction_type: Optional[TransactionType] = None,
-    start_date: Optional[date] = None,
-    end_date: Optional[date] = None
+    limit: int = 100,
+    category_id: Optional[int] = None,
+    location_id: Optional[int] = None
 ) -> Dict[str, Any]:
-    query = db.query(InventoryTransaction).options(
-        selectinload(InventoryTransaction.product).selectinload(Product.category),
-        selectinload(InventoryTransaction.location)
+    """ เวอร์ชัน async ของ get_current_stock_summary (relationships ถูก eager load ไว้แล้ว ใช้ต่อนอก session ได้) """
+    return await db.run_sync(
+        get_current_stock_summary, skip=skip, limit=limit, category_id=category_id, location_id=location_id
     )
+
+
+# --- ยอดสต็อกย้อนหลัง (as of) จาก stock_snapshots + ledger ช่วงท้าย ---
+STOCK_SNAPSHOT_KEEP_DAILY_DAYS = int(os.getenv("STOCK_SNAPSHOT_KEEP_DAILY_DAYS", "90"))
+
+def _as_utc_datetime(value: datetime) -> datetime:
+    """ naive ถือเป็น UTC (เหมือน utils.to_bangkok_date) """
+    if value.tzinfo is None or value.tzinfo.utcoffset(value) is None: return value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
+
+def _ledger_totals_until(
+    db: Session, until: datetime, location_id: Optional[int] = None, category_id: Optional[int] = None
+) -> Tuple[Optional[date], int, Dict[StockKey, float]]:
+    """
+    ยอดต่อ (product, location) ของ transaction ที่ transaction_date < until
+    เริ่มจาก snapshot ล่าสุดที่ครอบคลุมไม่เกิน until แล้วบวก transaction หลังสิ้นวันของ snapshot นั้น
+    คืน (snapshot_date ที่ใช้ หรือ None, จำนวน transaction ที่ replay, {key: quantity})
+    """
+    until = _as_utc_datetime(until)
+    snapshot_date = db.query(func.max(models.StockSnapshot.snapshot_date)).filter(
+        models.StockSnapshot.snapshot_date <= to_bangkok_date(until) - timedelta(days=1) # สิ้นวันของ snapshot ต้องไม่เกิน until
+    ).scalar()
+
+    totals: Dict[StockKey, float] = {}
+    if snapshot_date is not None:
+        snapshot_query = db.query(
+            models.StockSnapshot.product_id, models.StockSnapshot.location_id, models.StockSnapshot.quantity
+        ).filter(models.StockSnapshot.snapshot_date == snapshot_date)
+        if location_id is not None: snapshot_query = snapshot_query.filter(models.StockSnapshot.location_id == location_id)
+        if category_id is not None:
+            snapshot_query = snapshot_query.join(Product, Product.id == models.StockSnapshot.product_id).filter(Product.category_id == category_id)
+        totals = {(product_id, loc_id): quantity for product_id, loc_id, quantity in snapshot_query}
+
+    tail_query = db.query(
+        InventoryTransaction.product_id, InventoryTransaction.location_id,
+        func.sum(InventoryTransaction.quantity_change), func.count(InventoryTransaction.id)
+    ).filter(InventoryTransaction.transaction_date < until)
+    if snapshot_date is not None:
+        tail_query = tail_query.filter(InventoryTransaction.transaction_date >= bangkok_day_bounds(snapshot_date)[1])
+    if location_id is not None: tail_query = tail_query.filter(InventoryTransaction.location_id == location_id)
+    if category_id is not None:
+        tail_query = tail_query.join(Product, Product.id == InventoryTransaction.product_id).filter(Product.category_id == category_id)
+
+    replayed_count = 0
+    for product_id, loc_id, quantity_change, tx_count in tail_query.group_by(InventoryTransaction.product_id, InventoryTransaction.location_id):
+        totals[(product_id, loc_id)] = totals.get((product_id, loc_id), 0.0) + (quantity_change or 0.0)
+        replayed_count += tx_count
+    return snapshot_date, replayed_count, totals
+
+def get_stock_as_of(
+    db: Session, as_of: datetime, location_id: Optional[int] = None, category_id: Optional[int] = None
+) -> Dict[str, Any]:
+    """
+    ยอดสต็อก ณ เวลา as_of (ก่อน transaction ที่เวลา as_of พอดี, naive = UTC) กรองตามสถานที่/หมวดหมู่ได้
+    งานต่อคำขอ = แถวของ snapshot หนึ่งวัน + transaction หลัง snapshot นั้น (ไม่เกินหนึ่งวันถ้ารัน snapshot_stock.py ทุกคืน)
+    คืน {"as_of", "snapshot_date", "replayed_transactions", "items": [{product, location, quantity}, ...]}
+    เฉพาะรายการที่ยอดไม่เป็น 0 เรียงตามสถานที่และชื่อสินค้า
+    """
+    snapshot_date, replayed_count, totals = _ledger_totals_until(db, as_of, location_id=location_id, category_id=category_id)
+    totals = {key: quantity for key, quantity in totals.items() if abs(quantity) > 1e-9}
+    product_ids = {product_id for product_id, _ in totals}
+    location_ids = {loc_id for _, loc_id in totals}
+    products = {p.id: p for p in db.query(Product).filter(Product.id.in_(product_ids))} if product_ids else {}
+    locations = {l.id: l for l in db.query(Location).filter(Location.id.in_(location_ids))} if location_ids else {}
+    items = [
+        {"product_id": product_id, "location_id": loc_id, "quantity": quantity,
+         "product": products.get(product_id), "location": locations.get(loc_id)}
+        for (product_id, loc_id), quantity in totals.items()
+    ]
+    items.sort(key=lambda item: (item["location"].name if item["location"] else "", item["product"].name if item["product"] else ""))
+    return {"as_of": _as_utc_datetime(as_of), "snapshot_date": snapshot_date, "replayed_transactions": replayed_count, "items": items}
+
+def create_stock_snapshot(db: Session, snapshot_date: date) -> int:
+    """
+    สร้าง (หรือสร้างใหม่) snapshot ยอดสิ้นวัน snapshot_date (เวลาไทย) แล้ว commit คืนจำนวนแถว
+    ต่อยอดจาก snapshot ก่อนหน้า จึงควรสร้างเรียงวัน (รายคืนใช้เวลาตาม transaction ของวันเดียว)
+    """
+    try:
+        db.query(models.StockSnapshot).filter(models.StockSnapshot.snapshot_date == snapshot_date).delete(synchronize_session=False)
+        _, _, totals = _ledger_totals_until(db, bangkok_day_bounds(snapshot_date)[1])
+        rows = [
+            {"snapshot_date": snapshot_date, "product_id": product_id, "location_id": loc_id, "quantity": quantity}
+            for (product_id, loc_id), quantity in sorted(totals.items()) if abs(quantity) > 1e-9
+        ]
+        if rows: db.execute(insert(models.StockSnapshot), rows)
+        db.commit()
+        return len(rows)
+    except Exception as e:
+        db.rollback()
+        print(f"Error creating stock snapshot for {snapshot_date}: {type(e).__name__} - {e}")
+        raise
+
+def prune_stock_snapshots(db: Session, keep_daily_days: int = STOCK_SNAPSHOT_KEEP_DAILY_DAYS) -> int:
+    """
+    ลบ snapshot รายวันที่เก่ากว่า keep_daily_days วัน ยกเว้นวันสิ้นเดือน (commit) คืนจำนวนแถวที่ลบ
+    คำถามย้อนหลังไกล ๆ จึง replay ไม่เกินหนึ่งเดือน
+    """
+    cutoff = bangkok_today() - timedelta(days=keep_daily_days)
+    old_dates = [d for (d,) in db.query(models.StockSnapshot.snapshot_date).filter(models.StockSnapshot.snapshot_date < cutoff).distinct()]
+    dates_to_delete = [d for d in old_dates if (d + timedelta(days=1)).day != 1]
+    if not dates_to_delete: return 0
+    try:
+        deleted = db.query(models.StockSnapshot).filter(models.StockSnapshot.snapshot_date.in_(dates_to_delete)).delete(synchronize_session=False)
+        db.commit()
+        return deleted
+    except Exception:
+        db.rollback()
+        raise
+
+
+def _inventory_transaction_filters(
+    product_id: Optional[int] = None, location_id: Optional[int] = None, transaction_type: Optional[TransactionType] = None,
+    start_date: Optional[date] = None, end_date: Optional[date] = None
+) -> list:
     filters = []
     if product_id is not None:
         filters.append(InventoryTransaction.product_id == product_id)
@@ -210,20 +432,80 @@ def get_inventory_transactions(
     if end_date:
         end_datetime = datetime.combine(end_date + timedelta(days=1), time.min)
         filters.append(InventoryTransaction.transaction_date < end_datetime)
+    return filters
+
+def get_inventory_transactions(
+    db: Session,
+    skip: int = 0,
+    limit: int = 30,
+    product_id: Optional[int] = None,
+    location_id: Optional[int] = None,
+    transaction_type: Optional[TransactionType] = None,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    cursor: Optional[str] = None,
+    count_mode: str = "exact"
+) -> Dict[str, Any]:
+    """
+    ดึงรายการ InventoryTransaction เรียงจากใหม่ไปเก่า (transaction_date, id)
+    ส่ง cursor (next_cursor จากหน้าก่อน) เพื่อแบ่งหน้าแบบ keyset แทน OFFSET
+    count_mode: "exact" / "estimate" / "none" (total_count เป็น None)
+    """
+    query = db.query(InventoryTransaction).options(
+        selectinload(InventoryTransaction.product).selectinload(Product.category),
+        selectinload(InventoryTransaction.location)
+    )
+    filters = _inventory_transaction_filters(product_id, location_id, transaction_type, start_date, end_date)
     if filters:
         query = query.filter(and_(*filters))
     try:
-        total_count = query.count()
+        total_count = count_for_pagination(query, count_mode)
     except Exception as count_exc:
         print(f"Error counting transactions: {count_exc}")
         total_count = 0
-    transactions_data = []
-    if total_count > 0 :
-        transactions_data = query.order_by(
-            InventoryTransaction.transaction_date.desc(),
-            InventoryTransaction.id.desc()
-        ).offset(skip).limit(limit).all()
-    return {"items": transactions_data, "total_count": total_count}
+    transactions_data, next_cursor = [], None
+    if total_count != 0:
+        transactions_data, next_cursor = paginate_keyset(
+            query, InventoryTransaction.transaction_date, InventoryTransaction.id, limit=limit, skip=skip, cursor=cursor
+        )
+    return {"items": transactions_data, "total_count": total_count, "next_cursor": next_cursor}
+
+# --- CSV export (อ่านเป็นแถว tuple ผ่าน server-side cursor ไม่สร้าง ORM object) ---
+EXPORT_YIELD_PER = int(os.getenv("EXPORT_YIELD_PER", "2000"))
+
+INVENTORY_TRANSACTION_EXPORT_HEADER = (
+    "id", "transaction_date", "transaction_type", "product_sku", "product_name", "location", "quantity_change",
+    "cost_per_unit", "production_date", "expiry_date", "related_transaction_id", "notes",
+)
+
+def iter_inventory_transaction_rows(
+    db: Session, product_id: Optional[int] = None, location_id: Optional[int] = None,
+    transaction_type: Optional[TransactionType] = None, start_date: Optional[date] = None, end_date: Optional[date] = None
+) -> Iterator[Tuple]:
+    """ แถวตาม INVENTORY_TRANSACTION_EXPORT_HEADER ด้วยตัวกรองเดียวกับ get_inventory_transactions เรียงจากใหม่ไปเก่า """
+    stmt = select(
+        InventoryTransaction.id, InventoryTransaction.transaction_date, InventoryTransaction.transaction_type,
+        Product.sku, Product.name, Location.name, InventoryTransaction.quantity_change, InventoryTransaction.cost_per_unit,
+        InventoryTransaction.production_date, InventoryTransaction.expiry_date, InventoryTransaction.related_transaction_id,
+        InventoryTransaction.notes,
+    ).join(Product, Product.id == InventoryTransaction.product_id).join(Location, Location.id == InventoryTransaction.location_id).where(
+        *_inventory_transaction_filters(product_id, location_id, transaction_type, start_date, end_date)
+    ).order_by(InventoryTransaction.transaction_date.desc(), InventoryTransaction.id.desc())
+    yield from db.execute(stmt.execution_options(yield_per=EXPORT_YIELD_PER))
+
+CURRENT_STOCK_EXPORT_HEADER = ("location", "category", "product_sku", "product_name", "quantity", "last_updated")
+
+def iter_current_stock_rows(db: Session, category_id: Optional[int] = None, location_id: Optional[int] = None) -> Iterator[Tuple]:
+    """ แถวตาม CURRENT_STOCK_EXPORT_HEADER ด้วยตัวกรองเดียวกับ get_current_stock_summary เรียงตามสถานที่และชื่อสินค้า """
+    stmt = select(
+        Location.name, Category.name, Product.sku, Product.name, CurrentStock.quantity, CurrentStock.last_updated,
+    ).join(Product, Product.id == CurrentStock.product_id).join(Location, Location.id == CurrentStock.location_id).outerjoin(
+        Category, Category.id == Product.category_id
+    )
+    if category_id is not None: stmt = stmt.where(Product.category_id == category_id)
+    if location_id is not None: stmt = stmt.where(CurrentStock.location_id == location_id)
+    stmt = stmt.order_by(Location.name, Product.name, CurrentStock.id)
+    yield from db.execute(stmt.execution_options(yield_per=EXPORT_YIELD_PER))
 
 def record_stock_adjustment(db: Session, adjustment_data: StockAdjustmentSchema, allow_negative_stock_for_count: bool = False) -> InventoryTransaction:
     if adjustment_data.quantity_change == 0:
@@ -236,11 +518,12 @@ def record_stock_adjustment(db: Session, adjustment_data: StockAdjustmentSchema,
         raise ValueError(f"ไม่พบสถานที่จัดเก็บ รหัส {adjustment_data.location_id}")
 
     # try-except for db operations should be in the route handler to manage commit/rollback
-    current_stock = get_current_stock_record(db, product_id=adjustment_data.product_id, location_id=adjustment_data.location_id)
-    current_quantity_on_hand = current_stock.quantity if current_stock else 0.0 
+    stock_key = (adjustment_data.product_id, adjustment_data.location_id)
+    new_quantity_on_hand = apply_stock_deltas(db, [(stock_key, adjustment_data.quantity_change)])[stock_key]
+    current_quantity_on_hand = new_quantity_on_hand - adjustment_data.quantity_change
     if adjustment_data.quantity_change < 0:
         if not allow_negative_stock_for_count:
-            if current_quantity_on_hand < abs(adjustment_data.quantity_change):
+            if new_quantity_on_hand < 0: # ผู้เรียก rollback เมื่อได้ ValueError จึงไม่ต้องคืนยอด
                 raise ValueError(
                     f"สต็อกไม่เพียงพอสำหรับการปรับลด ปัจจุบัน: {current_quantity_on_hand}, "
                     f"ต้องการลด: {abs(adjustment_data.quantity_change)} ที่ {location.name} สำหรับ '{product.name}'"
@@ -257,18 +540,10 @@ def record_stock_adjustment(db: Session, adjustment_data: StockAdjustmentSchema,
         notes=transaction_notes
     )
     db.add(transaction)
-    if current_stock:
-        current_stock.quantity += adjustment_data.quantity_change
-    else:
-        if adjustment_data.quantity_change > 0 or allow_negative_stock_for_count:
-            current_stock = CurrentStock(
-                product_id=adjustment_data.product_id,
-                location_id=adjustment_data.location_id,
-                quantity=adjustment_data.quantity_change
-            )
-            db.add(current_stock)
-        else:
-             raise ValueError("ไม่สามารถปรับปรุงยอดติดลบสำหรับสต็อกที่ยังไม่มีได้ (ยกเว้นกรณีมาจากการนับสต็อก)")
+    db.flush()
+    stock_lot_service.apply_lot_deltas(
+        db, [(stock_key, adjustment_data.quantity_change)], {stock_key: new_quantity_on_hand}, {stock_key: transaction.id}
+    )
     # No commit here
     return transaction
 
@@ -281,8 +556,13 @@ def record_stock_deduction(
     quantity: float, 
     related_transaction_id: Optional[int] = None,
     notes: Optional[str] = None,
-    cost_per_unit: Optional[float] = None 
+    cost_per_unit: Optional[float] = None,
+    update_stock: bool = True
 ) -> InventoryTransaction:
+    """
+    ตัดสต็อก (ไม่ commit) ส่ง update_stock=False ถ้าผู้เรียกปรับ CurrentStock ผ่าน apply_stock_deltas
+    และตัดล็อตผ่าน stock_lot_service.consume_lots ไว้แล้ว
+    """
     if quantity <= 0:
         raise ValueError("Quantity for stock deduction must be a positive value.")
 
@@ -303,38 +583,18 @@ def record_stock_deduction(
     )
     db.add(transaction)
 
-    current_stock_record = get_current_stock_record(db, product_id=product_id, location_id=location_id)
-    if current_stock_record:
-        current_stock_record.quantity -= abs(quantity)
-    else:
-        print(f"Warning: Deducting stock for non-existent record (Product ID: {product_id}, Location ID: {location_id}). Creating new negative stock record.")
-        current_stock_record = CurrentStock(
-            product_id=product_id,
-            location_id=location_id,
-            quantity = -abs(quantity) 
-        )
-        db.add(current_stock_record)
+    if update_stock:
+        apply_stock_deltas(db, [((product_id, location_id), -abs(quantity))])
+        stock_lot_service.consume_lots(db, [((product_id, location_id), abs(quantity))])
     # No commit here
     return transaction
 
 
-def get_near_expiry_transactions(
+def get_near_expiry_lots(
     db: Session, days_ahead: int = 30, skip: int = 0, limit: int = 100
 ) -> Dict[str, Any]:
-    today = date.today()
-    expiry_threshold_date = today + timedelta(days=days_ahead)
-    query = db.query(InventoryTransaction).options(
-        selectinload(InventoryTransaction.product).selectinload(Product.category), 
-        selectinload(InventoryTransaction.location)
-    ).filter(
-        InventoryTransaction.transaction_type == TransactionType.STOCK_IN,
-        InventoryTransaction.expiry_date.isnot(None),
-        InventoryTransaction.expiry_date >= today,
-        InventoryTransaction.expiry_date <= expiry_threshold_date
-    )
-    total_count = query.count()
-    transactions_data = query.order_by(InventoryTransaction.expiry_date.asc()).offset(skip).limit(limit).all()
-    return {"transactions": transactions_data, "total_count": total_count}
+    """ ล็อตที่ยังมีของคงเหลือและใกล้หมดอายุ (ดู stock_lot_service) คืน {"lots": [...], "total_count": N} """
+    return stock_lot_service.get_near_expiry_lots(db, days_ahead=days_ahead, skip=skip, limit=limit)
 
 
 def record_stock_transfer(
@@ -350,9 +610,12 @@ def record_stock_transfer(
     if transfer_data.from_location_id == transfer_data.to_location_id:
         raise ValueError("สถานที่จัดเก็บต้นทางและปลายทางต้องแตกต่างกัน")
     
-    from_stock = get_current_stock_record(db, product_id=transfer_data.product_id, location_id=transfer_data.from_location_id)
-    from_quantity_on_hand = from_stock.quantity if from_stock else 0.0
-    if from_quantity_on_hand < transfer_data.quantity:
+    from_key = (transfer_data.product_id, transfer_data.from_location_id)
+    to_key = (transfer_data.product_id, transfer_data.to_location_id)
+    # ปรับทั้งสองฝั่งใน statement เดียวตามลำดับ lock มาตรฐาน แล้วตรวจยอดต้นทางจากค่าที่คืนมา
+    new_quantities = apply_stock_deltas(db, [(from_key, -transfer_data.quantity), (to_key, transfer_data.quantity)])
+    from_quantity_on_hand = new_quantities[from_key] + transfer_data.quantity
+    if new_quantities[from_key] < 0:
         raise ValueError(
             f"สต็อกที่ '{from_location.name}' ไม่เพียงพอสำหรับ '{product.name}'. "
             f"ต้องการ: {transfer_data.quantity}, มีอยู่: {from_quantity_on_hand}"
@@ -384,18 +647,10 @@ def record_stock_transfer(
         related_transaction_id=tx_out.id 
     )
     db.add(tx_in)
-    if from_stock: 
-        from_stock.quantity -= abs(transfer_data.quantity)
-    
-    to_stock = get_current_stock_record(db, product_id=transfer_data.product_id, location_id=transfer_data.to_location_id)
-    if to_stock:
-        to_stock.quantity += abs(transfer_data.quantity)
-    else:
-        to_stock = CurrentStock(
-            product_id=transfer_data.product_id,
-            location_id=transfer_data.to_location_id,
-            quantity=abs(transfer_data.quantity)
-        )
-        db.add(to_stock)
+    db.flush()
+    stock_lot_service.transfer_lots(
+        db, transfer_data.product_id, transfer_data.from_location_id, transfer_data.to_location_id, transfer_data.quantity,
+        stock_after=new_quantities, source_transaction_id=tx_in.id
+    )
     # No commit here
     return tx_out, tx_in
\ No newline at end of file
@@ -5,6 +5,9 @@ from typing import List, Optional, Dict, Any
 # Absolute Imports
 from models import Location, CurrentStock, InventoryTransaction, Sale
 import schemas # ใช้ schemas.LocationCreate
+from services import invalidation_service
+
+LOCATIONS_CACHE_NAME = "locations"
 
 def get_location(db: Session, location_id: int) -> Optional[Location]:
     """ ดึงข้อมูล Location ตาม ID """
@@ -21,6 +24,15 @@ def get_locations(db: Session, skip: int = 0, limit: int = 100) -> Dict[str, Any
     locations_data = query.order_by(Location.id).offset(skip).limit(limit).all()
     return {"items": locations_data, "total_count": total_count}
 
+def _load_all_locations(db: Session) -> List[schemas.Location]:
+    return [schemas.Location.model_validate(location) for location in db.query(Location).order_by(Location.id).all()]
+
+_locations_cache = invalidation_service.VersionedCache(LOCATIONS_CACHE_NAME, _load_all_locations)
+
+def get_all_locations_cached(db: Session) -> List[schemas.Location]:
+    """ สถานที่จัดเก็บทั้งหมด (เรียงตาม id) จาก cache ในหน่วยความจำ สำหรับ dropdown / filter ในหน้า UI ไม่ query DB ทุก request """
+    return _locations_cache.get(db)
+
 def create_location(db: Session, location: schemas.LocationCreate) -> Location:
     """ สร้าง Location ใหม่ (รองรับ discount_percent) """
     existing_location = get_location_by_name(db, name=location.name)
@@ -28,6 +40,7 @@ def create_location(db: Session, location: schemas.LocationCreate) -> Location:
         raise ValueError(f"มีสถานที่จัดเก็บชื่อ '{location.name}' อยู่ในระบบแล้ว")
     db_location = Location(**location.model_dump())
     db.add(db_location)
+    invalidation_service.publish(db, LOCATIONS_CACHE_NAME)
     db.commit()
     db.refresh(db_location)
     return db_location
@@ -43,6 +56,7 @@ def update_location(db: Session, location_id: int, location_update: schemas.Loca
     update_data = location_update.model_dump(exclude_unset=True)
     for key, value in update_data.items():
          setattr(db_location, key, value)
+    invalidation_service.publish(db, LOCATIONS_CACHE_NAME)
     db.commit()
     db.refresh(db_location)
     return db_location
@@ -62,5 +76,6 @@ def delete_location(db: Session, location_id: int) -> Optional[Location]:
         description=db_location.description, discount_percent=db_location.discount_percent
     )
     db.delete(db_location)
+    invalidation_service.publish(db, LOCATIONS_CACHE_NAME)
     db.commit()
     return deleted_location_copy
\ No newline at end of file
@@ -0,0 +1,258 @@
+# services/product_import_service.py
+# นำเข้าสินค้าจำนวนมากจากไฟล์ CSV / JSONL (เปิดสาขาใหม่ทีละหลายหมื่น SKU) แทนการ POST /api/products/ ทีละรายการ
+# 1) อ่านไฟล์ทีละแถว ตรวจรูปแบบด้วย schemas.ProductCreate และหาหมวดหมู่จาก categories ที่โหลดครั้งเดียว
+#    SKU / Barcode ที่ซ้ำกันเองในไฟล์: แถวแรกผ่าน แถวถัดไปเป็น error
+# 2) โหลดแถวที่ผ่านลง staging table ชั่วคราว: PostgreSQL ใช้ COPY, SQLite ใช้ executemany
+# 3) หาแถวที่ SKU / Barcode ชนกับสินค้าในระบบด้วย join กับ products (query เดียวต่อคอลัมน์)
+# 4) INSERT ... SELECT จาก staging เฉพาะแถวที่ไม่ชน แล้ว publish "products" ใน transaction เดียวกัน
+# แถวที่ผิดไม่ทำให้ทั้งไฟล์ล้ม ทุก error ถูกรายงานพร้อมเลขบรรทัดในไฟล์
+import csv
+import io
+import json
+import os
+from typing import Any, BinaryIO, Dict, Iterator, List, Optional, Tuple
+
+from pydantic import ValidationError
+from sqlalchemy import Column, Float, Integer, MetaData, String, Table, Text, exists, insert, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+import schemas
+from models.category import Category
+from models.product import Product
+from services import cache_service, invalidation_service
+
+PRODUCT_IMPORT_MAX_REPORTED_ERRORS = int(os.getenv("PRODUCT_IMPORT_MAX_REPORTED_ERRORS", "1000"))
+IMPORT_FORMATS = ("csv", "jsonl")
+IMPORT_COLUMNS = (
+    "sku", "name", "barcode", "description", "price_b2c", "price_b2b",
+    "standard_cost", "image_url", "category_id", "shelf_life_days",
+)
+
+_staging_metadata = MetaData()
+_staging = Table(
+    "product_import_staging", _staging_metadata,
+    Column("row_number", Integer, nullable=False),
+    Column("sku", String, nullable=False),
+    Column("name", String, nullable=False),
+    Column("barcode", String),
+    Column("description", Text),
+    Column("price_b2c", Float, nullable=False),
+    Column("price_b2b", Float),
+    Column("standard_cost", Float),
+    Column("image_url", String),
+    Column("category_id", Integer, nullable=False),
+    Column("shelf_life_days", Integer),
+    prefixes=["TEMPORARY"],
+    postgresql_on_commit="DROP",
+)
+
+def detect_format(filename: Optional[str], import_format: Optional[str] = None) -> str:
+    """ รูปแบบไฟล์จากค่าที่ระบุ หรือจากนามสกุล (.csv / .jsonl / .ndjson) """
+    if import_format:
+        import_format = import_format.strip().lower()
+        if import_format not in IMPORT_FORMATS: raise ValueError(f"ไม่รองรับรูปแบบไฟล์ '{import_format}' (รองรับ csv, jsonl)")
+        return import_format
+    extension = os.path.splitext(filename or "")[1].lower()
+    if extension == ".csv": return "csv"
+    if extension in (".jsonl", ".ndjson"): return "jsonl"
+    raise ValueError("ไม่ทราบรูปแบบไฟล์ กรุณาใช้ไฟล์ .csv หรือ .jsonl หรือระบุ format")
+
+def _iter_csv_rows(stream: BinaryIO) -> Iterator[Tuple[int, Optional[Dict[str, Any]], Optional[str]]]:
+    text_stream = io.TextIOWrapper(stream, encoding="utf-8-sig", newline="")
+    try:
+        reader = csv.DictReader(text_stream)
+        header = [name.strip() for name in (reader.fieldnames or [])]
+        missing = [name for name in ("sku", "name", "price_b2c") if name not in header]
+        if "category_id" not in header and "category_name" not in header: missing.append("category_id หรือ category_name")
+        if missing: raise ValueError(f"ไฟล์ CSV ไม่มีคอลัมน์: {', '.join(missing)}")
+        reader.fieldnames = header
+        for record in reader:
+            yield reader.line_num, record, None
+    except UnicodeDecodeError:
+        raise ValueError("ไฟล์ต้องเข้ารหัส UTF-8")
+    finally:
+        text_stream.detach() # ไม่ปิดไฟล์ต้นฉบับ (UploadFile ปิดเอง)
+
+def _iter_jsonl_rows(stream: BinaryIO) -> Iterator[Tuple[int, Optional[Dict[str, Any]], Optional[str]]]:
+    for line_number, raw_line in enumerate(stream, start=1):
+        try:
+            line = raw_line.decode("utf-8-sig" if line_number == 1 else "utf-8").strip()
+        except UnicodeDecodeError:
+            yield line_number, None, "บรรทัดนี้ไม่ได้เข้ารหัส UTF-8"
+            continue
+        if not line: continue
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError as e:
+            yield line_number, None, f"JSON ไม่ถูกต้อง: {e.msg}"
+            continue
+        if not isinstance(record, dict):
+            yield line_number, None, "แต่ละบรรทัดต้องเป็น JSON object"
+            continue
+        yield line_number, record, None
+
+def _normalize_record(record: Dict[str, Any]) -> Dict[str, Any]:
+    """ ตัดช่องว่าง และให้ค่าว่างเป็น None (คอลัมน์ว่างใน CSV = ไม่ระบุ) """
+    return {
+        key.strip(): (value.strip() or None) if isinstance(value, str) else value
+        for key, value in record.items() if key is not None # key None = CSV แถวที่มีคอลัมน์เกิน header
+    }
+
+def _format_validation_error(error: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(part) for part in detail['loc']) or 'row'}: {detail['msg']}" for detail in error.errors()
+    )
+
+def _load_category_lookup(db: Session) -> Tuple[set, Dict[str, int]]:
+    rows = db.query(Category.id, Category.name).all()
+    return {category_id for category_id, _ in rows}, {name.strip().casefold(): category_id for category_id, name in rows}
+
+def _parse_rows(
+    db: Session, stream: BinaryIO, import_format: str, errors: List[Dict[str, Any]]
+) -> Tuple[int, List[Dict[str, Any]]]:
+    """ อ่านและตรวจทุกแถว คืน (จำนวนแถวข้อมูล, แถวที่ผ่านพร้อม row_number) error ถูกเพิ่มลง errors """
+    category_ids, category_ids_by_name = _load_category_lookup(db)
+    rows: List[Dict[str, Any]] = []
+    row_numbers_by_sku: Dict[str, int] = {}
+    row_numbers_by_barcode: Dict[str, int] = {}
+    total_rows = 0
+    iter_rows = _iter_csv_rows if import_format == "csv" else _iter_jsonl_rows
+    for row_number, record, parse_error in iter_rows(stream):
+        total_rows += 1
+        if parse_error:
+            errors.append({"row": row_number, "sku": None, "error": parse_error})
+            continue
+        record = _normalize_record(record)
+        sku = record.get("sku")
+        category_name = record.pop("category_name", None)
+        if record.get("category_id") is None and category_name is not None:
+            record["category_id"] = category_ids_by_name.get(str(category_name).strip().casefold())
+            if record["category_id"] is None:
+                errors.append({"row": row_number, "sku": sku, "error": f"ไม่พบหมวดหมู่ชื่อ '{category_name}'"})
+                continue
+        try:
+            product_in = schemas.ProductCreate(**{column: record.get(column) for column in IMPORT_COLUMNS})
+        except ValidationError as e:
+            errors.append({"row": row_number, "sku": sku, "error": _format_validation_error(e)})
+            continue
+
+        if product_in.category_id not in category_ids:
+            errors.append({"row": row_number, "sku": product_in.sku, "error": f"ไม่พบหมวดหมู่รหัส {product_in.category_id}"})
+            continue
+        if product_in.sku in row_numbers_by_sku:
+            errors.append({"row": row_number, "sku": product_in.sku,
+                           "error": f"SKU '{product_in.sku}' ซ้ำกับบรรทัด {row_numbers_by_sku[product_in.sku]} ในไฟล์"})
+            continue
+        if product_in.barcode and product_in.barcode in row_numbers_by_barcode:
+            errors.append({"row": row_number, "sku": product_in.sku,
+                           "error": f"Barcode '{product_in.barcode}' ซ้ำกับบรรทัด {row_numbers_by_barcode[product_in.barcode]} ในไฟล์"})
+            continue
+        row_numbers_by_sku[product_in.sku] = row_number
+        if product_in.barcode: row_numbers_by_barcode[product_in.barcode] = row_number
+        rows.append({"row_number": row_number, **product_in.model_dump(include=set(IMPORT_COLUMNS))})
+    return total_rows, rows
+
+def _create_staging_table(db: Session) -> None:
+    # temp table อยู่ต่อ connection; SQLite ไม่มี ON COMMIT DROP จึงลบของรอบก่อน (ถ้าค้าง) ทิ้งก่อนเสมอ
+    connection = db.connection()
+    _staging.drop(connection, checkfirst=True)
+    _staging.create(connection)
+
+def _copy_into_staging(db: Session, rows: List[Dict[str, Any]]) -> None:
+    """ PostgreSQL: ส่งทุกแถวด้วย COPY ... FROM STDIN (CSV) ผ่าน cursor ของ psycopg2 ใน transaction เดียวกับ session """
+    columns = [column.name for column in _staging.columns]
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        writer.writerow(["" if row[column] is None else row[column] for column in columns])
+    buffer.seek(0)
+    cursor = db.connection().connection.cursor()
+    try:
+        # ค่าว่างที่ไม่มี quote = NULL (ค่า str ว่างถูกแปลงเป็น None ตั้งแต่ _normalize_record แล้ว)
+        cursor.copy_expert(f"COPY {_staging.name} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)", buffer)
+    finally:
+        cursor.close()
+
+def _load_staging(db: Session, rows: List[Dict[str, Any]]) -> None:
+    _create_staging_table(db)
+    if not rows: return
+    if db.get_bind().dialect.name == "postgresql":
+        _copy_into_staging(db, rows)
+        return
+    # executemany ด้วย tuple ผ่าน cursor ตรง ๆ (ไม่ต้องให้ SQLAlchemy สร้าง parameter dict ทีละแถว)
+    columns = [column.name for column in _staging.columns]
+    cursor = db.connection().connection.cursor()
+    try:
+        cursor.executemany(
+            f"INSERT INTO {_staging.name} ({', '.join(columns)}) VALUES ({', '.join('?' for _ in columns)})",
+            [tuple(row[column] for column in columns) for row in rows]
+        )
+    finally:
+        cursor.close()
+
+def _find_conflicts(db: Session) -> List[Dict[str, Any]]:
+    """ แถวใน staging ที่ SKU หรือ Barcode มีอยู่ในระบบแล้ว (แถวละหนึ่ง error, SKU ก่อน) """
+    sku_rows = db.execute(
+        select(_staging.c.row_number, _staging.c.sku).join(Product, Product.sku == _staging.c.sku)
+    ).all()
+    conflicts = {
+        row_number: {"row": row_number, "sku": sku, "error": f"มีสินค้า SKU '{sku}' อยู่ในระบบแล้ว"}
+        for row_number, sku in sku_rows
+    }
+    barcode_rows = db.execute(
+        select(_staging.c.row_number, _staging.c.sku, _staging.c.barcode).join(Product, Product.barcode == _staging.c.barcode)
+    ).all()
+    for row_number, sku, barcode in barcode_rows:
+        conflicts.setdefault(row_number, {"row": row_number, "sku": sku, "error": f"มีสินค้า Barcode '{barcode}' อยู่ในระบบแล้ว"})
+    return list(conflicts.values())
+
+def _merge_staging(db: Session) -> None:
+    """ INSERT ... SELECT แถวที่ไม่ชนกับสินค้าในระบบ ตามลำดับในไฟล์ """
+    columns = list(IMPORT_COLUMNS)
+    new_rows = select(*[_staging.c[column] for column in columns]).where(
+        ~exists().where(Product.sku == _staging.c.sku),
+        ~exists().where(Product.barcode == _staging.c.barcode),
+    ).order_by(_staging.c.row_number)
+    db.execute(insert(Product).from_select(columns, new_rows))
+
+def import_products(db: Session, stream: BinaryIO, import_format: str, dry_run: bool = False) -> Dict[str, Any]:
+    """
+    นำเข้าสินค้าจากไฟล์ (stream แบบ binary) แล้ว commit ครั้งเดียว
+    CSV: แถวแรกเป็น header ใช้ชื่อคอลัมน์เดียวกับ ProductCreate และใช้ category_name แทน category_id ได้
+    JSONL: หนึ่ง JSON object ต่อบรรทัด key เดียวกับ CSV
+    dry_run=True: ตรวจทั้งหมด (รวมการชนกับสินค้าในระบบ) แล้ว rollback ไม่บันทึก
+    คืน dict: total_rows, imported_count, error_count, errors (เรียงตามบรรทัด สูงสุด PRODUCT_IMPORT_MAX_REPORTED_ERRORS รายการ), dry_run
+    ไฟล์ที่อ่านไม่ได้ทั้งไฟล์ (header ไม่ครบ / ไม่ใช่ UTF-8) raise ValueError
+    """
+    errors: List[Dict[str, Any]] = []
+    try:
+        total_rows, rows = _parse_rows(db, stream, import_format, errors)
+        _load_staging(db, rows)
+        conflicts = _find_conflicts(db) if rows else []
+        errors.extend(conflicts)
+        imported_count = len(rows) - len(conflicts)
+        if imported_count and not dry_run:
+            _merge_staging(db)
+            invalidation_service.publish(db, cache_service.PRODUCTS_CACHE_NAME)
+            db.commit()
+            print(f"Imported {imported_count} products ({len(errors)} rows rejected).")
+        else:
+            db.rollback()
+    except IntegrityError as e:
+        db.rollback()
+        # มีการเพิ่มสินค้า SKU / Barcode เดียวกันระหว่างนำเข้า
+        print(f"Product import integrity error: {e.orig}")
+        raise ValueError("มีสินค้า SKU หรือ Barcode ซ้ำที่ถูกเพิ่มระหว่างการนำเข้า กรุณานำเข้าใหม่อีกครั้ง")
+    except Exception:
+        db.rollback()
+        raise
+
+    errors.sort(key=lambda error: error["row"])
+    return {
+        "total_rows": total_rows,
+        "imported_count": imported_count,
+        "error_count": len(errors),
+        "errors": errors[:PRODUCT_IMPORT_MAX_REPORTED_ERRORS],
+        "dry_run": dry_run,
+    }
@@ -0,0 +1,247 @@
+# services/product_search_service.py
+# ค้นหาสินค้าจากชื่อ / SKU / Barcode (type-ahead ของ POS, รับสินค้าเข้า และหน้าแคตตาล็อกราคา)
+# ทุกคำในคำค้น (แยกด้วยช่องว่าง) ต้องเป็น substring ของชื่อ, SKU หรือ Barcode (ไม่สนตัวพิมพ์เล็ก/ใหญ่)
+# เรียงตามความเกี่ยวข้อง: SKU/Barcode ตรงทั้งคำ > ชื่อหรือ SKU ขึ้นต้นด้วยคำค้น > มีคำในชื่อขึ้นต้นด้วยคำค้น > อื่น ๆ แล้วตามชื่อ
+#
+# Backend (PRODUCT_SEARCH_BACKEND = auto | trigram | memory)
+# - trigram: ILIKE บน PostgreSQL ซึ่งใช้ GIN index แบบ gin_trgm_ops (migration d4a8e6b1f203) ได้
+# - memory:  n-gram index (trigram -> รายการสินค้า) ในหน่วยความจำของ worker ผูกกับ cache_versions "products"
+# auto = trigram ถ้าเป็น PostgreSQL ที่ติดตั้ง pg_trgm แล้ว ไม่เช่นนั้นใช้ memory
+import heapq
+import os
+from bisect import bisect_left
+from array import array
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from sqlalchemy import and_, case, func, literal, or_, text
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+import schemas
+from models.category import Category
+from models.product import Product
+from services import cache_service, invalidation_service
+
+PRODUCT_SEARCH_BACKEND = os.getenv("PRODUCT_SEARCH_BACKEND", "auto").lower()
+SEARCH_MAX_TERMS = 8 # คำค้นที่ยาวกว่านี้ใช้เฉพาะ SEARCH_MAX_TERMS คำแรก
+SEARCH_FILTER_MAX_IDS = 1000 # product_search_filter: ถ้าผลมากกว่านี้ใช้ ILIKE แทน IN (...) ที่ยาวเกินไป
+SEARCH_FULL_RANK_MAX_MATCHES = 5000 # ผลไม่เกินนี้จัดระดับครบทุกรายการ มากกว่านี้จัดเฉพาะเท่าที่ต้องตอบ
+NGRAM_SIZE = 3
+
+def _search_terms(query: str) -> List[str]:
+    return query.lower().split()[:SEARCH_MAX_TERMS]
+
+_pg_trgm_installed: Dict[str, bool] = {} # ต่อ database URL (ตรวจครั้งเดียวต่อ process)
+
+def _trigram_available(db: Session) -> bool:
+    """ pg_trgm ติดตั้งใน database นี้หรือไม่ """
+    engine = db.get_bind()
+    if engine.dialect.name != "postgresql": return False
+    key = str(engine.url)
+    if key not in _pg_trgm_installed:
+        _pg_trgm_installed[key] = db.execute(text("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")).first() is not None
+    return _pg_trgm_installed[key]
+
+def _use_trigram(db: Session) -> bool:
+    if PRODUCT_SEARCH_BACKEND == "memory": return False
+    if PRODUCT_SEARCH_BACKEND == "trigram": return db.get_bind().dialect.name == "postgresql"
+    return _trigram_available(db)
+
+# --- Memory backend: n-gram index ---
+# คำค้นยาว 3 ตัวอักษรได้ผลตรงจาก posting เดียว คำที่ยาวกว่าใช้ posting ของ trigram ที่หายากที่สุดสองตัวเป็น candidate
+# แล้วตรวจ substring ถ้าทุกคำสั้นกว่า 3 ตัวอักษรจึงไล่ตรวจทุกสินค้า (ไม่เก็บ 1-2 gram เพราะ index จะใหญ่และสร้างช้ากว่าเท่าตัว)
+@dataclass
+class NgramIndex:
+    product_ids: array                            # เรียงตาม (ชื่อตัวพิมพ์เล็ก, id) ตำแหน่งใน array = ลำดับผลภายในระดับความเกี่ยวข้องเดียวกัน
+    category_ids: array                           # category_id ต่อตำแหน่ง (0 = ไม่มี)
+    names: List[str]                              # ชื่อตัวพิมพ์เล็ก (เรียงแล้ว ใช้ bisect หาชื่อที่ขึ้นต้นด้วยคำค้น)
+    haystacks: List[str]                          # "ชื่อ\nsku\nbarcode" ตัวพิมพ์เล็ก
+    skus: List[str]                               # sku ตัวพิมพ์เล็กต่อตำแหน่ง
+    sku_order: List[Tuple[str, int]]              # (sku ตัวพิมพ์เล็ก, ตำแหน่ง) เรียงตาม sku
+    postings: Dict[str, array]                    # trigram -> ตำแหน่ง (เรียงจากน้อยไปมาก, array ประหยัดหน่วยความจำกว่า list)
+    by_code: Dict[str, Tuple[int, ...]]           # sku / barcode ตัวพิมพ์เล็ก -> ตำแหน่ง
+
+SEARCH_RESULT_COLUMNS = (
+    Product.id, Product.name, Product.sku, Product.barcode, Product.price_b2c, Product.price_b2b,
+    Product.standard_cost, Product.shelf_life_days, Category.name.label("category_name"),
+)
+SEARCH_RESULT_FIELDS = tuple(column.key for column in SEARCH_RESULT_COLUMNS)
+
+def _load_ngram_index(db: Session) -> NgramIndex:
+    # เก็บเฉพาะข้อความที่ใช้ค้น ข้อมูลเต็มของหน้าที่ตอบดึงจาก DB ด้วย primary key (ประหยัดหน่วยความจำต่อ worker)
+    rows = db.query(Product.id, Product.name, Product.sku, Product.barcode, Product.category_id).all()
+    rows.sort(key=lambda row: (row.name.lower(), row.id))
+    index = NgramIndex(array("i"), array("i"), [], [], [], [], {}, {})
+    for position, (product_id, name, sku, barcode, category_id) in enumerate(rows):
+        name, sku, barcode = name.lower(), sku.lower(), (barcode or "").lower()
+        haystack = f"{name}\n{sku}\n{barcode}"
+        index.product_ids.append(product_id)
+        index.category_ids.append(category_id or 0)
+        index.names.append(name)
+        index.haystacks.append(haystack)
+        index.skus.append(sku)
+        index.sku_order.append((sku, position))
+        for gram in {haystack[i:i + NGRAM_SIZE] for i in range(len(haystack) - NGRAM_SIZE + 1)}:
+            posting = index.postings.get(gram)
+            if posting is None: posting = index.postings[gram] = array("i")
+            posting.append(position)
+        for code in {sku, barcode} - {""}:
+            index.by_code[code] = index.by_code.get(code, ()) + (position,)
+    index.sku_order.sort()
+    return index
+
+def _to_search_result(row: Tuple[Any, ...]) -> schemas.ProductScanResult:
+    return schemas.ProductScanResult.model_validate(dict(zip(SEARCH_RESULT_FIELDS, row)))
+
+def _load_search_results(db: Session, product_ids: List[int]) -> List[schemas.ProductScanResult]:
+    """ ข้อมูลของสินค้าในหน้าที่ตอบ (ไม่เกิน limit รายการ) ดึงด้วย primary key เรียงตามลำดับใน product_ids """
+    if not product_ids: return []
+    rows = db.query(*SEARCH_RESULT_COLUMNS).outerjoin(Category, Product.category_id == Category.id).filter(Product.id.in_(product_ids)).all()
+    rows_by_id = {row.id: row for row in rows}
+    return [_to_search_result(tuple(rows_by_id[product_id])) for product_id in product_ids if product_id in rows_by_id]
+
+_ngram_index = invalidation_service.VersionedCache(cache_service.PRODUCTS_CACHE_NAME, _load_ngram_index)
+
+def _ngram_candidates(index: NgramIndex, term: str) -> Tuple[Sequence[int], bool]:
+    """ (ตำแหน่งที่อาจมี term, ผลตรงแล้วหรือไม่) ถ้าไม่ตรงต้องตรวจ substring อีกที term ต้องยาวอย่างน้อย NGRAM_SIZE """
+    if len(term) == NGRAM_SIZE: return index.postings.get(term, ()), True
+    grams = {term[i:i + NGRAM_SIZE] for i in range(len(term) - NGRAM_SIZE + 1)}
+    postings = sorted((index.postings.get(gram, ()) for gram in grams), key=len)
+    if not postings[0]: return (), True
+    if len(postings) == 1: return postings[0], False # term ซ้ำตัวอักษร เช่น "0000" มี trigram เดียว
+    second = set(postings[1])
+    return [position for position in postings[0] if position in second], False
+
+def _rank_memory(index: NgramIndex, terms: List[str], category_id: Optional[int], skip: int, limit: int) -> Tuple[List[int], int]:
+    """ (product id ของผลลำดับ skip..skip+limit, จำนวนผลทั้งหมด) """
+    haystacks, category_ids = index.haystacks, index.category_ids
+
+    def is_match(position: int) -> bool:
+        return all(term in haystacks[position] for term in terms) and (category_id is None or category_ids[position] == category_id)
+
+    # เริ่มจาก candidate ของคำที่น้อยที่สุด แล้วกรองด้วยคำที่เหลือทีละคำ
+    indexed_terms = [term for term in terms if len(term) >= NGRAM_SIZE]
+    if indexed_terms:
+        base_term, (matches, exact) = min(((term, _ngram_candidates(index, term)) for term in indexed_terms), key=lambda item: len(item[1][0]))
+    else:
+        base_term, exact = terms[0], True
+        matches = [position for position, haystack in enumerate(haystacks) if base_term in haystack]
+    for term in terms:
+        if term == base_term and exact: continue
+        matches = [position for position in matches if term in haystacks[position]]
+    if category_id is not None:
+        matches = [position for position in matches if category_ids[position] == category_id]
+
+    # ระดับความเกี่ยวข้องตามคำแรก: SKU/Barcode ตรงทั้งคำ > ชื่อหรือ SKU ขึ้นต้นด้วยคำ > มีคำในชื่อขึ้นต้นด้วยคำ > อื่น ๆ
+    # แต่ละระดับเรียงตามตำแหน่ง (ชื่อ) อยู่แล้ว
+    need, first = skip + limit, terms[0]
+    names, skus, word_start = index.names, index.skus, f" {first}"
+    ranked = sorted(position for position in index.by_code.get(first, ()) if is_match(position))
+    seen = set(ranked)
+    if len(matches) <= SEARCH_FULL_RANK_MAX_MATCHES: # ผลไม่มาก จัดระดับทุกรายการในรอบเดียว
+        tiers: Tuple[List[int], ...] = ([], [], [])
+        for position in matches:
+            if position in seen: continue
+            if names[position].startswith(first) or skus[position].startswith(first): tiers[0].append(position)
+            elif word_start in names[position]: tiers[1].append(position)
+            else: tiers[2].append(position)
+        ranked += [position for tier in tiers for position in tier]
+        return [index.product_ids[position] for position in ranked[skip:need]], len(matches)
+
+    # ผลมาก: เดินเฉพาะเท่าที่ต้องใช้ (ชื่อที่ขึ้นต้นด้วยคำเป็นช่วงต่อเนื่องใน list ที่เรียงแล้ว) หยุดเมื่อได้ครบ skip + limit
+    if len(ranked) < need:
+        sku_from, sku_to = bisect_left(index.sku_order, (first,)), bisect_left(index.sku_order, (first + "\uffff",))
+        if sku_to - sku_from <= SEARCH_FULL_RANK_MAX_MATCHES:
+            name_range = range(bisect_left(names, first), bisect_left(names, first + "\uffff"))
+            sku_positions = sorted(position for _, position in index.sku_order[sku_from:sku_to])
+            prefix_positions: Iterable[int] = heapq.merge(name_range, sku_positions)
+        else: # SKU ขึ้นต้นด้วยคำนี้จำนวนมาก (เช่น "sku0") ไล่ตามลำดับผลแทนการเรียงทั้งหมด จะเจอครบเร็ว
+            prefix_positions = (position for position in matches if names[position].startswith(first) or skus[position].startswith(first))
+        for position in prefix_positions:
+            if position in seen or not is_match(position): continue
+            ranked.append(position); seen.add(position)
+            if len(ranked) >= need: break
+    if len(ranked) < need:
+        remaining = need - len(ranked)
+        word_matches: List[int] = []
+        other_matches: List[int] = []
+        for position in matches:
+            if position in seen: continue
+            if word_start in names[position]:
+                word_matches.append(position)
+                if len(word_matches) >= remaining: break
+            elif len(other_matches) < remaining:
+                other_matches.append(position)
+        ranked += word_matches + other_matches
+    return [index.product_ids[position] for position in ranked[skip:need]], len(matches)
+
+def _search_memory(
+    db: Session, terms: List[str], category_id: Optional[int], skip: int, limit: int
+) -> Tuple[List[schemas.ProductScanResult], int]:
+    product_ids, total_count = _rank_memory(_ngram_index.get(db), terms, category_id, skip, limit)
+    return _load_search_results(db, product_ids), total_count
+
+# --- Trigram backend (PostgreSQL + pg_trgm) ---
+def _escape_like(term: str) -> str:
+    return term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+def _match_clause(terms: List[str]):
+    """ ทุกคำต้องอยู่ใน name/sku/barcode (ILIKE '%คำ%' ใช้ GIN gin_trgm_ops ได้เมื่อคำยาวตั้งแต่ 3 ตัวอักษร) """
+    return and_(*[
+        or_(*[column.ilike(f"%{_escape_like(term)}%", escape="\\") for column in (Product.name, Product.sku, Product.barcode)])
+        for term in terms
+    ])
+
+def _search_trigram(
+    db: Session, terms: List[str], category_id: Optional[int], skip: int, limit: int
+) -> Tuple[List[schemas.ProductScanResult], int]:
+    first = _escape_like(terms[0])
+    tier = case(
+        (or_(func.lower(Product.sku) == terms[0], func.lower(Product.barcode) == terms[0]), 0),
+        (or_(Product.name.ilike(f"{first}%", escape="\\"), Product.sku.ilike(f"{first}%", escape="\\")), 1),
+        (Product.name.ilike(f"% {first}%", escape="\\"), 2),
+        else_=3,
+    )
+    query = db.query(
+        *SEARCH_RESULT_COLUMNS, func.count(literal(1)).over().label("total_count")
+    ).outerjoin(Category, Product.category_id == Category.id).filter(_match_clause(terms))
+    if category_id is not None:
+        query = query.filter(Product.category_id == category_id)
+    rows = query.order_by(tier, func.similarity(Product.name, " ".join(terms)).desc(), func.lower(Product.name), Product.id).offset(skip).limit(limit).all()
+    if not rows:
+        total_count = query.with_entities(func.count(Product.id)).order_by(None).scalar() if skip else 0
+        return [], total_count or 0
+    return [_to_search_result(tuple(row)[:-1]) for row in rows], rows[0].total_count
+
+# --- Public API ---
+def search_products(
+    db: Session, query: str, category_id: Optional[int] = None, skip: int = 0, limit: int = 20
+) -> Dict[str, Any]:
+    """
+    ค้นหาสินค้าตามคำค้น เรียงตามความเกี่ยวข้อง คืน {"items": [ProductScanResult], "total_count": N}
+    คำค้นว่างคืนผลว่าง
+    """
+    terms = _search_terms(query or "")
+    if not terms: return {"items": [], "total_count": 0}
+    search = _search_trigram if _use_trigram(db) else _search_memory
+    items, total_count = search(db, terms, category_id, skip, limit)
+    return {"items": items, "total_count": total_count}
+
+async def search_products_async(
+    db: AsyncSession, query: str, category_id: Optional[int] = None, skip: int = 0, limit: int = 20
+) -> Dict[str, Any]:
+    """ เวอร์ชัน async ของ search_products """
+    return await db.run_sync(search_products, query, category_id=category_id, skip=skip, limit=limit)
+
+def product_search_filter(db: Session, query: str):
+    """
+    เงื่อนไข WHERE บน Product สำหรับคำค้น query (ใช้กับ query ที่ต้องได้ Product เต็มรูปแบบ เช่น หน้าแคตตาล็อก)
+    trigram: ILIKE ที่ใช้ GIN index ได้, memory: Product.id IN (ผลจาก n-gram index)
+    """
+    terms = _search_terms(query or "")
+    if not terms: return literal(True)
+    if _use_trigram(db): return _match_clause(terms)
+    product_ids, total_count = _rank_memory(_ngram_index.get(db), terms, None, 0, SEARCH_FILTER_MAX_IDS)
+    if total_count > SEARCH_FILTER_MAX_IDS: return _match_clause(terms) # คำค้นกว้างมาก index ไม่ช่วยอยู่แล้ว
+    return Product.id.in_(product_ids)
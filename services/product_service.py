@@ -1,14 +1,15 @@
 # services/product_service.py
 from sqlalchemy.orm import Session, joinedload
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import or_
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Iterable, Tuple
 import datetime
 
 # Import models and schemas directly
 from models.product import Product
 from models.category import Category # If used directly for type hinting or checks
 import schemas # To access schemas like schemas.ProductCreate, schemas.ProductUpdate, etc.
-from services import category_service # For dependency
+from services import category_service, cache_service, invalidation_service # For dependency
 import models # For other models like CurrentStock, InventoryTransaction etc. in delete_product
 
 # --- Core Product Retrieval Functions ---
@@ -17,6 +18,13 @@ def get_product(db: Session, product_id: int) -> Optional[Product]:
     """ ดึงข้อมูล Product พร้อม Category """
     return db.query(Product).options(joinedload(Product.category)).filter(Product.id == product_id).first()
 
+def get_products_by_ids(db: Session, product_ids: Iterable[int]) -> Dict[int, Product]:
+    """ ดึงข้อมูล Product หลายรายการในครั้งเดียว (IN query) พร้อม Category คืนค่าเป็น dict {product_id: Product} """
+    ids = set(product_ids)
+    if not ids: return {}
+    products = db.query(Product).options(joinedload(Product.category)).filter(Product.id.in_(ids)).all()
+    return {product.id: product for product in products}
+
 def get_product_by_sku(db: Session, sku: str) -> Optional[Product]:
     """ ดึงข้อมูล Product ตาม SKU พร้อม Category """
     return db.query(Product).options(joinedload(Product.category)).filter(Product.sku == sku).first()
@@ -38,6 +46,42 @@ def get_product_by_scan_code(db: Session, scan_code: str) -> Optional[Product]:
     ).first()
     return product
 
+# --- In-memory Scan Index (barcode / SKU -> ProductScanResult) ---
+# โหลดสินค้าทั้งหมดเข้า dict ครั้งเดียวต่อ worker แล้วตอบ scan จากหน่วยความจำ ไม่ต้อง query ทุกครั้งที่ยิงบาร์โค้ด
+# create/update/delete_product (และ update_category) publish "products" ผ่าน invalidation_service ใน transaction เดียวกัน
+ScanIndex = Tuple[Dict[str, schemas.ProductScanResult], Dict[str, schemas.ProductScanResult]] # (by_barcode, by_sku)
+
+def _load_scan_index(db: Session) -> ScanIndex:
+    rows = db.query(
+        Product.id, Product.name, Product.sku, Product.barcode, Product.price_b2c, Product.price_b2b,
+        Product.standard_cost, Product.shelf_life_days, Category.name.label("category_name")
+    ).outerjoin(Category, Product.category_id == Category.id).all()
+    by_barcode, by_sku = {}, {}
+    for row in rows:
+        record = schemas.ProductScanResult.model_validate(row._asdict())
+        by_sku[record.sku] = record
+        if record.barcode: by_barcode[record.barcode] = record
+    return by_barcode, by_sku
+
+_scan_index = invalidation_service.VersionedCache(cache_service.PRODUCTS_CACHE_NAME, _load_scan_index)
+
+def _lookup_in_scan_index(db: Session, scan_code: str) -> Optional[schemas.ProductScanResult]:
+    by_barcode, by_sku = _scan_index.get(db)
+    candidates = [record for record in (by_barcode.get(scan_code), by_sku.get(scan_code)) if record is not None]
+    if not candidates: return None
+    # ลำดับเดียวกับ get_product_by_scan_code: สินค้าที่มี barcode ก่อน แล้วตาม id
+    return min(candidates, key=lambda record: (record.barcode is None, record.id))
+
+def lookup_product_by_scan_code(db: Session, scan_code: str) -> Optional[schemas.ProductScanResult]:
+    """ ค้นหาสินค้าจาก Barcode หรือ SKU ผ่าน scan index ในหน่วยความจำ (ใช้ db เฉพาะตอนตรวจเวอร์ชัน/สร้าง index ใหม่) """
+    if not scan_code: return None
+    return _lookup_in_scan_index(db, scan_code)
+
+async def lookup_product_by_scan_code_async(db: AsyncSession, scan_code: str) -> Optional[schemas.ProductScanResult]:
+    """ เวอร์ชัน async ของ lookup_product_by_scan_code """
+    if not scan_code: return None
+    return await db.run_sync(_lookup_in_scan_index, scan_code)
+
 # --- Listing and Grouping Functions ---
 
 def get_products(db: Session, skip: int = 0, limit: int = 100) -> Dict[str, Any]:
@@ -98,6 +142,7 @@ def create_product(db: Session, product_in: schemas.ProductCreate) -> Product:
     )
     db_product = Product(**db_product_data)
     db.add(db_product)
+    invalidation_service.publish(db, cache_service.PRODUCTS_CACHE_NAME)
     db.commit()
     db.refresh(db_product)
     return get_product(db, product_id=db_product.id) # Return with category loaded
@@ -160,6 +205,7 @@ def update_product(db: Session, product_id: int, product_update: schemas.Product
     for key, value in update_data.items():
         setattr(db_product, key, value)
 
+    invalidation_service.publish(db, cache_service.PRODUCTS_CACHE_NAME)
     db.commit()
     db.refresh(db_product)
     # Eager load category again after refresh for the returned object
@@ -211,6 +257,7 @@ def delete_product(db: Session, product_id: int) -> Optional[schemas.Product]:
     deleted_product_schema = schemas.Product.model_validate(db_product)
 
     db.delete(db_product)
+    invalidation_service.publish(db, cache_service.PRODUCTS_CACHE_NAME)
     db.commit() # Commit all deletions (product and zero-stock CurrentStock)
     
     return deleted_product_schema
\ No newline at end of file
@@ -0,0 +1,145 @@
+# services/sales_rollup_service.py
+from sqlalchemy.orm import Session
+from sqlalchemy import func, case, select, insert, delete
+from datetime import date, datetime
+from typing import List, Optional, Dict, Any, Iterable, Tuple
+
+import models
+from services.inventory_service import _dialect_insert
+from utils import to_bangkok_date, bangkok_day_bounds
+
+RollupKey = Tuple[date, int, int] # (business_date, location_id, product_id)
+ROLLUP_SUM_COLUMNS = ("quantity", "revenue", "discount_amount", "sale_line_count", "rtc_quantity", "rtc_line_count")
+
+def _empty_rollup_values() -> Dict[str, float]:
+    return {column_name: 0 for column_name in ROLLUP_SUM_COLUMNS}
+
+def _upsert_rollup_rows(db: Session, rows_by_key: Dict[RollupKey, Dict[str, float]]) -> None:
+    """
+    บวกยอดเข้า daily_sales_rollup ด้วย INSERT ... ON CONFLICT DO UPDATE statement เดียว (ไม่ commit)
+    เรียง key ตาม (business_date, location_id, product_id) เพื่อให้ลำดับ lock คงที่
+    """
+    ordered_keys = sorted(rows_by_key)
+    if not ordered_keys: return
+    rollup_table = models.DailySalesRollup
+
+    insert_fn = _dialect_insert(db)
+    if insert_fn is None: # Fallback สำหรับ dialect อื่น: lock แถวที่มีแล้วและบวกยอดใน Python
+        for business_date, location_id, product_id in ordered_keys:
+            values = rows_by_key[(business_date, location_id, product_id)]
+            rollup_row = db.query(rollup_table).filter(
+                rollup_table.business_date == business_date,
+                rollup_table.location_id == location_id,
+                rollup_table.product_id == product_id
+            ).with_for_update().first()
+            if rollup_row is None:
+                db.add(rollup_table(business_date=business_date, location_id=location_id, product_id=product_id, **values))
+            else:
+                for column_name, value in values.items():
+                    setattr(rollup_row, column_name, getattr(rollup_row, column_name) + value)
+        db.flush()
+        return
+
+    stmt = insert_fn(rollup_table).values([
+        {"business_date": business_date, "location_id": location_id, "product_id": product_id, **rows_by_key[(business_date, location_id, product_id)]}
+        for business_date, location_id, product_id in ordered_keys
+    ])
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["business_date", "location_id", "product_id"],
+        set_={
+            **{column_name: getattr(rollup_table, column_name) + getattr(stmt.excluded, column_name) for column_name in ROLLUP_SUM_COLUMNS},
+            "last_updated": func.now()
+        }
+    )
+    db.execute(stmt)
+
+def add_sale_to_rollup(db: Session, sale: models.Sale, items: Iterable[Any]) -> None:
+    """
+    บวกยอดของการขายหนึ่งครั้งเข้า daily_sales_rollup (เรียกจาก record_sale ก่อน commit ให้อยู่ใน transaction เดียวกัน)
+    items: รายการที่มี product_id, quantity, unit_price, discount_amount, is_rtc (SaleItemCreate หรือ SaleItem)
+    """
+    business_date = to_bangkok_date(sale.sale_date or datetime.utcnow())
+    rows_by_key: Dict[RollupKey, Dict[str, float]] = {}
+    for item in items:
+        values = rows_by_key.setdefault((business_date, sale.location_id, item.product_id), _empty_rollup_values())
+        values["quantity"] += item.quantity
+        values["revenue"] += item.quantity * item.unit_price
+        values["discount_amount"] += (item.discount_amount or 0.0) * item.quantity # discount_amount เป็นส่วนลดต่อหน่วย
+        values["sale_line_count"] += 1
+        if item.is_rtc:
+            values["rtc_quantity"] += item.quantity
+            values["rtc_line_count"] += 1
+    _upsert_rollup_rows(db, rows_by_key)
+
+def _bangkok_business_date_expr(db: Session):
+    """ SQL expression ของวันทำการตามเวลาไทยจาก Sale.sale_date (ใช้ตอน backfill) """
+    if db.get_bind().dialect.name == "postgresql":
+        return func.date(func.timezone("Asia/Bangkok", models.Sale.sale_date))
+    # SQLite เก็บเวลาเป็น UTC และไทยไม่มี DST จึงบวก 7 ชั่วโมงได้ตรง ๆ
+    return func.date(models.Sale.sale_date, "+7 hours")
+
+def backfill_daily_sales_rollup(db: Session, start_date: Optional[date] = None, end_date: Optional[date] = None) -> Dict[str, Any]:
+    """
+    สร้าง daily_sales_rollup ใหม่จาก sales/sale_items สำหรับช่วงวันที่ (ตามเวลาไทย, รวมทั้งสองวัน) แล้ว commit
+    ไม่ระบุวันที่ = สร้างใหม่ทั้งหมด ลบแถวเดิมในช่วงนั้นก่อนแล้ว INSERT ... SELECT ... GROUP BY ใน statement เดียว
+    """
+    rollup_table = models.DailySalesRollup
+    business_date_expr = _bangkok_business_date_expr(db)
+    rollup_filters, sale_filters = [], []
+    if start_date:
+        rollup_filters.append(rollup_table.business_date >= start_date)
+        sale_filters.append(models.Sale.sale_date >= bangkok_day_bounds(start_date)[0])
+    if end_date:
+        rollup_filters.append(rollup_table.business_date <= end_date)
+        sale_filters.append(models.Sale.sale_date < bangkok_day_bounds(end_date)[1])
+
+    aggregated_sales = select(
+        business_date_expr,
+        models.Sale.location_id,
+        models.SaleItem.product_id,
+        func.sum(models.SaleItem.quantity),
+        func.sum(models.SaleItem.quantity * models.SaleItem.unit_price),
+        func.sum(func.coalesce(models.SaleItem.discount_amount, 0.0) * models.SaleItem.quantity),
+        func.count(models.SaleItem.id),
+        func.sum(case((models.SaleItem.is_rtc, models.SaleItem.quantity), else_=0.0)),
+        func.sum(case((models.SaleItem.is_rtc, 1), else_=0)),
+    ).join(models.Sale, models.SaleItem.sale_id == models.Sale.id).where(*sale_filters).group_by(
+        business_date_expr, models.Sale.location_id, models.SaleItem.product_id
+    )
+    try:
+        deleted_rows = db.execute(delete(rollup_table).where(*rollup_filters)).rowcount
+        inserted_rows = db.execute(insert(rollup_table).from_select(
+            ["business_date", "location_id", "product_id", *ROLLUP_SUM_COLUMNS], aggregated_sales
+        )).rowcount
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        print(f"Error backfilling daily_sales_rollup: {type(e).__name__} - {e}")
+        raise
+    return {"deleted": deleted_rows, "inserted": inserted_rows}
+
+def get_daily_totals(db: Session, start_date: date, end_date: date, location_id: Optional[int] = None) -> Dict[date, float]:
+    """ ยอดขายรวมต่อวัน (ตามเวลาไทย) จาก daily_sales_rollup คืน dict {business_date: revenue} """
+    rollup_table = models.DailySalesRollup
+    query = db.query(rollup_table.business_date, func.sum(rollup_table.revenue)).filter(
+        rollup_table.business_date >= start_date, rollup_table.business_date <= end_date
+    )
+    if location_id is not None:
+        query = query.filter(rollup_table.location_id == location_id)
+    return {business_date: float(total or 0.0) for business_date, total in query.group_by(rollup_table.business_date).all()}
+
+def get_top_products_by_quantity(db: Session, start_date: date, end_date: date, limit: int = 5) -> List[Any]:
+    """ สินค้าขายดีตามจำนวนในช่วงวันที่ (ตามเวลาไทย) จาก daily_sales_rollup """
+    rollup_table = models.DailySalesRollup
+    return db.query(
+        rollup_table.product_id,
+        models.Product.name.label("product_name"),
+        models.Product.sku.label("product_sku"),
+        func.sum(rollup_table.quantity).label("total_quantity")
+    ).join(
+        models.Product, rollup_table.product_id == models.Product.id
+    ).filter(
+        rollup_table.business_date >= start_date, rollup_table.business_date <= end_date
+    ).group_by(
+        rollup_table.product_id, models.Product.name, models.Product.sku
+    ).order_by(func.sum(rollup_table.quantity).desc()).limit(limit).all()
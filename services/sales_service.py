@@ -1,12 +1,15 @@
 # services/sales_service.py
 from sqlalchemy.orm import Session, joinedload, subqueryload
-from typing import List, Optional, Dict, Any
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select
+from typing import List, Optional, Dict, Any, Iterator, Tuple
 from datetime import date, datetime, time, timedelta
 
 # Absolute Imports
 import models
 import schemas
-from services import inventory_service, product_service, location_service
+from services import inventory_service, product_service, location_service, sales_rollup_service, stock_lot_service
+from utils import paginate_keyset, count_for_pagination
 
 def record_sale(db: Session, sale_data: schemas.SaleCreate, allow_negative_stock_on_sale: bool = False) -> models.Sale:
     """
@@ -24,23 +27,42 @@ def record_sale(db: Session, sale_data: schemas.SaleCreate, allow_negative_stock
         total_sale_amount = 0.0
         items_to_process = []
 
+        # โหลดสินค้าทั้งตะกร้าใน query เดียว แล้วตัด CurrentStock ทั้งตะกร้าด้วย upsert statement เดียว (atomic, ไม่ต้องอ่านก่อน)
+        # ยอดใหม่ที่คืนมาใช้ตรวจสต็อกติดลบ ถ้าไม่พอจะ raise และ rollback ทั้ง transaction
+        product_ids = {item.product_id for item in sale_data.items}
+        products_by_id = product_service.get_products_by_ids(db, product_ids)
+        missing_product_ids = sorted(product_ids - products_by_id.keys())
+        if missing_product_ids:
+            raise ValueError(f"ไม่พบสินค้า รหัส {', '.join(str(pid) for pid in missing_product_ids)}")
+        quantity_by_product: Dict[int, float] = {}
         for item_data in sale_data.items:
-            product = product_service.get_product(db, product_id=item_data.product_id)
-            if not product:
-                raise ValueError(f"ไม่พบสินค้า รหัส {item_data.product_id}")
-
-            current_stock_record = inventory_service.get_current_stock_record(
-                db, product_id=item_data.product_id, location_id=sale_data.location_id
-            )
-            current_quantity_in_system = current_stock_record.quantity if current_stock_record else 0
-
-            if not allow_negative_stock_on_sale:
-                if current_quantity_in_system < item_data.quantity:
+            quantity_by_product[item_data.product_id] = quantity_by_product.get(item_data.product_id, 0.0) + item_data.quantity
+        new_stock = inventory_service.apply_stock_deltas(
+            db, [((product_id, sale_data.location_id), -quantity) for product_id, quantity in quantity_by_product.items()]
+        )
+        stock_lot_service.consume_lots(
+            db, [((product_id, sale_data.location_id), quantity) for product_id, quantity in quantity_by_product.items()]
+        )
+        # ยอดก่อนขายของแต่ละสินค้า (ไล่ลดลงทีละรายการ กรณีสินค้าเดียวกันอยู่หลายบรรทัด)
+        stock_before_by_product = {
+            product_id: new_stock[(product_id, sale_data.location_id)] + quantity
+            for product_id, quantity in quantity_by_product.items()
+        }
+
+        if not allow_negative_stock_on_sale:
+            for product_id in sorted(quantity_by_product):
+                if new_stock[(product_id, sale_data.location_id)] < 0:
+                    product = products_by_id[product_id]
                     raise ValueError(
                         f"สต็อกในระบบไม่เพียงพอสำหรับสินค้า '{product.name}' (SKU: {product.sku}) ที่ {location.name}. "
-                        f"ต้องการ: {item_data.quantity}, ในระบบมี: {current_quantity_in_system}"
+                        f"ต้องการ: {quantity_by_product[product_id]}, ในระบบมี: {stock_before_by_product[product_id]}"
                     )
 
+        for item_data in sale_data.items:
+            product = products_by_id[item_data.product_id]
+            current_quantity_in_system = stock_before_by_product[item_data.product_id]
+            stock_before_by_product[item_data.product_id] -= item_data.quantity
+
             item_total = item_data.quantity * item_data.unit_price
             total_sale_amount += item_total
             items_to_process.append({
@@ -75,10 +97,13 @@ def record_sale(db: Session, sale_data: schemas.SaleCreate, allow_negative_stock
                 quantity=item_data_schema.quantity,
                 related_transaction_id=db_sale.id,
                 notes=f"Sale #{db_sale.id}. System stock before: {item_info['current_system_stock_before_sale']}",
+                update_stock=False, # ตัด CurrentStock ไปแล้วด้วย apply_stock_deltas ด้านบน
                 # cost_per_unit for sale deduction is usually not the sale price, but the product's standard_cost.
                 # This might need to be fetched and passed if you want to log cost with sale transactions.
                 # For now, it's not explicitly passed to record_stock_deduction's InventoryTransaction.
             )
+        # อัปเดตยอดขายรายวันสำหรับ Dashboard ใน transaction เดียวกับการขาย
+        sales_rollup_service.add_sale_to_rollup(db, db_sale, sale_data.items)
         db.commit()
 
     except Exception as e:
@@ -98,22 +123,59 @@ def record_sale(db: Session, sale_data: schemas.SaleCreate, allow_negative_stock
         raise RuntimeError("Critical error: Failed to fetch newly created sale after commit.")
     return final_sale
 
+async def record_sale_async(db: AsyncSession, sale_data: schemas.SaleCreate, allow_negative_stock_on_sale: bool = False) -> models.Sale:
+    """
+    เวอร์ชัน async ของ record_sale สำหรับ AsyncSession
+    ใช้ logic เดียวกับ record_sale ผ่าน run_sync (รันบน greenlet ของ event loop ไม่ต้องใช้ thread ต่อ request)
+    """
+    return await db.run_sync(record_sale, sale_data, allow_negative_stock_on_sale=allow_negative_stock_on_sale)
+
+def _sale_date_filters(start_date: Optional[date] = None, end_date: Optional[date] = None) -> list:
+    filters = []
+    if start_date:
+        start_datetime = datetime.combine(start_date, time.min)
+        filters.append(models.Sale.sale_date >= start_datetime)
+    if end_date:
+        # To include the entire end_date, filter up to the beginning of the next day
+        end_datetime = datetime.combine(end_date + timedelta(days=1), time.min)
+        filters.append(models.Sale.sale_date < end_datetime)
+    return filters
+
 def get_sales_report(
     db: Session, start_date: Optional[date] = None, end_date: Optional[date] = None,
-    skip: int = 0, limit: int = 100
+    skip: int = 0, limit: int = 100, cursor: Optional[str] = None, count_mode: str = "exact"
 ) -> Dict[str, Any]:
+    """
+    รายงานการขายเรียงจากใหม่ไปเก่า (sale_date, id)
+    ส่ง cursor (next_cursor จากหน้าก่อน) เพื่อแบ่งหน้าแบบ keyset แทน OFFSET
+    count_mode: "exact" / "estimate" / "none" (total_count เป็น None)
+    """
     query = db.query(models.Sale).options(
         joinedload(models.Sale.location),
         subqueryload(models.Sale.items).joinedload(models.SaleItem.product).joinedload(models.Product.category)
     )
-    if start_date:
-        start_datetime = datetime.combine(start_date, time.min)
-        query = query.filter(models.Sale.sale_date >= start_datetime)
-    if end_date:
-        # To include the entire end_date, filter up to the beginning of the next day
-        end_datetime = datetime.combine(end_date + timedelta(days=1), time.min)
-        query = query.filter(models.Sale.sale_date < end_datetime)
+    query = query.filter(*_sale_date_filters(start_date, end_date))
+
+    total_count = count_for_pagination(query, count_mode)
+    sales_data, next_cursor = paginate_keyset(query, models.Sale.sale_date, models.Sale.id, limit=limit, skip=skip, cursor=cursor)
+    return {"sales": sales_data, "total_count": total_count, "next_cursor": next_cursor}
 
-    total_count = query.count()
-    sales_data = query.order_by(models.Sale.sale_date.desc()).offset(skip).limit(limit).all()
-    return {"sales": sales_data, "total_count": total_count}
\ No newline at end of file
+SALES_REPORT_EXPORT_HEADER = (
+    "sale_id", "sale_date", "location", "product_sku", "product_name", "quantity", "unit_price", "line_total",
+    "is_rtc", "original_unit_price", "discount_amount", "standard_cost", "estimated_profit", "sale_notes",
+)
+
+def iter_sales_report_rows(db: Session, start_date: Optional[date] = None, end_date: Optional[date] = None) -> Iterator[Tuple]:
+    """
+    แถวตาม SALES_REPORT_EXPORT_HEADER หนึ่งแถวต่อรายการสินค้าที่ขาย ตัวกรองวันที่เดียวกับ get_sales_report เรียงจากใหม่ไปเก่า
+    กำไรโดยประมาณคิดแบบเดียวกับหน้ารายงาน (quantity * (unit_price - standard_cost))
+    """
+    sale, item, product = models.Sale, models.SaleItem, models.Product
+    stmt = select(
+        sale.id, sale.sale_date, models.Location.name, product.sku, product.name, item.quantity, item.unit_price,
+        item.quantity * item.unit_price, item.is_rtc, item.original_unit_price, item.discount_amount, product.standard_cost,
+        item.quantity * (item.unit_price - product.standard_cost), sale.notes,
+    ).join(item, item.sale_id == sale.id).join(product, product.id == item.product_id).join(
+        models.Location, models.Location.id == sale.location_id
+    ).where(*_sale_date_filters(start_date, end_date)).order_by(sale.sale_date.desc(), sale.id.desc(), item.id)
+    yield from db.execute(stmt.execution_options(yield_per=inventory_service.EXPORT_YIELD_PER))
@@ -1,12 +1,15 @@
 # services/stock_count_service.py
 from sqlalchemy.orm import Session, joinedload, subqueryload
+from sqlalchemy import select, insert, update, values, column, func, literal, Integer, Float
 from typing import List, Optional, Dict, Any, Tuple
 from datetime import datetime
+import time
 
 import models
 import schemas
-# inventory_service ถูกเรียกใช้ที่นี่สำหรับ record_stock_adjustment ตอน close session
-from services import location_service, product_service, inventory_service
+# inventory_service ถูกเรียกใช้ที่นี่สำหรับ apply_stock_deltas ตอน close session
+from services import location_service, product_service, inventory_service, stock_lot_service
+from utils import paginate_keyset, count_for_pagination
 
 def create_stock_count_session(db: Session, session_data: schemas.StockCountSessionCreate) -> models.StockCountSession:
     location = location_service.get_location(db, location_id=session_data.location_id)
@@ -27,11 +30,16 @@ def get_stock_count_session(db: Session, session_id: int) -> Optional[models.Sto
         subqueryload(models.StockCountSession.items).joinedload(models.StockCountItem.product).joinedload(models.Product.category)
     ).filter(models.StockCountSession.id == session_id).first()
 
-def get_stock_count_sessions(db: Session, skip: int = 0, limit: int = 100) -> Dict[str, Any]:
+def get_stock_count_sessions(
+    db: Session, skip: int = 0, limit: int = 100, cursor: Optional[str] = None, count_mode: str = "exact"
+) -> Dict[str, Any]:
+    """ รายการรอบนับเรียงจากใหม่ไปเก่า (start_date, id) รองรับ cursor (keyset) และ count_mode เหมือนรายงานอื่น """
     query = db.query(models.StockCountSession).options(joinedload(models.StockCountSession.location))
-    total_count = query.count()
-    sessions = query.order_by(models.StockCountSession.start_date.desc()).offset(skip).limit(limit).all()
-    return {"items": sessions, "total_count": total_count}
+    total_count = count_for_pagination(query, count_mode)
+    sessions, next_cursor = paginate_keyset(
+        query, models.StockCountSession.start_date, models.StockCountSession.id, limit=limit, skip=skip, cursor=cursor
+    )
+    return {"items": sessions, "total_count": total_count, "next_cursor": next_cursor}
 
 def add_product_to_session(db: Session, session_id: int, item_data: schemas.StockCountItemCreate) -> models.StockCountItem:
     session = get_stock_count_session(db, session_id)
@@ -86,6 +94,67 @@ def update_counted_quantity(db: Session, item_id: int, item_update_data: schemas
         raise ValueError(f"DB error updating count for item {item_id}: {type(e).__name__} - {e}") from e
     return db_item
 
+def bulk_update_counted_quantities(db: Session, session_id: int, counts: List[schemas.StockCountItemBulkEntry]) -> Dict[str, Any]:
+    """
+    บันทึกยอดนับหลายรายการใน transaction เดียว (commit ครั้งเดียว)
+    - PostgreSQL: UPDATE stock_count_items ... FROM (VALUES ...) statement เดียว
+    - dialect อื่น: executemany ของ UPDATE ตาม primary key
+    รายการที่ไม่ผ่านการตรวจสอบ (ไม่อยู่ในรอบนับนี้ / ยอดติดลบ) จะถูกข้ามและรายงานใน errors ส่วนรายการอื่นยังบันทึกตามปกติ
+    คืนค่า {"updated": จำนวนที่บันทึก, "errors": [{"item_id": ..., "error": ...}]}
+    """
+    session = db.query(models.StockCountSession).filter(models.StockCountSession.id == session_id).with_for_update().first()
+    if not session: raise ValueError(f"ไม่พบรอบนับสต็อก รหัส {session_id}")
+    if session.status not in [models.StockCountStatus.OPEN, models.StockCountStatus.COUNTING]:
+        raise ValueError(f"ไม่สามารถบันทึกยอดนับในรอบนับที่สถานะ {session.status.value} ได้ (ต้องเป็น COUNTING)")
+
+    errors: List[Dict[str, Any]] = []
+    counted_by_item_id: Dict[int, float] = {} # ถ้าส่ง item_id ซ้ำ ใช้ค่าสุดท้าย
+    for entry in counts:
+        if entry.counted_quantity < 0:
+            errors.append({"item_id": entry.item_id, "error": "ยอดนับต้องไม่ติดลบ"})
+            continue
+        counted_by_item_id[entry.item_id] = entry.counted_quantity
+
+    if counted_by_item_id:
+        item_ids_in_session = set(db.scalars(
+            select(models.StockCountItem.id).where(
+                models.StockCountItem.session_id == session_id,
+                models.StockCountItem.id.in_(counted_by_item_id.keys())
+            )
+        ))
+        for item_id in sorted(counted_by_item_id.keys() - item_ids_in_session):
+            errors.append({"item_id": item_id, "error": f"ไม่พบรายการตรวจนับ รหัส {item_id} ในรอบนับนี้"})
+            del counted_by_item_id[item_id]
+
+    if not counted_by_item_id:
+        return {"updated": 0, "errors": errors}
+
+    count_date = datetime.utcnow()
+    try:
+        if session.status == models.StockCountStatus.OPEN:
+            session.status = models.StockCountStatus.COUNTING
+        if db.get_bind().dialect.name == "postgresql":
+            counts_values = values(
+                column("item_id", Integer), column("counted_quantity", Float), name="counts"
+            ).data(sorted(counted_by_item_id.items()))
+            db.execute(
+                update(models.StockCountItem)
+                .where(models.StockCountItem.id == counts_values.c.item_id, models.StockCountItem.session_id == session_id)
+                .values(counted_quantity=counts_values.c.counted_quantity, count_date=count_date)
+                .execution_options(synchronize_session=False)
+            )
+        else:
+            db.execute(update(models.StockCountItem), [
+                {"id": item_id, "counted_quantity": counted_quantity, "count_date": count_date}
+                for item_id, counted_quantity in sorted(counted_by_item_id.items())
+            ])
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        print(f"DB error bulk updating counts for session {session_id}: {type(e).__name__} - {e}")
+        raise ValueError(f"DB error bulk updating counts for session {session_id}: {type(e).__name__} - {e}") from e
+    return {"updated": len(counted_by_item_id), "errors": errors}
+
 def start_counting_session(db: Session, session_id: int) -> models.StockCountSession:
     session = db.query(models.StockCountSession).filter(models.StockCountSession.id == session_id).with_for_update().first()
     if not session: raise ValueError(f"ไม่พบรอบนับสต็อก รหัส {session_id}")
@@ -102,38 +171,62 @@ def start_counting_session(db: Session, session_id: int) -> models.StockCountSes
     return session
 
 def close_stock_count_session(db: Session, session_id: int) -> models.StockCountSession:
-    session = db.query(models.StockCountSession).options(
-        subqueryload(models.StockCountSession.items)
-    ).filter(models.StockCountSession.id == session_id).with_for_update().first()
+    """
+    ปิดรอบนับและสร้าง Adjustment แบบ set-based ใน transaction เดียว
+    - หา item ที่ยังไม่นับ และส่วนต่าง (counted - system) ด้วย SQL ไม่ต้องโหลด item ทั้งรอบ
+    - INSERT ADJUSTMENT_ADD/ADJUSTMENT_SUB ทุกรายการด้วย multi-row insert เดียว
+    - ปรับ CurrentStock ทั้งหมดด้วย inventory_service.apply_stock_deltas (upsert เดียว, อนุญาตให้ติดลบเหมือนเดิม)
+    """
+    lock_started_at = time.perf_counter()
+    session = db.query(models.StockCountSession).filter(models.StockCountSession.id == session_id).with_for_update().first()
 
     if not session: raise ValueError(f"ไม่พบรอบนับสต็อก รหัส {session_id}")
     if session.status != models.StockCountStatus.COUNTING:
         raise ValueError(f"ไม่สามารถปิดรอบนับที่สถานะ '{session.status.value}' ได้ (ต้องเป็น COUNTING)")
 
-    items_in_session = session.items
-    uncounted_items = [item for item in items_in_session if item.counted_quantity is None]
-    if uncounted_items:
-        product_ids_str = ", ".join(str(item.product_id) for item in uncounted_items)
+    uncounted_product_ids = db.scalars(
+        select(models.StockCountItem.product_id).where(
+            models.StockCountItem.session_id == session_id, models.StockCountItem.counted_quantity.is_(None)
+        ).order_by(models.StockCountItem.id)
+    ).all()
+    if uncounted_product_ids:
+        product_ids_str = ", ".join(str(product_id) for product_id in uncounted_product_ids)
         raise ValueError(f"กรุณาบันทึกยอดนับให้ครบทุกรายการก่อนปิดรอบนับ (สินค้า ID ที่ยังไม่ได้นับ: {product_ids_str})")
 
     try:
-        adjustments_created_count = 0
-        for item in items_in_session:
-            difference = item.difference
-            if difference is not None and difference != 0: # difference เป็น float
-                adjustment_data_schema = schemas.StockAdjustmentSchema(
-                    product_id=item.product_id, location_id=session.location_id,
-                    quantity_change=difference, # quantity_change ใน schema เป็น float
-                    reason=f"ปิดรอบตรวจนับสต็อก #{session_id}",
-                    notes=(
-                        f"ยอดในระบบ: {item.system_quantity}, "
-                        f"ยอดนับจริง: {item.counted_quantity}, "
-                        f"ส่วนต่าง: {difference:+.2f}" # Format float
-                    )
-                )
-                # เรียกใช้ inventory_service.record_stock_adjustment ที่นี่
-                inventory_service.record_stock_adjustment(db=db, adjustment_data=adjustment_data_schema, allow_negative_stock_for_count=True)
-                adjustments_created_count += 1
+        difference_expr = models.StockCountItem.counted_quantity - models.StockCountItem.system_quantity
+        differences = db.execute(
+            select(
+                models.StockCountItem.product_id, models.StockCountItem.system_quantity,
+                models.StockCountItem.counted_quantity, difference_expr.label("difference")
+            ).where(models.StockCountItem.session_id == session_id, difference_expr != 0).order_by(models.StockCountItem.id)
+        ).all()
+
+        adjustments_created_count = len(differences)
+        if differences:
+            reason = f"ปิดรอบตรวจนับสต็อก #{session_id}"
+            created_transactions = db.execute(insert(models.InventoryTransaction).returning(
+                models.InventoryTransaction.id, models.InventoryTransaction.product_id, models.InventoryTransaction.location_id
+            ), [
+                {
+                    "transaction_type": models.TransactionType.ADJUSTMENT_ADD if row.difference > 0 else models.TransactionType.ADJUSTMENT_SUB,
+                    "product_id": row.product_id,
+                    "location_id": session.location_id,
+                    "quantity_change": row.difference,
+                    "notes": (
+                        f"เหตุผล: {reason}; หมายเหตุ: "
+                        f"ยอดในระบบ: {row.system_quantity}, "
+                        f"ยอดนับจริง: {row.counted_quantity}, "
+                        f"ส่วนต่าง: {row.difference:+.2f}" # Format float
+                    ),
+                }
+                for row in differences
+            ])
+            # ล็อตที่เพิ่มจากการปิดรอบนับอ้างถึง adjustment ของตัวเอง เหมือน record_stock_adjustment
+            transaction_ids = {(row.product_id, row.location_id): row.id for row in created_transactions}
+            stock_deltas = [((row.product_id, session.location_id), row.difference) for row in differences]
+            stock_after = inventory_service.apply_stock_deltas(db, stock_deltas)
+            stock_lot_service.apply_lot_deltas(db, stock_deltas, stock_after, transaction_ids)
 
         session.status = models.StockCountStatus.CLOSED
         session.end_date = datetime.utcnow()
@@ -144,8 +237,9 @@ def close_stock_count_session(db: Session, session_id: int) -> models.StockCount
         if isinstance(e, ValueError): raise e
         else: raise ValueError(f"เกิดข้อผิดพลาดในระบบขณะปิดรอบนับสต็อก: {str(e)}") from e
 
+    lock_held_seconds = time.perf_counter() - lock_started_at
     db.refresh(session)
-    print(f"Stock Count Session {session_id} closed. {adjustments_created_count} adjustments created.")
+    print(f"Stock Count Session {session_id} closed. {adjustments_created_count} adjustments created (locks held {lock_held_seconds:.3f}s).")
     return session
 
 def cancel_stock_count_session(db: Session, session_id: int) -> models.StockCountSession:
@@ -168,7 +262,13 @@ def cancel_stock_count_session(db: Session, session_id: int) -> models.StockCoun
     return session
 
 def add_all_products_from_location_to_session(db: Session, session_id: int) -> Dict[str, Any]:
-    session = get_stock_count_session(db, session_id)
+    """
+    เพิ่มสินค้าทุกรายการที่มี CurrentStock ณ สถานที่ของรอบนับ แบบ set-based
+    INSERT INTO stock_count_items SELECT ... FROM current_stock WHERE location_id = ? AND product_id NOT IN (รายการที่มีแล้ว)
+    ใช้ statement เดียวและ commit ครั้งเดียว (system_quantity = ยอด CurrentStock ณ ตอนเพิ่ม)
+    """
+    # Lock แถว session ไว้ เพื่อไม่ให้การกดเพิ่มพร้อมกันสองครั้งเพิ่มสินค้าซ้ำ
+    session = db.query(models.StockCountSession).filter(models.StockCountSession.id == session_id).with_for_update().first()
     if not session:
         raise ValueError(f"ไม่พบรอบนับสต็อก รหัส {session_id}")
     if not session.location_id:
@@ -176,44 +276,29 @@ def add_all_products_from_location_to_session(db: Session, session_id: int) -> D
     if session.status not in [models.StockCountStatus.OPEN, models.StockCountStatus.COUNTING]:
         raise ValueError(f"ไม่สามารถเพิ่มสินค้าในรอบนับที่สถานะ {session.status.value} ได้")
 
-    # ดึง product_id ทั้งหมดที่มีรายการใน CurrentStock ณ สถานที่ของ session นี้
-    products_at_location_query = db.query(models.CurrentStock.product_id)\
-                                   .filter(models.CurrentStock.location_id == session.location_id)\
-                                   .distinct() # เพิ่ม distinct เผื่อมีข้อมูลซ้ำซ้อน (ไม่ควรมีถ้า PK ถูกต้อง)
-    
-    product_ids_to_add = {pid for (pid,) in products_at_location_query.all()}
-    
-    # ดึง product_id ที่มีอยู่แล้วใน session นี้ เพื่อป้องกันการเพิ่มซ้ำ
-    existing_item_product_ids = {item.product_id for item in session.items}
-
-    added_count = 0
-    skipped_count = 0
-    errors = []
-
-    for product_id_to_add in product_ids_to_add:
-        if product_id_to_add in existing_item_product_ids:
-            skipped_count += 1
-            continue
-        
-        try:
-            # ตรวจสอบว่า Product ID นั้นมีอยู่จริงในตาราง Products หรือไม่ก่อนเพิ่ม
-            product_check = product_service.get_product(db, product_id=product_id_to_add)
-            if not product_check:
-                errors.append(f"Product ID {product_id_to_add}: ไม่พบข้อมูลสินค้าในระบบ")
-                continue
-
-            item_data = schemas.StockCountItemCreate(product_id=product_id_to_add)
-            # ใช้ add_product_to_session ที่มีอยู่ ซึ่งจะดึง system_quantity จาก CurrentStock ให้เอง
-            add_product_to_session(db, session_id, item_data) 
-            added_count += 1
-        except ValueError as e:
-            errors.append(f"Product ID {product_id_to_add}: {str(e)}")
-        except Exception as e:
-            db.rollback() # Rollback ถ้าเกิด error ตอนเพิ่มแต่ละรายการ
-            errors.append(f"Unexpected error for Product ID {product_id_to_add}: {str(e)}")
-            print(f"Rolling back for product {product_id_to_add} due to error: {e}")
-    
-    # ไม่จำเป็นต้อง commit ที่นี่ถ้า add_product_to_session มีการ commit ภายในตัวมันเอง
-    # แต่ถ้า add_product_to_session ไม่ได้ commit ก็ต้อง db.commit() ที่นี่
-
-    return {"added": added_count, "skipped_already_in_session": skipped_count, "errors": errors}
\ No newline at end of file
+    existing_product_ids = select(models.StockCountItem.product_id).where(models.StockCountItem.session_id == session_id)
+    # Join กับ Product เพื่อข้ามแถว CurrentStock ที่ไม่มีสินค้าอยู่จริง
+    stock_at_location = select(models.CurrentStock.product_id, models.CurrentStock.quantity).join(
+        models.Product, models.Product.id == models.CurrentStock.product_id
+    ).where(models.CurrentStock.location_id == session.location_id)
+
+    try:
+        skipped_count = db.scalar(
+            select(func.count()).select_from(
+                stock_at_location.where(models.CurrentStock.product_id.in_(existing_product_ids)).subquery()
+            )
+        ) or 0
+        rows_to_add = stock_at_location.where(models.CurrentStock.product_id.not_in(existing_product_ids)).with_only_columns(
+            literal(session_id), models.CurrentStock.product_id, models.CurrentStock.quantity
+        )
+        result = db.execute(
+            insert(models.StockCountItem).from_select(["session_id", "product_id", "system_quantity"], rows_to_add)
+        )
+        added_count = result.rowcount if result.rowcount is not None and result.rowcount >= 0 else 0
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        print(f"Error adding all products to stock count session {session_id}: {type(e).__name__} - {e}")
+        raise ValueError(f"เกิดข้อผิดพลาดในระบบขณะเพิ่มสินค้าเข้ารอบนับ: {type(e).__name__}") from e
+
+    return {"added": added_count, "skipped_already_in_session": skipped_count, "errors": []}
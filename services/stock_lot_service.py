@@ -0,0 +1,141 @@
+# services/stock_lot_service.py
+# ล็อตสินค้า (stock_lots) สำหรับรายงานใกล้หมดอายุที่นับเฉพาะของที่ยังอยู่จริง
+# - รับเข้า / รับโอน / ปรับเพิ่ม สร้างล็อต (receive_lots)
+# - ขาย / โอนออก / ปรับลด ตัดล็อตแบบ FEFO: วันหมดอายุเร็วสุดก่อน ล็อตไม่มีวันหมดอายุหลังสุด แล้วตามลำดับรับเข้า (consume_lots)
+# ทุกฟังก์ชันไม่ commit และต้องเรียกหลัง inventory_service.apply_stock_deltas ของ key เดียวกัน
+# (แถว CurrentStock ที่ถูก lock แล้วทำให้การแก้ล็อตของ (product, location) เดียวกันเป็นลำดับอยู่แล้ว)
+from datetime import date, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import and_, distinct, func, insert, or_
+from sqlalchemy.orm import Session, selectinload
+
+from models import StockLot, Product
+from utils import bangkok_today
+
+StockKey = Tuple[int, int] # (product_id, location_id)
+LOT_ATTRIBUTES = ("expiry_date", "production_date", "cost_per_unit")
+
+def _lot_keys_filter(keys: Iterable[StockKey]):
+    product_ids_by_location: Dict[int, List[int]] = {}
+    for product_id, location_id in keys:
+        product_ids_by_location.setdefault(location_id, []).append(product_id)
+    return or_(*[
+        and_(StockLot.location_id == location_id, StockLot.product_id.in_(product_ids))
+        for location_id, product_ids in product_ids_by_location.items()
+    ])
+
+def receive_lots(db: Session, lots: List[Dict[str, Any]], stock_after: Dict[StockKey, float]) -> None:
+    """
+    สร้างล็อตใหม่ (ไม่ commit) แต่ละ dict มี product_id, location_id, quantity และอาจมี expiry_date, production_date,
+    cost_per_unit, source_transaction_id
+    stock_after: ยอด CurrentStock หลังรับเข้า (ค่าที่ apply_stock_deltas คืนมา) ถ้าก่อนรับเข้ายอดติดลบ (ขายไปก่อนรับของ)
+    ส่วนที่ติดลบถือว่าขายออกจากล็อตที่รับเข้ามานี้แล้ว จึงตัดออกแบบ FEFO ก่อนบันทึก
+    """
+    received_by_key: Dict[StockKey, float] = {}
+    for lot in lots:
+        key = (lot["product_id"], lot["location_id"])
+        received_by_key[key] = received_by_key.get(key, 0.0) + lot["quantity"]
+    deficit_by_key = {
+        key: min(received, received - stock_after[key]) for key, received in received_by_key.items()
+        if key in stock_after and stock_after[key] < received # ยอดก่อนรับเข้า < 0
+    }
+    rows = []
+    for lot in sorted(lots, key=lambda lot: (lot.get("expiry_date") is None, lot.get("expiry_date") or date.max)):
+        key = (lot["product_id"], lot["location_id"])
+        remaining = lot["quantity"]
+        deficit = deficit_by_key.get(key, 0.0)
+        if deficit > 0:
+            taken = min(deficit, remaining)
+            remaining -= taken
+            deficit_by_key[key] = deficit - taken
+        rows.append({
+            "product_id": lot["product_id"], "location_id": lot["location_id"],
+            **{attribute: lot.get(attribute) for attribute in LOT_ATTRIBUTES},
+            "received_quantity": lot["quantity"], "remaining_qty": remaining,
+            "source_transaction_id": lot.get("source_transaction_id"),
+        })
+    if rows: db.execute(insert(StockLot), rows)
+
+def consume_lots(db: Session, deltas: Iterable[Tuple[StockKey, float]]) -> Dict[StockKey, List[Tuple[StockLot, float]]]:
+    """
+    ตัดล็อตแบบ FEFO ตามจำนวน (บวก) ต่อ key (ไม่ commit) โหลดล็อตที่ยังมีของของทุก key ใน query เดียว
+    ส่วนที่ล็อตไม่พอ (สต็อกติดลบ) ไม่ถูกบันทึกในล็อต
+    คืน {key: [(ล็อต, จำนวนที่ตัด), ...]} ใช้ต่อในการโอนย้าย
+    """
+    quantity_by_key: Dict[StockKey, float] = {}
+    for key, quantity in deltas:
+        if quantity > 0: quantity_by_key[key] = quantity_by_key.get(key, 0.0) + quantity
+    if not quantity_by_key: return {}
+
+    live_lots = db.query(StockLot).filter(_lot_keys_filter(quantity_by_key), StockLot.remaining_qty > 0).order_by(
+        StockLot.product_id, StockLot.location_id,
+        StockLot.expiry_date.is_(None), StockLot.expiry_date, StockLot.received_at, StockLot.id
+    ).with_for_update().all()
+
+    consumed: Dict[StockKey, List[Tuple[StockLot, float]]] = {key: [] for key in quantity_by_key}
+    for lot in live_lots:
+        key = (lot.product_id, lot.location_id)
+        needed = quantity_by_key[key]
+        if needed <= 0: continue
+        taken = min(needed, lot.remaining_qty)
+        lot.remaining_qty -= taken
+        quantity_by_key[key] = needed - taken
+        consumed[key].append((lot, taken))
+    db.flush()
+    return consumed
+
+def apply_lot_deltas(
+    db: Session, deltas: Iterable[Tuple[StockKey, float]], stock_after: Dict[StockKey, float],
+    source_transaction_ids: Optional[Dict[StockKey, int]] = None
+) -> None:
+    """
+    ปรับล็อตตามการปรับสต็อกที่ไม่มีข้อมูลล็อต (ปรับปรุงสต็อก / ปิดรอบนับ) ไม่ commit
+    ลด = ตัด FEFO, เพิ่ม = ล็อตใหม่ที่ไม่มีวันหมดอายุ
+    """
+    deltas = list(deltas)
+    consume_lots(db, [(key, -delta) for key, delta in deltas if delta < 0])
+    receive_lots(db, [
+        {"product_id": key[0], "location_id": key[1], "quantity": delta,
+         "source_transaction_id": (source_transaction_ids or {}).get(key)}
+        for key, delta in deltas if delta > 0
+    ], stock_after)
+
+def transfer_lots(
+    db: Session, product_id: int, from_location_id: int, to_location_id: int, quantity: float,
+    stock_after: Dict[StockKey, float], source_transaction_id: Optional[int] = None
+) -> None:
+    """ ย้ายล็อตตามการโอน (ไม่ commit): ตัด FEFO ที่ต้นทาง แล้วสร้างล็อตที่ปลายทางด้วยวันหมดอายุ/ต้นทุนเดิม """
+    taken_lots = consume_lots(db, [((product_id, from_location_id), quantity)]).get((product_id, from_location_id), [])
+    lots = [
+        {"product_id": product_id, "location_id": to_location_id, "quantity": taken,
+         **{attribute: getattr(lot, attribute) for attribute in LOT_ATTRIBUTES}, "source_transaction_id": source_transaction_id}
+        for lot, taken in taken_lots
+    ]
+    uncovered = quantity - sum(taken for _, taken in taken_lots)
+    if uncovered > 1e-9: # ต้นทางไม่มีล็อตรองรับ (ข้อมูลเก่า) ปลายทางได้ล็อตที่ไม่มีวันหมดอายุ
+        lots.append({"product_id": product_id, "location_id": to_location_id, "quantity": uncovered, "source_transaction_id": source_transaction_id})
+    receive_lots(db, lots, stock_after)
+
+def _near_expiry_filter(today: date, days_ahead: int):
+    return and_(
+        StockLot.remaining_qty > 0,
+        StockLot.expiry_date >= today,
+        StockLot.expiry_date <= today + timedelta(days=days_ahead),
+    )
+
+def get_near_expiry_lots(db: Session, days_ahead: int = 30, skip: int = 0, limit: int = 100) -> Dict[str, Any]:
+    """ ล็อตที่ยังมีของและหมดอายุภายใน days_ahead วัน (ตามวันที่ไทย) เรียงตามวันหมดอายุ """
+    query = db.query(StockLot).options(
+        selectinload(StockLot.product).selectinload(Product.category),
+        selectinload(StockLot.location)
+    ).filter(_near_expiry_filter(bangkok_today(), days_ahead))
+    total_count = query.count()
+    lots = query.order_by(StockLot.expiry_date.asc(), StockLot.id.asc()).offset(skip).limit(limit).all()
+    return {"lots": lots, "total_count": total_count}
+
+def count_near_expiry_products(db: Session, days_ahead: int = 7, today: Optional[date] = None) -> int:
+    """ จำนวนสินค้า (ไม่ซ้ำ) ที่มีล็อตคงเหลือหมดอายุภายใน days_ahead วัน """
+    return db.query(func.count(distinct(StockLot.product_id))).filter(
+        _near_expiry_filter(today or bangkok_today(), days_ahead)
+    ).scalar() or 0
@@ -0,0 +1,201 @@
+# services/stock_reconciliation_service.py
+# ตรวจว่า current_stock (projection) ตรงกับ SUM(inventory_transactions.quantity_change) ต่อ (product_id, location_id)
+# - full: แบ่งช่วง product_id เป็น chunk แล้วให้ process pool คำนวณผลรวม ledger + เทียบกับ current_stock ขนานกัน
+#   (แต่ละ chunk เป็น GROUP BY บน ix_inventory_transactions_product_location_qty แบบ index-only)
+# - incremental: ตรวจเฉพาะ key ที่มี transaction id มากกว่า watermark (to_transaction_id ของรอบก่อน)
+# ความต่างที่เจอถูกตรวจซ้ำอีกครั้งใน process หลัก (repair: หลัง lock แถว current_stock) ก่อนรายงาน/ซ่อม
+# เพื่อตัดกรณีที่มีการขาย/รับเข้าเกิดขึ้นระหว่างสแกน
+import os
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import and_, func, or_, select
+from sqlalchemy.orm import Session
+
+import database
+import models
+from services import inventory_service, stock_lot_service
+
+StockKey = Tuple[int, int] # (product_id, location_id)
+
+RECONCILE_WORKERS = int(os.getenv("RECONCILE_WORKERS", str(min(4, os.cpu_count() or 1))))
+RECONCILE_CHUNK_PRODUCTS = int(os.getenv("RECONCILE_CHUNK_PRODUCTS", "2000")) # จำนวน product_id ต่อ chunk (full)
+RECONCILE_CHUNK_KEYS = int(os.getenv("RECONCILE_CHUNK_KEYS", "5000")) # จำนวน key ต่อ chunk (incremental / ตรวจซ้ำ)
+# transaction id ไม่ได้ commit ตามลำดับ id เสมอ incremental จึงย้อนตรวจก่อน watermark เผื่อไว้จำนวนนี้
+RECONCILE_WATERMARK_OVERLAP = int(os.getenv("RECONCILE_WATERMARK_OVERLAP", "1000"))
+DRIFT_TOLERANCE = 1e-6
+
+def _keys_filter(model, keys: Iterable[StockKey]):
+    product_ids_by_location: Dict[int, List[int]] = {}
+    for product_id, location_id in keys:
+        product_ids_by_location.setdefault(location_id, []).append(product_id)
+    return or_(*[
+        and_(model.location_id == location_id, model.product_id.in_(product_ids))
+        for location_id, product_ids in product_ids_by_location.items()
+    ])
+
+def _chunks(items: List[Any], size: int) -> List[List[Any]]:
+    return [items[start:start + size] for start in range(0, len(items), size)]
+
+def _ledger_totals(db: Session, condition) -> Dict[StockKey, float]:
+    tx = models.InventoryTransaction
+    rows = db.execute(
+        select(tx.product_id, tx.location_id, func.sum(tx.quantity_change)).where(condition).group_by(tx.product_id, tx.location_id)
+    ).all()
+    return {(product_id, location_id): float(total or 0.0) for product_id, location_id, total in rows}
+
+def _stock_totals(db: Session, condition) -> Dict[StockKey, float]:
+    stock = models.CurrentStock
+    rows = db.execute(select(stock.product_id, stock.location_id, stock.quantity).where(condition)).all()
+    return {(product_id, location_id): float(quantity or 0.0) for product_id, location_id, quantity in rows}
+
+def _diff(ledger: Dict[StockKey, float], stock: Dict[StockKey, float], keys: Optional[Iterable[StockKey]] = None) -> List[Dict[str, Any]]:
+    """ key ที่ไม่มีแถว current_stock ถือว่ายอด 0 และ key ที่ไม่มี transaction ถือว่าผลรวม 0 """
+    drifts = []
+    for key in sorted(set(keys) if keys is not None else set(ledger) | set(stock)):
+        ledger_quantity, stock_quantity = ledger.get(key, 0.0), stock.get(key, 0.0)
+        if abs(ledger_quantity - stock_quantity) > DRIFT_TOLERANCE:
+            drifts.append({
+                "product_id": key[0], "location_id": key[1], "ledger_quantity": ledger_quantity,
+                "stock_quantity": stock_quantity, "difference": ledger_quantity - stock_quantity,
+                "stock_row_exists": key in stock,
+            })
+    return drifts
+
+def find_drift_in_product_range(db: Session, product_id_from: int, product_id_to: int) -> Tuple[int, List[Dict[str, Any]]]:
+    """ เทียบทุก key ที่ product_id อยู่ในช่วง [from, to] คืน (จำนวน key ที่ตรวจ, รายการที่ไม่ตรง) """
+    tx, stock = models.InventoryTransaction, models.CurrentStock
+    ledger = _ledger_totals(db, tx.product_id.between(product_id_from, product_id_to))
+    stock_totals = _stock_totals(db, stock.product_id.between(product_id_from, product_id_to))
+    return len(set(ledger) | set(stock_totals)), _diff(ledger, stock_totals)
+
+def find_drift_for_keys(db: Session, keys: List[StockKey]) -> Tuple[int, List[Dict[str, Any]]]:
+    """ เทียบเฉพาะ key ที่ระบุ คืน (จำนวน key ที่ตรวจ, รายการที่ไม่ตรง) """
+    if not keys: return 0, []
+    ledger = _ledger_totals(db, _keys_filter(models.InventoryTransaction, keys))
+    stock_totals = _stock_totals(db, _keys_filter(models.CurrentStock, keys))
+    return len(keys), _diff(ledger, stock_totals, keys)
+
+# --- Process pool ---
+def _init_worker() -> None:
+    # connection ที่ติดมากับ fork ใช้ร่วมกับ process แม่ไม่ได้ ทิ้ง pool ของ process ลูก (ไม่ปิด connection ของแม่)
+    if database.engine is not None: database.engine.dispose(close=False)
+
+def _run_chunk(task: Tuple[str, Any]) -> Tuple[int, List[Dict[str, Any]]]:
+    kind, payload = task
+    db = database.SessionLocal()
+    try:
+        if kind == "range": return find_drift_in_product_range(db, *payload)
+        return find_drift_for_keys(db, payload)
+    finally:
+        db.close()
+
+def _scan(db: Session, tasks: List[Tuple[str, Any]], workers: int) -> Tuple[int, List[Dict[str, Any]]]:
+    if workers <= 1 or len(tasks) <= 1:
+        results = [find_drift_in_product_range(db, *payload) if kind == "range" else find_drift_for_keys(db, payload) for kind, payload in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=min(workers, len(tasks)), initializer=_init_worker) as pool:
+            results = list(pool.map(_run_chunk, tasks))
+    keys_checked = sum(checked for checked, _ in results)
+    drifts = [drift for _, chunk_drifts in results for drift in chunk_drifts]
+    return keys_checked, drifts
+
+def _product_range_tasks(db: Session, chunk_products: int) -> List[Tuple[str, Any]]:
+    bounds = [
+        db.query(func.min(model.product_id), func.max(model.product_id)).one()
+        for model in (models.InventoryTransaction, models.CurrentStock)
+    ]
+    lows = [low for low, _ in bounds if low is not None]
+    highs = [high for _, high in bounds if high is not None]
+    if not lows: return []
+    low, high = min(lows), max(highs)
+    return [("range", (start, min(start + chunk_products - 1, high))) for start in range(low, high + 1, chunk_products)]
+
+def _touched_keys(db: Session, after_transaction_id: int, up_to_transaction_id: int) -> List[StockKey]:
+    tx = models.InventoryTransaction
+    return sorted(db.execute(
+        select(tx.product_id, tx.location_id).where(tx.id > after_transaction_id, tx.id <= up_to_transaction_id).distinct()
+    ).tuples().all())
+
+# --- ตรวจซ้ำ / ซ่อม ---
+def confirm_drift(db: Session, drifts: List[Dict[str, Any]], repair: bool = False) -> List[Dict[str, Any]]:
+    """
+    ตรวจ key ที่สแกนแล้วไม่ตรงอีกครั้งด้วยข้อมูลล่าสุด (ทีละ RECONCILE_CHUNK_KEYS key) คืนเฉพาะรายการที่ยังไม่ตรง
+    repair=True: lock แถว current_stock (inventory_service.lock_current_stock_rows) ก่อนอ่าน ledger
+    ตั้ง quantity = ผลรวม ledger ปรับล็อต (stock_lots) ตามส่วนต่าง แล้ว commit ทีละ chunk เพื่อไม่ถือ lock นาน
+    """
+    confirmed: List[Dict[str, Any]] = []
+    for key_chunk in _chunks(sorted((drift["product_id"], drift["location_id"]) for drift in drifts), RECONCILE_CHUNK_KEYS):
+        if not repair:
+            confirmed.extend(find_drift_for_keys(db, key_chunk)[1])
+            continue
+        try:
+            stock_rows = inventory_service.lock_current_stock_rows(db, key_chunk)
+            ledger = _ledger_totals(db, _keys_filter(models.InventoryTransaction, key_chunk))
+            chunk_drifts = _diff(ledger, {key: row.quantity for key, row in stock_rows.items()}, key_chunk)
+            lot_deltas, stock_after = [], {}
+            for drift in chunk_drifts:
+                key = (drift["product_id"], drift["location_id"])
+                stock_rows[key].quantity = drift["ledger_quantity"]
+                lot_deltas.append((key, drift["difference"]))
+                stock_after[key] = drift["ledger_quantity"]
+            db.flush()
+            stock_lot_service.apply_lot_deltas(db, lot_deltas, stock_after)
+            db.commit()
+            confirmed.extend(chunk_drifts)
+        except Exception:
+            db.rollback()
+            raise
+    return confirmed
+
+def get_watermark(db: Session) -> Optional[int]:
+    """ to_transaction_id ของรอบล่าสุดที่บันทึกไว้ (None ถ้ายังไม่เคยรัน) """
+    run = models.StockReconciliationRun
+    return db.query(run.to_transaction_id).filter(run.to_transaction_id.isnot(None)).order_by(run.id.desc()).limit(1).scalar()
+
+def reconcile_stock(
+    db: Session, incremental: bool = False, repair: bool = False, since_transaction_id: Optional[int] = None,
+    workers: int = RECONCILE_WORKERS, chunk_products: int = RECONCILE_CHUNK_PRODUCTS,
+    watermark_overlap: int = RECONCILE_WATERMARK_OVERLAP
+) -> Dict[str, Any]:
+    """
+    ตรวจ (และซ่อมถ้า repair=True) current_stock เทียบกับ inventory_transactions แล้วบันทึกรอบใน stock_reconciliation_runs
+    incremental=True: ตรวจเฉพาะ key ที่มี transaction id > since_transaction_id (ค่า default = watermark ของรอบก่อน)
+    ถ้ายังไม่มี watermark จะตรวจแบบ full
+    คืน dict สรุปผล (mode, from/to_transaction_id, keys_checked, drifts, repaired_count)
+    """
+    started_at = datetime.now(timezone.utc)
+    to_transaction_id = db.query(func.max(models.InventoryTransaction.id)).scalar() or 0
+    from_transaction_id = None
+    if incremental:
+        from_transaction_id = since_transaction_id if since_transaction_id is not None else get_watermark(db)
+    db.rollback() # ไม่ถือ transaction ค้างไว้ระหว่างที่ worker สแกน
+
+    if from_transaction_id is None:
+        mode = "full"
+        tasks = _product_range_tasks(db, chunk_products)
+    else:
+        mode = "incremental"
+        keys = _touched_keys(db, max(0, from_transaction_id - watermark_overlap), to_transaction_id)
+        tasks = [("keys", key_chunk) for key_chunk in _chunks(keys, RECONCILE_CHUNK_KEYS)]
+    db.rollback()
+
+    keys_checked, scanned_drifts = _scan(db, tasks, workers)
+    drifts = confirm_drift(db, scanned_drifts, repair=repair) if scanned_drifts else []
+
+    try:
+        db.add(models.StockReconciliationRun(
+            mode=mode, repair=repair, from_transaction_id=from_transaction_id, to_transaction_id=to_transaction_id,
+            keys_checked=keys_checked, drift_count=len(drifts), repaired_count=len(drifts) if repair else 0,
+            started_at=started_at
+        ))
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    return {
+        "mode": mode, "from_transaction_id": from_transaction_id, "to_transaction_id": to_transaction_id,
+        "keys_checked": keys_checked, "chunks": len(tasks), "drifts": drifts,
+        "repaired_count": len(drifts) if repair else 0,
+    }
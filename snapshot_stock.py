@@ -0,0 +1,45 @@
+# snapshot_stock.py
+# สร้าง stock_snapshots (ยอดสิ้นวันตามเวลาไทย) สำหรับ /api/inventory/as-of ตั้ง cron ให้รันทุกคืนหลังเที่ยงคืน
+#   python snapshot_stock.py                                      (เมื่อวาน แล้วลบ snapshot รายวันที่เก่ากว่า STOCK_SNAPSHOT_KEEP_DAILY_DAYS)
+#   python snapshot_stock.py --start 2025-01-01 --end 2025-06-30   (สร้างย้อนหลังทีละวันตามลำดับ)
+import argparse
+from datetime import date, timedelta
+
+import database
+import models # noqa: F401 ให้ Base รู้จักทุกตาราง
+from services import inventory_service
+from utils import bangkok_today
+
+def main():
+    parser = argparse.ArgumentParser(description="Write end-of-day stock snapshots from inventory_transactions.")
+    parser.add_argument("--start", type=date.fromisoformat, default=None, help="วันแรก (YYYY-MM-DD, เวลาไทย) ค่าเริ่มต้น = เมื่อวาน")
+    parser.add_argument("--end", type=date.fromisoformat, default=None, help="วันสุดท้าย (YYYY-MM-DD, เวลาไทย) ค่าเริ่มต้น = เมื่อวาน")
+    parser.add_argument("--keep-daily-days", type=int, default=inventory_service.STOCK_SNAPSHOT_KEEP_DAILY_DAYS,
+                        help="เก็บ snapshot รายวันกี่วัน ที่เก่ากว่านั้นเหลือเฉพาะวันสิ้นเดือน (0 = ไม่ลบ)")
+    args = parser.parse_args()
+
+    yesterday = bangkok_today() - timedelta(days=1)
+    start_date, end_date = args.start or args.end or yesterday, args.end or yesterday
+    if start_date > end_date:
+        print("!!! --start must not be after --end.")
+        return
+    if database.SessionLocal is None:
+        print("!!! Database session factory is not configured in database.py.")
+        return
+    db = database.SessionLocal()
+    try:
+        day = start_date
+        while day <= end_date:
+            rows = inventory_service.create_stock_snapshot(db, day)
+            print(f"✅ stock snapshot {day}: {rows} rows.")
+            day += timedelta(days=1)
+        if args.keep_daily_days > 0:
+            pruned = inventory_service.prune_stock_snapshots(db, keep_daily_days=args.keep_daily_days)
+            if pruned: print(f"Pruned {pruned} daily snapshot rows older than {args.keep_daily_days} days (month-end snapshots kept).")
+    except Exception as e:
+        print(f"!!! Snapshot failed: {type(e).__name__} - {e}")
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    main()
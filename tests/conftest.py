@@ -0,0 +1,57 @@
+# tests/conftest.py
+# ทดสอบกับ SQLite ไฟล์ชั่วคราว (ตั้ง DATABASE_URL ก่อน import database เพราะ engine ถูกสร้างตอน import)
+# ตั้ง TEST_DATABASE_URL=postgresql://... เพื่อรันกับ PostgreSQL จริง (ต้องเป็น database ว่างสำหรับทดสอบ ตารางจะถูกลบ/สร้างใหม่)
+import os
+import sys
+import tempfile
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+_tmp_dir = tempfile.mkdtemp(prefix="gofresh-tests-")
+os.environ["DATABASE_URL"] = os.getenv("TEST_DATABASE_URL") or f"sqlite:///{os.path.join(_tmp_dir, 'test.db')}"
+# async stack ใช้ database เดียวกันผ่าน aiosqlite (กับ TEST_DATABASE_URL ให้ตั้ง TEST_ASYNC_DATABASE_URL เช่น postgresql+asyncpg://...)
+_async_url = os.getenv("TEST_ASYNC_DATABASE_URL") or (None if os.getenv("TEST_DATABASE_URL") else f"sqlite+aiosqlite:///{os.path.join(_tmp_dir, 'test.db')}")
+if _async_url: os.environ["ASYNC_DATABASE_URL"] = _async_url
+else: os.environ.pop("ASYNC_DATABASE_URL", None)
+os.environ.setdefault("CACHE_BUS_ENABLED", "false")
+
+import pytest
+
+import database
+import models
+from services import invalidation_service
+
+@pytest.fixture
+def engine():
+    database.Base.metadata.drop_all(bind=database.engine)
+    database.Base.metadata.create_all(bind=database.engine)
+    for name in list(invalidation_service._subscribers): invalidation_service.dispatch(name) # ล้าง cache ในหน่วยความจำจากเทสก่อนหน้า
+    yield database.engine
+
+@pytest.fixture
+def db(engine):
+    session = database.SessionLocal()
+    try: yield session
+    finally: session.close()
+
+@pytest.fixture
+def make_product(db):
+    """ สร้างสินค้า (และหมวดหมู่ "Test" ถ้ายังไม่มี) คืน Product """
+    def _make(sku: str, name: str, barcode=None, price_b2c: float = 10.0) -> models.Product:
+        category = db.query(models.Category).filter_by(name="Test").first()
+        if category is None:
+            category = models.Category(name="Test")
+            db.add(category); db.flush()
+        product = models.Product(sku=sku, name=name, barcode=barcode, price_b2c=price_b2c, category_id=category.id)
+        db.add(product); db.commit(); db.refresh(product)
+        return product
+    return _make
+
+@pytest.fixture
+def make_location(db):
+    def _make(name: str) -> models.Location:
+        location = models.Location(name=name)
+        db.add(location); db.commit(); db.refresh(location)
+        return location
+    return _make
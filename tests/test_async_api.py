@@ -0,0 +1,62 @@
+# tests/test_async_api.py
+# Async stack (AsyncSession ผ่าน aiosqlite, ASYNC_DATABASE_URL ตั้งใน conftest.py) ผ่าน routers/async_api.py ของ app จริง:
+# ขาย (record_sale_async), scan (lookup_product_by_scan_code_async), สต็อก (get_current_stock_summary_async) และ dashboard KPI
+# ต้อง dispose async_engine ใน event loop เดียวกับที่ใช้ ไม่เช่นนั้น thread ของ aiosqlite ค้างทำให้ interpreter ไม่ออก
+import asyncio
+
+import httpx
+import pytest
+
+import database
+from routers import async_api
+from services import inventory_service
+
+pytestmark = pytest.mark.skipif(not database.ASYNC_DB_ENABLED, reason="ASYNC_DATABASE_URL is not configured")
+
+def _endpoint(app, path: str, method: str):
+    return next(route.endpoint for route in app.routes if getattr(route, "path", None) == path and method in route.methods)
+
+def test_async_routes_record_sale_and_read_back(db, make_product, make_location):
+    import main # หลัง conftest ตั้ง ASYNC_DATABASE_URL: main include async router เมื่อ database.ASYNC_DB_ENABLED
+    product, location = make_product("ASYNC-1", "Async product", barcode="8850000000011"), make_location("Async location")
+    inventory_service.apply_stock_deltas(db, [((product.id, location.id), 10.0)])
+    db.commit()
+    assert _endpoint(main.app, "/api/sales/", "POST") is async_api.api_record_new_sale_async # async handler มาก่อน sync API
+
+    async def scenario():
+        try:
+            async with httpx.AsyncClient(transport=httpx.ASGITransport(app=main.app), base_url="http://test") as client:
+                sale = await client.post("/api/sales/", json={
+                    "location_id": location.id, "items": [{"product_id": product.id, "quantity": 3, "unit_price": 20.0}]
+                })
+                scan = await client.get(f"/api/products/lookup-by-scan/{product.barcode}")
+                stock = await client.get("/api/inventory/summary/", params={"location_id": location.id})
+                kpis = await client.get("/api/dashboard/kpis")
+                return sale, scan, stock, kpis
+        finally:
+            await database.async_engine.dispose()
+
+    sale, scan, stock, kpis = asyncio.run(scenario())
+    assert sale.status_code == 201, sale.text
+    assert sale.json()["total_amount"] == 60.0 and sale.json()["items"][0]["product_id"] == product.id
+    assert scan.status_code == 200 and scan.json()["sku"] == "ASYNC-1"
+    assert [(row["product"]["id"], row["quantity"]) for row in stock.json()] == [(product.id, 7.0)]
+    assert kpis.status_code == 200 and kpis.json()["today_sales_count"] == 1 and kpis.json()["today_sales_total"] == 60.0
+
+def test_async_sale_rejects_insufficient_stock(db, make_product, make_location):
+    import main
+    product, location = make_product("ASYNC-2", "Async product 2"), make_location("Async location 2")
+
+    async def scenario():
+        try:
+            async with httpx.AsyncClient(transport=httpx.ASGITransport(app=main.app), base_url="http://test") as client:
+                return await client.post("/api/sales/", json={
+                    "location_id": location.id, "items": [{"product_id": product.id, "quantity": 1, "unit_price": 20.0}]
+                })
+        finally:
+            await database.async_engine.dispose()
+
+    response = asyncio.run(scenario())
+    assert 400 <= response.status_code < 500
+    db.expire_all()
+    assert inventory_service.get_current_stock_record(db, product.id, location.id) is None # rollback ทั้งการขาย
@@ -0,0 +1,68 @@
+# tests/test_dashboard_stream_service.py
+# ยอดขาย/สต็อกที่ commit จาก worker หนึ่งต้องไปถึง dashboard ของทุก worker ผ่าน invalidation bus
+# (ไม่ต้องรอรอบ DASHBOARD_STREAM_REFRESH_SECONDS) จำลอง worker อื่นด้วย InvalidationListener.poll_versions()
+import asyncio
+import threading
+
+import database
+import schemas
+from services import dashboard_service, dashboard_stream_service, inventory_service, invalidation_service, sales_service
+
+def _sale(location_id: int, product_id: int) -> schemas.SaleCreate:
+    return schemas.SaleCreate(location_id=location_id, items=[schemas.SaleItemCreate(product_id=product_id, quantity=2, unit_price=25.0)])
+
+def _other_worker_listener() -> invalidation_service.InvalidationListener:
+    listener = invalidation_service.InvalidationListener(database.engine, database.SessionLocal)
+    listener.poll_versions() # poll แรกแค่จำเวอร์ชันตั้งต้น
+    return listener
+
+def test_sale_commit_clears_overview_cache_on_other_workers(db, make_product, make_location):
+    product, location = make_product("DASH-1", "Dash product"), make_location("Dash location")
+    listener = _other_worker_listener()
+
+    sales_service.record_sale(db, _sale(location.id, product.id), allow_negative_stock_on_sale=True)
+    dashboard_service._overview_cache.set("other-worker", "stale overview") # cache ของ worker ที่ไม่ได้ commit เอง
+    assert listener.poll_versions() == {dashboard_service.DASHBOARD_CACHE_NAME}
+    assert len(dashboard_service._overview_cache) == 0
+
+def test_inventory_commit_is_published_and_rollback_is_not(db, make_product, make_location):
+    product = make_product("DASH-2", "Dash product 2")
+    from_location, to_location = make_location("Dash from"), make_location("Dash to")
+    inventory_service.apply_stock_deltas(db, [((product.id, from_location.id), 10.0)])
+    db.commit()
+    listener = _other_worker_listener()
+    transfer = schemas.StockTransferSchema(product_id=product.id, from_location_id=from_location.id, to_location_id=to_location.id, quantity=1)
+
+    inventory_service.record_stock_transfer(db, transfer)
+    db.rollback()
+    assert listener.poll_versions() == set()
+
+    inventory_service.record_stock_transfer(db, transfer)
+    db.commit()
+    assert listener.poll_versions() == {dashboard_service.DASHBOARD_CACHE_NAME}
+    db.commit() # commit ที่ไม่ได้แก้ตารางของ dashboard ไม่ publish
+    assert listener.poll_versions() == set()
+
+def test_kpi_stream_pushes_sale_committed_on_other_worker(db, make_product, make_location, monkeypatch):
+    product, location = make_product("DASH-3", "Dash product 3"), make_location("Dash location 3")
+    monkeypatch.setattr(dashboard_stream_service, "DASHBOARD_STREAM_DEBOUNCE_SECONDS", 0)
+    monkeypatch.setattr(dashboard_stream_service, "DASHBOARD_STREAM_REFRESH_SECONDS", 3600) # ต้องมาจาก bus ไม่ใช่รอบสำรอง
+    listener = _other_worker_listener()
+    broadcaster = dashboard_stream_service.KpiBroadcaster(database.SessionLocal)
+
+    async def scenario():
+        queue = await broadcaster.subscribe()
+        assert (await queue.get())[1]["today_sales_count"] == 0
+        # worker อื่น commit การขาย (ตอนนั้น broadcaster นี้ยังไม่ได้ผูกกับ bus จึงไม่ได้รับ callback หลัง commit โดยตรง)
+        await asyncio.to_thread(sales_service.record_sale, db, _sale(location.id, product.id), True)
+        callbacks = list(invalidation_service._subscribers.get(dashboard_service.DASHBOARD_CACHE_NAME, ()))
+        monkeypatch.setitem(invalidation_service._subscribers, dashboard_service.DASHBOARD_CACHE_NAME, [*callbacks, broadcaster.notify_changed])
+        threading.Thread(target=listener.poll_versions).start()
+        event, delta = await asyncio.wait_for(queue.get(), timeout=10)
+        broadcaster.unsubscribe(queue)
+        broadcaster._task.cancel()
+        return event, delta
+
+    event, delta = asyncio.run(scenario())
+    assert event == "delta"
+    assert delta["today_sales_count"] == 1 and delta["today_sales_total"] == 50.0
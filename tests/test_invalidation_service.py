@@ -0,0 +1,91 @@
+# tests/test_invalidation_service.py
+# Bus ล้าง cache ข้าม worker: สอง process ใช้ SQLite ไฟล์เดียวกัน process หนึ่งแก้สินค้า (publish "products")
+# อีก process ที่เปิด listener (poll cache_versions) ต้องล้าง scan index และตอบชื่อใหม่โดยไม่ต้องรอ VERSION_CHECK_SECONDS
+import multiprocessing
+
+from services import invalidation_service
+
+WAIT_SECONDS = 20
+
+def _listening_worker(sku: str, events, rename_done) -> None:
+    import time
+    import database
+    from services import product_service
+
+    invalidation_service.CACHE_BUS_POLL_SECONDS = 0.05
+    invalidation_service.VERSION_CHECK_SECONDS = 3600 # ถ้าไม่ได้รับเหตุการณ์จาก bus จะไม่ตรวจเวอร์ชันเองภายในเวลาทดสอบ
+    invalidation_service.subscribe("products", lambda name: events.put(("invalidated", name)))
+    listener = invalidation_service.start_listener(database.engine, database.SessionLocal)
+    while listener._known_versions is None: time.sleep(0.01) # รอ poll แรก (จำเวอร์ชันตั้งต้น)
+    db = database.SessionLocal()
+    try:
+        events.put(("loaded", product_service.lookup_product_by_scan_code(db, sku).name))
+        rename_done.wait(WAIT_SECONDS)
+        deadline = time.monotonic() + WAIT_SECONDS
+        while time.monotonic() < deadline:
+            name = product_service.lookup_product_by_scan_code(db, sku).name
+            if name != "Before": break
+            time.sleep(0.02)
+        events.put(("reloaded", name))
+    finally:
+        db.close()
+        invalidation_service.stop_listener()
+
+def _publishing_worker(product_id: int, events) -> None:
+    import database
+    import schemas
+    from services import product_service
+
+    db = database.SessionLocal()
+    try:
+        product_service.update_product(db, product_id, schemas.ProductUpdate(name="After"))
+        events.put(("published", product_id))
+    finally:
+        db.close()
+
+def _next_event(events, kind: str, pending: dict):
+    """ รอเหตุการณ์ชนิด kind; เหตุการณ์ชนิดอื่นที่มาก่อน (เช่น "invalidated" มาก่อน "published") เก็บไว้ใน pending """
+    if kind in pending: return pending.pop(kind)
+    while True:
+        event_kind, value = events.get(timeout=WAIT_SECONDS)
+        if event_kind == kind: return value
+        pending[event_kind] = value
+
+def test_publish_in_one_process_invalidates_cache_in_another(db, make_product):
+    product = make_product("BUS-1", "Before", barcode="8859999000001")
+    context = multiprocessing.get_context("spawn")
+    events, rename_done = context.Queue(), context.Event()
+    pending = {}
+
+    listener_process = context.Process(target=_listening_worker, args=(product.sku, events, rename_done))
+    listener_process.start()
+    try:
+        assert _next_event(events, "loaded", pending) == "Before"
+        publisher_process = context.Process(target=_publishing_worker, args=(product.id, events))
+        publisher_process.start()
+        publisher_process.join(WAIT_SECONDS)
+        assert publisher_process.exitcode == 0
+        assert _next_event(events, "published", pending) == product.id
+        rename_done.set()
+        assert _next_event(events, "invalidated", pending) == "products"
+        assert _next_event(events, "reloaded", pending) == "After"
+        listener_process.join(WAIT_SECONDS)
+        assert listener_process.exitcode == 0
+    finally:
+        if listener_process.is_alive(): listener_process.kill()
+
+def test_invalidate_during_load_is_not_reported_fresh(db):
+    cache = None
+    def loader(session):
+        cache.invalidate("test") # มีการ publish ระหว่างโหลด
+        return "value"
+    cache = invalidation_service.VersionedCache("test-cache", loader)
+    value, version = cache.get_with_version(db)
+    assert value == "value" and version is None
+    assert cache._state == ("value", None)
+
+def test_loaded_value_and_version_are_read_together(db):
+    cache = invalidation_service.VersionedCache("test-cache", lambda session: "value")
+    assert cache.get_with_version(db) == ("value", (0,))
+    cache.invalidate("test-cache")
+    assert cache._state == ("value", None) # ข้อมูลเดิมถูกเก็บไว้แต่ไม่มีเวอร์ชัน ต้องโหลดใหม่
@@ -0,0 +1,35 @@
+# tests/test_product_search_service.py
+import pytest
+
+from services import product_search_service
+
+@pytest.fixture
+def memory_backend(monkeypatch):
+    monkeypatch.setattr(product_search_service, "PRODUCT_SEARCH_BACKEND", "memory")
+
+def test_repeated_character_term_has_single_trigram(db, make_product, memory_backend):
+    barcode_match = make_product("SKU-A", "Apple", barcode="8850000012")
+    make_product("SKU-B", "Banana 000", barcode="8851111111") # มี "000" แต่ไม่มี "0000"
+    make_product("SKU-C", "Cherry", barcode="8852222222")
+
+    result = product_search_service.search_products(db, "0000")
+    assert [item.id for item in result["items"]] == [barcode_match.id]
+    assert result["total_count"] == 1
+
+    result = product_search_service.search_products(db, "1111")
+    assert [item.sku for item in result["items"]] == ["SKU-B"]
+
+def test_repeated_character_term_in_catalog_filter(db, make_product, memory_backend):
+    from models.product import Product
+    match = make_product("SKU-A", "Apple", barcode="8850000012")
+    make_product("SKU-B", "Banana 000")
+    condition = product_search_service.product_search_filter(db, "0000")
+    assert [product.id for product in db.query(Product).filter(condition)] == [match.id]
+
+def test_multi_term_ranking(db, make_product, memory_backend):
+    make_product("MLK-2", "Fresh milk 2L")
+    make_product("MLK-1", "Milk chocolate")
+    make_product("XYZ", "Oat drink", barcode="milk")
+    result = product_search_service.search_products(db, "milk")
+    assert [item.sku for item in result["items"]] == ["XYZ", "MLK-1", "MLK-2"]
+    assert product_search_service.search_products(db, "fresh milk")["total_count"] == 1
@@ -0,0 +1,87 @@
+# tests/test_stock_concurrency.py
+# Stress test ของลำดับ lock มาตรฐาน (apply_stock_deltas / lock_current_stock_rows): หลาย thread ขายและโอนย้าย
+# ตะกร้าที่มีสินค้าซ้อนกัน (เรียงคนละลำดับ) พร้อมกัน ต้องไม่มี deadlock และ current_stock ต้องตรงกับผลรวม ledger
+# บน SQLite การเขียนถูก serialize ทั้ง database จึงตรวจได้เฉพาะความถูกต้องของยอด (thread มากเกินไปจะเจอ "database is locked"
+# จาก busy timeout 5 วินาทีของ sqlite3 ไม่ใช่ deadlock) ให้รันกับ PostgreSQL เพื่อทดสอบ row lock จริง:
+#   TEST_DATABASE_URL=postgresql://.../stockpro_test STOCK_STRESS_THREADS=32 STOCK_STRESS_OPS=200 pytest tests/test_stock_concurrency.py
+import os
+import random
+import threading
+
+from sqlalchemy import func, insert
+
+import database
+import models
+import schemas
+from services import inventory_service, sales_service
+
+STRESS_THREADS = int(os.getenv("STOCK_STRESS_THREADS", "8"))
+STRESS_OPS = int(os.getenv("STOCK_STRESS_OPS", "25")) # ต่อ thread
+STRESS_PRODUCTS = 6 # น้อยเพื่อให้ทุกตะกร้าแย่งแถวเดียวกัน
+
+def _is_deadlock(error: BaseException) -> bool:
+    while error is not None:
+        if "deadlock" in str(error).lower(): return True
+        error = error.__cause__
+    return False
+
+def _worker(seed: int, product_ids, location_ids, barrier: threading.Barrier, errors: list) -> None:
+    rng = random.Random(seed)
+    db = database.SessionLocal()
+    try:
+        barrier.wait()
+        for _ in range(STRESS_OPS):
+            basket = rng.sample(product_ids, rng.randint(2, len(product_ids))) # ลำดับสุ่ม: service ต้องเรียงเอง
+            try:
+                if rng.random() < 0.6:
+                    sales_service.record_sale(db, schemas.SaleCreate(location_id=rng.choice(location_ids), items=[
+                        schemas.SaleItemCreate(product_id=product_id, quantity=rng.randint(1, 3), unit_price=10.0) for product_id in basket
+                    ]), allow_negative_stock_on_sale=True)
+                else:
+                    from_location_id, to_location_id = rng.sample(location_ids, 2)
+                    inventory_service.record_stock_transfer(db, schemas.StockTransferSchema(
+                        product_id=basket[0], from_location_id=from_location_id, to_location_id=to_location_id, quantity=rng.randint(1, 5)
+                    ))
+                    db.commit()
+            except ValueError as e:
+                db.rollback()
+                if e.__cause__ is not None: errors.append(e) # ValueError ที่ห่อ error ของ DB (เช่น deadlock) ไม่ใช่สต็อกไม่พอ
+            except Exception as e:
+                db.rollback()
+                errors.append(e)
+    finally:
+        db.close()
+
+def test_overlapping_sales_and_transfers_do_not_deadlock(db, make_product, make_location):
+    product_ids = [make_product(f"STRESS-{i}", f"Stress product {i}").id for i in range(STRESS_PRODUCTS)]
+    location_ids = [make_location(f"Stress location {i}").id for i in range(3)]
+    keys = [(product_id, location_id) for product_id in product_ids for location_id in location_ids]
+    db.execute(insert(models.CurrentStock), [{"product_id": p, "location_id": l, "quantity": 500.0} for p, l in keys])
+    db.execute(insert(models.InventoryTransaction), [
+        {"transaction_type": models.TransactionType.INITIAL, "quantity_change": 500.0, "product_id": p, "location_id": l} for p, l in keys
+    ])
+    db.commit()
+
+    errors: list = []
+    barrier = threading.Barrier(STRESS_THREADS)
+    threads = [threading.Thread(target=_worker, args=(seed, product_ids, location_ids, barrier, errors)) for seed in range(STRESS_THREADS)]
+    for thread in threads: thread.start()
+    for thread in threads: thread.join(timeout=300)
+
+    assert not any(thread.is_alive() for thread in threads), "stress workers did not finish (lock wait?)"
+    assert not [e for e in errors if _is_deadlock(e)], f"deadlocks: {errors[:3]}"
+    assert not errors, f"unexpected errors: {errors[:3]}"
+
+    db.expire_all()
+    stock = dict(((row.product_id, row.location_id), row.quantity) for row in db.query(models.CurrentStock))
+    ledger = dict(
+        ((row.product_id, row.location_id), row.total)
+        for row in db.query(
+            models.InventoryTransaction.product_id, models.InventoryTransaction.location_id,
+            func.sum(models.InventoryTransaction.quantity_change).label("total")
+        ).group_by(models.InventoryTransaction.product_id, models.InventoryTransaction.location_id)
+    )
+    assert stock.keys() == ledger.keys()
+    for key, quantity in stock.items():
+        assert abs(quantity - ledger[key]) < 1e-9, f"current_stock {key} = {quantity}, ledger = {ledger[key]}"
+    assert db.query(func.count(models.Sale.id)).scalar() > 0
@@ -0,0 +1,38 @@
+# tests/test_stock_count_service.py
+import models
+import schemas
+from services import inventory_service, stock_count_service
+
+def _counting_session(db, location_id: int) -> models.StockCountSession:
+    session = stock_count_service.create_stock_count_session(db, schemas.StockCountSessionCreate(location_id=location_id))
+    stock_count_service.add_all_products_from_location_to_session(db, session.id)
+    stock_count_service.start_counting_session(db, session.id)
+    return session
+
+def test_close_session_links_new_lots_to_their_adjustments(db, make_product, make_location):
+    location = make_location("Count store")
+    gain, loss, same = (make_product(f"CNT-{i}", f"Count product {i}") for i in range(3))
+    for product in (gain, loss, same):
+        inventory_service.record_stock_in(db, schemas.StockInSchema(product_id=product.id, location_id=location.id, quantity=10))
+    db.commit()
+
+    session = _counting_session(db, location.id)
+    item_ids = {item.product_id: item.id for item in db.query(models.StockCountItem).filter_by(session_id=session.id)}
+    counted = {gain.id: 14, loss.id: 7, same.id: 10}
+    result = stock_count_service.bulk_update_counted_quantities(db, session.id, [
+        schemas.StockCountItemBulkEntry(item_id=item_ids[product_id], counted_quantity=quantity) for product_id, quantity in counted.items()
+    ])
+    assert result["errors"] == []
+    stock_count_service.close_stock_count_session(db, session.id)
+
+    adjustments = {
+        transaction.product_id: transaction for transaction in db.query(models.InventoryTransaction).filter(
+            models.InventoryTransaction.transaction_type.in_([models.TransactionType.ADJUSTMENT_ADD, models.TransactionType.ADJUSTMENT_SUB])
+        )
+    }
+    assert {product_id: transaction.quantity_change for product_id, transaction in adjustments.items()} == {gain.id: 4, loss.id: -3}
+    adjustment_lot = db.query(models.StockLot).filter_by(product_id=gain.id, received_quantity=4).one()
+    assert adjustment_lot.source_transaction_id == adjustments[gain.id].id
+    assert db.query(models.StockLot).filter(models.StockLot.source_transaction_id.is_(None)).count() == 0
+    stock = {row.product_id: row.quantity for row in db.query(models.CurrentStock).filter_by(location_id=location.id)}
+    assert stock == counted
@@ -0,0 +1,144 @@
+# tests/test_stock_lot_service.py
+# ล็อตสินค้า (FEFO) ผ่าน service จริง: รับเข้า ขาย โอนย้าย ปรับปรุง และรายงานใกล้หมดอายุ
+import importlib.util
+import os
+from datetime import date, datetime, timedelta, timezone
+
+from alembic.operations import Operations
+from alembic.runtime.migration import MigrationContext
+from sqlalchemy import insert
+
+import models
+import schemas
+from services import inventory_service, sales_service, stock_lot_service
+
+TODAY = date(2026, 1, 10)
+BACKFILL_MIGRATION_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "alembic", "versions", "f6c3d8a2b514_add_stock_lots_table.py"
+)
+
+def _stock_in(db, product, location, quantity, expiry_date=None, cost_per_unit=None) -> models.InventoryTransaction:
+    transaction = inventory_service.record_stock_in(db, schemas.StockInSchema(
+        product_id=product.id, location_id=location.id, quantity=quantity, expiry_date=expiry_date, cost_per_unit=cost_per_unit
+    ))
+    db.commit()
+    return transaction
+
+def _sell(db, product, location, quantity) -> None:
+    sales_service.record_sale(db, schemas.SaleCreate(location_id=location.id, items=[
+        schemas.SaleItemCreate(product_id=product.id, quantity=quantity, unit_price=10.0)
+    ]), allow_negative_stock_on_sale=True)
+
+def _lots(db, product, location):
+    """ [(expiry_date, cost_per_unit, received_quantity, remaining_qty), ...] เรียงตามลำดับที่สร้าง """
+    db.expire_all()
+    return [
+        (lot.expiry_date, lot.cost_per_unit, lot.received_quantity, lot.remaining_qty)
+        for lot in db.query(models.StockLot).filter_by(product_id=product.id, location_id=location.id).order_by(models.StockLot.id)
+    ]
+
+def test_sale_consumes_earliest_expiry_first_across_two_lots(db, make_product, make_location):
+    product, location = make_product("LOT-1", "Lot product"), make_location("Lot location")
+    _stock_in(db, product, location, 5, expiry_date=None)                       # ไม่มีวันหมดอายุ: ตัดหลังสุด
+    _stock_in(db, product, location, 4, expiry_date=TODAY + timedelta(days=20))
+    _stock_in(db, product, location, 3, expiry_date=TODAY + timedelta(days=5))
+
+    _sell(db, product, location, 5)
+
+    assert _lots(db, product, location) == [
+        (None, None, 5, 5),
+        (TODAY + timedelta(days=20), None, 4, 2),
+        (TODAY + timedelta(days=5), None, 3, 0),
+    ]
+
+def test_stock_in_after_negative_stock_deducts_deficit_from_new_lot(db, make_product, make_location):
+    product, location = make_product("LOT-2", "Lot product 2"), make_location("Lot location 2")
+    _sell(db, product, location, 3) # ขายก่อนรับของ: ยอด -3 ไม่มีล็อตให้ตัด
+    assert _lots(db, product, location) == []
+
+    transaction = _stock_in(db, product, location, 10, expiry_date=TODAY + timedelta(days=30))
+
+    assert _lots(db, product, location) == [(TODAY + timedelta(days=30), None, 10, 7)]
+    assert inventory_service.get_current_stock_record(db, product.id, location.id).quantity == 7
+    assert db.query(models.StockLot).filter_by(product_id=product.id).one().source_transaction_id == transaction.id
+
+def test_stock_in_smaller_than_deficit_leaves_empty_lot(db, make_product, make_location):
+    product, location = make_product("LOT-3", "Lot product 3"), make_location("Lot location 3")
+    _sell(db, product, location, 8)
+
+    _stock_in(db, product, location, 5, expiry_date=TODAY + timedelta(days=30))
+
+    assert _lots(db, product, location) == [(TODAY + timedelta(days=30), None, 5, 0)]
+    assert inventory_service.get_current_stock_record(db, product.id, location.id).quantity == -3
+
+def test_transfer_keeps_expiry_and_cost_and_adds_no_expiry_lot_for_uncovered_part(db, make_product, make_location):
+    product = make_product("LOT-4", "Lot product 4")
+    from_location, to_location = make_location("Lot from"), make_location("Lot to")
+    inventory_service.apply_stock_deltas(db, [((product.id, from_location.id), 5.0)]) # ยอดเก่าที่ไม่มีล็อต
+    db.commit()
+    _stock_in(db, product, from_location, 3, expiry_date=TODAY + timedelta(days=12), cost_per_unit=7.5)
+
+    _, tx_in = inventory_service.record_stock_transfer(db, schemas.StockTransferSchema(
+        product_id=product.id, from_location_id=from_location.id, to_location_id=to_location.id, quantity=6
+    ))
+    db.commit()
+
+    assert _lots(db, product, from_location) == [(TODAY + timedelta(days=12), 7.5, 3, 0)]
+    assert _lots(db, product, to_location) == [
+        (TODAY + timedelta(days=12), 7.5, 3, 3),
+        (None, None, 3, 3),
+    ]
+    assert {lot.source_transaction_id for lot in db.query(models.StockLot).filter_by(location_id=to_location.id)} == {tx_in.id}
+
+def test_negative_adjustment_consumes_lots_fefo(db, make_product, make_location):
+    product, location = make_product("LOT-5", "Lot product 5"), make_location("Lot location 5")
+    _stock_in(db, product, location, 4, expiry_date=TODAY + timedelta(days=9))
+    _stock_in(db, product, location, 4, expiry_date=TODAY + timedelta(days=2))
+
+    inventory_service.record_stock_adjustment(db, schemas.StockAdjustmentSchema(
+        product_id=product.id, location_id=location.id, quantity_change=-6, reason="damaged"
+    ))
+    db.commit()
+
+    assert _lots(db, product, location) == [
+        (TODAY + timedelta(days=9), None, 4, 2),
+        (TODAY + timedelta(days=2), None, 4, 0),
+    ]
+    assert inventory_service.get_current_stock_record(db, product.id, location.id).quantity == 2
+
+def test_count_near_expiry_products_ignores_used_up_lots(db, make_product, make_location):
+    location = make_location("Lot location 6")
+    sold_out, still_on_shelf, far_expiry = (make_product(f"LOT-6{i}", f"Lot product 6{i}") for i in range(3))
+    _stock_in(db, sold_out, location, 2, expiry_date=TODAY + timedelta(days=3))
+    _stock_in(db, still_on_shelf, location, 2, expiry_date=TODAY + timedelta(days=3))
+    _stock_in(db, far_expiry, location, 2, expiry_date=TODAY + timedelta(days=60))
+    assert stock_lot_service.count_near_expiry_products(db, days_ahead=7, today=TODAY) == 2
+
+    _sell(db, sold_out, location, 2)
+    _sell(db, still_on_shelf, location, 1)
+
+    assert stock_lot_service.count_near_expiry_products(db, days_ahead=7, today=TODAY) == 1
+
+def test_migration_backfills_lots_from_latest_stock_ins(db, make_product, make_location):
+    product, location = make_product("LOT-7", "Lot product 7"), make_location("Lot location 7")
+    db.execute(insert(models.InventoryTransaction), [
+        {"transaction_type": models.TransactionType.STOCK_IN, "product_id": product.id, "location_id": location.id,
+         "quantity_change": quantity, "expiry_date": expiry_date, "cost_per_unit": 5.0,
+         "transaction_date": datetime(2025, 12, day, tzinfo=timezone.utc)}
+        for day, quantity, expiry_date in ((1, 10, TODAY + timedelta(days=1)), (5, 4, TODAY + timedelta(days=8)))
+    ])
+    db.execute(insert(models.CurrentStock), [{"product_id": product.id, "location_id": location.id, "quantity": 16.0}])
+    db.commit()
+
+    spec = importlib.util.spec_from_file_location("add_stock_lots_table", BACKFILL_MIGRATION_PATH)
+    migration = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(migration)
+    with db.get_bind().begin() as connection, Operations.context(MigrationContext.configure(connection)):
+        migration._backfill_lots()
+
+    # ยอด 16: รับเข้าล่าสุด (4) ก่อน แล้วรับเข้าก่อนหน้า (10) ส่วนที่เกิน (2) เป็นล็อตไม่มีวันหมดอายุ
+    assert sorted(_lots(db, product, location), key=lambda lot: lot[0] or date.max) == [
+        (TODAY + timedelta(days=1), 5.0, 10, 10),
+        (TODAY + timedelta(days=8), 5.0, 4, 4),
+        (None, None, 2, 2),
+    ]
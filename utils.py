@@ -1,8 +1,39 @@
 # gofresh_stockpro/utils.py
 import datetime
+import base64
+import binascii
+import csv
+import io
+import json
+from email.utils import format_datetime, parsedate_to_datetime
 from urllib.parse import urlencode as JinjaUrlencode, parse_qs, urlsplit, urlunsplit, quote_plus
 from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
-from typing import Optional, Union
+from typing import Optional, Union, Dict, Any, List, Tuple, Callable, Iterable, Iterator, Sequence
+from starlette.requests import Request
+from starlette.responses import Response
+from sqlalchemy import and_, or_, func
+from sqlalchemy.orm import Query
+
+try:
+    BANGKOK_TZ: datetime.tzinfo = ZoneInfo("Asia/Bangkok")
+except ZoneInfoNotFoundError:
+    BANGKOK_TZ = datetime.timezone(datetime.timedelta(hours=7), "Asia/Bangkok") # ไทยไม่มี DST จึงใช้ UTC+7 คงที่แทนได้
+
+def to_bangkok_date(value: datetime.datetime) -> datetime.date:
+    """ วันทำการ (business date) ตามเวลาไทยของ datetime ที่ระบุ (naive ถือเป็น UTC) """
+    if value.tzinfo is None or value.tzinfo.utcoffset(value) is None:
+        value = value.replace(tzinfo=datetime.timezone.utc)
+    return value.astimezone(BANGKOK_TZ).date()
+
+def bangkok_today() -> datetime.date:
+    """ วันที่ปัจจุบันตามเวลาไทย (แทน date.today() ซึ่งขึ้นกับ timezone ของ server) """
+    return datetime.datetime.now(BANGKOK_TZ).date()
+
+def bangkok_day_bounds(day: datetime.date) -> Tuple[datetime.datetime, datetime.datetime]:
+    """ ช่วงเวลา [เริ่ม, สิ้นสุด) ของวันตามเวลาไทย แปลงเป็น UTC สำหรับใช้กรองคอลัมน์ timestamp """
+    start = datetime.datetime.combine(day, datetime.time.min, tzinfo=BANGKOK_TZ)
+    end = start + datetime.timedelta(days=1)
+    return start.astimezone(datetime.timezone.utc), end.astimezone(datetime.timezone.utc)
 
 def format_thai_datetime(value: Optional[Union[datetime.datetime, datetime.date]], format_str: str = "%d/%m/%Y %H:%M") -> str:
     """Jinja2 filter to convert UTC or naive datetime to Thai time and format it."""
@@ -89,4 +120,167 @@ def generate_filter_url_for_template(request_url_str: str, base_path_for_route:
 
     query_string_built = JinjaUrlencode(final_query_params)
     separator = "?" if query_string_built else ""
-    return f"{base_path_for_route.rstrip('/')}{separator}{query_string_built}"
\ No newline at end of file
+    return f"{base_path_for_route.rstrip('/')}{separator}{query_string_built}"
+
+
+async def get_form_data(request: Request) -> Dict[str, Any]:
+    """
+    FastAPI dependency that reads the submitted form into a plain dict.
+    Lets DB-bound handlers stay plain `def` (run on the thread pool) while still
+    reading dynamic form fields such as items[0][product_id] or count_for_<id>.
+    """
+    return dict(await request.form())
+
+
+# --- Keyset (cursor) pagination ---
+COUNT_MODES = ("exact", "estimate", "none")
+
+def encode_cursor(sort_value: datetime.datetime, row_id: int) -> str:
+    """ เข้ารหัสตำแหน่งแถวสุดท้ายของหน้า (sort_value, id) เป็น cursor string แบบ URL-safe """
+    raw = f"{sort_value.isoformat()}|{row_id}".encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+def decode_cursor(cursor: str) -> Tuple[datetime.datetime, int]:
+    """ ถอดรหัส cursor จาก encode_cursor, raise ValueError ถ้า cursor ไม่ถูกต้อง """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode("utf-8")
+        sort_value_str, row_id_str = raw.rsplit("|", 1)
+        return datetime.datetime.fromisoformat(sort_value_str), int(row_id_str)
+    except (ValueError, UnicodeDecodeError, binascii.Error) as e:
+        raise ValueError(f"cursor ไม่ถูกต้อง: '{cursor}'") from e
+
+def paginate_keyset(query: Query, sort_column, id_column, limit: int, skip: int = 0, cursor: Optional[str] = None) -> Tuple[List[Any], Optional[str]]:
+    """
+    ดึงหน้าข้อมูลเรียงจากใหม่ไปเก่าตาม (sort_column DESC, id_column DESC)
+    - ถ้ามี cursor: ใช้ WHERE (sort, id) < (cursor) แทน OFFSET ความเร็วเท่ากันทุกหน้า ไม่ว่าจะลึกแค่ไหน
+    - ถ้าไม่มี cursor: ใช้ OFFSET skip แบบเดิม (สำหรับหน้าที่ระบุเลขหน้า)
+    ดึงเกิน 1 แถวเพื่อรู้ว่ามีหน้าถัดไปหรือไม่ คืนค่า (items, next_cursor) โดย next_cursor เป็น None ถ้าเป็นหน้าสุดท้าย
+    """
+    query = query.order_by(sort_column.desc(), id_column.desc())
+    if cursor:
+        cursor_sort_value, cursor_id = decode_cursor(cursor)
+        sort_expr, cursor_sort_expr = sort_column, cursor_sort_value
+        if query.session.get_bind().dialect.name == "sqlite":
+            # SQLite เก็บ datetime เป็น text หลายรูปแบบ (CURRENT_TIMESTAMP ไม่มีเศษวินาที) จึงต้องแปลงทั้งสองฝั่งให้รูปแบบเดียวกันก่อนเทียบ
+            sort_expr = func.strftime("%Y-%m-%d %H:%M:%f", sort_column)
+            cursor_sort_expr = func.strftime("%Y-%m-%d %H:%M:%f", cursor_sort_value.strftime("%Y-%m-%d %H:%M:%S.%f"))
+        query = query.filter(sort_column <= cursor_sort_value, or_( # เงื่อนไขแรกให้ใช้ index ของ sort_column ได้
+            sort_expr < cursor_sort_expr,
+            and_(sort_expr == cursor_sort_expr, id_column < cursor_id)
+        ))
+    elif skip:
+        query = query.offset(skip)
+    rows = query.limit(limit + 1).all()
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    last_row = rows[-1]
+    return rows, encode_cursor(getattr(last_row, sort_column.key), getattr(last_row, id_column.key))
+
+def count_for_pagination(query: Query, count_mode: str = "exact") -> Optional[int]:
+    """
+    นับจำนวนแถวทั้งหมดของ query ตาม count_mode
+    - "exact": COUNT(*) ตามเดิม
+    - "estimate": PostgreSQL ใช้จำนวนแถวที่ planner ประมาณจาก EXPLAIN (ไม่ต้อง scan), dialect อื่นใช้ COUNT(*)
+    - "none": ไม่นับ คืน None
+    """
+    if count_mode not in COUNT_MODES:
+        raise ValueError(f"count_mode ไม่ถูกต้อง: '{count_mode}' (ต้องเป็น {', '.join(COUNT_MODES)})")
+    if count_mode == "none":
+        return None
+    if count_mode == "estimate" and query.session.get_bind().dialect.name == "postgresql":
+        compiled = query.statement.compile(dialect=query.session.get_bind().dialect)
+        plan = query.session.connection().exec_driver_sql(f"EXPLAIN (FORMAT JSON) {compiled}", compiled.params).scalar()
+        if isinstance(plan, str): plan = json.loads(plan)
+        return int(plan[0]["Plan"]["Plan Rows"])
+    return query.count()
+
+def set_pagination_headers(response: Response, page_data: Dict[str, Any]) -> None:
+    """ ใส่ X-Next-Cursor / X-Total-Count ให้ API ที่คืนค่าเป็น list (ไม่เปลี่ยนรูปแบบ body เดิม) """
+    if page_data.get("next_cursor"):
+        response.headers["X-Next-Cursor"] = page_data["next_cursor"]
+    if page_data.get("total_count") is not None:
+        response.headers["X-Total-Count"] = str(page_data["total_count"])
+
+# --- CSV export แบบ streaming ---
+CSV_EXPORT_FLUSH_ROWS = 1000 # จำนวนแถวต่อ chunk ที่ส่งออกไป
+
+def _csv_datetime(value: datetime.datetime) -> str:
+    if value.tzinfo is None or value.tzinfo.utcoffset(value) is None: value = value.replace(tzinfo=datetime.timezone.utc) # naive = UTC
+    return value.astimezone(BANGKOK_TZ).strftime("%Y-%m-%d %H:%M:%S")
+
+_CSV_PLAIN_TYPES = frozenset((str, int, float, bool, type(None)))
+_CSV_CONVERTERS = {datetime.datetime: _csv_datetime, datetime.date: datetime.date.isoformat}
+
+def _csv_cell(value: Any) -> Any:
+    value_type = type(value)
+    if value_type in _CSV_PLAIN_TYPES: return value
+    converter = _CSV_CONVERTERS.get(value_type)
+    if converter is not None: return converter(value)
+    return getattr(value, "value", value) # Enum -> ค่า (เช่น "STOCK_IN")
+
+def stream_csv_rows(header: Sequence[str], rows: Iterable[Sequence[Any]]) -> Iterator[bytes]:
+    """
+    แปลง rows เป็น CSV (UTF-8 มี BOM ให้ Excel อ่านภาษาไทยได้) ทีละ CSV_EXPORT_FLUSH_ROWS แถว
+    datetime แสดงเป็นเวลาไทย date เป็น YYYY-MM-DD หน่วยความจำคงที่ไม่ว่าจะมีกี่แถว
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    buffer.write("\ufeff")
+    writer.writerow(header)
+    pending = 0
+    for row in rows:
+        writer.writerow([_csv_cell(value) for value in row])
+        pending += 1
+        if pending >= CSV_EXPORT_FLUSH_ROWS:
+            yield buffer.getvalue().encode("utf-8")
+            buffer.seek(0); buffer.truncate(0); pending = 0
+    yield buffer.getvalue().encode("utf-8")
+
+def stream_csv_export(session_factory: Callable[[], Any], header: Sequence[str], iter_rows: Callable[..., Iterable[Sequence[Any]]], **filters: Any) -> Iterator[bytes]:
+    """
+    generator สำหรับ StreamingResponse: เปิด session ของตัวเอง (session จาก Depends(get_db) ถูกปิดก่อนส่ง body)
+    แล้วส่ง iter_rows(db, **filters) ออกเป็น CSV ปิด session เมื่อจบหรือ client ตัดการเชื่อมต่อ
+    """
+    db = session_factory()
+    try:
+        yield from stream_csv_rows(header, iter_rows(db, **filters))
+    except Exception as e: # header 200 ถูกส่งไปแล้ว แจ้งได้แค่ใน log
+        print(f"!!! Error while streaming CSV export: {type(e).__name__} - {e}")
+        raise
+    finally:
+        db.close()
+
+def csv_attachment_headers(filename_prefix: str) -> Dict[str, str]:
+    """ Content-Disposition สำหรับไฟล์ CSV ชื่อ <prefix>_<YYYYMMDD-HHMM>.csv (เวลาไทย) """
+    stamp = datetime.datetime.now(BANGKOK_TZ).strftime("%Y%m%d-%H%M")
+    return {"Content-Disposition": f'attachment; filename="{filename_prefix}_{stamp}.csv"', "Cache-Control": "no-store",
+            "X-Accel-Buffering": "no"}
+
+def export_url(request: Request, route_name: str, **params: Any) -> str:
+    """ URL ของ route export พร้อมตัวกรองปัจจุบันของหน้า (ตัดค่าว่าง / None ออก) """
+    query = {key: getattr(value, "name", value) for key, value in params.items() if value not in (None, "")}
+    path = request.app.url_path_for(route_name)
+    return f"{path}?{JinjaUrlencode(query)}" if query else str(path)
+
+# --- Conditional GET (ETag / Last-Modified) ---
+def conditional_get_headers(etag: str, last_modified: Optional[datetime.datetime]) -> Dict[str, str]:
+    """ header ETag / Last-Modified + Cache-Control: no-cache (ให้ browser/จอแสดงผล revalidate ทุกครั้งแทนการใช้ของเก่า) """
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if last_modified is not None:
+        headers["Last-Modified"] = format_datetime(last_modified.astimezone(datetime.timezone.utc), usegmt=True)
+    return headers
+
+def is_not_modified(request: Request, etag: str, last_modified: Optional[datetime.datetime]) -> bool:
+    """ True ถ้า request มี If-None-Match ตรงกับ etag (weak comparison) หรือ If-Modified-Since ไม่เก่ากว่า last_modified """
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None: # ถ้ามี If-None-Match ให้ใช้อย่างเดียว (RFC 9110)
+        strip_weak = lambda tag: tag.strip().removeprefix("W/")
+        return if_none_match.strip() == "*" or strip_weak(etag) in {strip_weak(tag) for tag in if_none_match.split(",")}
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since and last_modified is not None:
+        try:
+            return last_modified <= parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+    return False